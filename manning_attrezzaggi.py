@@ -0,0 +1,133 @@
+# Processo manning - tempi di attrezzaggio (cambi lotto) e fabbisogno Attrezzisti
+# Le ore di attrezzaggio da numero lotti x tempo di cambio si sommano alle ore macchina e generano la domanda di Attrezzisti
+# rev1: lotti per Risorsa e mese (formato volumi_bgt), tempi per Risorsa, Attrezzisti del foglio equipaggi sostituiti per gruppo
+# rev2: risorse con tempo di cambio vuoto o nullo escluse, modello con Minuti_attrezzaggio da compilare (vuoto)
+
+import numpy as np
+import pandas as pd
+
+# Tempi per Risorsa: obbligatorie Risorsa e Minuti_attrezzaggio (per cambio lotto); facoltativa Attrezzisti_per_cambio
+COLONNE_TEMPI_OBBLIGATORIE = ['Risorsa', 'Minuti_attrezzaggio']
+
+
+####### Funzioni di utilità
+
+def prepara_attrezzaggi(df_lotti, df_tempi):
+    """
+    Ore di attrezzaggio per Risorsa e mese: Lotti x Minuti_attrezzaggio / 60, in un'unica operazione vettoriale.
+
+    Args:
+        df_lotti: DataFrame lotti nel formato volumi_bgt (Gruppo_risorse, Risorsa e una colonna per mese)
+            oppure long con Risorsa, Anno_Mese e Lotti
+        df_tempi: DataFrame con Risorsa, Minuti_attrezzaggio e facoltativa Attrezzisti_per_cambio (default 1)
+
+    Returns:
+        DataFrame df_attrezzaggi con Risorsa, Anno_Mese, Lotti, Minuti_attrezzaggio, Attrezzisti_per_cambio,
+        ore_attrezzaggio (ore macchina) e ore_attrezzisti (ore persona degli Attrezzisti); le risorse con
+        Minuti_attrezzaggio vuoto o nullo non hanno tempi di attrezzaggio e restano fuori
+    """
+    mancanti = set(COLONNE_TEMPI_OBBLIGATORIE) - set(df_tempi.columns)
+    if mancanti:
+        raise ValueError(f"Tempi attrezzaggio: colonne mancanti {', '.join(sorted(mancanti))}")
+
+    if 'Anno_Mese' in df_lotti.columns:
+        df_lotti_long = df_lotti[['Risorsa', 'Anno_Mese', 'Lotti']].copy()
+    else:
+        colonne_mese = [col for col in df_lotti.columns if col not in ('Gruppo_risorse', 'Risorsa')]
+        df_lotti_long = df_lotti.melt(id_vars=['Risorsa'], value_vars=colonne_mese, var_name='Periodo', value_name='Lotti')
+        df_lotti_long['Anno_Mese'] = pd.to_datetime(df_lotti_long.pop('Periodo')).dt.to_period('M').astype(str)
+    df_lotti_long['Risorsa'] = df_lotti_long['Risorsa'].astype(str)
+    df_lotti_long['Lotti'] = pd.to_numeric(df_lotti_long['Lotti'], errors='coerce').fillna(0.0)
+
+    df_tempi = df_tempi.drop_duplicates('Risorsa').assign(Risorsa=lambda df: df['Risorsa'].astype(str),
+                                                          Minuti_attrezzaggio=lambda df: pd.to_numeric(df['Minuti_attrezzaggio'], errors='coerce'))
+    # Righe del modello non compilate: senza tempi il gruppo mantiene gli Attrezzisti del foglio equipaggi
+    df_tempi = df_tempi[df_tempi['Minuti_attrezzaggio'] > 0]
+    if 'Attrezzisti_per_cambio' not in df_tempi.columns:
+        df_tempi = df_tempi.assign(Attrezzisti_per_cambio=1.0)
+    df_attrezzaggi = df_lotti_long.groupby(['Risorsa', 'Anno_Mese'], as_index=False)['Lotti'].sum().merge(
+        df_tempi[['Risorsa', 'Minuti_attrezzaggio', 'Attrezzisti_per_cambio']], on='Risorsa', how='inner')
+    df_attrezzaggi['Attrezzisti_per_cambio'] = df_attrezzaggi['Attrezzisti_per_cambio'].fillna(1.0)
+
+    df_attrezzaggi['ore_attrezzaggio'] = df_attrezzaggi['Lotti'] * df_attrezzaggi['Minuti_attrezzaggio'] / 60
+    df_attrezzaggi['ore_attrezzisti'] = df_attrezzaggi['ore_attrezzaggio'] * df_attrezzaggi['Attrezzisti_per_cambio']
+    return df_attrezzaggi
+
+
+def aggiungi_ore_attrezzaggio(df_melted_equipaggi, df_attrezzaggi):
+    """
+    Somma le ore di attrezzaggio alle ore macchina (l'equipaggio della Risorsa è impegnato anche nel cambio).
+
+    Args:
+        df_melted_equipaggi: DataFrame con Risorsa, Anno_Mese e ore_macchina
+        df_attrezzaggi: DataFrame da prepara_attrezzaggi
+
+    Returns:
+        DataFrame con ore_attrezzaggio e ore_macchina comprensive dei cambi
+    """
+    df_melted_equipaggi = df_melted_equipaggi.merge(df_attrezzaggi[['Risorsa', 'Anno_Mese', 'ore_attrezzaggio']],
+                                                    on=['Risorsa', 'Anno_Mese'], how='left')
+    # fill_value: un mese senza volume ma con lotti ha solo ore di cambio, senza né volume né lotti resta NaN
+    df_melted_equipaggi['ore_macchina'] = df_melted_equipaggi['ore_macchina'].add(df_melted_equipaggi['ore_attrezzaggio'], fill_value=0)
+    return df_melted_equipaggi
+
+
+def sostituisci_attrezzisti(df_indiretti_attrezzisti_melted, df_attrezzaggi, df_efficienza_oee, df_calendario_melted,
+                            df_assenteismo_ferie, ore_standard):
+    """
+    Attrezzisti per Gruppo_risorse e mese dalle ore di cambio al posto dei valori fissi del foglio equipaggi.
+
+    Head count = ore_attrezzisti / (Giorni_lavorativi x ore_standard) x (1 + Assenteismo) x (1 + Copertura_ferie).
+    I gruppi senza tempi di attrezzaggio (nessuna Risorsa con Minuti_attrezzaggio > 0) mantengono gli Attrezzisti del foglio.
+
+    Args:
+        df_indiretti_attrezzisti_melted: DataFrame da prepara_indiretti
+        df_attrezzaggi: DataFrame da prepara_attrezzaggi
+        df_efficienza_oee: DataFrame con Gruppo_risorse per Risorsa
+        df_calendario_melted: DataFrame con giorni lavorativi per Gruppo_risorse e Anno_Mese
+        df_assenteismo_ferie: DataFrame con Assenteismo e Copertura_ferie per Gruppo_risorse
+        ore_standard: Ore standard di lavoro
+
+    Returns:
+        DataFrame nel formato di prepara_indiretti con gli Attrezzisti calcolati
+    """
+    gruppi = df_efficienza_oee.drop_duplicates('Risorsa').assign(Risorsa=lambda df: df['Risorsa'].astype(str)).set_index('Risorsa')['Gruppo_risorse']
+    df_attrezzisti = df_attrezzaggi[df_attrezzaggi['Minuti_attrezzaggio'] > 0]
+    df_attrezzisti = df_attrezzisti.assign(Gruppo_risorse=df_attrezzisti['Risorsa'].map(gruppi)).dropna(subset=['Gruppo_risorse'])
+    df_attrezzisti = df_attrezzisti.groupby(['Gruppo_risorse', 'Anno_Mese'], as_index=False)['ore_attrezzisti'].sum()
+
+    df_attrezzisti = df_attrezzisti.merge(df_calendario_melted[['Gruppo_risorse', 'Anno_Mese', 'Giorni_lavorativi']],
+                                          on=['Gruppo_risorse', 'Anno_Mese'], how='left')
+    df_attrezzisti = df_attrezzisti.merge(df_assenteismo_ferie[['Gruppo_risorse', 'Assenteismo', 'Copertura_ferie']],
+                                          on='Gruppo_risorse', how='left')
+    df_attrezzisti['Equipaggi'] = (df_attrezzisti['ore_attrezzisti'] / (df_attrezzisti['Giorni_lavorativi'] * ore_standard)
+                                   * (1 + df_attrezzisti['Assenteismo'].fillna(0)) * (1 + df_attrezzisti['Copertura_ferie'].fillna(0)))
+    df_attrezzisti['Risorsa'] = 'Attrezzisti'
+    df_attrezzisti['Periodo_dt'] = pd.to_datetime(df_attrezzisti['Anno_Mese'] + '-01')
+    df_attrezzisti['Periodo'] = df_attrezzisti['Periodo_dt']
+
+    sostituiti = (df_indiretti_attrezzisti_melted['Risorsa'] == 'Attrezzisti') & \
+        df_indiretti_attrezzisti_melted['Gruppo_risorse'].isin(df_attrezzisti['Gruppo_risorse'])
+    return pd.concat([df_indiretti_attrezzisti_melted[~sostituiti], df_attrezzisti[df_indiretti_attrezzisti_melted.columns]],
+                     ignore_index=True)
+
+
+def crea_modello_attrezzaggi(df_volume, df_efficienza_oee):
+    """
+    Modello di input da compilare: foglio lotti con righe e mesi di volumi_bgt e foglio tempi per Risorsa.
+
+    Minuti_attrezzaggio è vuoto: le risorse lasciate vuote non hanno tempi di attrezzaggio.
+
+    Args:
+        df_volume: DataFrame del foglio volumi_bgt
+        df_efficienza_oee: DataFrame del foglio efficienza_oee
+
+    Returns:
+        Dizionario nome foglio -> DataFrame per esporta_excel
+    """
+    df_lotti = df_volume.copy()
+    colonne_mese = [col for col in df_lotti.columns if col not in ('Gruppo_risorse', 'Risorsa')]
+    df_lotti[colonne_mese] = 0
+    df_tempi = df_efficienza_oee[['Gruppo_risorse', 'Risorsa']].drop_duplicates('Risorsa').assign(
+        Minuti_attrezzaggio=np.nan, Attrezzisti_per_cambio=1.0)
+    return {'lotti': df_lotti, 'tempi_attrezzaggio': df_tempi}
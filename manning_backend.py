@@ -0,0 +1,301 @@
+# Processo manning - backend di esecuzione per piani volumi di dettaglio (SKU / ordini)
+# I piani da milioni di righe sono aggregati a Risorsa x mese prima della fase di head count
+# rev1: backend pandas (tutto in memoria), blocchi (lettura a blocchi di Parquet/CSV) e duckdb (SQL lazy out-of-core)
+# rev2: leggi_a_blocchi pubblica e su buffer, usata anche per gli export ordini ERP
+# rev3: ore di attrezzaggio e Attrezzisti calcolati anche nella query duckdb
+# rev4: con il modello a driver degli indiretti duckdb aggrega il piano e la catena passa da calcola_manning
+# Polars non incluso: il percorso lazy out-of-core è coperto da duckdb, senza una seconda dipendenza
+#
+# File di dettaglio (Parquet o CSV): Risorsa, Volume, Anno_Mese ('YYYY-MM') o Periodo (data),
+# Velocità facoltativa (pezzi/ora dello SKU sulla Risorsa, se manca vale la Velocità_LL della Risorsa)
+
+import os
+import importlib.util
+import pandas as pd
+import numpy as np
+from manning_pipeline import calcola_manning, identifica_colonne_data, prepara_indiretti, aggiorna_avanzamento
+from manning_attrezzaggi import sostituisci_attrezzisti
+
+BACKEND = ['pandas', 'blocchi', 'duckdb']
+
+# Catena da volumi di dettaglio a df_analisi, stesse formule di calcola_equipaggi, calcola_ore_uomo_dirette e calcola_analisi
+SQL_MANNING = """
+WITH dettaglio AS (
+    SELECT CAST("Risorsa" AS VARCHAR) AS Risorsa, {mese} AS Anno_Mese,
+           CAST("Volume" AS DOUBLE) AS Volume, {velocita} AS Velocita_sku
+    FROM {sorgente}
+),
+volumi AS (
+    SELECT d.Risorsa, d.Anno_Mese, SUM(d.Volume) AS Volume,
+           SUM(d.Volume / COALESCE(d.Velocita_sku, v.Velocita_LL)) AS ore_macchina
+    FROM dettaglio d
+    LEFT JOIN velocita_risorsa v ON v.Risorsa = d.Risorsa
+    GROUP BY d.Risorsa, d.Anno_Mese
+),
+risorsa_mese AS (
+    SELECT q.Gruppo_risorse, q.Risorsa, q.Anno_Mese, w.Volume,
+           CASE WHEN w.ore_macchina IS NULL AND s.ore_attrezzaggio IS NULL THEN NULL
+                ELSE COALESCE(w.ore_macchina, 0) + COALESCE(s.ore_attrezzaggio, 0) END AS ore_macchina,
+           CASE WHEN q.Risorsa ILIKE '%mastercut%' THEN q.Equipaggi / 5 ELSE q.Equipaggi END
+               * {ore_standard} / COALESCE(t.Ore_turno, {ore_standard}) AS Equipaggi
+    FROM equipaggi_long q
+    JOIN (SELECT Risorsa FROM efficienza WHERE "Velocità_LL" IS NOT NULL) e ON e.Risorsa = q.Risorsa
+    LEFT JOIN volumi w ON w.Risorsa = q.Risorsa AND w.Anno_Mese = q.Anno_Mese
+    LEFT JOIN attrezzaggi s ON s.Risorsa = q.Risorsa AND s.Anno_Mese = q.Anno_Mese
+    LEFT JOIN piano_turni t ON t.Gruppo_risorse = q.Gruppo_risorse AND t.Risorsa = q.Risorsa AND t.Anno_Mese = q.Anno_Mese
+),
+gruppo AS (
+    SELECT Gruppo_risorse, Anno_Mese, COALESCE(SUM(ore_macchina * Equipaggi), 0) AS ore_uomo
+    FROM risorsa_mese
+    GROUP BY Gruppo_risorse, Anno_Mese
+),
+head_count AS (
+    SELECT g.Gruppo_risorse, g.Anno_Mese, g.ore_uomo, c.Giorni_lavorativi, qd.Quadratura,
+           g.ore_uomo / (c.Giorni_lavorativi * {ore_standard}) AS head_count,
+           a.Assenteismo, a.Copertura_ferie
+    FROM gruppo g
+    LEFT JOIN calendario c ON c.Gruppo_risorse = g.Gruppo_risorse AND c.Anno_Mese = g.Anno_Mese
+    LEFT JOIN (SELECT DISTINCT Gruppo_risorse, Quadratura FROM efficienza) qd ON qd.Gruppo_risorse = g.Gruppo_risorse
+    LEFT JOIN assenteismo_ferie a ON a.Gruppo_risorse = g.Gruppo_risorse
+),
+ore_uomo_dirette AS (
+    SELECT *,
+           head_count / (Quadratura / 100) AS head_count_quadratura,
+           head_count / (Quadratura / 100) * (1 + Assenteismo) AS head_count_assenteismo,
+           head_count / (Quadratura / 100) * (1 + Assenteismo) * (1 + Copertura_ferie) AS head_count_assenteismo_ferie
+    FROM head_count
+),
+diretti AS (
+    SELECT Gruppo_risorse, Anno_Mese, COALESCE(SUM(head_count_assenteismo_ferie), 0) AS "Head Count Diretti"
+    FROM ore_uomo_dirette
+    GROUP BY Gruppo_risorse, Anno_Mese
+),
+indiretti AS (
+    SELECT Gruppo_risorse, Anno_Mese, COALESCE(SUM(Equipaggi), 0) AS "Head Count Indiretti e Attrezzisti"
+    FROM indiretti_long
+    GROUP BY Gruppo_risorse, Anno_Mese
+)
+SELECT Gruppo_risorse, Anno_Mese, d."Head Count Diretti", i."Head Count Indiretti e Attrezzisti",
+       d."Head Count Diretti" + i."Head Count Indiretti e Attrezzisti" AS "Head Count Totale"
+FROM diretti d
+FULL OUTER JOIN indiretti i USING (Gruppo_risorse, Anno_Mese)
+ORDER BY Gruppo_risorse, Anno_Mese
+"""
+
+
+####### Funzioni di utilità
+
+def backend_disponibili():
+    """Backend utilizzabili in questo ambiente (duckdb solo se installato)."""
+    return [backend for backend in BACKEND if backend != 'duckdb' or importlib.util.find_spec('duckdb') is not None]
+
+
+def velocita_risorsa(df_efficienza_oee):
+    """Velocità_LL e Gruppo_risorse per Risorsa (prima riga per Risorsa, come le mappe del resto della catena)."""
+    return df_efficienza_oee.drop_duplicates('Risorsa').set_index('Risorsa')[['Gruppo_risorse', 'Velocità_LL']]
+
+
+def _aggrega_blocco(blocco, velocita):
+    # Volume e ore macchina per Risorsa e mese di un blocco del piano di dettaglio
+    if 'Anno_Mese' in blocco.columns:
+        anno_mese = blocco['Anno_Mese'].astype(str).str[:7]
+    else:
+        anno_mese = pd.to_datetime(blocco['Periodo']).dt.strftime('%Y-%m')
+    velocita_sku = blocco['Velocità'] if 'Velocità' in blocco.columns else pd.Series(np.nan, index=blocco.index)
+    risorsa = blocco['Risorsa'].astype(str)
+    velocita_sku = velocita_sku.astype(float).fillna(risorsa.map(velocita['Velocità_LL']))
+    volume = blocco['Volume'].astype(float)
+    return pd.DataFrame({'Risorsa': risorsa, 'Anno_Mese': anno_mese, 'Volume': volume,
+                         'ore_macchina': volume / velocita_sku}).groupby(['Risorsa', 'Anno_Mese'])[['Volume', 'ore_macchina']].sum()
+
+
+def e_parquet(sorgente):
+    """True se la sorgente (percorso o buffer) è un file Parquet: estensione o firma 'PAR1' in testa."""
+    if isinstance(sorgente, (str, os.PathLike)):
+        return str(sorgente).endswith('.parquet')
+    posizione = sorgente.tell()
+    firma = sorgente.read(4)
+    sorgente.seek(posizione)
+    return firma == b'PAR1'
+
+
+def leggi_a_blocchi(sorgente, dimensione_blocco, colonne):
+    """
+    Blocchi di DataFrame da un file Parquet (pyarrow iter_batches) o CSV (read_csv a blocchi).
+
+    Args:
+        sorgente: Percorso o buffer del file
+        dimensione_blocco: Righe per blocco
+        colonne: Colonne da leggere (quelle assenti nel file sono ignorate)
+
+    Returns:
+        Generatore di coppie (blocco, righe totali del file o None se non note)
+    """
+    if e_parquet(sorgente):
+        import pyarrow.parquet as pq
+        file_parquet = pq.ParquetFile(sorgente)
+        presenti = [col for col in colonne if col in file_parquet.schema_arrow.names]
+        totale = file_parquet.metadata.num_rows
+        for batch in file_parquet.iter_batches(batch_size=dimensione_blocco, columns=presenti):
+            yield batch.to_pandas(), totale
+    else:
+        for blocco in pd.read_csv(sorgente, chunksize=dimensione_blocco, usecols=lambda col: col in colonne):
+            yield blocco, None
+
+
+def aggrega_volumi_dettaglio(sorgente, df_efficienza_oee, backend='pandas', dimensione_blocco=1_000_000, job=None):
+    """
+    Aggrega il piano di dettaglio a Risorsa x mese nel formato di df_melted.
+
+    Velocità_ponderata = Volume / somma(Volume_SKU / Velocità_SKU): con questa velocità calcola_equipaggi
+    ottiene le stesse ore macchina della somma sugli SKU.
+
+    Args:
+        sorgente: Percorso del file Parquet o CSV (con duckdb anche glob, es. 'ordini/*.parquet')
+        df_efficienza_oee: DataFrame con Gruppo_risorse, Risorsa e Velocità_LL
+        backend: 'pandas' (file intero in memoria), 'blocchi' (memoria limitata a dimensione_blocco) o 'duckdb'
+        dimensione_blocco: Righe per blocco con backend blocchi
+        job: Job opzionale per avanzamento e annullamento
+
+    Returns:
+        DataFrame con Gruppo_risorse, Risorsa, Periodo, Volume, Periodo_dt, Anno_Mese e Velocità_ponderata
+    """
+    velocita = velocita_risorsa(df_efficienza_oee)
+    colonne = ['Risorsa', 'Volume', 'Anno_Mese', 'Periodo', 'Velocità']
+
+    if backend == 'duckdb':
+        con = connessione_duckdb(sorgente, df_efficienza_oee)
+        aggiorna_avanzamento(job, 0.1, 'Aggregazione con duckdb')
+        sql = SQL_MANNING.split('risorsa_mese AS')[0].rstrip().rstrip(',') + '\nSELECT * FROM volumi'
+        accumulato = con.execute(sql.format(**espressioni_duckdb(con, sorgente))).df().set_index(['Risorsa', 'Anno_Mese'])
+    else:
+        if backend == 'pandas':
+            dimensione_blocco = None
+            lettura = pd.read_parquet if e_parquet(sorgente) else pd.read_csv
+            blocchi = [(lettura(sorgente), None)]
+        else:
+            blocchi = leggi_a_blocchi(sorgente, dimensione_blocco, colonne)
+        accumulato = None
+        righe_lette = 0
+        for blocco, totale in blocchi:
+            totali = _aggrega_blocco(blocco, velocita)
+            accumulato = totali if accumulato is None else accumulato.add(totali, fill_value=0)
+            righe_lette += len(blocco)
+            aggiorna_avanzamento(job, min(righe_lette / totale, 0.99) if totale else 0.5, f'{righe_lette:,} righe aggregate')
+
+    df_volumi = accumulato.reset_index()
+    df_volumi['Gruppo_risorse'] = df_volumi['Risorsa'].map(velocita['Gruppo_risorse'])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        df_volumi['Velocità_ponderata'] = (df_volumi['Volume'] / df_volumi['ore_macchina']).replace([np.inf, -np.inf], np.nan)
+    df_volumi['Periodo_dt'] = pd.to_datetime(df_volumi['Anno_Mese'] + '-01')
+    df_volumi['Periodo'] = df_volumi['Periodo_dt']
+    aggiorna_avanzamento(job, 1.0, 'Aggregazione completata')
+    return df_volumi[['Gruppo_risorse', 'Risorsa', 'Periodo', 'Volume', 'Periodo_dt', 'Anno_Mese', 'Velocità_ponderata']].sort_values(
+        ['Anno_Mese', 'Gruppo_risorse', 'Risorsa']).reset_index(drop=True)
+
+
+def connessione_duckdb(sorgente, df_efficienza_oee, caricamento=None, ore_standard=8, df_piano_turni=None, limite_memoria=None):
+    """
+    Connessione duckdb in memoria con le tabelle piccole della catena registrate come viste.
+
+    Args:
+        sorgente: Percorso del piano di dettaglio
+        df_efficienza_oee: DataFrame del foglio efficienza_oee
+        caricamento: Dizionario opzionale da carica_e_prepara (equipaggi, calendario, assenteismo, df_attrezzaggi per la catena completa)
+        ore_standard: Ore standard di lavoro
+        df_piano_turni: DataFrame opzionale da crea_piano_turni
+        limite_memoria: Limite di memoria di duckdb (es. '4GB'), oltre si appoggia al disco
+
+    Returns:
+        duckdb.DuckDBPyConnection
+    """
+    import duckdb
+
+    con = duckdb.connect()
+    if limite_memoria:
+        con.execute(f"SET memory_limit = '{limite_memoria}'")
+    con.register('efficienza', df_efficienza_oee)
+    con.register('velocita_risorsa', velocita_risorsa(df_efficienza_oee)[['Velocità_LL']].rename(
+        columns={'Velocità_LL': 'Velocita_LL'}).reset_index())
+
+    if caricamento is not None:
+        fogli = caricamento['fogli']
+        df_equipaggi = fogli['equipaggi']
+        df_equipaggi_long = df_equipaggi.melt(
+            id_vars=['Gruppo_risorse', 'Risorsa'],
+            value_vars=identifica_colonne_data(df_equipaggi, ['Gruppo_risorse', 'Risorsa']),
+            var_name='Periodo',
+            value_name='Equipaggi'
+        )
+        df_equipaggi_long['Anno_Mese'] = pd.to_datetime(df_equipaggi_long['Periodo']).dt.to_period('M').astype(str)
+        con.register('equipaggi_long', df_equipaggi_long[['Gruppo_risorse', 'Risorsa', 'Anno_Mese', 'Equipaggi']])
+        con.register('calendario', caricamento['df_calendario_melted'][['Gruppo_risorse', 'Anno_Mese', 'Giorni_lavorativi']])
+        con.register('assenteismo_ferie', fogli['assenteismo_ferie'][['Gruppo_risorse', 'Assenteismo', 'Copertura_ferie']])
+        df_indiretti = prepara_indiretti(df_equipaggi)
+        df_attrezzaggi = caricamento.get('df_attrezzaggi')
+        if df_attrezzaggi is not None:
+            df_indiretti = sostituisci_attrezzisti(df_indiretti, df_attrezzaggi, df_efficienza_oee, caricamento['df_calendario_melted'],
+                                                   fogli['assenteismo_ferie'], ore_standard)
+        else:
+            df_attrezzaggi = pd.DataFrame({'Risorsa': pd.Series(dtype=str), 'Anno_Mese': pd.Series(dtype=str),
+                                           'ore_attrezzaggio': pd.Series(dtype=float)})
+        con.register('indiretti_long', df_indiretti[['Gruppo_risorse', 'Anno_Mese', 'Equipaggi']])
+        con.register('attrezzaggi', df_attrezzaggi[['Risorsa', 'Anno_Mese', 'ore_attrezzaggio']])
+        if df_piano_turni is None:
+            df_piano_turni = pd.DataFrame({'Gruppo_risorse': pd.Series(dtype=str), 'Risorsa': pd.Series(dtype=str),
+                                           'Anno_Mese': pd.Series(dtype=str), 'Ore_turno': pd.Series(dtype=float)})
+        con.register('piano_turni', df_piano_turni[['Gruppo_risorse', 'Risorsa', 'Anno_Mese', 'Ore_turno']])
+    return con
+
+
+def espressioni_duckdb(con, sorgente, ore_standard=8):
+    """Parti variabili di SQL_MANNING: lettura del file, colonna mese e velocità SKU secondo le colonne presenti."""
+    percorso = str(sorgente).replace("'", "''")
+    lettura = f"read_parquet('{percorso}')" if percorso.endswith('.parquet') else f"read_csv_auto('{percorso}')"
+    colonne = set(con.execute(f'DESCRIBE SELECT * FROM {lettura}').df()['column_name'])
+    return {
+        'sorgente': lettura,
+        'mese': 'LEFT(CAST("Anno_Mese" AS VARCHAR), 7)' if 'Anno_Mese' in colonne else """strftime(CAST("Periodo" AS DATE), '%Y-%m')""",
+        'velocita': 'CAST("Velocità" AS DOUBLE)' if 'Velocità' in colonne else 'CAST(NULL AS DOUBLE)',
+        'ore_standard': float(ore_standard),
+    }
+
+
+def calcola_manning_dettaglio(caricamento, sorgente, ore_standard, backend='pandas', df_piano_turni=None,
+                              dimensione_blocco=1_000_000, limite_memoria=None, job=None):
+    """
+    Catena manning con volumi da un piano di dettaglio al posto di volumi_bgt.
+
+    Con pandas e blocchi il piano è aggregato a Risorsa x mese e poi passa da calcola_manning; con duckdb
+    l'intera catena fino a df_analisi è una query SQL sul file, senza caricarlo in memoria.
+
+    Args:
+        caricamento: Dizionario da carica_e_prepara
+        sorgente: Percorso del file Parquet o CSV di dettaglio
+        ore_standard: Ore standard di lavoro
+        backend: Uno di BACKEND
+        df_piano_turni: DataFrame opzionale da crea_piano_turni
+        dimensione_blocco: Righe per blocco con backend blocchi
+        limite_memoria: Limite di memoria di duckdb (es. '4GB')
+        job: Job opzionale per avanzamento e annullamento
+
+    Returns:
+        Dizionario con df_analisi ordinato per Gruppo_risorse e Anno_Mese
+    """
+    if backend not in backend_disponibili():
+        raise ValueError(f"Backend non disponibile: {backend} (disponibili: {', '.join(backend_disponibili())})")
+    df_efficienza_oee = caricamento['fogli']['efficienza_oee']
+
+    # il modello a driver degli indiretti usa i risultati intermedi dei diretti: con regole duckdb fa solo l'aggregazione
+    if backend == 'duckdb' and caricamento.get('df_regole_indiretti') is None:
+        con = connessione_duckdb(sorgente, df_efficienza_oee, caricamento, ore_standard, df_piano_turni, limite_memoria)
+        aggiorna_avanzamento(job, 0.1, 'Catena manning con duckdb')
+        df_analisi = con.execute(SQL_MANNING.format(**espressioni_duckdb(con, sorgente, ore_standard))).df()
+        aggiorna_avanzamento(job, 1.0, 'Calcolo completato')
+        return {'df_analisi': df_analisi}
+
+    df_volumi = aggrega_volumi_dettaglio(sorgente, df_efficienza_oee, backend, dimensione_blocco, job)
+    risultati = calcola_manning({**caricamento, 'df_melted': df_volumi}, ore_standard, df_piano_turni)
+    risultati['df_analisi'] = risultati['df_analisi'].sort_values(['Gruppo_risorse', 'Anno_Mese']).reset_index(drop=True)
+    risultati['df_volumi_dettaglio'] = df_volumi
+    return risultati
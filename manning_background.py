@@ -0,0 +1,147 @@
+# Processo manning - esecuzione in background delle fasi lente
+# Job su thread con avanzamento, annullamento cooperativo e riuso dei risultati per stesso input
+# rev1: pool di thread condiviso dal processo, un job per nome e sessione
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+IN_ATTESA = 'In attesa'
+IN_CORSO = 'In corso'
+COMPLETATO = 'Completato'
+ANNULLATO = 'Annullato'
+ERRORE = 'Errore'
+
+_esecutore = None
+_lock_esecutore = threading.Lock()
+
+
+####### Funzioni di utilità
+
+def esecutore_condiviso(max_thread=4):
+    """
+    Restituisce il pool di thread condiviso da tutte le sessioni del processo (creato al primo uso).
+
+    Args:
+        max_thread: Numero massimo di job eseguiti contemporaneamente
+
+    Returns:
+        ThreadPoolExecutor
+    """
+    global _esecutore
+    with _lock_esecutore:
+        if _esecutore is None:
+            _esecutore = ThreadPoolExecutor(max_workers=max_thread, thread_name_prefix='manning')
+    return _esecutore
+
+
+class JobAnnullato(Exception):
+    """Sollevata dentro il job al primo aggiornamento di avanzamento dopo la richiesta di annullamento."""
+
+
+class Job:
+    """
+    Calcolo in background con avanzamento e annullamento.
+
+    La funzione eseguita riceve il job come argomento job= e chiama job.aggiorna(frazione, messaggio)
+    tra una fase e l'altra: è lì che l'annullamento viene rilevato.
+    """
+
+    def __init__(self, nome, chiave):
+        self.nome = nome
+        self.chiave = chiave
+        self.avanzamento = 0.0
+        self.messaggio = IN_ATTESA
+        self.inizio = time.time()
+        self.future = None
+        self._annullamento = threading.Event()
+
+    def aggiorna(self, avanzamento, messaggio=''):
+        """Aggiorna avanzamento (0..1) e messaggio; solleva JobAnnullato se è stato chiesto l'annullamento."""
+        if self._annullamento.is_set():
+            raise JobAnnullato(self.nome)
+        self.avanzamento = min(max(float(avanzamento), 0.0), 1.0)
+        self.messaggio = messaggio
+
+    def annulla(self):
+        """Chiede l'annullamento: il job si ferma al prossimo aggiornamento (o non parte se ancora in coda)."""
+        self._annullamento.set()
+        if self.future is not None:
+            self.future.cancel()
+
+    @property
+    def stato(self):
+        if self.future is None:
+            return IN_ATTESA
+        if not self.future.done():
+            return IN_CORSO
+        if self.future.cancelled() or isinstance(self.future.exception(), JobAnnullato):
+            return ANNULLATO
+        if self.future.exception() is not None:
+            return ERRORE
+        return COMPLETATO
+
+    @property
+    def in_corso(self):
+        return self.stato in (IN_ATTESA, IN_CORSO)
+
+    @property
+    def durata(self):
+        return time.time() - self.inizio
+
+    def risultato(self):
+        """Risultato del job completato (solleva l'eccezione originale se il job è fallito)."""
+        return self.future.result()
+
+    def errore(self):
+        """Eccezione del job fallito, None altrimenti."""
+        if self.stato != ERRORE:
+            return None
+        return self.future.exception()
+
+
+class GestoreJob:
+    """
+    Job di una sessione, al massimo uno per nome.
+
+    Avviare un job con la stessa chiave (es. hash del file caricato) riusa quello esistente, in corso o già
+    completato; una chiave diversa annulla il job precedente con lo stesso nome e ne avvia uno nuovo.
+    """
+
+    def __init__(self, esecutore=None):
+        self.esecutore = esecutore if esecutore is not None else esecutore_condiviso()
+        self.jobs = {}
+
+    def avvia(self, nome, chiave, funzione, *args, forza=False, **kwargs):
+        """
+        Avvia funzione(*args, job=job, **kwargs) in background se non c'è già un job con la stessa chiave.
+
+        Args:
+            nome: Nome del job (es. 'caricamento')
+            chiave: Identificativo dell'input del job
+            funzione: Funzione da eseguire, deve accettare l'argomento job
+            forza: Riavvia anche se esiste un job con la stessa chiave (es. dopo un annullamento)
+
+        Returns:
+            Job
+        """
+        job = self.jobs.get(nome)
+        if job is not None and job.chiave == chiave and not forza:
+            return job
+        if job is not None and job.in_corso:
+            job.annulla()
+
+        job = Job(nome, chiave)
+        job.future = self.esecutore.submit(funzione, *args, job=job, **kwargs)
+        self.jobs[nome] = job
+        return job
+
+    def job(self, nome):
+        """Job con il nome indicato, None se mai avviato."""
+        return self.jobs.get(nome)
+
+    def annulla_tutti(self):
+        """Annulla tutti i job in corso della sessione."""
+        for job in self.jobs.values():
+            if job.in_corso:
+                job.annulla()
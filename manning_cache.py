@@ -0,0 +1,487 @@
+# Processo manning - memoizzazione dei risultati per fase della catena
+# Ogni fase è salvata sotto l'impronta dei suoi input e parametri: se un input a monte cambia cambia la chiave
+# rev1: LRU in memoria con limite di voci e MB, copia facoltativa su disco, contatori hit/miss per fase
+# rev2: registro dei modelli base (master_data caricati) condiviso in sola lettura tra le sessioni, con budget di memoria
+# rev3: chiave con costanti, nomi e helper del progetto richiamati dalla fase (non solo il bytecode)
+
+import os
+import time
+import pickle
+import hashlib
+import threading
+import types
+from collections import OrderedDict, defaultdict
+import pandas as pd
+import numpy as np
+
+# Argomenti che non entrano nell'impronta (avanzamento e annullamento)
+ARGOMENTI_ESCLUSI = {'job'}
+
+# Le funzioni definite nei file di questa cartella entrano nell'impronta del codice di uno stadio che le chiama
+CARTELLA_PROGETTO = os.path.dirname(os.path.abspath(__file__))
+
+_cache = None
+_registro = None
+_lock_cache = threading.Lock()
+
+
+####### Funzioni di utilità
+
+def impronta_valore(valore):
+    """
+    Impronta SHA-256 del contenuto di un valore: DataFrame e Series per contenuto, colonne e tipi,
+    contenitori in modo ricorsivo, scalari per rappresentazione.
+
+    Args:
+        valore: DataFrame, Series, array, dizionario, lista, tupla, bytes o scalare
+
+    Returns:
+        Stringa esadecimale
+    """
+    h = hashlib.sha256()
+
+    def aggiungi(v):
+        if isinstance(v, pd.DataFrame):
+            h.update(b'df')
+            h.update(repr([(str(col), str(tipo)) for col, tipo in v.dtypes.items()]).encode())
+            h.update(pd.util.hash_pandas_object(v, index=False).to_numpy().tobytes())
+        elif isinstance(v, pd.Series):
+            h.update(b'serie' + str(v.name).encode() + str(v.dtype).encode())
+            h.update(pd.util.hash_pandas_object(v, index=False).to_numpy().tobytes())
+        elif isinstance(v, np.ndarray):
+            h.update(b'array' + str(v.dtype).encode() + str(v.shape).encode())
+            h.update(np.ascontiguousarray(v).tobytes())
+        elif isinstance(v, dict):
+            h.update(b'dict')
+            for chiave in sorted(v, key=str):
+                h.update(str(chiave).encode())
+                aggiungi(v[chiave])
+        elif isinstance(v, (list, tuple)):
+            h.update(b'seq%d' % len(v))
+            for elemento in v:
+                aggiungi(elemento)
+        elif isinstance(v, bytes):
+            h.update(b'bytes' + hashlib.sha256(v).digest())
+        else:
+            h.update(repr(v).encode())
+
+    aggiungi(valore)
+    return h.hexdigest()
+
+
+def impronta_codice(funzione):
+    """
+    Impronta del codice di una funzione e, ricorsivamente, delle funzioni del progetto che richiama.
+
+    Entrano bytecode, costanti (anche delle funzioni annidate), nomi usati e valori di default: cambiare una
+    costante o un helper chiamato dalla fase cambia la chiave, anche per le voci su disco.
+
+    Args:
+        funzione: Funzione della fase
+
+    Returns:
+        Stringa esadecimale
+    """
+    h = hashlib.sha256()
+    visitate = set()
+
+    def aggiungi_codice(codice):
+        h.update(codice.co_code)
+        h.update(repr(codice.co_names).encode())
+        for costante in codice.co_consts:
+            if isinstance(costante, types.CodeType):
+                aggiungi_codice(costante)
+            else:
+                h.update(repr(costante).encode())
+
+    def aggiungi_funzione(f):
+        codice = getattr(f, '__code__', None)
+        if codice is None or id(f) in visitate:
+            return
+        visitate.add(id(f))
+        h.update(f'{f.__module__}.{f.__qualname__}'.encode())
+        h.update(repr((f.__defaults__, f.__kwdefaults__)).encode())
+        aggiungi_codice(codice)
+        # helper richiamati per nome: solo le funzioni definite nei file del progetto
+        nomi = set(codice.co_names)
+        pila = [c for c in codice.co_consts if isinstance(c, types.CodeType)]
+        while pila:
+            annidato = pila.pop()
+            nomi.update(annidato.co_names)
+            pila.extend(c for c in annidato.co_consts if isinstance(c, types.CodeType))
+        globali = getattr(f, '__globals__', {})
+        for nome in sorted(nomi):
+            richiamata = globali.get(nome)
+            if (isinstance(richiamata, types.FunctionType)
+                    and os.path.abspath(richiamata.__code__.co_filename).startswith(CARTELLA_PROGETTO + os.sep)):
+                aggiungi_funzione(richiamata)
+
+    aggiungi_funzione(funzione)
+    return h.hexdigest()
+
+
+def copy_on_write_attivo():
+    """True se pandas usa copy-on-write (sempre da pandas 3, con l'opzione mode.copy_on_write prima)."""
+    return int(pd.__version__.split('.')[0]) >= 3 or pd.options.mode.copy_on_write is True
+
+
+def dimensione_valore(valore):
+    """Stima in byte della memoria occupata da un risultato."""
+    if isinstance(valore, (pd.DataFrame, pd.Series)):
+        return int(valore.memory_usage(deep=True).sum()) if isinstance(valore, pd.DataFrame) else int(valore.memory_usage(deep=True))
+    if isinstance(valore, dict):
+        return sum(dimensione_valore(v) for v in valore.values())
+    if isinstance(valore, (list, tuple)):
+        return sum(dimensione_valore(v) for v in valore)
+    if isinstance(valore, np.ndarray):
+        return int(valore.nbytes)
+    return len(pickle.dumps(valore))
+
+
+def copia_risultato(valore):
+    """
+    Copia superficiale dei DataFrame restituiti dalla cache: aggiungere o sostituire colonne sulla copia
+    non tocca la voce in cache (con copy-on-write di pandas anche le modifiche in place).
+    Senza copy-on-write (pandas < 3 senza l'opzione attiva) la copia è profonda: una modifica in place di una
+    sessione altrimenti cambierebbe il modello condiviso da tutte.
+    """
+    if isinstance(valore, (pd.DataFrame, pd.Series)):
+        return valore.copy(deep=not copy_on_write_attivo())
+    if isinstance(valore, dict):
+        return {chiave: copia_risultato(v) for chiave, v in valore.items()}
+    if isinstance(valore, tuple):
+        return tuple(copia_risultato(v) for v in valore)
+    if isinstance(valore, list):
+        return [copia_risultato(v) for v in valore]
+    return valore
+
+
+class CacheStadi:
+    """
+    Cache dei risultati per fase (stadio) della catena manning.
+
+    La chiave è l'impronta di nome e codice della funzione, argomenti e parametri: quando cambia un input
+    a monte (un foglio, df_melted, un override) la fase a valle ha una chiave nuova e viene ricalcolata.
+    Per ogni stadio si tengono al massimo voci_per_stadio versioni, in totale max_voci voci e max_mb MB
+    (evizione LRU). Con cartella le voci sono copiate anche su disco e sopravvivono al riavvio.
+    """
+
+    def __init__(self, max_voci=128, max_mb=512, voci_per_stadio=8, cartella=None):
+        self.voci = OrderedDict()
+        self.statistiche = defaultdict(lambda: {'hit': 0, 'hit_disco': 0, 'miss': 0, 'evizioni': 0,
+                                                'secondi_calcolo': 0.0, 'secondi_risparmiati': 0.0})
+        self._lock = threading.Lock()
+        self.cartella = None
+        self.configura(max_voci, max_mb, voci_per_stadio, cartella)
+
+    def configura(self, max_voci=None, max_mb=None, voci_per_stadio=None, cartella=None):
+        """Aggiorna i limiti (None = invariato; cartella '' = solo memoria) ed applica subito l'evizione."""
+        with self._lock:
+            if max_voci is not None:
+                self.max_voci = max_voci
+            if max_mb is not None:
+                self.max_mb = max_mb
+            if voci_per_stadio is not None:
+                self.voci_per_stadio = voci_per_stadio
+            if cartella is not None:
+                self.cartella = cartella or None
+                if self.cartella:
+                    os.makedirs(self.cartella, exist_ok=True)
+            self._evizione()
+
+    def chiave(self, stadio, funzione, args, kwargs):
+        """Chiave di cache: stadio, codice della funzione e dei suoi helper (impronta_codice) e impronta degli argomenti."""
+        parametri = {nome: valore for nome, valore in kwargs.items() if nome not in ARGOMENTI_ESCLUSI}
+        return impronta_valore([
+            stadio,
+            f'{funzione.__module__}.{funzione.__qualname__}',
+            impronta_codice(funzione),
+            list(args),
+            parametri
+        ])
+
+    def _percorso(self, stadio, chiave):
+        return os.path.join(self.cartella, f'{stadio}_{chiave[:40]}.pkl')
+
+    def _evizione(self):
+        # Prima le versioni vecchie di ogni stadio, poi LRU sui limiti globali
+        per_stadio = defaultdict(int)
+        for chiave in reversed(list(self.voci)):
+            stadio = self.voci[chiave]['stadio']
+            per_stadio[stadio] += 1
+            if per_stadio[stadio] > self.voci_per_stadio:
+                self.statistiche[stadio]['evizioni'] += 1
+                del self.voci[chiave]
+        while self.voci and (len(self.voci) > self.max_voci or self.byte_in_memoria() > self.max_mb * 1024 ** 2):
+            _, voce = self.voci.popitem(last=False)
+            self.statistiche[voce['stadio']]['evizioni'] += 1
+
+    def byte_in_memoria(self):
+        return sum(voce['byte'] for voce in self.voci.values())
+
+    def esegui(self, stadio, funzione, *args, **kwargs):
+        """
+        Restituisce il risultato di funzione(*args, **kwargs) dalla cache o lo calcola e lo salva.
+
+        Args:
+            stadio: Nome della fase (per contatori, evizione per stadio e file su disco)
+            funzione: Funzione della fase (deve dipendere solo dai suoi argomenti)
+            args, kwargs: Argomenti della funzione; job è escluso dall'impronta
+
+        Returns:
+            Risultato (copia superficiale dei DataFrame in cache)
+        """
+        chiave = self.chiave(stadio, funzione, args, kwargs)
+        with self._lock:
+            statistiche = self.statistiche[stadio]
+            voce = self.voci.get(chiave)
+            if voce is not None:
+                self.voci.move_to_end(chiave)
+                statistiche['hit'] += 1
+                statistiche['secondi_risparmiati'] += voce['secondi']
+                return copia_risultato(voce['valore'])
+            cartella = self.cartella
+
+        if cartella and os.path.exists(self._percorso(stadio, chiave)):
+            try:
+                voce = pd.read_pickle(self._percorso(stadio, chiave))
+            except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+                voce = None
+            if voce is not None:
+                with self._lock:
+                    self.statistiche[stadio]['hit_disco'] += 1
+                    self.statistiche[stadio]['secondi_risparmiati'] += voce['secondi']
+                    self.voci[chiave] = voce
+                    self._evizione()
+                return copia_risultato(voce['valore'])
+
+        inizio = time.perf_counter()
+        valore = funzione(*args, **kwargs)
+        voce = {'stadio': stadio, 'valore': valore, 'secondi': time.perf_counter() - inizio,
+                'byte': dimensione_valore(valore), 'creata': time.time()}
+
+        with self._lock:
+            statistiche['miss'] += 1
+            statistiche['secondi_calcolo'] += voce['secondi']
+            self.voci[chiave] = voce
+            self._evizione()
+        if cartella:
+            pd.to_pickle(voce, self._percorso(stadio, chiave))
+        return copia_risultato(valore)
+
+    def invalida(self, stadio=None):
+        """Elimina le voci di uno stadio (tutte se None), in memoria e su disco."""
+        with self._lock:
+            for chiave in [c for c, voce in self.voci.items() if stadio is None or voce['stadio'] == stadio]:
+                del self.voci[chiave]
+            if self.cartella:
+                for nome in os.listdir(self.cartella):
+                    if nome.endswith('.pkl') and (stadio is None or nome.rsplit('_', 1)[0] == stadio):
+                        os.remove(os.path.join(self.cartella, nome))
+
+    def diagnostica(self):
+        """
+        Contatori per stadio: hit (memoria e disco), miss, evizioni, voci e MB in memoria, tempi.
+
+        Returns:
+            DataFrame con una riga per stadio
+        """
+        with self._lock:
+            righe = []
+            for stadio, statistiche in self.statistiche.items():
+                voci = [voce for voce in self.voci.values() if voce['stadio'] == stadio]
+                richieste = statistiche['hit'] + statistiche['hit_disco'] + statistiche['miss']
+                righe.append({
+                    'Stadio': stadio,
+                    **statistiche,
+                    'Hit_rate_%': 100 * (statistiche['hit'] + statistiche['hit_disco']) / richieste if richieste else 0.0,
+                    'Voci': len(voci),
+                    'MB': sum(voce['byte'] for voce in voci) / 1024 ** 2
+                })
+        return pd.DataFrame(righe, columns=['Stadio', 'hit', 'hit_disco', 'miss', 'evizioni', 'Hit_rate_%', 'Voci', 'MB',
+                                            'secondi_calcolo', 'secondi_risparmiati'])
+
+
+def cache_condivisa(**parametri):
+    """
+    Restituisce la cache degli stadi condivisa da tutte le sessioni del processo (creata al primo uso).
+
+    Args:
+        parametri: Argomenti di CacheStadi usati alla creazione
+
+    Returns:
+        CacheStadi
+    """
+    global _cache
+    with _lock_cache:
+        if _cache is None:
+            _cache = CacheStadi(**parametri)
+    return _cache
+
+
+def esegui_stadio(cache, stadio, funzione, *args, **kwargs):
+    """Esegue la fase attraverso la cache se presente, altrimenti la chiama direttamente."""
+    if cache is None:
+        return funzione(*args, **kwargs)
+    return cache.esegui(stadio, funzione, *args, **kwargs)
+
+
+class RegistroModelli:
+    """
+    Modelli base (risultati di carica_e_prepara) per impronta del file, condivisi in sola lettura da tutte le sessioni.
+
+    Ogni sessione riceve una copia superficiale (copia_risultato): i DataFrame sono gli stessi in memoria e le
+    modifiche di una sessione (override, volumi sostituiti) restano nella sua copia come delta. Sessioni che caricano
+    lo stesso file insieme aspettano un solo caricamento. Oltre max_modelli o max_mb si eliminano i modelli usati
+    meno di recente: una sessione che ne ha ancora bisogno lo ricarica.
+    """
+
+    def __init__(self, max_modelli=8, max_mb=2048):
+        self.modelli = OrderedDict()
+        self.max_modelli = max_modelli
+        self.max_mb = max_mb
+        self.statistiche = {'hit': 0, 'miss': 0, 'attese': 0, 'evizioni': 0}
+        self._lock = threading.Lock()
+        self._lock_chiavi = defaultdict(threading.Lock)
+
+    def configura(self, max_modelli=None, max_mb=None):
+        """Aggiorna i limiti (None = invariato) ed applica subito l'evizione."""
+        with self._lock:
+            if max_modelli is not None:
+                self.max_modelli = max_modelli
+            if max_mb is not None:
+                self.max_mb = max_mb
+            self._evizione()
+
+    def _evizione(self):
+        while self.modelli and (len(self.modelli) > self.max_modelli or self.byte_in_memoria() > self.max_mb * 1024 ** 2):
+            self.modelli.popitem(last=False)
+            self.statistiche['evizioni'] += 1
+
+    def byte_in_memoria(self):
+        return sum(voce['byte'] for voce in self.modelli.values())
+
+    def ottieni(self, chiave):
+        """Copia del modello con questa impronta (vedi copia_risultato), None se non caricato o eliminato."""
+        with self._lock:
+            voce = self.modelli.get(chiave)
+            if voce is None:
+                return None
+            self.modelli.move_to_end(chiave)
+            voce['letture'] += 1
+            return copia_risultato(voce['modello'])
+
+    def registra(self, chiave, modello):
+        """Aggiunge (o conferma) il modello di un'impronta e restituisce la copia per la sessione."""
+        with self._lock:
+            if chiave not in self.modelli:
+                self.modelli[chiave] = {'modello': modello, 'byte': dimensione_valore(modello), 'letture': 0,
+                                        'creato': time.time()}
+                self._evizione()
+        return self.ottieni(chiave) or copia_risultato(modello)
+
+    def ottieni_o_carica(self, chiave, funzione, *args, **kwargs):
+        """
+        Restituisce il modello dal registro o lo calcola con funzione(*args, **kwargs) e lo registra.
+
+        Con la stessa chiave in più sessioni contemporaneamente la funzione gira una sola volta: le altre
+        aspettano e ricevono lo stesso modello.
+
+        Args:
+            chiave: Impronta del file (es. SHA-256 di master_data.xlsx)
+            funzione: Funzione di caricamento (es. carica_e_prepara)
+            args, kwargs: Argomenti della funzione
+
+        Returns:
+            Copia superficiale del modello
+        """
+        modello = self.ottieni(chiave)
+        if modello is not None:
+            with self._lock:
+                self.statistiche['hit'] += 1
+            return modello
+        with self._lock:
+            lock_chiave = self._lock_chiavi[chiave]
+        if lock_chiave.locked():
+            with self._lock:
+                self.statistiche['attese'] += 1
+        with lock_chiave:
+            modello = self.ottieni(chiave)
+            if modello is not None:
+                return modello
+            modello = funzione(*args, **kwargs)
+            with self._lock:
+                self.statistiche['miss'] += 1
+            return self.registra(chiave, modello)
+
+    def diagnostica(self):
+        """
+        Modelli in memoria dal più al meno recente.
+
+        Returns:
+            DataFrame con Impronta, MB, Letture e Secondi_in_memoria
+        """
+        with self._lock:
+            adesso = time.time()
+            righe = [{'Impronta': chiave[:12], 'MB': voce['byte'] / 1024 ** 2, 'Letture': voce['letture'],
+                      'Secondi_in_memoria': adesso - voce['creato']} for chiave, voce in reversed(self.modelli.items())]
+        return pd.DataFrame(righe, columns=['Impronta', 'MB', 'Letture', 'Secondi_in_memoria'])
+
+
+def _condivide_memoria(serie, originale):
+    # Stessi buffer in memoria: colonne arrow (stringhe) confrontando gli indirizzi dei buffer, le altre con numpy
+    if len(serie) != len(originale):
+        return False
+    if len(serie) == 0:
+        return True
+    if isinstance(serie.dtype, pd.CategoricalDtype) and isinstance(originale.dtype, pd.CategoricalDtype):
+        return bool(np.shares_memory(serie.array.codes, originale.array.codes))
+    if hasattr(serie.array, '__arrow_array__') and hasattr(originale.array, '__arrow_array__'):
+        indirizzi = [[buffer.address for blocco in colonna.chunks for buffer in blocco.buffers() if buffer is not None]
+                     for colonna in (serie.array.__arrow_array__(), originale.array.__arrow_array__())]
+        return indirizzi[0] == indirizzi[1]
+    return bool(np.shares_memory(serie.to_numpy(), originale.to_numpy()))
+
+
+def byte_delta(modello, base):
+    """
+    Byte dei dati di una sessione che non sono condivisi con il modello base (colonne sostituite o aggiunte).
+
+    Args:
+        modello: Dizionario della sessione (copia del base con eventuali sostituzioni)
+        base: Dizionario del modello base
+
+    Returns:
+        Intero
+    """
+    totale = 0
+    for chiave, valore in modello.items():
+        originale = base.get(chiave)
+        if isinstance(valore, dict) and isinstance(originale, dict):
+            totale += byte_delta(valore, originale)
+        elif isinstance(valore, pd.DataFrame):
+            for col in valore.columns:
+                if not (isinstance(originale, pd.DataFrame) and col in originale.columns
+                        and _condivide_memoria(valore[col], originale[col])):
+                    totale += int(valore[col].memory_usage(deep=True, index=False))
+        elif isinstance(valore, pd.Series):
+            if not (isinstance(originale, pd.Series) and _condivide_memoria(valore, originale)):
+                totale += dimensione_valore(valore)
+    return totale
+
+
+def registro_condiviso(**parametri):
+    """
+    Restituisce il registro dei modelli base condiviso da tutte le sessioni del processo (creato al primo uso).
+
+    Args:
+        parametri: Argomenti di RegistroModelli usati alla creazione
+
+    Returns:
+        RegistroModelli
+    """
+    global _registro
+    with _lock_cache:
+        if _registro is None:
+            _registro = RegistroModelli(**parametri)
+    return _registro
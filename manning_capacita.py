@@ -0,0 +1,140 @@
+# Processo manning - saturazione capacità e colli di bottiglia per Risorsa
+# Ore macchina richieste vs disponibili per ogni Risorsa e mese, senza la media pesata di reparto
+# rev1: calcolo vettoriale su tutte le risorse e mesi + heatmap
+# rev2: scala della heatmap solo sui valori finiti
+# rev3: saturazioni infinite (ore richieste senza turni) al massimo della scala ed etichettate, non celle vuote
+
+import pandas as pd
+import numpy as np
+import plotly.express as px
+
+
+####### Funzioni di utilità
+
+def calcola_saturazione_risorse(df_melted, df_efficienza_oee, df_calendario_melted, df_turni_melted, ore_standard,
+                                soglia_collo_bottiglia=1.0):
+    """
+    Calcola ore macchina richieste e disponibili per ogni Risorsa e Anno_Mese.
+
+    Ore richieste = Volume / Velocità_LL
+    Ore disponibili = Turni * Giorni_lavorativi * ore_standard (turni medi del mese da df_turni_melted)
+
+    Args:
+        df_melted: DataFrame con i volumi in formato long
+        df_efficienza_oee: DataFrame con velocità per risorsa
+        df_calendario_melted: DataFrame con giorni lavorativi
+        df_turni_melted: DataFrame con i turni per Risorsa in formato long
+        ore_standard: Ore standard di lavoro
+        soglia_collo_bottiglia: Saturazione oltre la quale la risorsa è un collo di bottiglia
+
+    Returns:
+        DataFrame per Risorsa e Anno_Mese con ore richieste, disponibili, saturazione e flag collo di bottiglia
+    """
+    df_volumi = df_melted.groupby(['Gruppo_risorse', 'Risorsa', 'Anno_Mese']).agg({
+        'Volume': 'sum'
+    }).reset_index()
+
+    df_turni = df_turni_melted.groupby(['Gruppo_risorse', 'Risorsa', 'Anno_Mese']).agg({
+        'Turni': 'mean'
+    }).reset_index()
+
+    df_saturazione = df_volumi.merge(df_turni, on=['Gruppo_risorse', 'Risorsa', 'Anno_Mese'], how='outer')
+    df_saturazione = df_saturazione.merge(df_efficienza_oee[['Risorsa', 'Velocità_LL']], on=['Risorsa'], how='left')
+    df_saturazione = df_saturazione.merge(
+        df_calendario_melted[['Gruppo_risorse', 'Anno_Mese', 'Giorni_lavorativi']],
+        on=['Gruppo_risorse', 'Anno_Mese'],
+        how='left'
+    )
+
+    df_saturazione['Volume'] = df_saturazione['Volume'].fillna(0)
+    df_saturazione['Ore_richieste'] = df_saturazione['Volume'] / df_saturazione['Velocità_LL']
+    df_saturazione['Ore_disponibili'] = df_saturazione['Turni'] * df_saturazione['Giorni_lavorativi'] * ore_standard
+
+    ore_disponibili = df_saturazione['Ore_disponibili'].to_numpy(dtype=float)
+    ore_richieste = df_saturazione['Ore_richieste'].to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Ore richieste su una risorsa senza turni: saturazione infinita
+        df_saturazione['Saturazione'] = np.where(ore_disponibili > 0, ore_richieste / ore_disponibili,
+                                                 np.where(ore_richieste > 0, np.inf, 0.0))
+    df_saturazione['Ore_sovraccarico'] = (df_saturazione['Ore_richieste'] - df_saturazione['Ore_disponibili'].fillna(0)).clip(lower=0)
+    df_saturazione['Collo_bottiglia'] = df_saturazione['Saturazione'] > soglia_collo_bottiglia
+
+    return df_saturazione.sort_values(['Gruppo_risorse', 'Risorsa', 'Anno_Mese']).reset_index(drop=True)
+
+
+def classifica_colli_bottiglia(df_saturazione):
+    """
+    Classifica le risorse per gravità del collo di bottiglia.
+
+    Args:
+        df_saturazione: DataFrame da calcola_saturazione_risorse
+
+    Returns:
+        DataFrame per Risorsa ordinato per ore di sovraccarico e saturazione massima
+    """
+    df_classifica = df_saturazione.groupby(['Gruppo_risorse', 'Risorsa']).agg(
+        Saturazione_max=('Saturazione', 'max'),
+        Saturazione_media=('Saturazione', 'mean'),
+        Mesi_collo_bottiglia=('Collo_bottiglia', 'sum'),
+        Ore_sovraccarico=('Ore_sovraccarico', 'sum')
+    ).reset_index()
+
+    df_classifica = df_classifica.sort_values(['Ore_sovraccarico', 'Saturazione_max'], ascending=False).reset_index(drop=True)
+    df_classifica.insert(0, 'Rank', np.arange(1, len(df_classifica) + 1))
+    return df_classifica
+
+
+def crea_heatmap_saturazione(df_saturazione, soglia_collo_bottiglia=1.0):
+    """
+    Crea una heatmap della saturazione per Risorsa (righe) e Anno_Mese (colonne).
+
+    Args:
+        df_saturazione: DataFrame da calcola_saturazione_risorse
+        soglia_collo_bottiglia: Saturazione al centro della scala colori
+
+    Returns:
+        Figure plotly
+    """
+    df_pivot = df_saturazione.pivot_table(
+        index=['Gruppo_risorse', 'Risorsa'],
+        columns='Anno_Mese',
+        values='Saturazione',
+        aggfunc='first'
+    )
+    df_pivot.index = [f'{gruppo} | {risorsa}' for gruppo, risorsa in df_pivot.index]
+
+    # Scala colori centrata sulla soglia: verde sotto, rosso sopra (1.0 se nessuna saturazione è calcolabile)
+    valori = df_pivot.to_numpy(dtype=float)
+    valori = valori[np.isfinite(valori)]
+    massimo = max(float(valori.max()) if valori.size else 0.0, soglia_collo_bottiglia * 1.5)
+    if not massimo > 0:
+        massimo = 1.0
+
+    # Ore richieste senza turni: saturazione infinita, colorata come il massimo ed etichettata
+    infinite = np.isinf(df_pivot.to_numpy(dtype=float))
+    testi = np.where(infinite, '∞ senza turni',
+                     df_pivot.map(lambda valore: '' if pd.isna(valore) else f'{valore:.0%}').to_numpy())
+    df_pivot = df_pivot.mask(infinite, massimo)
+
+    fig = px.imshow(
+        df_pivot,
+        aspect='auto',
+        color_continuous_scale=[(0, 'green'), (soglia_collo_bottiglia / massimo, 'yellow'), (1, 'red')],
+        zmin=0,
+        zmax=massimo,
+        labels={'x': 'Anno-Mese', 'y': 'Risorsa', 'color': 'Saturazione'},
+        title='Saturazione capacità per Risorsa (ore richieste / ore disponibili)'
+    )
+
+    fig.update_traces(text=testi, hovertemplate='Anno-Mese: %{x}<br>Risorsa: %{y}<br>Saturazione: %{text}<extra></extra>')
+
+    # Testo nelle celle solo se la griglia è leggibile
+    if df_pivot.shape[0] <= 40:
+        fig.update_traces(texttemplate='%{text}')
+
+    fig.update_layout(
+        height=max(400, 22 * df_pivot.shape[0]),
+        xaxis_tickangle=-45
+    )
+
+    return fig
@@ -0,0 +1,297 @@
+# Processo manning - prova di carico dell'app Streamlit con pianificatori simulati in parallelo
+# N sessioni AppTest nello stesso processo (come sul server) caricano varianti sintetiche di master_data e cambiano parametri
+# rev1: latenza di ogni rerun con percentili per azione, tempo al primo risultato e memoria del processo campionata
+#
+# Prova: python manning_carico.py --sessioni 8 --varianti 2 --risorse 50 --mesi 12 --azioni 10
+
+import os
+import sys
+import time
+import random
+import argparse
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from manning_lettura import genera_master_data_sintetico
+
+PERCORSO_APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'manning_opt_rev2.py')
+# la pagina è completa quando compare l'ultima sezione
+SEZIONE_FINALE = 'Esportazione risultati'
+PERCENTILI = [50, 90, 95, 99]
+
+# Parametri cambiati dagli utenti simulati: (nome azione, tipo widget, etichetta o chiave, valori; None = opzioni del widget)
+AZIONI_PARAMETRI = [
+    ('soglia_colli_bottiglia', 'slider', 'Soglia saturazione collo di bottiglia (%)', [80, 90, 110, 120]),
+    ('variazione_sensitivita', 'slider', 'Variazione driver (%)', [5, 15, 20]),
+    ('rispetta_capacita', 'checkbox', 'Rispetta capacità macchina (Turni standard)', [True, False]),
+    ('costo_assunzione', 'number_input', 'Costo assunzione (€)', [3000.0, 5000.0, 8000.0]),
+    ('drill_gruppo', 'selectbox', 'drill_gruppo', None),
+    ('scenario_costo', 'selectbox', 'Scenario per la composizione del costo', None),
+]
+
+
+####### Funzioni di utilità
+
+def memoria_processo():
+    """Memoria residente del processo in bytes (da /proc, altrimenti il picco da resource)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        import resource
+        picco = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return picco if sys.platform == 'darwin' else picco * 1024
+
+
+class CampionatoreMemoria:
+    """Campiona la memoria residente del processo a intervalli regolari in un thread separato."""
+
+    def __init__(self, intervallo=0.25):
+        self.intervallo = intervallo
+        self.campioni = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._campiona, daemon=True)
+
+    def _campiona(self):
+        inizio = time.perf_counter()
+        while not self._stop.is_set():
+            self.campioni.append({'Secondi': time.perf_counter() - inizio, 'MB': memoria_processo() / 1024 ** 2})
+            self._stop.wait(self.intervallo)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *eccezione):
+        self._stop.set()
+        self._thread.join()
+
+    def dataframe(self):
+        return pd.DataFrame(self.campioni, columns=['Secondi', 'MB'])
+
+
+@contextmanager
+def runtime_condiviso():
+    """
+    Sessioni AppTest in parallelo nello stesso processo.
+
+    AppTest imposta Runtime._instance all'inizio di ogni run e lo azzera alla fine: con più sessioni un run che
+    termina toglierebbe il runtime a quelli ancora in corso. Durante la prova Runtime.instance() restituisce
+    l'ultimo runtime impostato anche dopo l'azzeramento.
+    """
+    from streamlit.runtime.runtime import Runtime
+
+    originale = Runtime.__dict__['instance']
+    ultimo = []
+
+    def instance(cls):
+        if cls._instance is not None:
+            ultimo[:] = [cls._instance]
+        return ultimo[0] if ultimo else originale.__func__(cls)
+
+    Runtime.instance = classmethod(instance)
+    try:
+        yield
+    finally:
+        Runtime.instance = originale
+
+
+def trova_widget(at, tipo, etichetta):
+    """Widget di un tipo per etichetta o chiave (None se la sezione non è visibile in questa esecuzione)."""
+    for widget in getattr(at, tipo):
+        if widget.label == etichetta or widget.key == etichetta:
+            return widget
+    return None
+
+
+def pagina_completa(at):
+    return any(sezione.value == SEZIONE_FINALE for sezione in at.subheader)
+
+
+def esegui_rerun(at, sessione, azione, righe, timeout):
+    """Esegue un rerun e ne registra durata ed eccezioni mostrate nella pagina."""
+    inizio = time.perf_counter()
+    errore = None
+    try:
+        at.run(timeout=timeout)
+    except Exception as e:
+        errore = f'{type(e).__name__}: {e}'
+    secondi = time.perf_counter() - inizio
+    if errore is None and len(at.exception):
+        errore = at.exception[0].message
+    righe.append({'Sessione': sessione, 'Azione': azione, 'Secondi': secondi, 'Errore': errore,
+                  'MB': memoria_processo() / 1024 ** 2})
+    return errore is None
+
+
+def sessione_utente(sessione, dati_file, n_azioni, barriera=None, seme=0, timeout=300, attesa_job=0.5,
+                    percorso_app=PERCORSO_APP):
+    """
+    Un pianificatore simulato: apre la pagina, carica master_data, attende i risultati e cambia n_azioni parametri.
+
+    Il caricamento gira in un job in background: come il frammento di avanzamento nel browser, la sessione
+    riesegue la pagina ogni attesa_job secondi finché non compare l'ultima sezione.
+
+    Args:
+        sessione: Indice della sessione
+        dati_file: Contenuto di master_data.xlsx (bytes)
+        n_azioni: Numero di cambi di parametro dopo il caricamento
+        barriera: threading.Barrier opzionale per caricare tutti nello stesso istante
+        seme: Seme casuale della sequenza di azioni
+        timeout: Secondi massimi per un rerun e per l'attesa dei risultati
+        attesa_job: Secondi tra i rerun mentre il caricamento è in corso
+        percorso_app: Script Streamlit da provare
+
+    Returns:
+        Tupla (righe di rerun, secondi dal caricamento alla pagina completa o None)
+    """
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(seme)
+    righe = []
+    at = AppTest.from_file(percorso_app, default_timeout=timeout)
+    if not esegui_rerun(at, sessione, 'apertura', righe, timeout):
+        return righe, None
+
+    if barriera is not None:
+        barriera.wait()
+    inizio = time.perf_counter()
+    at.file_uploader[0].set_value(('master_data.xlsx', dati_file, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'))
+    azione = 'caricamento'
+    while esegui_rerun(at, sessione, azione, righe, timeout) and not pagina_completa(at):
+        if time.perf_counter() - inizio > timeout:
+            righe[-1]['Errore'] = f'Risultati non disponibili dopo {timeout} s'
+            return righe, None
+        azione = 'attesa_job'
+        time.sleep(attesa_job)
+    if righe[-1]['Errore'] is not None:
+        return righe, None
+    tempo_al_risultato = time.perf_counter() - inizio
+
+    for _ in range(n_azioni):
+        nome, tipo, etichetta, valori = rng.choice(AZIONI_PARAMETRI)
+        widget = trova_widget(at, tipo, etichetta)
+        if widget is None:
+            continue
+        opzioni = [valore for valore in (valori if valori is not None else widget.options) if valore != widget.value]
+        if not opzioni:
+            continue
+        widget.set_value(rng.choice(opzioni))
+        esegui_rerun(at, sessione, nome, righe, timeout)
+    return righe, tempo_al_risultato
+
+
+def riepilogo_latenze(df_rerun):
+    """
+    Percentili di latenza per azione e complessivi.
+
+    Args:
+        df_rerun: DataFrame dei rerun da prova_carico
+
+    Returns:
+        DataFrame con Azione, Rerun, Errori, p50, p90, p95, p99 e Max (secondi)
+    """
+    def riga(azione, df):
+        secondi = df['Secondi'].to_numpy()
+        return {'Azione': azione, 'Rerun': len(df), 'Errori': int(df['Errore'].notna().sum()),
+                **{f'p{p}': np.percentile(secondi, p) for p in PERCENTILI}, 'Max': secondi.max()}
+
+    righe = [riga(azione, df) for azione, df in df_rerun.groupby('Azione', sort=False)]
+    # il totale esclude apertura e attesa del job: sono i rerun che il pianificatore aspetta davanti alla pagina
+    interattivi = df_rerun[~df_rerun['Azione'].isin(['apertura', 'attesa_job'])]
+    if len(interattivi):
+        righe.append(riga('Totale interattivi', interattivi))
+    return pd.DataFrame(righe)
+
+
+def prova_carico(n_sessioni=4, n_varianti=2, n_risorse=50, n_mesi=12, n_azioni=10, seme=0, timeout=300,
+                 percorso_app=PERCORSO_APP):
+    """
+    Lancia n_sessioni utenti simulati in parallelo che caricano nello stesso istante.
+
+    Le sessioni usano le varianti a rotazione: più sessioni sullo stesso file misurano la condivisione del
+    modello base, più varianti il caricamento concorrente di file diversi.
+
+    Args:
+        n_sessioni: Numero di sessioni concorrenti
+        n_varianti: Numero di master_data sintetici diversi
+        n_risorse: Risorse per variante
+        n_mesi: Mesi per variante
+        n_azioni: Cambi di parametro per sessione
+        seme: Seme di varianti e azioni
+        timeout: Secondi massimi per un rerun
+        percorso_app: Script Streamlit da provare
+
+    Returns:
+        Dizionario con rerun (una riga per rerun), riepilogo (riepilogo_latenze), sessioni (tempo al risultato),
+        memoria (campioni nel tempo), memoria_iniziale_mb, memoria_picco_mb e secondi_totali
+    """
+    varianti = [genera_master_data_sintetico(n_risorse, n_mesi, seme=seme + i) for i in range(n_varianti)]
+    barriera = threading.Barrier(n_sessioni)
+    memoria_iniziale = memoria_processo() / 1024 ** 2
+
+    inizio = time.perf_counter()
+    with runtime_condiviso(), CampionatoreMemoria() as campionatore, ThreadPoolExecutor(max_workers=n_sessioni) as esecutore:
+        futuri = [esecutore.submit(sessione_utente, i, varianti[i % n_varianti], n_azioni, barriera, seme + i, timeout,
+                                   percorso_app=percorso_app)
+                  for i in range(n_sessioni)]
+        risultati = [futuro.result() for futuro in futuri]
+    secondi_totali = time.perf_counter() - inizio
+
+    df_rerun = pd.DataFrame([riga for righe, _ in risultati for riga in righe],
+                            columns=['Sessione', 'Azione', 'Secondi', 'Errore', 'MB'])
+    df_sessioni = pd.DataFrame({'Sessione': range(n_sessioni), 'Variante': [i % n_varianti for i in range(n_sessioni)],
+                                'Secondi_al_risultato': [tempo for _, tempo in risultati]})
+    df_memoria = campionatore.dataframe()
+    return {
+        'rerun': df_rerun,
+        'riepilogo': riepilogo_latenze(df_rerun),
+        'sessioni': df_sessioni,
+        'memoria': df_memoria,
+        'memoria_iniziale_mb': memoria_iniziale,
+        'memoria_picco_mb': max(df_memoria['MB'].max(), df_rerun['MB'].max()) if len(df_rerun) else memoria_iniziale,
+        'secondi_totali': secondi_totali
+    }
+
+
+if __name__ == '__main__':
+    from manning_cache import cache_condivisa, registro_condiviso
+
+    parser = argparse.ArgumentParser(description="Prova di carico dell'app manning con sessioni Streamlit concorrenti")
+    parser.add_argument('--sessioni', type=int, default=4)
+    parser.add_argument('--varianti', type=int, default=2, help='master_data sintetici diversi, assegnati a rotazione')
+    parser.add_argument('--risorse', type=int, default=50)
+    parser.add_argument('--mesi', type=int, default=12)
+    parser.add_argument('--azioni', type=int, default=10, help='cambi di parametro per sessione')
+    parser.add_argument('--seme', type=int, default=0)
+    parser.add_argument('--timeout', type=int, default=300)
+    parser.add_argument('--app', default=PERCORSO_APP)
+    parser.add_argument('--csv', help='salva qui i rerun per confrontare esecuzioni successive')
+    parser.add_argument('--soglia-p95', type=float, help='esce con codice 1 se il p95 dei rerun interattivi supera questi secondi')
+    args = parser.parse_args()
+
+    risultato = prova_carico(args.sessioni, args.varianti, args.risorse, args.mesi, args.azioni, args.seme, args.timeout, args.app)
+    print(f'Sessioni: {args.sessioni}, varianti: {args.varianti} ({args.risorse} risorse x {args.mesi} mesi), '
+          f'durata {risultato["secondi_totali"]:.1f} s')
+    print(risultato['riepilogo'].round(3).to_string(index=False))
+    print()
+    print(risultato['sessioni'].round(2).to_string(index=False))
+    print()
+    print(f'Memoria processo: iniziale {risultato["memoria_iniziale_mb"]:.0f} MB, picco {risultato["memoria_picco_mb"]:.0f} MB, '
+          f'finale {memoria_processo() / 1024 ** 2:.0f} MB')
+    registro = registro_condiviso()
+    cache = cache_condivisa()
+    print(f'Registro modelli: {len(registro.modelli)} modelli, {registro.byte_in_memoria() / 1024 ** 2:.1f} MB, {registro.statistiche}')
+    print(f'Cache stadi: {len(cache.voci)} voci, {cache.byte_in_memoria() / 1024 ** 2:.1f} MB')
+    if args.csv:
+        risultato['rerun'].to_csv(args.csv, index=False)
+
+    riepilogo = risultato['riepilogo'].set_index('Azione')
+    errori = int(riepilogo['Errori'].sum())
+    if errori:
+        print(f'{errori} rerun con errori')
+    if errori or (args.soglia_p95 is not None and 'Totale interattivi' in riepilogo.index
+                  and riepilogo.loc['Totale interattivi', 'p95'] > args.soglia_p95):
+        sys.exit(1)
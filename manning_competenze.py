@@ -0,0 +1,336 @@
+# Processo manning - copertura del fabbisogno con la matrice competenze operatori x Risorsa
+# Flusso massimo sorgente -> operatori -> Risorse qualificate -> pozzo, mese per mese
+# rev1: Dinic su grafo bipartito, formazioni incrociate greedy sui cammini residui e assunzioni per il resto
+# rev2: Coperto_matrice sempre con le sole qualifiche caricate, le formazioni dei mesi precedenti solo nel secondo passaggio
+
+import heapq
+import math
+from collections import deque
+import pandas as pd
+import numpy as np
+import plotly.graph_objects as go
+
+EPS = 1e-9
+COLONNE_ANAGRAFICA = ['Operatore', 'Gruppo_risorse', 'Disponibilita']
+
+
+####### Funzioni di utilità
+
+class ReteFlusso:
+    """
+    Rete di flusso con archi in coppie (arco, inverso) e flusso massimo con l'algoritmo di Dinic.
+
+    Il flusso è incrementale: dopo aver aggiunto archi, flusso_massimo riparte dal flusso corrente.
+    """
+
+    def __init__(self, n_nodi):
+        self.adiacenza = [[] for _ in range(n_nodi)]
+        self.destinazione = []
+        self.capacita = []
+
+    def aggiungi_arco(self, da, a, capacita):
+        """Aggiunge l'arco da -> a e il suo inverso a capacità zero; restituisce l'indice dell'arco."""
+        indice = len(self.destinazione)
+        self.adiacenza[da].append(indice)
+        self.destinazione.append(a)
+        self.capacita.append(float(capacita))
+        self.adiacenza[a].append(indice + 1)
+        self.destinazione.append(da)
+        self.capacita.append(0.0)
+        return indice
+
+    def flusso_arco(self, indice):
+        """Flusso sull'arco (capacità residua dell'arco inverso)."""
+        return self.capacita[indice + 1]
+
+    def _livelli(self, sorgente, pozzo):
+        livello = [-1] * len(self.adiacenza)
+        livello[sorgente] = 0
+        coda = deque([sorgente])
+        while coda:
+            u = coda.popleft()
+            for arco in self.adiacenza[u]:
+                v = self.destinazione[arco]
+                if livello[v] < 0 and self.capacita[arco] > EPS:
+                    livello[v] = livello[u] + 1
+                    coda.append(v)
+        return livello
+
+    def _cammino_aumentante(self, sorgente, pozzo, livello, puntatore):
+        # DFS iterativa sul grafo a livelli: i cammini alternati possono superare il limite di ricorsione
+        cammino = []
+        u = sorgente
+        while True:
+            if u == pozzo:
+                flusso = min(self.capacita[arco] for arco in cammino)
+                for arco in cammino:
+                    self.capacita[arco] -= flusso
+                    self.capacita[arco ^ 1] += flusso
+                return flusso
+            avanzato = False
+            while puntatore[u] < len(self.adiacenza[u]):
+                arco = self.adiacenza[u][puntatore[u]]
+                v = self.destinazione[arco]
+                if self.capacita[arco] > EPS and livello[v] == livello[u] + 1:
+                    cammino.append(arco)
+                    u = v
+                    avanzato = True
+                    break
+                puntatore[u] += 1
+            if not avanzato:
+                if u == sorgente:
+                    return 0.0
+                livello[u] = -1
+                arco = cammino.pop()
+                u = self.destinazione[arco ^ 1]
+                puntatore[u] += 1
+
+    def flusso_massimo(self, sorgente, pozzo):
+        """Aumenta il flusso fino al massimo; restituisce il flusso aggiunto."""
+        totale = 0.0
+        while True:
+            livello = self._livelli(sorgente, pozzo)
+            if livello[pozzo] < 0:
+                return totale
+            puntatore = [0] * len(self.adiacenza)
+            while True:
+                flusso = self._cammino_aumentante(sorgente, pozzo, livello, puntatore)
+                if flusso <= EPS:
+                    break
+                totale += flusso
+
+    def capacita_massima_raggiungibile(self, sorgente):
+        """
+        Capacità del cammino più largo dalla sorgente a ogni nodo nel grafo residuo (Dijkstra sul collo di bottiglia).
+
+        Per un operatore è la capacità che si libera (sua o spostando altri operatori) se lo si forma su una nuova Risorsa.
+        """
+        larghezza = [0.0] * len(self.adiacenza)
+        larghezza[sorgente] = math.inf
+        coda = [(-math.inf, sorgente)]
+        while coda:
+            negativo, u = heapq.heappop(coda)
+            if -negativo < larghezza[u]:
+                continue
+            for arco in self.adiacenza[u]:
+                v = self.destinazione[arco]
+                candidata = min(larghezza[u], self.capacita[arco])
+                if candidata > larghezza[v] + EPS:
+                    larghezza[v] = candidata
+                    heapq.heappush(coda, (-candidata, v))
+        return larghezza
+
+
+def fabbisogno_persone_risorsa(df_melted_equipaggi, df_ore_uomo_dirette_gruppo, ore_standard):
+    """
+    Fabbisogno di persone per Risorsa e Anno_Mese, con gli stessi coefficienti dell'head count di gruppo.
+
+    Fabbisogno_persone = ore_uomo / (Giorni_lavorativi * ore_standard) * head_count_assenteismo_ferie / head_count:
+    sommato sulle Risorse del gruppo restituisce l'head count diretti del gruppo.
+
+    Args:
+        df_melted_equipaggi: DataFrame con ore_uomo per Risorsa e Anno_Mese
+        df_ore_uomo_dirette_gruppo: DataFrame per Gruppo_risorse e Anno_Mese con head count e giorni lavorativi
+        ore_standard: Ore standard di lavoro
+
+    Returns:
+        DataFrame con Gruppo_risorse, Risorsa, Anno_Mese e Fabbisogno_persone
+    """
+    df_gruppo = df_ore_uomo_dirette_gruppo[['Gruppo_risorse', 'Anno_Mese', 'Giorni_lavorativi',
+                                            'head_count', 'head_count_assenteismo_ferie']].copy()
+    df_gruppo['Coefficiente'] = (df_gruppo['head_count_assenteismo_ferie'] / df_gruppo['head_count']).replace([np.inf, -np.inf], np.nan).fillna(1.0)
+
+    df_fabbisogno = df_melted_equipaggi.groupby(['Gruppo_risorse', 'Risorsa', 'Anno_Mese'])['ore_uomo'].sum().reset_index()
+    df_fabbisogno = df_fabbisogno.merge(df_gruppo[['Gruppo_risorse', 'Anno_Mese', 'Giorni_lavorativi', 'Coefficiente']],
+                                        on=['Gruppo_risorse', 'Anno_Mese'], how='left')
+    df_fabbisogno['Fabbisogno_persone'] = (df_fabbisogno['ore_uomo'] / (df_fabbisogno['Giorni_lavorativi'] * ore_standard)
+                                           * df_fabbisogno['Coefficiente']).fillna(0.0)
+    return df_fabbisogno[['Gruppo_risorse', 'Risorsa', 'Anno_Mese', 'Fabbisogno_persone']]
+
+
+def crea_matrice_competenze_modello(df_fabbisogno):
+    """
+    Crea una matrice competenze di partenza: per ogni gruppo tanti operatori quanti il picco di fabbisogno,
+    qualificati su tutte le Risorse del gruppo (l'ipotesi implicita del calcolo per gruppo).
+
+    Args:
+        df_fabbisogno: DataFrame da fabbisogno_persone_risorsa
+
+    Returns:
+        DataFrame con Operatore, Gruppo_risorse, Disponibilita e una colonna 0/1 per Risorsa
+    """
+    risorse = sorted(df_fabbisogno['Risorsa'].unique())
+    picchi = df_fabbisogno.groupby(['Gruppo_risorse', 'Anno_Mese'])['Fabbisogno_persone'].sum().groupby('Gruppo_risorse').max()
+    risorse_gruppo = df_fabbisogno.groupby('Gruppo_risorse')['Risorsa'].unique()
+
+    righe = []
+    for gruppo, picco in picchi.items():
+        for i in range(int(np.ceil(picco - EPS))):
+            riga = {'Operatore': f'{gruppo}_{i + 1:03d}', 'Gruppo_risorse': gruppo, 'Disponibilita': 1.0}
+            riga.update({risorsa: int(risorsa in risorse_gruppo[gruppo]) for risorsa in risorse})
+            righe.append(riga)
+    return pd.DataFrame(righe, columns=COLONNE_ANAGRAFICA + risorse)
+
+
+def calcola_copertura_competenze(df_fabbisogno, df_competenze, formazione=True):
+    """
+    Verifica mese per mese se il fabbisogno per Risorsa è coperto dagli operatori qualificati e trova
+    formazioni incrociate e assunzioni aggiuntive.
+
+    Rete: sorgente -> operatore (Disponibilita) -> Risorse qualificate (illimitato) -> pozzo (Fabbisogno_persone).
+    Coperto_matrice usa sempre e solo le qualifiche della matrice caricata. Se il flusso massimo non copre il
+    fabbisogno, si forma un operatore su una Risorsa scoperta scegliendo quello con la capacità liberabile più
+    alta (cammino più largo nel residuo, stesso gruppo prima) e si riaumenta il flusso; il fabbisogno che resta
+    scoperto va coperto con assunzioni. I mesi sono processati dal più carico e le formazioni proposte valgono
+    anche per i mesi successivi (solo in Coperto_con_formazione). La scelta delle formazioni è euristica (greedy):
+    copre il fabbisogno quando possibile ma non garantisce il numero minimo di formazioni.
+
+    Args:
+        df_fabbisogno: DataFrame da fabbisogno_persone_risorsa
+        df_competenze: DataFrame con Operatore, eventuali Gruppo_risorse e Disponibilita (FTE, default 1)
+            e una colonna per Risorsa (1/x = qualificato)
+        formazione: Se False verifica solo la copertura con la matrice attuale
+
+    Returns:
+        Tupla (df_copertura per Risorsa e mese, df_formazioni, df_assunzioni per Gruppo_risorse)
+    """
+    operatori = df_competenze['Operatore'].astype(str).to_numpy()
+    disponibilita = (df_competenze['Disponibilita'].fillna(1.0).to_numpy(dtype=float)
+                     if 'Disponibilita' in df_competenze.columns else np.ones(len(operatori)))
+    gruppo_operatore = (df_competenze['Gruppo_risorse'].to_numpy()
+                        if 'Gruppo_risorse' in df_competenze.columns else np.full(len(operatori), None))
+
+    risorse = sorted(df_fabbisogno['Risorsa'].unique())
+    gruppo_risorsa = df_fabbisogno.groupby('Risorsa')['Gruppo_risorse'].first().to_dict()
+    indice_risorsa = {risorsa: i for i, risorsa in enumerate(risorse)}
+    qualifiche_matrice = set()
+    for risorsa in risorse:
+        if risorsa in df_competenze.columns:
+            valori = df_competenze[risorsa]
+            qualificato = valori.astype(str).str.strip().str.lower().isin(['1', '1.0', 'x', 'si', 'sì', 'true'])
+            qualifiche_matrice.update((o, indice_risorsa[risorsa]) for o in np.flatnonzero(qualificato.to_numpy()))
+    # qualifiche della matrice più le formazioni proposte nei mesi già processati
+    qualifiche = set(qualifiche_matrice)
+
+    n_operatori, n_risorse = len(operatori), len(risorse)
+    sorgente, pozzo = 0, 1 + n_operatori + n_risorse
+    formazioni = []
+    coperture = []
+    scoperto_gruppo = {}
+
+    fabbisogno_mese = df_fabbisogno.pivot_table(index='Anno_Mese', columns='Risorsa', values='Fabbisogno_persone',
+                                                aggfunc='sum').reindex(columns=risorse).fillna(0.0)
+    ordine_mesi = fabbisogno_mese.sum(axis=1).sort_values(ascending=False).index
+
+    for mese in ordine_mesi:
+        fabbisogno = fabbisogno_mese.loc[mese].to_numpy()
+        rete = ReteFlusso(pozzo + 1)
+        for o in range(n_operatori):
+            rete.aggiungi_arco(sorgente, 1 + o, disponibilita[o])
+        for o, r in sorted(qualifiche_matrice):
+            rete.aggiungi_arco(1 + o, 1 + n_operatori + r, math.inf)
+        archi_pozzo = [rete.aggiungi_arco(1 + n_operatori + r, pozzo, fabbisogno[r]) for r in range(n_risorse)]
+        rete.flusso_massimo(sorgente, pozzo)
+        coperto_matrice = np.array([rete.flusso_arco(arco) for arco in archi_pozzo])
+
+        # formazioni dei mesi precedenti: il flusso riparte da quello della matrice attuale
+        if formazione:
+            for o, r in sorted(qualifiche - qualifiche_matrice):
+                rete.aggiungi_arco(1 + o, 1 + n_operatori + r, math.inf)
+            rete.flusso_massimo(sorgente, pozzo)
+
+        while formazione:
+            scoperto = fabbisogno - np.array([rete.flusso_arco(arco) for arco in archi_pozzo])
+            risorse_scoperte = np.flatnonzero(scoperto > 1e-6)
+            if len(risorse_scoperte) == 0:
+                break
+            larghezza = rete.capacita_massima_raggiungibile(sorgente)
+            candidati = [
+                (gruppo_operatore[o] == gruppo_risorsa[risorse[r]], min(larghezza[1 + o], scoperto[r]), -o, r)
+                for r in risorse_scoperte for o in range(n_operatori)
+                if larghezza[1 + o] > 1e-6 and (o, r) not in qualifiche
+            ]
+            if not candidati:
+                break
+            _, guadagno, meno_o, r = max(candidati)
+            o = -meno_o
+            qualifiche.add((o, r))
+            rete.aggiungi_arco(1 + o, 1 + n_operatori + r, math.inf)
+            rete.flusso_massimo(sorgente, pozzo)
+            formazioni.append({'Operatore': operatori[o], 'Gruppo_operatore': gruppo_operatore[o],
+                               'Risorsa': risorse[r], 'Gruppo_risorse': gruppo_risorsa[risorse[r]],
+                               'Mese_necessaria': mese, 'Persone_liberate': guadagno})
+
+        coperto = np.array([rete.flusso_arco(arco) for arco in archi_pozzo])
+        for r, risorsa in enumerate(risorse):
+            coperture.append({'Gruppo_risorse': gruppo_risorsa[risorsa], 'Risorsa': risorsa, 'Anno_Mese': mese,
+                              'Fabbisogno_persone': fabbisogno[r], 'Coperto_matrice': coperto_matrice[r],
+                              'Coperto_con_formazione': coperto[r], 'Scoperto': max(fabbisogno[r] - coperto[r], 0.0)})
+
+    df_copertura = pd.DataFrame(coperture).sort_values(['Gruppo_risorse', 'Risorsa', 'Anno_Mese']).reset_index(drop=True)
+    df_formazioni = pd.DataFrame(formazioni, columns=['Operatore', 'Gruppo_operatore', 'Risorsa', 'Gruppo_risorse',
+                                                      'Mese_necessaria', 'Persone_liberate'])
+
+    # Assunzioni: nuovi operatori qualificati sulle Risorse scoperte del gruppo, dimensionati sul mese peggiore
+    df_scoperto = df_copertura.groupby(['Gruppo_risorse', 'Anno_Mese'])['Scoperto'].sum().groupby('Gruppo_risorse').max()
+    risorse_scoperte = df_copertura[df_copertura['Scoperto'] > 1e-6].groupby('Gruppo_risorse')['Risorsa'].unique()
+    df_assunzioni = pd.DataFrame({
+        'Gruppo_risorse': df_scoperto.index,
+        'Scoperto_massimo': df_scoperto.to_numpy(),
+        'Assunzioni': np.ceil(df_scoperto.to_numpy() - 1e-6).clip(min=0).astype(int),
+        'Qualifiche_richieste': [', '.join(risorse_scoperte.get(gruppo, [])) for gruppo in df_scoperto.index]
+    })
+    return df_copertura, df_formazioni, df_assunzioni
+
+
+def crea_grafico_copertura(df_copertura):
+    """
+    Crea un grafico mensile di stabilimento con fabbisogno, copertura con la matrice attuale e dopo le formazioni.
+
+    Args:
+        df_copertura: DataFrame da calcola_copertura_competenze
+
+    Returns:
+        Figure plotly
+    """
+    df_mese = df_copertura.groupby('Anno_Mese')[['Fabbisogno_persone', 'Coperto_matrice', 'Coperto_con_formazione']].sum().reset_index()
+
+    fig = go.Figure()
+
+    fig.add_trace(go.Bar(
+        x=df_mese['Anno_Mese'],
+        y=df_mese['Coperto_matrice'],
+        name='Coperto con matrice attuale'
+    ))
+
+    fig.add_trace(go.Bar(
+        x=df_mese['Anno_Mese'],
+        y=df_mese['Coperto_con_formazione'] - df_mese['Coperto_matrice'],
+        name='Coperto con formazione incrociata'
+    ))
+
+    fig.add_trace(go.Scatter(
+        x=df_mese['Anno_Mese'],
+        y=df_mese['Fabbisogno_persone'],
+        name='Fabbisogno',
+        mode='lines+markers',
+        line=dict(color='black')
+    ))
+
+    fig.update_layout(
+        title='Copertura fabbisogno diretti con la matrice competenze',
+        xaxis_title='Anno-Mese',
+        yaxis_title='Numero Persone',
+        barmode='stack',
+        xaxis_tickangle=-45,
+        legend=dict(
+            x=0,
+            y=1.0,
+            bgcolor='rgba(255, 255, 255, 0.5)',
+            bordercolor='rgba(255, 255, 255, 0.5)',
+            borderwidth=2,
+            font=dict(size=12)
+        )
+    )
+
+    return fig
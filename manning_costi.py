@@ -0,0 +1,268 @@
+# Processo manning - costo del lavoro da head count
+# Converte head count, quadratura, assenteismo e ferie in costo scegliendo il mix di copertura più economico
+# rev1: organico a contratto, straordinario e interinali, vettoriale su scenari x gruppi x mesi
+# rev2: coperture del gap confrontate per head count presente (gli assunti a contratto hanno a loro volta assenze e ferie)
+# rev3: fattore assenze e copertura del gap in funzioni condivise con livellamento organico e frontiera
+
+import pandas as pd
+import numpy as np
+import plotly.express as px
+
+COLONNE_TARIFFE = ['Costo_persona_mese', 'Maggiorazione_straordinario', 'Quota_straordinario_max', 'Costo_interinale_mese']
+
+
+####### Funzioni di utilità
+
+def crea_tariffe_default(gruppi_risorse, costo_persona_mese=3500.0, maggiorazione_straordinario=0.25,
+                         quota_straordinario_max=0.10, costo_interinale_mese=4800.0):
+    """
+    Crea la tabella delle tariffe con gli stessi valori per ogni gruppo risorsa.
+
+    Args:
+        gruppi_risorse: Lista dei gruppi risorsa
+        costo_persona_mese: Costo mensile di una persona a contratto
+        maggiorazione_straordinario: Maggiorazione oraria dello straordinario (0.25 = +25%)
+        quota_straordinario_max: Straordinario massimo come quota dell'organico strutturale
+        costo_interinale_mese: Costo mensile di un interinale da agenzia
+
+    Returns:
+        DataFrame con Gruppo_risorse e le colonne tariffa
+    """
+    return pd.DataFrame({
+        'Gruppo_risorse': list(gruppi_risorse),
+        'Costo_persona_mese': costo_persona_mese,
+        'Maggiorazione_straordinario': maggiorazione_straordinario,
+        'Quota_straordinario_max': quota_straordinario_max,
+        'Costo_interinale_mese': costo_interinale_mese
+    })
+
+
+def fattore_assenze(strutturale, gap):
+    """
+    Persone a contratto per head count presente: (strutturale + gap) / strutturale, 1 senza organico strutturale.
+
+    Args:
+        strutturale: Array di head count strutturali (head_count + delta_quadratura)
+        gap: Array di head count per assenteismo e ferie (delta_assenteismo + delta_ferie)
+
+    Returns:
+        Array del fattore assenze
+    """
+    strutturale, gap = np.broadcast_arrays(np.asarray(strutturale, dtype=float), np.asarray(gap, dtype=float))
+    return np.divide(strutturale + gap, strutturale, out=np.ones(strutturale.shape), where=strutturale > 0)
+
+
+def calcola_fattore_assenze(df_ore_uomo_dirette_gruppo):
+    """
+    Fattore assenze per Gruppo_risorse e Anno_Mese dagli head count diretti.
+
+    Args:
+        df_ore_uomo_dirette_gruppo: DataFrame per Gruppo_risorse e Anno_Mese con head count e delta
+
+    Returns:
+        DataFrame con Gruppo_risorse, Anno_Mese e Fattore_assenze
+    """
+    df = df_ore_uomo_dirette_gruppo.fillna({col: 0.0 for col in ['head_count', 'delta_quadratura', 'delta_assenteismo', 'delta_ferie']})
+    return df[['Gruppo_risorse', 'Anno_Mese']].assign(Fattore_assenze=fattore_assenze(
+        (df['head_count'] + df['delta_quadratura']).to_numpy(dtype=float),
+        (df['delta_assenteismo'] + df['delta_ferie']).to_numpy(dtype=float)
+    ))
+
+
+def costi_unitari_presenza(fattore, costo_persona_mese, maggiorazione_straordinario, costo_interinale_mese):
+    """
+    Costi mensili per head count presente di contratto, straordinario e interinali (array in broadcast).
+
+    Args:
+        fattore: Fattore assenze (da fattore_assenze)
+        costo_persona_mese: Costo mensile di una persona a contratto
+        maggiorazione_straordinario: Maggiorazione dello straordinario
+        costo_interinale_mese: Costo mensile di un interinale
+
+    Returns:
+        Tupla (contratto, straordinario, interinali): l'assunto è a sua volta assente, straordinario e interinali no
+    """
+    costo_persona_mese = np.asarray(costo_persona_mese, dtype=float)
+    return (costo_persona_mese * fattore,
+            costo_persona_mese * (1 + np.asarray(maggiorazione_straordinario, dtype=float)),
+            np.asarray(costo_interinale_mese, dtype=float) + np.zeros_like(np.asarray(fattore, dtype=float)))
+
+
+def copri_gap_presenze(gap, straordinario_max, fattore, costo_persona_mese, maggiorazione_straordinario, costo_interinale_mese,
+                       contratto=True):
+    """
+    Copre un gap di head count con il mix più economico confrontato per head count presente.
+
+    Gap e tetto dello straordinario sono in persone (assenze e ferie incluse) e diventano head count presenti
+    dividendo per il fattore assenze. Costi per head count presente da costi_unitari_presenza:
+    - contratto: ogni assunto è a sua volta assente, Costo_persona_mese x fattore
+    - straordinario: ore lavorate dai presenti, Costo_persona_mese x (1 + Maggiorazione_straordinario), fino al tetto
+    - interinali: fatturati sulla presenza, Costo_interinale_mese
+    Lo straordinario (l'unica copertura limitata) si usa per primo solo se costa meno delle altre.
+    Tutti gli argomenti sono array in broadcast.
+
+    Args:
+        gap: Head count da coprire (persone)
+        straordinario_max: Straordinario massimo (persone, es. quota x organico)
+        fattore: Fattore assenze (da fattore_assenze)
+        costo_persona_mese: Costo mensile di una persona a contratto
+        maggiorazione_straordinario: Maggiorazione dello straordinario
+        costo_interinale_mese: Costo mensile di un interinale
+        contratto: False se il gap va coperto solo con straordinario e interinali (organico già deciso)
+
+    Returns:
+        Dizionario con straordinario, interinali e contratto (head count presenti) e costo mensile
+    """
+    costo_contratto, costo_straordinario, costo_interinale = costi_unitari_presenza(
+        fattore, costo_persona_mese, maggiorazione_straordinario, costo_interinale_mese)
+    if not contratto:
+        costo_contratto = np.inf
+    gap_presenze = np.asarray(gap, dtype=float) / fattore
+
+    costo_illimitato = np.minimum(costo_contratto, costo_interinale)
+    straordinario = np.where(costo_straordinario < costo_illimitato, np.minimum(gap_presenze, straordinario_max / fattore), 0.0)
+    resto = gap_presenze - straordinario
+    interinali = np.where(costo_interinale < costo_contratto, resto, 0.0)
+    contratto_presenze = resto - interinali
+    costo = straordinario * costo_straordinario + interinali * costo_interinale
+    if contratto:
+        costo = costo + contratto_presenze * costo_contratto
+    return {'straordinario': straordinario, 'interinali': interinali, 'contratto': contratto_presenze, 'costo': costo}
+
+
+def calcola_costo_lavoro(df_ore_uomo_dirette_gruppo, df_tariffe, manning_indiretti=None, df_scenari=None):
+    """
+    Calcola il costo del lavoro per scenario, Gruppo_risorse e Anno_Mese.
+
+    L'head count strutturale (head_count + delta_quadratura) e gli indiretti sono coperti da personale a contratto.
+    Il gap da assenteismo e ferie (delta_assenteismo + delta_ferie) viene coperto con copri_gap_presenze: mix più
+    economico tra contratto, straordinario (fino a Quota_straordinario_max dello strutturale) e interinali, confrontati
+    per head count effettivamente presente (fattore_assenze = (1 + Assenteismo) x (1 + Copertura_ferie)).
+    Lo straordinario conviene quindi quando la maggiorazione è inferiore all'incidenza di assenze e ferie.
+
+    Args:
+        df_ore_uomo_dirette_gruppo: DataFrame per Gruppo_risorse e Anno_Mese con head count e delta
+        df_tariffe: DataFrame per Gruppo_risorse con le colonne COLONNE_TARIFFE
+        manning_indiretti: DataFrame opzionale con Gruppo_risorse, Anno_Mese e Head Count Indiretti e Attrezzisti
+        df_scenari: DataFrame opzionale con Scenario, eventuali colonne tariffa che sostituiscono la base
+            e Fattore_head_count (moltiplicatore dell'head count diretto e indiretto, es. variazione volumi)
+
+    Returns:
+        DataFrame per Scenario, Gruppo_risorse e Anno_Mese con head count per copertura e costi
+        (HC_contratto_assenze in persone, HC_straordinario e HC_interinali in head count presenti)
+    """
+    df_costi = df_ore_uomo_dirette_gruppo[['Gruppo_risorse', 'Anno_Mese', 'head_count', 'delta_quadratura',
+                                           'delta_assenteismo', 'delta_ferie']].copy()
+    if manning_indiretti is not None:
+        df_costi = df_costi.merge(manning_indiretti[['Gruppo_risorse', 'Anno_Mese', 'Head Count Indiretti e Attrezzisti']],
+                                  on=['Gruppo_risorse', 'Anno_Mese'], how='outer')
+    else:
+        df_costi['Head Count Indiretti e Attrezzisti'] = 0.0
+    df_costi = df_costi.fillna({col: 0.0 for col in ['head_count', 'delta_quadratura', 'delta_assenteismo',
+                                                     'delta_ferie', 'Head Count Indiretti e Attrezzisti']})
+    df_costi = df_costi.merge(df_tariffe[['Gruppo_risorse'] + COLONNE_TARIFFE], on=['Gruppo_risorse'], how='left')
+
+    # Prodotto cartesiano con gli scenari: le tariffe di scenario sostituiscono quelle base dove presenti
+    if df_scenari is None or df_scenari.empty:
+        df_scenari = pd.DataFrame({'Scenario': ['Base']})
+    df_costi = df_costi.merge(df_scenari, how='cross', suffixes=('', '_scenario'))
+    for col in COLONNE_TARIFFE:
+        if f'{col}_scenario' in df_costi.columns:
+            df_costi[col] = df_costi[f'{col}_scenario'].fillna(df_costi[col])
+            df_costi = df_costi.drop(columns=f'{col}_scenario')
+    if 'Fattore_head_count' not in df_costi.columns:
+        df_costi['Fattore_head_count'] = 1.0
+    fattore = df_costi['Fattore_head_count'].fillna(1.0)
+
+    df_costi['HC_strutturale'] = (df_costi['head_count'] + df_costi['delta_quadratura']) * fattore
+    df_costi['HC_gap_assenze'] = (df_costi['delta_assenteismo'] + df_costi['delta_ferie']) * fattore
+    df_costi['HC_indiretti'] = df_costi['Head Count Indiretti e Attrezzisti'] * fattore
+
+    # Incidenza di assenze e ferie: persone a contratto per head count presente
+    strutturale = df_costi['HC_strutturale'].to_numpy(dtype=float)
+    fattore = fattore_assenze(strutturale, df_costi['HC_gap_assenze'].to_numpy(dtype=float))
+    costo_contratto = df_costi['Costo_persona_mese'].to_numpy(dtype=float)
+    maggiorazione = df_costi['Maggiorazione_straordinario'].to_numpy(dtype=float)
+    costo_interinale = df_costi['Costo_interinale_mese'].to_numpy(dtype=float)
+    copertura = copri_gap_presenze(df_costi['HC_gap_assenze'].to_numpy(dtype=float),
+                                   df_costi['Quota_straordinario_max'].to_numpy(dtype=float) * strutturale,
+                                   fattore, costo_contratto, maggiorazione, costo_interinale)
+
+    df_costi['HC_contratto_assenze'] = copertura['contratto'] * fattore
+    df_costi['HC_straordinario'] = copertura['straordinario']
+    df_costi['HC_interinali'] = copertura['interinali']
+
+    df_costi['Costo_strutturale'] = df_costi['HC_strutturale'] * costo_contratto
+    df_costi['Costo_indiretti'] = df_costi['HC_indiretti'] * costo_contratto
+    df_costi['Costo_contratto_assenze'] = df_costi['HC_contratto_assenze'] * costo_contratto
+    df_costi['Costo_straordinario'] = copertura['straordinario'] * costo_contratto * (1 + maggiorazione)
+    df_costi['Costo_interinali'] = copertura['interinali'] * costo_interinale
+    df_costi['Costo_totale'] = (df_costi['Costo_strutturale'] + df_costi['Costo_indiretti'] + df_costi['Costo_contratto_assenze']
+                                + df_costi['Costo_straordinario'] + df_costi['Costo_interinali'])
+
+    colonne = ['Scenario', 'Gruppo_risorse', 'Anno_Mese', 'HC_strutturale', 'HC_gap_assenze', 'HC_indiretti',
+               'HC_contratto_assenze', 'HC_straordinario', 'HC_interinali', 'Costo_strutturale', 'Costo_indiretti',
+               'Costo_contratto_assenze', 'Costo_straordinario', 'Costo_interinali', 'Costo_totale']
+    return df_costi[colonne].sort_values(['Scenario', 'Gruppo_risorse', 'Anno_Mese']).reset_index(drop=True)
+
+
+def crea_grafico_curve_costo(df_costi):
+    """
+    Crea un grafico con la curva del costo totale mensile di stabilimento per ogni scenario.
+
+    Args:
+        df_costi: DataFrame da calcola_costo_lavoro
+
+    Returns:
+        Figure plotly
+    """
+    df_curve = df_costi.groupby(['Scenario', 'Anno_Mese'])['Costo_totale'].sum().reset_index()
+    df_curve['Costo_totale_k'] = df_curve['Costo_totale'] / 1000
+
+    fig = px.line(
+        df_curve,
+        x='Anno_Mese',
+        y='Costo_totale_k',
+        color='Scenario',
+        markers=True,
+        title='Costo del lavoro mensile di stabilimento per scenario (k€)',
+        labels={'Costo_totale_k': 'Costo (k€)', 'Anno_Mese': 'Anno-Mese'}
+    )
+
+    fig.update_layout(xaxis_tickangle=-45)
+
+    return fig
+
+
+def crea_grafico_composizione_costo(df_costi, scenario):
+    """
+    Crea un grafico a barre impilate della composizione del costo per gruppo in uno scenario.
+
+    Args:
+        df_costi: DataFrame da calcola_costo_lavoro
+        scenario: Nome dello scenario
+
+    Returns:
+        Figure plotly
+    """
+    componenti = ['Costo_strutturale', 'Costo_indiretti', 'Costo_contratto_assenze', 'Costo_straordinario', 'Costo_interinali']
+    df_scenario = df_costi[df_costi['Scenario'] == scenario].groupby('Gruppo_risorse')[componenti].sum().reset_index()
+    df_scenario_melted = df_scenario.melt(
+        id_vars=['Gruppo_risorse'],
+        value_vars=componenti,
+        var_name='Componente',
+        value_name='Costo'
+    )
+    df_scenario_melted['Costo_k'] = df_scenario_melted['Costo'] / 1000
+
+    fig = px.bar(
+        df_scenario_melted,
+        x='Gruppo_risorse',
+        y='Costo_k',
+        color='Componente',
+        barmode='stack',
+        title=f'Composizione costo annuo per Gruppo Risorse - {scenario} (k€)',
+        labels={'Costo_k': 'Costo (k€)', 'Gruppo_risorse': 'Gruppo Risorse'}
+    )
+
+    return fig
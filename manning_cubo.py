@@ -0,0 +1,165 @@
+# Processo manning - cubo dei risultati per stabilimento, Gruppo_risorse, Risorsa e mese
+# Calcolato una volta per esecuzione con i totali a ogni livello: grafici e drill-down leggono fette già pronte
+# rev1: componenti base, quadratura, assenteismo, ferie e indiretti; head count per Risorsa ripartito con i fattori del gruppo
+
+import pandas as pd
+import plotly.graph_objects as go
+
+TOTALE = 'Totale'
+MISURE = ['Volume', 'ore_macchina', 'ore_uomo']
+COMPONENTI = ['Base', 'Quadratura', 'Assenteismo', 'Ferie', 'Indiretti']
+LIVELLI = ['Stabilimento', 'Gruppo_risorse', 'Risorsa']
+
+
+####### Funzioni di utilità
+
+class CuboManning:
+    """
+    Cubo (Gruppo_risorse, Risorsa, Anno_Mese) x (misure, componenti di head count) con i totali già sommati.
+
+    Le fette sono indicizzate per (Gruppo_risorse, Risorsa) con TOTALE ai livelli aggregati:
+    (TOTALE, TOTALE) è lo stabilimento, (gruppo, TOTALE) il gruppo, (gruppo, risorsa) la macchina.
+    Per i ruoli indiretti la Risorsa è il nome del ruolo (Indiretti, Attrezzisti, Voltapile).
+    """
+
+    def __init__(self, dati, stabilimento='Stabilimento'):
+        self.dati = dati
+        self.stabilimento = stabilimento
+        self._fette = {chiave: fetta.set_index('Anno_Mese')[MISURE + COMPONENTI + ['Head_count_diretti', 'Head_count_totale']]
+                       for chiave, fetta in dati.groupby(['Gruppo_risorse', 'Risorsa'], sort=False)}
+        self._figli = {TOTALE: sorted(g for g, r in self._fette if g != TOTALE and r == TOTALE)}
+        for gruppo, risorsa in self._fette:
+            if gruppo != TOTALE and risorsa != TOTALE:
+                self._figli.setdefault(gruppo, []).append(risorsa)
+
+    def fetta(self, gruppo=TOTALE, risorsa=TOTALE):
+        """Serie mensile di misure e componenti per un nodo del cubo (vuota se il nodo non esiste)."""
+        fetta = self._fette.get((gruppo, risorsa))
+        if fetta is None:
+            return pd.DataFrame(columns=MISURE + COMPONENTI + ['Head_count_diretti', 'Head_count_totale'])
+        return fetta
+
+    def figli(self, gruppo=TOTALE):
+        """Nodi sotto lo stabilimento (gruppi) o sotto un gruppo (Risorse e ruoli indiretti)."""
+        return self._figli.get(gruppo, [])
+
+    def fette_figli(self, gruppo=TOTALE):
+        """Fette dei figli di un nodo in formato long (una riga per figlio e mese) per i grafici."""
+        figli = self.figli(gruppo)
+        if not figli:
+            return pd.DataFrame(columns=['Figlio', 'Anno_Mese'] + MISURE + COMPONENTI)
+        chiavi = [(figlio, TOTALE) if gruppo == TOTALE else (gruppo, figlio) for figlio in figli]
+        return pd.concat([self._fette[chiave] for chiave in chiavi], keys=figli, names=['Figlio']).reset_index()
+
+
+def costruisci_cubo(df_melted_equipaggi, df_ore_uomo_dirette_gruppo, df_indiretti_attrezzisti_melted, ore_standard,
+                    stabilimento='Stabilimento'):
+    """
+    Costruisce il cubo dei risultati in un solo passaggio dalle foglie (Risorsa x mese) ai totali.
+
+    L'head count di una Risorsa è ore_uomo / (Giorni_lavorativi x ore_standard) con quadratura, assenteismo e ferie
+    del suo gruppo: la somma sulle Risorse coincide con df_ore_uomo_dirette_gruppo.
+
+    Args:
+        df_melted_equipaggi: DataFrame da calcola_equipaggi
+        df_ore_uomo_dirette_gruppo: DataFrame da calcola_ore_uomo_dirette
+        df_indiretti_attrezzisti_melted: DataFrame da prepara_indiretti (o dal modello a driver)
+        ore_standard: Ore standard di lavoro
+        stabilimento: Nome del livello stabilimento
+
+    Returns:
+        CuboManning
+    """
+    df_risorse = df_melted_equipaggi.groupby(['Gruppo_risorse', 'Risorsa', 'Anno_Mese'], as_index=False)[MISURE].sum()
+    df_fattori = df_ore_uomo_dirette_gruppo[['Gruppo_risorse', 'Anno_Mese', 'Giorni_lavorativi', 'Quadratura',
+                                             'Assenteismo', 'Copertura_ferie']].drop_duplicates(['Gruppo_risorse', 'Anno_Mese'])
+    df_risorse = df_risorse.merge(df_fattori, on=['Gruppo_risorse', 'Anno_Mese'], how='left')
+
+    base = df_risorse['ore_uomo'] / (df_risorse['Giorni_lavorativi'] * ore_standard)
+    quadratura = base / (df_risorse['Quadratura'] / 100)
+    assenteismo = quadratura * (1 + df_risorse['Assenteismo'])
+    df_risorse['Base'] = base
+    df_risorse['Quadratura'] = quadratura - base
+    df_risorse['Assenteismo'] = assenteismo - quadratura
+    df_risorse['Ferie'] = assenteismo * (1 + df_risorse['Copertura_ferie']) - assenteismo
+    df_risorse['Indiretti'] = 0.0
+
+    df_ruoli = df_indiretti_attrezzisti_melted.groupby(['Gruppo_risorse', 'Risorsa', 'Anno_Mese'], as_index=False)['Equipaggi'].sum()
+    df_ruoli = df_ruoli.rename(columns={'Equipaggi': 'Indiretti'}).assign(
+        **{col: 0.0 for col in MISURE + ['Base', 'Quadratura', 'Assenteismo', 'Ferie']})
+
+    colonne = ['Gruppo_risorse', 'Risorsa', 'Anno_Mese'] + MISURE + COMPONENTI
+    df_foglie = pd.concat([df_risorse[colonne], df_ruoli[colonne]], ignore_index=True)
+    df_foglie[MISURE + COMPONENTI] = df_foglie[MISURE + COMPONENTI].fillna(0.0)
+
+    # totali per gruppo e per stabilimento dalle foglie (grouping sets)
+    df_gruppi = df_foglie.groupby(['Gruppo_risorse', 'Anno_Mese'], as_index=False)[MISURE + COMPONENTI].sum().assign(Risorsa=TOTALE)
+    df_stabilimento = df_foglie.groupby('Anno_Mese', as_index=False)[MISURE + COMPONENTI].sum().assign(
+        Gruppo_risorse=TOTALE, Risorsa=TOTALE)
+
+    dati = pd.concat([df_foglie, df_gruppi[colonne], df_stabilimento[colonne]], ignore_index=True)
+    dati['Head_count_diretti'] = dati[['Base', 'Quadratura', 'Assenteismo', 'Ferie']].sum(axis=1)
+    dati['Head_count_totale'] = dati['Head_count_diretti'] + dati['Indiretti']
+    dati.insert(0, 'Stabilimento', stabilimento)
+    return CuboManning(dati.sort_values(['Gruppo_risorse', 'Risorsa', 'Anno_Mese']).reset_index(drop=True), stabilimento)
+
+
+def crea_grafico_componenti(cubo, gruppo=TOTALE, risorsa=TOTALE):
+    """
+    Barre impilate delle componenti di head count di un nodo del cubo con il totale sopra ogni mese.
+
+    Args:
+        cubo: CuboManning
+        gruppo: Gruppo_risorse (TOTALE = stabilimento)
+        risorsa: Risorsa (TOTALE = intero gruppo)
+
+    Returns:
+        Figura Plotly
+    """
+    fetta = cubo.fetta(gruppo, risorsa)
+    nome = cubo.stabilimento if gruppo == TOTALE else (gruppo if risorsa == TOTALE else f'{gruppo} / {risorsa}')
+    fig = go.Figure()
+    for componente in COMPONENTI:
+        if fetta[componente].abs().sum() > 0:
+            fig.add_trace(go.Bar(x=fetta.index, y=fetta[componente], name=componente))
+    fig.add_trace(go.Scatter(
+        x=fetta.index, y=fetta['Head_count_totale'], mode='text',
+        text=[f"<b>{valore:.1f}</b>" for valore in fetta['Head_count_totale']],
+        textposition='top center', textfont=dict(size=14), showlegend=False
+    ))
+    fig.update_layout(
+        title=f'Composizione Head Count - {nome}',
+        xaxis_title='Anno-Mese',
+        yaxis_title='Numero Persone',
+        barmode='stack',
+        xaxis_tickangle=-45,
+        height=550
+    )
+    return fig
+
+
+def crea_grafico_figli(cubo, gruppo=TOTALE):
+    """
+    Head count totale dei figli di un nodo (gruppi dello stabilimento o Risorse del gruppo), impilati per mese.
+
+    Args:
+        cubo: CuboManning
+        gruppo: Nodo di partenza (TOTALE = stabilimento)
+
+    Returns:
+        Figura Plotly (customdata = nome del figlio, per il click di drill-down)
+    """
+    df_figli = cubo.fette_figli(gruppo)
+    fig = go.Figure()
+    for figlio, df_figlio in df_figli.groupby('Figlio', sort=False):
+        fig.add_trace(go.Bar(x=df_figlio['Anno_Mese'], y=df_figlio['Head_count_totale'], name=str(figlio),
+                             customdata=[figlio] * len(df_figlio)))
+    fig.update_layout(
+        title=f"Head Count per {'Gruppo Risorse' if gruppo == TOTALE else 'Risorsa'} - {cubo.stabilimento if gruppo == TOTALE else gruppo}",
+        xaxis_title='Anno-Mese',
+        yaxis_title='Numero Persone',
+        barmode='stack',
+        xaxis_tickangle=-45,
+        height=550
+    )
+    return fig
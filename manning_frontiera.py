@@ -0,0 +1,310 @@
+# Processo manning - frontiera di Pareto costo del lavoro / probabilità di copertura per Gruppo_risorse
+# Organico = fabbisogno x (1 + buffer) più la flessibilità della politica (straordinario, interinali), con domanda incerta a scenari
+# rev1: scenari ordinati una volta, copertura e ore di flessibilità attese esatte con searchsorted e somme cumulate per tutti
+#       i buffer x politiche x mesi insieme; tetto di copertura da Turni_standard / Fabbisogno_turni; frontiera a epsilon-vincolo
+# rev2: straordinario e interinali prezzati per head count presente con costi_unitari_presenza di manning_costi
+
+import pandas as pd
+import numpy as np
+import plotly.graph_objects as go
+from manning_costi import calcola_fattore_assenze, costi_unitari_presenza
+
+COLONNE_POLITICHE = ['Politica', 'Quota_straordinario', 'Quota_interinali']
+
+
+####### Funzioni di utilità
+
+def crea_politiche_default():
+    """
+    Politiche di organico da confrontare: la flessibilità è una quota dell'organico a contratto.
+
+    Quota_straordinario vuota usa Quota_straordinario_max delle tariffe del gruppo.
+
+    Returns:
+        DataFrame con le colonne di COLONNE_POLITICHE
+    """
+    return pd.DataFrame({
+        'Politica': ['Solo organico', 'Organico + straordinario', 'Organico + straordinario + interinali'],
+        'Quota_straordinario': [0.0, np.nan, np.nan],
+        'Quota_interinali': [0.0, 0.0, 0.15]
+    })
+
+
+def genera_moltiplicatori(n_gruppi, n_scenari=2000, cv_domanda=0.10, seme=0):
+    """
+    Scenari del rapporto volume effettivo / volume di budget, lognormali con media 1.
+
+    Tutti i gruppi usano le stesse estrazioni normali (numeri casuali comuni): le differenze tra gruppi
+    dipendono solo da cv_domanda e non dal rumore di campionamento.
+
+    Args:
+        n_gruppi: Numero di gruppi
+        n_scenari: Numero di scenari
+        cv_domanda: Coefficiente di variazione del volume (scalare o uno per gruppo)
+        seme: Seme casuale
+
+    Returns:
+        Array (gruppi x scenari)
+    """
+    normali = np.random.default_rng(seme).standard_normal(n_scenari)
+    sigma = np.sqrt(np.log1p(np.broadcast_to(np.asarray(cv_domanda, dtype=float), (n_gruppi,)) ** 2))[:, None]
+    return np.exp(sigma * normali[None, :] - sigma ** 2 / 2)
+
+
+def _eccesso_atteso(ordinati, code, soglie):
+    """
+    E[(m - k)+] e P(m <= k) sugli scenari ordinati di un gruppo per un array di soglie k (anche infinite).
+
+    Args:
+        ordinati: Scenari del gruppo in ordine crescente (S,)
+        code: Somme degli scenari da ogni posizione alla fine (S + 1,)
+        soglie: Array di soglie
+
+    Returns:
+        Tupla (eccesso atteso, probabilità di non superare la soglia), con la forma di soglie
+    """
+    n_scenari = len(ordinati)
+    indici = np.searchsorted(ordinati, soglie, side='right')
+    sopra = n_scenari - indici
+    with np.errstate(invalid='ignore'):
+        eccesso = np.where(sopra > 0, (code[indici] - soglie * sopra) / n_scenari, 0.0)
+    return eccesso, indici / n_scenari
+
+
+def _minimo_costo_vincolato(costo, copertura, soglie):
+    """
+    Epsilon-vincolo: per ogni soglia il candidato di costo minimo con copertura almeno pari alla soglia.
+
+    Args:
+        costo: Array (gruppi x candidati)
+        copertura: Array (gruppi x candidati)
+        soglie: Array (gruppi x soglie)
+
+    Returns:
+        Tupla (indice del candidato, ammissibile) con forma (gruppi x soglie)
+    """
+    ammessi = copertura[:, None, :] >= soglie[:, :, None] - 1e-12
+    costo_ammesso = np.where(ammessi, costo[:, None, :], np.inf)
+    return costo_ammesso.argmin(axis=2), ammessi.any(axis=2)
+
+
+def calcola_frontiera_copertura(df_fabbisogno, df_tariffe, df_politiche=None, df_turni=None, colonna_fabbisogno='head_count_assenteismo_ferie',
+                                cv_domanda=0.10, n_scenari=2000, buffer_max=0.5, n_buffer=101, n_punti=50, seme=0, moltiplicatori=None):
+    """
+    Costo del lavoro atteso e probabilità di copertura per ogni Gruppo_risorse, politica e buffer, con la frontiera di Pareto.
+
+    In ogni mese l'organico a contratto è fabbisogno x (1 + buffer). Se il volume effettivo (fabbisogno x m, con m
+    dagli scenari) supera l'organico si usa straordinario fino a Quota_straordinario e poi interinali fino a
+    Quota_interinali dell'organico. Il mese è coperto se la domanda sta in organico + flessibilità e nella capacità
+    macchina (m <= Turni_standard / Fabbisogno_turni): oltre i turni standard nessun organico copre la domanda.
+    La copertura è la media sui mesi della probabilità di coprire il mese, quindi basta la distribuzione di m.
+    Come nel costo del lavoro, il gap in persone diventa head count presente dividendo per il fattore assenze
+    (le quote valgono sull'organico presente) e straordinario e interinali sono prezzati con costi_unitari_presenza.
+
+    Args:
+        df_fabbisogno: DataFrame con Gruppo_risorse, Anno_Mese e colonna_fabbisogno (es. df_ore_uomo_dirette_gruppo:
+            con head_count e delta il fattore assenze è calcolato, altrimenti si usa Fattore_assenze se presente o 1)
+        df_tariffe: DataFrame per Gruppo_risorse con le colonne tariffa di manning_costi (solo i gruppi presenti sono analizzati)
+        df_politiche: DataFrame con le colonne di COLONNE_POLITICHE (default crea_politiche_default)
+        df_turni: DataFrame opzionale con Gruppo_risorse, Anno_Mese, Fabbisogno_turni e Turni_standard
+        colonna_fabbisogno: Colonna di head count da coprire
+        cv_domanda: Coefficiente di variazione del volume mensile (scalare o Series per Gruppo_risorse)
+        n_scenari: Scenari di volume per gruppo
+        buffer_max: Buffer massimo sull'organico (0.5 = +50%)
+        n_buffer: Livelli di buffer tra 0 e buffer_max
+        n_punti: Punti della frontiera per gruppo
+        seme: Seme casuale degli scenari
+        moltiplicatori: Array opzionale (gruppi x scenari) o (scenari,) di rapporti volume effettivo / budget
+            al posto degli scenari lognormali (es. da errori di previsione storici)
+
+    Returns:
+        Dizionario con candidati (Gruppo_risorse, Politica, Buffer, Costo, Copertura, organico medio,
+        straordinario e interinali medi in head count presenti, Pareto),
+        frontiera (Gruppo_risorse, Punto, Copertura_obiettivo, Copertura, Costo, Politica, Buffer) e
+        limiti (Gruppo_risorse, Margine_turni_medio, Copertura_massima_macchina)
+    """
+    df_politiche = crea_politiche_default() if df_politiche is None else df_politiche.dropna(subset=['Politica'])
+    tariffe = df_tariffe.drop_duplicates('Gruppo_risorse').set_index('Gruppo_risorse')
+    df_fabbisogno = df_fabbisogno[df_fabbisogno['Gruppo_risorse'].isin(tariffe.index)]
+    fabbisogno = df_fabbisogno.pivot_table(index='Gruppo_risorse', columns='Anno_Mese', values=colonna_fabbisogno,
+                                           aggfunc='sum').fillna(0.0)
+    gruppi = fabbisogno.index
+    fabbisogno_gm = fabbisogno.to_numpy(dtype=float)
+
+    # persone per head count presente per gruppo e mese
+    if {'head_count', 'delta_quadratura', 'delta_assenteismo', 'delta_ferie'} <= set(df_fabbisogno.columns):
+        df_fattore = calcola_fattore_assenze(df_fabbisogno)
+    elif 'Fattore_assenze' in df_fabbisogno.columns:
+        df_fattore = df_fabbisogno
+    else:
+        df_fattore = df_fabbisogno.assign(Fattore_assenze=1.0)
+    fattore_gm = df_fattore.pivot_table(index='Gruppo_risorse', columns='Anno_Mese', values='Fattore_assenze', aggfunc='mean')
+    fattore_gm = fattore_gm.reindex(index=gruppi, columns=fabbisogno.columns).fillna(1.0).to_numpy(dtype=float)
+
+    # tetto macchina come rapporto m massimo servibile: infinito senza turni o con fabbisogno turni nullo
+    if df_turni is not None:
+        turni = df_turni.groupby(['Gruppo_risorse', 'Anno_Mese'])[['Fabbisogno_turni', 'Turni_standard']].sum(min_count=1)
+        turni = turni.reindex(pd.MultiIndex.from_product([gruppi, fabbisogno.columns], names=['Gruppo_risorse', 'Anno_Mese']))
+        fabbisogno_turni = turni['Fabbisogno_turni'].to_numpy(dtype=float).reshape(fabbisogno_gm.shape)
+        turni_standard = turni['Turni_standard'].to_numpy(dtype=float).reshape(fabbisogno_gm.shape)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            tetto = np.where((fabbisogno_turni > 0) & np.isfinite(turni_standard), turni_standard / fabbisogno_turni, np.inf)
+        margine_turni = np.nanmean(turni_standard - fabbisogno_turni, axis=1) if fabbisogno_gm.size else np.full(len(gruppi), np.nan)
+    else:
+        tetto = np.full(fabbisogno_gm.shape, np.inf)
+        margine_turni = np.full(len(gruppi), np.nan)
+
+    if moltiplicatori is None:
+        cv = cv_domanda.reindex(gruppi).fillna(0.0).to_numpy() if isinstance(cv_domanda, pd.Series) else cv_domanda
+        moltiplicatori = genera_moltiplicatori(len(gruppi), n_scenari, cv, seme)
+    ordinati = np.sort(np.broadcast_to(moltiplicatori, (len(gruppi), np.shape(moltiplicatori)[-1])), axis=1)
+    code = np.concatenate([np.cumsum(ordinati[:, ::-1], axis=1)[:, ::-1], np.zeros((len(gruppi), 1))], axis=1)
+
+    tariffe = tariffe.reindex(gruppi)
+    costo_persona = tariffe['Costo_persona_mese'].to_numpy(dtype=float)
+    _, costo_straordinario, costo_interinale = costi_unitari_presenza(
+        fattore_gm, costo_persona[:, None], tariffe['Maggiorazione_straordinario'].to_numpy(dtype=float)[:, None],
+        tariffe['Costo_interinale_mese'].to_numpy(dtype=float)[:, None])
+    quota_straordinario = df_politiche['Quota_straordinario'].to_numpy(dtype=float)[:, None]
+    quota_straordinario = np.where(np.isnan(quota_straordinario), tariffe['Quota_straordinario_max'].to_numpy(dtype=float)[None, :],
+                                   quota_straordinario)
+    quota_interinali = np.broadcast_to(df_politiche['Quota_interinali'].fillna(0.0).to_numpy(dtype=float)[:, None],
+                                       quota_straordinario.shape)
+    buffer = np.linspace(0.0, buffer_max, n_buffer)
+
+    # soglie su m (in unità di fabbisogno di budget, persone) per politica x gruppo x buffer: organico, + straordinario,
+    # + interinali; quota x organico in persone equivale a quota x organico presente in head count presenti
+    organico = np.broadcast_to(1 + buffer, (len(df_politiche), len(gruppi), n_buffer))
+    soglia_straordinario = organico * (1 + quota_straordinario)[:, :, None]
+    soglia_interinali = organico * (1 + quota_straordinario + quota_interinali)[:, :, None]
+
+    # un solo passaggio per gruppo su tutte le soglie (politiche x buffer x mesi); il resto è broadcast
+    forma = (len(df_politiche), n_buffer, fabbisogno_gm.shape[1])
+    copertura_mesi = np.empty((len(gruppi),) + forma)
+    straordinario = np.empty((len(gruppi),) + forma)
+    interinali = np.empty((len(gruppi),) + forma)
+    for g in range(len(gruppi)):
+        tetto_g = tetto[g][None, None, :]
+        soglie = np.stack([np.broadcast_to(s[:, g, :, None], forma) for s in (organico, soglia_straordinario, soglia_interinali)])
+        # E[(min(m, tetto) - k)+] = E[(m - k)+] - E[(m - max(k, tetto))+]: oltre il tetto la domanda non si lavora
+        eccesso, _ = _eccesso_atteso(ordinati[g], code[g], soglie)
+        eccesso_tetto, _ = _eccesso_atteso(ordinati[g], code[g], np.maximum(soglie, tetto_g))
+        servito = eccesso - eccesso_tetto
+        straordinario[g] = servito[0] - servito[1]
+        interinali[g] = servito[1] - servito[2]
+        _, copertura_mesi[g] = _eccesso_atteso(ordinati[g], code[g], np.minimum(soglie[2], tetto_g))
+
+    # costi in euro: organico in persone, flessibilità attesa in head count presenti (persone / fattore assenze)
+    f = fabbisogno_gm[:, None, None, :]
+    organico_gpbm = np.moveaxis(organico, 1, 0)[:, :, :, None] * f
+    straordinario = straordinario * f / fattore_gm[:, None, None, :]
+    interinali = interinali * f / fattore_gm[:, None, None, :]
+    costo = (costo_persona[:, None, None, None] * organico_gpbm
+             + costo_straordinario[:, None, None, :] * straordinario
+             + costo_interinale[:, None, None, :] * interinali).sum(axis=3)
+    copertura = copertura_mesi.mean(axis=3)
+
+    # candidati (gruppo x politica x buffer) in forma piatta per gruppo
+    n_candidati = len(df_politiche) * n_buffer
+    costo_piatto = costo.reshape(len(gruppi), n_candidati)
+    copertura_piatta = copertura.reshape(len(gruppi), n_candidati)
+    df_candidati = pd.DataFrame({
+        'Gruppo_risorse': np.repeat(gruppi.to_numpy(), n_candidati),
+        'Politica': np.tile(np.repeat(df_politiche['Politica'].to_numpy(), n_buffer), len(gruppi)),
+        'Buffer': np.tile(buffer, len(gruppi) * len(df_politiche)),
+        'Costo': costo_piatto.ravel(),
+        'Copertura': copertura_piatta.ravel(),
+        'Organico_medio': organico_gpbm.mean(axis=3).ravel(),
+        'Straordinario_medio': straordinario.mean(axis=3).ravel(),
+        'Interinali_medi': interinali.mean(axis=3).ravel()
+    })
+    # Pareto: ordinati per costo, un candidato è non dominato se copre più di tutti quelli meno costosi
+    df_candidati = df_candidati.sort_values(['Gruppo_risorse', 'Costo', 'Copertura'], ascending=[True, True, False])
+    massimo_precedente = df_candidati.groupby('Gruppo_risorse')['Copertura'].transform(lambda s: s.cummax().shift(fill_value=-np.inf))
+    df_candidati['Pareto'] = df_candidati['Copertura'] > massimo_precedente + 1e-12
+    df_candidati = df_candidati.sort_index().reset_index(drop=True)
+
+    # epsilon-vincolo: n_punti obiettivi di copertura tra il candidato più economico e la copertura massima del gruppo
+    piu_economico = np.take_along_axis(copertura_piatta, costo_piatto.argmin(axis=1)[:, None], axis=1)[:, 0] if n_candidati else np.zeros(len(gruppi))
+    obiettivi = np.linspace(piu_economico, copertura_piatta.max(axis=1, initial=0.0), n_punti, axis=1)
+    scelti, ammissibili = _minimo_costo_vincolato(costo_piatto, copertura_piatta, obiettivi)
+    df_frontiera = pd.DataFrame({
+        'Gruppo_risorse': np.repeat(gruppi.to_numpy(), n_punti),
+        'Punto': np.tile(np.arange(n_punti), len(gruppi)),
+        'Copertura_obiettivo': obiettivi.ravel(),
+        'Copertura': np.take_along_axis(copertura_piatta, scelti, axis=1).ravel(),
+        'Costo': np.take_along_axis(costo_piatto, scelti, axis=1).ravel(),
+        'Politica': df_politiche['Politica'].to_numpy()[(scelti // n_buffer).ravel()],
+        'Buffer': buffer[(scelti % n_buffer).ravel()]
+    })[ammissibili.ravel()].reset_index(drop=True)
+
+    df_limiti = pd.DataFrame({
+        'Gruppo_risorse': gruppi,
+        'Margine_turni_medio': margine_turni,
+        'Copertura_massima_macchina': np.array([(np.searchsorted(ordinati[g], tetto[g], side='right') / ordinati.shape[1]).mean()
+                                                if fabbisogno_gm.shape[1] else 1.0 for g in range(len(gruppi))])
+    })
+    return {'candidati': df_candidati, 'frontiera': df_frontiera, 'limiti': df_limiti}
+
+
+def costo_per_copertura(df_candidati, obiettivi=(0.90, 0.95, 0.99)):
+    """
+    Costo minimo per raggiungere coperture obiettivo, per gruppo (epsilon-vincolo sugli stessi candidati della frontiera).
+
+    Args:
+        df_candidati: DataFrame candidati da calcola_frontiera_copertura
+        obiettivi: Coperture obiettivo (0.95 = 95%)
+
+    Returns:
+        DataFrame con Gruppo_risorse, Copertura_obiettivo, Costo, Politica, Buffer e Copertura (vuoti se l'obiettivo
+        supera il tetto macchina o il buffer massimo)
+    """
+    righe = []
+    for gruppo, df_gruppo in df_candidati.groupby('Gruppo_risorse', sort=False):
+        scelti, ammissibili = _minimo_costo_vincolato(df_gruppo['Costo'].to_numpy()[None, :], df_gruppo['Copertura'].to_numpy()[None, :],
+                                                      np.asarray(obiettivi, dtype=float)[None, :])
+        for obiettivo, indice, ammissibile in zip(obiettivi, scelti[0], ammissibili[0]):
+            scelto = df_gruppo.iloc[indice]
+            righe.append({'Gruppo_risorse': gruppo, 'Copertura_obiettivo': obiettivo,
+                          **({col: scelto[col] for col in ['Costo', 'Politica', 'Buffer', 'Copertura']} if ammissibile
+                             else {'Costo': np.nan, 'Politica': None, 'Buffer': np.nan, 'Copertura': np.nan})})
+    return pd.DataFrame(righe, columns=['Gruppo_risorse', 'Copertura_obiettivo', 'Costo', 'Politica', 'Buffer', 'Copertura'])
+
+
+def crea_grafico_frontiera(risultato, gruppo_risorse):
+    """
+    Candidati per politica e frontiera di Pareto costo / copertura di un gruppo, con il tetto dei turni standard.
+
+    Args:
+        risultato: Dizionario da calcola_frontiera_copertura
+        gruppo_risorse: Nome del gruppo risorsa
+
+    Returns:
+        Figure plotly
+    """
+    df_candidati = risultato['candidati'][risultato['candidati']['Gruppo_risorse'] == gruppo_risorse]
+    df_frontiera = risultato['frontiera'][risultato['frontiera']['Gruppo_risorse'] == gruppo_risorse]
+    limiti = risultato['limiti'].set_index('Gruppo_risorse')
+
+    fig = go.Figure()
+    for politica, df_politica in df_candidati.groupby('Politica', sort=False):
+        fig.add_trace(go.Scatter(
+            x=df_politica['Copertura'] * 100, y=df_politica['Costo'] / 1000, mode='lines', name=politica, opacity=0.5,
+            customdata=df_politica['Buffer'] * 100,
+            hovertemplate='Buffer %{customdata:.0f}%<br>Copertura %{x:.1f}%<br>Costo %{y:,.0f} k€<extra>' + politica + '</extra>'
+        ))
+    fig.add_trace(go.Scatter(
+        x=df_frontiera['Copertura'] * 100, y=df_frontiera['Costo'] / 1000, mode='markers+lines', name='Frontiera di Pareto',
+        line=dict(color='black', width=3), customdata=np.stack([df_frontiera['Buffer'] * 100, df_frontiera['Politica']], axis=1),
+        hovertemplate='%{customdata[1]}<br>Buffer %{customdata[0]:.0f}%<br>Copertura %{x:.1f}%<br>Costo %{y:,.0f} k€<extra></extra>'
+    ))
+    if gruppo_risorse in limiti.index and limiti.loc[gruppo_risorse, 'Copertura_massima_macchina'] < 1:
+        fig.add_vline(x=limiti.loc[gruppo_risorse, 'Copertura_massima_macchina'] * 100, line_dash='dash', line_color='red',
+                      annotation_text='Tetto turni standard')
+    fig.update_layout(
+        title=f'Costo del lavoro vs probabilità di copertura - {gruppo_risorse}',
+        xaxis_title='Probabilità di copertura mensile (%)',
+        yaxis_title='Costo atteso (k€)',
+        height=550
+    )
+    return fig
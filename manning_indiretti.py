@@ -0,0 +1,125 @@
+# Processo manning - modello a driver per Indiretti, Attrezzisti e Voltapile
+# Ogni ruolo indiretto è una parte fissa più una parte variabile su un driver della catena diretta
+# rev1: driver head count diretti, ore macchina, pallet movimentati e turni; regole tarate sul foglio equipaggi
+
+import numpy as np
+import pandas as pd
+
+# Driver per Gruppo_risorse e mese: fisso (nessun driver), head count diretti, ore macchina (con attrezzaggi),
+# pallet movimentati (Volume / Pezzi_per_pallet) e turni (massimo dei turni standard tra le Risorse del gruppo)
+DRIVER_INDIRETTI = ['fisso', 'head_count_diretti', 'ore_macchina', 'pallet', 'turni']
+COLONNE_REGOLE = ['Gruppo_risorse', 'Ruolo', 'Driver', 'Fisso', 'Variabile', 'Pezzi_per_pallet']
+
+
+####### Funzioni di utilità
+
+def calcola_driver_indiretti(df_melted_equipaggi, df_ore_uomo_dirette_gruppo, turni_standard=None):
+    """
+    Valori dei driver per Gruppo_risorse e Anno_Mese dai risultati della catena diretta.
+
+    Args:
+        df_melted_equipaggi: DataFrame da calcola_equipaggi
+        df_ore_uomo_dirette_gruppo: DataFrame da calcola_ore_uomo_dirette
+        turni_standard: DataFrame opzionale con Turni_standard per Risorsa e Anno_Mese
+
+    Returns:
+        DataFrame con Gruppo_risorse, Anno_Mese, fisso, head_count_diretti, ore_macchina, volume e turni
+    """
+    df_driver = df_melted_equipaggi.groupby(['Gruppo_risorse', 'Anno_Mese'], as_index=False).agg(
+        ore_macchina=('ore_macchina', 'sum'), volume=('Volume', 'sum'))
+    df_driver = df_driver.merge(
+        df_ore_uomo_dirette_gruppo.groupby(['Gruppo_risorse', 'Anno_Mese'], as_index=False).agg(
+            head_count_diretti=('head_count_assenteismo_ferie', 'sum')),
+        on=['Gruppo_risorse', 'Anno_Mese'], how='outer')
+    if turni_standard is not None:
+        df_driver = df_driver.merge(
+            turni_standard.groupby(['Gruppo_risorse', 'Anno_Mese'], as_index=False).agg(turni=('Turni_standard', 'max')),
+            on=['Gruppo_risorse', 'Anno_Mese'], how='left')
+    else:
+        df_driver['turni'] = np.nan
+    df_driver['fisso'] = 0.0
+    return df_driver[['Gruppo_risorse', 'Anno_Mese', 'fisso', 'head_count_diretti', 'ore_macchina', 'volume', 'turni']]
+
+
+def prepara_regole_indiretti(df_regole):
+    """
+    Controlla le regole e completa le colonne facoltative (Fisso, Variabile 0, Pezzi_per_pallet 1).
+
+    Args:
+        df_regole: DataFrame con Gruppo_risorse, Ruolo, Driver e facoltative Fisso, Variabile, Pezzi_per_pallet
+
+    Returns:
+        DataFrame con le colonne di COLONNE_REGOLE
+    """
+    mancanti = {'Gruppo_risorse', 'Ruolo', 'Driver'} - set(df_regole.columns)
+    if mancanti:
+        raise ValueError(f"Regole indiretti: colonne mancanti {', '.join(sorted(mancanti))}")
+    df_regole = df_regole.dropna(subset=['Gruppo_risorse', 'Ruolo', 'Driver']).copy()
+    sconosciuti = sorted(set(df_regole['Driver']) - set(DRIVER_INDIRETTI))
+    if sconosciuti:
+        raise ValueError(f"Regole indiretti: driver non validi {', '.join(map(str, sconosciuti))} (validi: {', '.join(DRIVER_INDIRETTI)})")
+    for col, predefinito in [('Fisso', 0.0), ('Variabile', 0.0), ('Pezzi_per_pallet', 1.0)]:
+        df_regole[col] = df_regole[col].astype(float).fillna(predefinito) if col in df_regole.columns else predefinito
+    return df_regole[COLONNE_REGOLE]
+
+
+def applica_regole_indiretti(df_indiretti_attrezzisti_melted, df_regole, df_driver):
+    """
+    Head count dei ruoli indiretti = somma sulle regole di Fisso + Variabile x driver, per tutti i gruppi e mesi insieme.
+
+    I ruoli con almeno una regola sostituiscono le righe del foglio equipaggi del loro gruppo, gli altri restano invariati.
+
+    Args:
+        df_indiretti_attrezzisti_melted: DataFrame da prepara_indiretti
+        df_regole: DataFrame di regole (vedi prepara_regole_indiretti)
+        df_driver: DataFrame da calcola_driver_indiretti
+
+    Returns:
+        DataFrame nel formato di prepara_indiretti
+    """
+    df_regole = prepara_regole_indiretti(df_regole)
+    df_calcolo = df_regole.merge(df_driver, on='Gruppo_risorse', how='inner')
+    df_calcolo['pallet'] = df_calcolo['volume'] / df_calcolo['Pezzi_per_pallet']
+
+    # valore del driver di ogni regola preso dalla sua colonna con un solo take sulla matrice dei driver
+    matrice = df_calcolo[DRIVER_INDIRETTI].to_numpy(dtype=float)
+    indice_driver = df_calcolo['Driver'].map({driver: i for i, driver in enumerate(DRIVER_INDIRETTI)}).to_numpy()
+    valore = np.nan_to_num(matrice[np.arange(len(df_calcolo)), indice_driver])
+    df_calcolo['Equipaggi'] = df_calcolo['Fisso'] + df_calcolo['Variabile'] * valore
+
+    df_ruoli = df_calcolo.groupby(['Gruppo_risorse', 'Ruolo', 'Anno_Mese'], as_index=False)['Equipaggi'].sum().rename(
+        columns={'Ruolo': 'Risorsa'})
+    df_ruoli['Periodo_dt'] = pd.to_datetime(df_ruoli['Anno_Mese'] + '-01')
+    df_ruoli['Periodo'] = df_ruoli['Periodo_dt']
+
+    chiavi_ruoli = pd.MultiIndex.from_frame(df_regole[['Gruppo_risorse', 'Ruolo']].drop_duplicates())
+    sostituiti = pd.MultiIndex.from_frame(df_indiretti_attrezzisti_melted[['Gruppo_risorse', 'Risorsa']]).isin(chiavi_ruoli)
+    return pd.concat([df_indiretti_attrezzisti_melted[~sostituiti], df_ruoli[df_indiretti_attrezzisti_melted.columns]],
+                     ignore_index=True)
+
+
+def crea_regole_indiretti(df_indiretti_attrezzisti_melted, df_driver, driver='head_count_diretti', quota_fissa=0.5):
+    """
+    Regole tarate sul foglio equipaggi: sul budget ogni ruolo vale in media quanto nel foglio.
+
+    Fisso = quota_fissa x media del ruolo, Variabile = (1 - quota_fissa) x media del ruolo / media del driver.
+
+    Args:
+        df_indiretti_attrezzisti_melted: DataFrame da prepara_indiretti
+        df_driver: DataFrame da calcola_driver_indiretti
+        driver: Driver di DRIVER_INDIRETTI usato per la parte variabile
+        quota_fissa: Quota della media del ruolo che non dipende dal driver
+
+    Returns:
+        DataFrame di regole con le colonne di COLONNE_REGOLE
+    """
+    medie_ruoli = df_indiretti_attrezzisti_melted.groupby(['Gruppo_risorse', 'Risorsa'], as_index=False)['Equipaggi'].mean()
+    colonna_driver = 'volume' if driver == 'pallet' else driver
+    medie_driver = df_driver.groupby('Gruppo_risorse')[colonna_driver].mean()
+    df_regole = medie_ruoli.rename(columns={'Risorsa': 'Ruolo'})
+    media_driver = df_regole['Gruppo_risorse'].map(medie_driver)
+    df_regole['Driver'] = np.where(media_driver > 0, driver, 'fisso')
+    df_regole['Fisso'] = np.where(media_driver > 0, quota_fissa * df_regole['Equipaggi'], df_regole['Equipaggi'])
+    df_regole['Variabile'] = np.where(media_driver > 0, (1 - quota_fissa) * df_regole['Equipaggi'] / media_driver, 0.0)
+    df_regole['Pezzi_per_pallet'] = 1.0
+    return df_regole[COLONNE_REGOLE]
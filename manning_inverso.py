@@ -0,0 +1,209 @@
+# Processo manning - modalità inversa
+# Dato un tetto di head count per Gruppo_risorse e mese calcola il volume massimo producibile per Risorsa
+# rev1: forma chiusa senza vincoli macchina, bisezione vettoriale con capacità turni
+
+import pandas as pd
+import numpy as np
+import plotly.graph_objects as go
+
+
+####### Funzioni di utilità
+
+def calcola_coefficiente_head_count(df_ore_uomo_dirette_gruppo, ore_standard):
+    """
+    Calcola il coefficiente che trasforma ore uomo in head count con assenteismo e ferie.
+
+    head_count_assenteismo_ferie = ore_uomo * coefficiente, con
+    coefficiente = (1 + Assenteismo) * (1 + Copertura_ferie) / (Giorni_lavorativi * ore_standard * Quadratura/100)
+
+    Args:
+        df_ore_uomo_dirette_gruppo: DataFrame per Gruppo_risorse e Anno_Mese con Giorni_lavorativi,
+            Quadratura, Assenteismo e Copertura_ferie
+        ore_standard: Ore standard di lavoro
+
+    Returns:
+        DataFrame con Gruppo_risorse, Anno_Mese e Coefficiente_head_count
+    """
+    df_coeff = df_ore_uomo_dirette_gruppo[['Gruppo_risorse', 'Anno_Mese']].copy()
+    df_coeff['Coefficiente_head_count'] = (
+        (1 + df_ore_uomo_dirette_gruppo['Assenteismo']) * (1 + df_ore_uomo_dirette_gruppo['Copertura_ferie'])
+        / (df_ore_uomo_dirette_gruppo['Giorni_lavorativi'] * ore_standard * df_ore_uomo_dirette_gruppo['Quadratura'] / 100)
+    )
+    # giorni lavorativi o quadratura a zero non permettono di calcolare il volume
+    df_coeff['Coefficiente_head_count'] = df_coeff['Coefficiente_head_count'].replace([np.inf, -np.inf], np.nan)
+    return df_coeff
+
+
+def calcola_volumi_massimi(df_melted_equipaggi, df_ore_uomo_dirette_gruppo, df_head_count_max, ore_standard,
+                           turni_standard=None, iterazioni=60):
+    """
+    Calcola il volume massimo producibile per Risorsa dato un tetto di head count per gruppo e mese.
+
+    Il mix di volumi del budget viene mantenuto: ogni Risorsa del gruppo viene scalata dello stesso fattore.
+    Senza vincoli di capacità macchina la soluzione è in forma chiusa (fattore = tetto / head count budget).
+    Con turni_standard le risorse si saturano a Turni_standard * Giorni_lavorativi * ore_standard * Velocità_LL
+    e il fattore viene trovato con una bisezione vettoriale su tutti i gruppi e mesi insieme.
+
+    Args:
+        df_melted_equipaggi: DataFrame per Risorsa e Anno_Mese con Volume, Velocità_LL ed Equipaggi
+        df_ore_uomo_dirette_gruppo: DataFrame per Gruppo_risorse e Anno_Mese con i parametri di head count
+        df_head_count_max: DataFrame con Gruppo_risorse, Anno_Mese e Head_count_max
+        ore_standard: Ore standard di lavoro
+        turni_standard: DataFrame opzionale con Anno_Mese, Gruppo_risorse, Risorsa e Turni_standard
+        iterazioni: Numero di iterazioni della bisezione
+
+    Returns:
+        Tupla (df_risorse, df_gruppi): volumi massimi per Risorsa e riepilogo per gruppo e mese
+    """
+    df_risorse = df_melted_equipaggi[['Gruppo_risorse', 'Risorsa', 'Anno_Mese', 'Volume', 'Velocità_LL', 'Equipaggi']].copy()
+    df_risorse['Volume'] = df_risorse['Volume'].fillna(0)
+    df_risorse = df_risorse.merge(
+        calcola_coefficiente_head_count(df_ore_uomo_dirette_gruppo, ore_standard),
+        on=['Gruppo_risorse', 'Anno_Mese'],
+        how='left'
+    )
+    df_risorse = df_risorse.merge(
+        df_ore_uomo_dirette_gruppo[['Gruppo_risorse', 'Anno_Mese', 'Giorni_lavorativi']],
+        on=['Gruppo_risorse', 'Anno_Mese'],
+        how='left'
+    )
+
+    # Capacità macchina in pezzi per mese (infinita se i turni non sono forniti)
+    if turni_standard is not None:
+        df_risorse = df_risorse.merge(
+            turni_standard[['Anno_Mese', 'Gruppo_risorse', 'Risorsa', 'Turni_standard']],
+            on=['Anno_Mese', 'Gruppo_risorse', 'Risorsa'],
+            how='left'
+        )
+        df_risorse['Volume_capacita'] = (df_risorse['Turni_standard'] * df_risorse['Giorni_lavorativi']
+                                         * ore_standard * df_risorse['Velocità_LL']).fillna(np.inf)
+    else:
+        df_risorse['Volume_capacita'] = np.inf
+
+    # Head count per pezzo di ogni risorsa
+    df_risorse['Head_count_per_pezzo'] = df_risorse['Equipaggi'] / df_risorse['Velocità_LL'] * df_risorse['Coefficiente_head_count']
+
+    # Indici dei gruppi-mese per le somme vettoriali
+    df_gruppi = df_risorse.groupby(['Gruppo_risorse', 'Anno_Mese'], sort=True).size().reset_index()[['Gruppo_risorse', 'Anno_Mese']]
+    df_gruppi = df_gruppi.merge(df_head_count_max[['Gruppo_risorse', 'Anno_Mese', 'Head_count_max']],
+                                on=['Gruppo_risorse', 'Anno_Mese'], how='left')
+    indice = df_risorse.set_index(['Gruppo_risorse', 'Anno_Mese']).index
+    gid = pd.MultiIndex.from_frame(df_gruppi[['Gruppo_risorse', 'Anno_Mese']]).get_indexer(indice)
+    n_gruppi = len(df_gruppi)
+
+    volume_0 = df_risorse['Volume'].to_numpy(dtype=float)
+    capacita = df_risorse['Volume_capacita'].to_numpy(dtype=float)
+    hc_pezzo = np.nan_to_num(df_risorse['Head_count_per_pezzo'].to_numpy(dtype=float), nan=0.0)
+    head_count_max = df_gruppi['Head_count_max'].to_numpy(dtype=float)
+
+    def head_count(fattore):
+        return np.bincount(gid, weights=hc_pezzo * np.minimum(fattore[gid] * volume_0, capacita), minlength=n_gruppi)
+
+    head_count_budget = np.bincount(gid, weights=hc_pezzo * volume_0, minlength=n_gruppi)
+
+    # Forma chiusa: fattore lineare senza saturazione
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fattore = np.where(head_count_budget > 0, head_count_max / head_count_budget, np.nan)
+
+    # Fattore oltre il quale tutte le risorse con capacità finita sono sature
+    libera = ~np.isfinite(capacita) & (volume_0 > 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        saturazione = np.where((volume_0 > 0) & ~libera, capacita / volume_0, 0.0)
+    fattore_saturo = np.zeros(n_gruppi)
+    np.maximum.at(fattore_saturo, gid, saturazione)
+    pendenza_libera = np.bincount(gid, weights=hc_pezzo * volume_0 * libera, minlength=n_gruppi)
+
+    valido = np.isfinite(fattore) & (fattore > 0)
+    fattore_top = np.where(valido, np.maximum(fattore, fattore_saturo), 0.0)
+    head_count_top = head_count(fattore_top)
+
+    # Oltre la saturazione l'head count cresce linearmente con le sole risorse senza vincolo
+    oltre = valido & (head_count_top <= head_count_max)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fattore_oltre = np.where(pendenza_libera > 0,
+                                 fattore_top + (head_count_max - head_count_top) / pendenza_libera,
+                                 fattore_saturo)
+
+    # Bisezione vettoriale tra forma chiusa (limite inferiore) e saturazione: l'head count è monotono nel fattore
+    da_bisezionare = valido & ~oltre
+    if da_bisezionare.any():
+        basso = np.where(da_bisezionare, fattore, 0.0)
+        alto = np.where(da_bisezionare, fattore_top, 0.0)
+        for _ in range(iterazioni):
+            medio = (basso + alto) / 2
+            sotto = head_count(medio) <= head_count_max
+            basso = np.where(sotto, medio, basso)
+            alto = np.where(sotto, alto, medio)
+        fattore = np.where(da_bisezionare, basso, fattore)
+    fattore = np.where(oltre, fattore_oltre, fattore)
+    fattore = np.where(head_count_max <= 0, 0.0, fattore)
+
+    df_risorse['Fattore_scala'] = fattore[gid]
+    df_risorse['Volume_massimo'] = np.minimum(df_risorse['Fattore_scala'] * volume_0, capacita)
+    df_risorse['Saturata'] = np.isfinite(capacita) & (df_risorse['Volume_massimo'] >= capacita)
+    df_risorse['ore_macchina_massime'] = df_risorse['Volume_massimo'] / df_risorse['Velocità_LL']
+
+    df_gruppi['Head_count_budget'] = head_count_budget
+    df_gruppi['Fattore_scala'] = fattore
+    df_gruppi = df_gruppi.merge(
+        df_risorse.groupby(['Gruppo_risorse', 'Anno_Mese']).agg({
+            'Volume': 'sum',
+            'Volume_massimo': 'sum',
+            'Saturata': 'sum'
+        }).reset_index().rename(columns={'Volume': 'Volume_budget', 'Saturata': 'Risorse_sature'}),
+        on=['Gruppo_risorse', 'Anno_Mese'],
+        how='left'
+    )
+    df_gruppi['Head_count_utilizzato'] = np.bincount(
+        gid, weights=hc_pezzo * np.nan_to_num(df_risorse['Volume_massimo'].to_numpy(dtype=float)), minlength=n_gruppi)
+    df_gruppi['Limite'] = np.where(oltre & (pendenza_libera == 0), 'Capacità macchina', 'Head count')
+
+    df_risorse = df_risorse.drop(columns=['Coefficiente_head_count', 'Head_count_per_pezzo'])
+    return df_risorse, df_gruppi
+
+
+def crea_grafico_volume_massimo(df_gruppi, gruppo_risorse):
+    """
+    Crea un grafico confronto tra volume budget e volume massimo con il tetto di head count.
+
+    Args:
+        df_gruppi: DataFrame riepilogo per gruppo e mese da calcola_volumi_massimi
+        gruppo_risorse: Nome del gruppo risorsa per il titolo
+
+    Returns:
+        Figure plotly
+    """
+    df_gruppo = df_gruppi[df_gruppi['Gruppo_risorse'] == gruppo_risorse]
+
+    fig = go.Figure()
+
+    fig.add_trace(go.Bar(
+        x=df_gruppo['Anno_Mese'],
+        y=df_gruppo['Volume_budget'] / 1000000,
+        name='Volume Budget'
+    ))
+
+    fig.add_trace(go.Bar(
+        x=df_gruppo['Anno_Mese'],
+        y=df_gruppo['Volume_massimo'] / 1000000,
+        name='Volume Massimo',
+        text=[f"<b>{val:.0%}</b>" if pd.notna(val) else '' for val in df_gruppo['Volume_massimo'] / df_gruppo['Volume_budget']],
+        textposition='outside'
+    ))
+
+    fig.update_layout(
+        title=f'Volume massimo con tetto head count - {gruppo_risorse}',
+        xaxis_title='Anno-Mese',
+        yaxis_title='Volume (Milioni)',
+        xaxis_tickangle=-45,
+        legend=dict(
+            x=0,
+            y=1.0,
+            bgcolor='rgba(255, 255, 255, 0.5)',
+            bordercolor='rgba(255, 255, 255, 0.5)',
+            borderwidth=2,
+            font=dict(size=12)
+        )
+    )
+
+    return fig
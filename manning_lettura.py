@@ -0,0 +1,373 @@
+# Processo manning - lettura veloce di master_data.xlsx con scelta automatica del motore
+# Motori: calamine (se installato python-calamine), valori_xml (parser XML della libreria standard) e openpyxl
+# rev1: valori_xml è un reader pandas, quindi righe -> DataFrame passa dallo stesso parser e i tipi sono identici
+#
+# Benchmark: python manning_lettura.py --risorse 2000 --mesi 36
+
+import time
+import argparse
+import zipfile
+import posixpath
+import importlib.util
+import xml.etree.ElementTree as ET
+from io import BytesIO
+import pandas as pd
+import numpy as np
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format, is_timedelta_format
+from openpyxl.utils.datetime import CALENDAR_MAC_1904, CALENDAR_WINDOWS_1900, from_excel
+
+# Ordine di preferenza (dal più veloce nel benchmark) per la scelta automatica
+MOTORI_EXCEL = ['calamine', 'valori_xml', 'openpyxl']
+
+NS_MAIN = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+NS_FOGLIO = {'m': NS_MAIN,
+             'r': 'http://schemas.openxmlformats.org/officeDocument/2006/relationships',
+             'rel': 'http://schemas.openxmlformats.org/package/2006/relationships'}
+TAG_RIGA = f'{{{NS_MAIN}}}row'
+TAG_CELLA = f'{{{NS_MAIN}}}c'
+TAG_VALORE = f'{{{NS_MAIN}}}v'
+TAG_TESTO = f'{{{NS_MAIN}}}t'
+TAG_STRINGA = f'{{{NS_MAIN}}}si'
+TAG_RICCO = f'{{{NS_MAIN}}}r'
+
+
+####### Funzioni di utilità
+
+def parti_fogli(archivio):
+    """
+    Percorso della parte XML di ogni foglio nello zip di un .xlsx.
+
+    Args:
+        archivio: zipfile.ZipFile aperto sul file .xlsx
+
+    Returns:
+        Dizionario nome foglio -> percorso nello zip (nell'ordine del workbook)
+    """
+    nomi = set(archivio.namelist())
+    workbook = ET.fromstring(archivio.read('xl/workbook.xml'))
+    relazioni = ET.fromstring(archivio.read('xl/_rels/workbook.xml.rels'))
+    destinazioni = {rel.get('Id'): rel.get('Target') for rel in relazioni.findall('rel:Relationship', NS_FOGLIO)}
+
+    parti = {}
+    for foglio in workbook.findall('m:sheets/m:sheet', NS_FOGLIO):
+        destinazione = destinazioni.get(foglio.get(f"{{{NS_FOGLIO['r']}}}id"), '')
+        parte = destinazione.lstrip('/') if destinazione.startswith('/') else posixpath.normpath(posixpath.join('xl', destinazione))
+        if parte in nomi:
+            parti[foglio.get('name')] = parte
+    return parti
+
+
+def indice_colonna(riferimento):
+    """Indice (da 0) della colonna di un riferimento di cella, es. 'AB12' -> 27."""
+    indice = 0
+    for carattere in riferimento:
+        if carattere.isdigit():
+            break
+        indice = indice * 26 + ord(carattere) - 64
+    return indice - 1
+
+
+class CartellaValori:
+    """Workbook aperto dal lettore valori_xml: zip, stringhe condivise, formati data per stile ed epoca."""
+
+    def __init__(self, sorgente):
+        self.archivio = zipfile.ZipFile(sorgente)
+        nomi = set(self.archivio.namelist())
+        self.parti = parti_fogli(self.archivio)
+
+        workbook_pr = ET.fromstring(self.archivio.read('xl/workbook.xml')).find('m:workbookPr', NS_FOGLIO)
+        data_1904 = workbook_pr is not None and workbook_pr.get('date1904') in ('1', 'true')
+        self.epoca = CALENDAR_MAC_1904 if data_1904 else CALENDAR_WINDOWS_1900
+
+        # Stesso testo di openpyxl: <t> diretto o concatenazione delle sequenze di testo ricco (senza fonetica)
+        self.stringhe = []
+        if 'xl/sharedStrings.xml' in nomi:
+            for stringa in ET.fromstring(self.archivio.read('xl/sharedStrings.xml')).iter(TAG_STRINGA):
+                testo = stringa.find(TAG_TESTO)
+                if testo is not None:
+                    contenuto = testo.text or ''
+                else:
+                    contenuto = ''.join(t.text or '' for r in stringa.findall(TAG_RICCO) for t in r.findall(TAG_TESTO))
+                self.stringhe.append(contenuto.replace('x005F_', ''))
+
+        # Per ogni stile di cella: None se non è una data, altrimenti True/False per i formati durata
+        self.stili_data = []
+        if 'xl/styles.xml' in nomi:
+            stili = ET.fromstring(self.archivio.read('xl/styles.xml'))
+            formati = dict(BUILTIN_FORMATS)
+            for formato in stili.findall('m:numFmts/m:numFmt', NS_FOGLIO):
+                formati[int(formato.get('numFmtId'))] = formato.get('formatCode')
+            for xf in stili.findall('m:cellXfs/m:xf', NS_FOGLIO):
+                codice = formati.get(int(xf.get('numFmtId', 0)), 'General')
+                self.stili_data.append(is_timedelta_format(codice) if is_date_format(codice) else None)
+
+    def close(self):
+        self.archivio.close()
+
+
+def _classe_lettore_valori():
+    """
+    Crea il reader pandas valori_xml (None se gli interni di pandas non sono quelli attesi).
+
+    Il reader legge solo i valori in cache delle celle con il parser XML in C della libreria standard e
+    restituisce le righe come il reader openpyxl di pandas (stesse conversioni di celle, righe e colonne vuote).
+    """
+    try:
+        from pandas.io.excel._base import BaseExcelReader
+    except ImportError:
+        return None
+
+    class LettoreValoriXml(BaseExcelReader):
+
+        @property
+        def _workbook_class(self):
+            return CartellaValori
+
+        def load_workbook(self, filepath_or_buffer, engine_kwargs):
+            return CartellaValori(filepath_or_buffer)
+
+        @property
+        def sheet_names(self):
+            return list(self.book.parti)
+
+        def get_sheet_by_name(self, name):
+            self.raise_if_bad_sheet_by_name(name)
+            return self.book.parti[name]
+
+        def get_sheet_by_index(self, index):
+            self.raise_if_bad_sheet_by_index(index)
+            return list(self.book.parti.values())[index]
+
+        def _converti_cella(self, cella):
+            tipo = cella.get('t')
+            if tipo == 'inlineStr':
+                return ''.join(t.text or '' for t in cella.iter(TAG_TESTO)) or ''
+            valore = cella.find(TAG_VALORE)
+            if valore is None or valore.text is None:
+                return ''
+            testo = valore.text
+            if tipo == 's':
+                return self.book.stringhe[int(testo)]
+            if tipo == 'str':
+                return testo
+            if tipo == 'b':
+                return bool(int(testo))
+            if tipo == 'e':
+                return np.nan
+            if tipo == 'd':
+                return pd.Timestamp(testo).to_pydatetime()
+
+            numero = float(testo) if ('.' in testo or 'E' in testo or 'e' in testo) else int(testo)
+            stile = int(cella.get('s', 0))
+            durata = self.book.stili_data[stile] if stile < len(self.book.stili_data) else None
+            if durata is not None:
+                return from_excel(numero, self.book.epoca, timedelta=durata)
+            intero = int(numero)
+            return intero if intero == numero else float(numero)
+
+        def get_sheet_data(self, sheet, file_rows_needed=None):
+            data = []
+            last_row_with_data = -1
+            with self.book.archivio.open(sheet) as parte:
+                for _, elemento in ET.iterparse(parte):
+                    if elemento.tag != TAG_RIGA:
+                        continue
+                    numero_riga = int(elemento.get('r', len(data) + 1)) - 1
+                    # righe assenti nell'XML sono righe vuote
+                    data.extend([] for _ in range(numero_riga - len(data)))
+
+                    converted_row = []
+                    for cella in elemento.iter(TAG_CELLA):
+                        riferimento = cella.get('r')
+                        if riferimento is not None:
+                            converted_row.extend('' for _ in range(indice_colonna(riferimento) - len(converted_row)))
+                        converted_row.append(self._converti_cella(cella))
+                    elemento.clear()
+
+                    while converted_row and converted_row[-1] == '':
+                        converted_row.pop()
+                    if converted_row:
+                        last_row_with_data = len(data)
+                    data.append(converted_row)
+                    if file_rows_needed is not None and len(data) >= file_rows_needed:
+                        break
+
+            data = data[: last_row_with_data + 1]
+            if len(data) > 0:
+                max_width = max(len(data_row) for data_row in data)
+                if min(len(data_row) for data_row in data) < max_width:
+                    data = [data_row + (max_width - len(data_row)) * [''] for data_row in data]
+            return data
+
+    return LettoreValoriXml
+
+
+def registra_motore_valori_xml():
+    """Registra valori_xml tra i motori di pd.ExcelFile; False se non è possibile con questa versione di pandas."""
+    if 'valori_xml' in pd.ExcelFile._engines:
+        return True
+    lettore = _classe_lettore_valori()
+    if lettore is None or not isinstance(pd.ExcelFile._engines, dict):
+        return False
+    pd.ExcelFile._engines = {**pd.ExcelFile._engines, 'valori_xml': lettore}
+    return True
+
+
+def motori_disponibili():
+    """Motori utilizzabili in questo ambiente, nell'ordine di MOTORI_EXCEL."""
+    disponibili = []
+    for motore in MOTORI_EXCEL:
+        if motore == 'calamine' and importlib.util.find_spec('python_calamine') is None:
+            continue
+        if motore == 'valori_xml' and not registra_motore_valori_xml():
+            continue
+        disponibili.append(motore)
+    return disponibili
+
+
+def scegli_motore(motore='auto'):
+    """
+    Motore da usare: il primo disponibile di MOTORI_EXCEL con 'auto', altrimenti quello indicato.
+
+    Args:
+        motore: 'auto' o nome di un motore
+
+    Returns:
+        Nome del motore
+    """
+    disponibili = motori_disponibili()
+    if motore == 'auto':
+        return disponibili[0]
+    if motore not in disponibili:
+        raise ValueError(f"Motore Excel non disponibile: {motore} (disponibili: {', '.join(disponibili)})")
+    return motore
+
+
+def apri_excel(dati_file, motore='auto'):
+    """
+    Apre il file con il motore scelto; i fogli si leggono con parse() senza riaprirlo.
+
+    Args:
+        dati_file: Contenuto del file .xlsx (bytes) o percorso
+        motore: 'auto' o nome del motore
+
+    Returns:
+        pd.ExcelFile (da usare come context manager)
+    """
+    sorgente = BytesIO(dati_file) if isinstance(dati_file, bytes) else dati_file
+    if motore == 'auto' and not zipfile.is_zipfile(sorgente):
+        # .xls o .ods: motore scelto da pandas in base al formato
+        if hasattr(sorgente, 'seek'):
+            sorgente.seek(0)
+        return pd.ExcelFile(sorgente)
+    if hasattr(sorgente, 'seek'):
+        sorgente.seek(0)
+    return pd.ExcelFile(sorgente, engine=scegli_motore(motore))
+
+
+def leggi_fogli(dati_file, fogli, motore='auto'):
+    """
+    Legge più fogli aprendo il file una volta sola.
+
+    Args:
+        dati_file: Contenuto del file .xlsx (bytes) o percorso
+        fogli: Dizionario nome foglio -> parametri di ExcelFile.parse (es. {'parse_dates': True})
+        motore: 'auto' o nome del motore
+
+    Returns:
+        Dizionario nome foglio -> DataFrame
+    """
+    with apri_excel(dati_file, motore) as libro:
+        return {foglio: libro.parse(foglio, **parametri) for foglio, parametri in fogli.items()}
+
+
+def genera_master_data_sintetico(n_risorse=500, n_mesi=24, seme=0):
+    """
+    Genera un master_data.xlsx sintetico con la struttura dei sei fogli (per il benchmark).
+
+    Args:
+        n_risorse: Numero di Risorse, divise in gruppi da 25
+        n_mesi: Numero di colonne mese
+        seme: Seme casuale
+
+    Returns:
+        Contenuto del file .xlsx in bytes
+    """
+    rng = np.random.default_rng(seme)
+    mesi = list(pd.date_range('2026-01-01', periods=n_mesi, freq='MS'))
+    gruppi = [f'Gruppo_{i // 25:03d}' for i in range(n_risorse)]
+    risorse = [f'Risorsa_{i:05d}' for i in range(n_risorse)]
+    nomi_gruppi = sorted(set(gruppi))
+
+    def per_risorsa(valori):
+        return pd.DataFrame({'Gruppo_risorse': gruppi, 'Risorsa': risorse,
+                             **{mese: valori[:, j] for j, mese in enumerate(mesi)}})
+
+    fogli = {
+        'volumi_bgt': per_risorsa(rng.integers(100_000, 5_000_000, (n_risorse, n_mesi))),
+        'equipaggi': per_risorsa(rng.integers(2, 6, (n_risorse, n_mesi)) + 0.5),
+        'calendario': pd.DataFrame({'Gruppo_risorse': nomi_gruppi,
+                                    **{mese: rng.integers(18, 23, len(nomi_gruppi)) for mese in mesi}}),
+        'turni': per_risorsa(rng.choice([2, 3], (n_risorse, n_mesi))),
+        'assenteismo_ferie': pd.DataFrame({'Gruppo_risorse': nomi_gruppi, 'Assenteismo': 0.06, 'Copertura_ferie': 0.1}),
+        'efficienza_oee': pd.DataFrame({'Gruppo_risorse': gruppi, 'Risorsa': risorse,
+                                        'Velocità_LL': rng.integers(4000, 9000, n_risorse),
+                                        'OEE': rng.uniform(0.6, 0.85, n_risorse).round(3), 'Quadratura': 85}),
+    }
+    output = BytesIO()
+    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+        for foglio, df in fogli.items():
+            df.to_excel(writer, index=False, sheet_name=foglio)
+    return output.getvalue()
+
+
+def confronta_motori(dati_file, fogli, ripetizioni=3):
+    """
+    Tempi di lettura dei fogli con ogni motore disponibile e verifica che i DataFrame siano identici a openpyxl.
+
+    Args:
+        dati_file: Contenuto del file .xlsx (bytes)
+        fogli: Dizionario nome foglio -> parametri di lettura
+        ripetizioni: Letture per motore (si tiene la migliore)
+
+    Returns:
+        DataFrame con Motore, Secondi, Velocita_vs_openpyxl e Identico
+    """
+    riferimento = leggi_fogli(dati_file, fogli, 'openpyxl')
+    righe = []
+    for motore in motori_disponibili():
+        tempi = []
+        for _ in range(ripetizioni):
+            inizio = time.perf_counter()
+            letti = leggi_fogli(dati_file, fogli, motore)
+            tempi.append(time.perf_counter() - inizio)
+        identico = True
+        for foglio, df in letti.items():
+            try:
+                pd.testing.assert_frame_equal(df, riferimento[foglio])
+            except AssertionError:
+                identico = False
+        righe.append({'Motore': motore, 'Secondi': min(tempi), 'Identico': identico})
+    df_confronto = pd.DataFrame(righe)
+    secondi_openpyxl = df_confronto.loc[df_confronto['Motore'] == 'openpyxl', 'Secondi'].iloc[0]
+    df_confronto['Velocita_vs_openpyxl'] = secondi_openpyxl / df_confronto['Secondi']
+    return df_confronto
+
+
+if __name__ == '__main__':
+    from manning_pipeline import FOGLI_MASTER_DATA
+
+    parser = argparse.ArgumentParser(description='Benchmark dei motori di lettura di master_data.xlsx')
+    parser.add_argument('file', nargs='?', help='master_data.xlsx (default: workbook sintetico)')
+    parser.add_argument('--risorse', type=int, default=2000)
+    parser.add_argument('--mesi', type=int, default=36)
+    parser.add_argument('--ripetizioni', type=int, default=3)
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file, 'rb') as f:
+            dati = f.read()
+    else:
+        dati = genera_master_data_sintetico(args.risorse, args.mesi)
+    print(f'File: {args.file or f"sintetico {args.risorse} risorse x {args.mesi} mesi"} ({len(dati) / 1024 ** 2:.1f} MB)')
+    print(confronta_motori(dati, FOGLI_MASTER_DATA, args.ripetizioni).to_string(index=False))
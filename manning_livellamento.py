@@ -0,0 +1,263 @@
+# Processo manning - livellamento organico con costi di assunzione e uscita
+# Programmazione dinamica sugli organici interi per trovare la traiettoria di minimo costo
+# rev1: DP vettoriale su tutti i gruppi insieme, transizioni lineari con min cumulati (O(mesi * livelli))
+# rev2: costi mensili per gruppo dalla tabella tariffe di manning_costi, come nel costo del lavoro
+# rev3: straordinario e interinali per head count presente (copri_gap_presenze di manning_costi)
+
+import pandas as pd
+import numpy as np
+import plotly.graph_objects as go
+from manning_costi import COLONNE_TARIFFE, crea_tariffe_default, copri_gap_presenze
+
+
+####### Funzioni di utilità
+
+def costo_copertura(organico, fabbisogno, fattore, costo_persona_mese, maggiorazione_straordinario, costo_interinale,
+                    quota_straordinario):
+    """
+    Calcola il costo mensile di un organico dato il fabbisogno, coprendo il gap con straordinario e interinali.
+
+    Organico e fabbisogno sono persone (assenze e ferie incluse). Il gap (fabbisogno - organico) è coperto come nel
+    costo del lavoro (copri_gap_presenze) per head count presente: straordinario fino a quota_straordinario
+    dell'organico presente, se costa meno degli interinali, e il resto con interinali.
+    Tutti gli argomenti possono essere array per gruppo (broadcast con organico).
+
+    Args:
+        organico: Array di organici (persone)
+        fabbisogno: Array di fabbisogni head count (broadcast con organico)
+        fattore: Fattore assenze (persone per head count presente, 1 = nessuna assenza)
+        costo_persona_mese: Costo mensile di una persona in organico
+        maggiorazione_straordinario: Maggiorazione dello straordinario
+        costo_interinale: Costo mensile di un interinale
+        quota_straordinario: Straordinario massimo come quota dell'organico
+
+    Returns:
+        Tupla (costo, straordinario, interinali) con straordinario e interinali in head count presenti
+    """
+    copertura = copri_gap_presenze(np.maximum(fabbisogno - organico, 0), quota_straordinario * organico, fattore,
+                                   costo_persona_mese, maggiorazione_straordinario, costo_interinale, contratto=False)
+    costo = costo_persona_mese * organico + copertura['costo']
+    return costo, copertura['straordinario'], copertura['interinali']
+
+
+def argmin_cumulato(valori):
+    """
+    Minimo cumulato lungo l'ultimo asse con l'indice che lo realizza.
+
+    Args:
+        valori: Array 2D (gruppi x livelli)
+
+    Returns:
+        Tupla (minimo_cumulato, indice_argmin)
+    """
+    minimo = np.minimum.accumulate(valori, axis=1)
+    indici = np.broadcast_to(np.arange(valori.shape[1]), valori.shape)
+    # Il minimo cambia solo dove il valore coincide con il minimo cumulato: l'ultimo di questi è l'argmin
+    argmin = np.maximum.accumulate(np.where(valori == minimo, indici, 0), axis=1)
+    return minimo, argmin
+
+
+def calcola_livellamento_organico(df_fabbisogno, df_tariffe=None, colonna_fabbisogno='Head Count Totale', organico_iniziale=None,
+                                  costo_assunzione=5000.0, costo_uscita=15000.0, organico_massimo=None):
+    """
+    Calcola la traiettoria di organico di minimo costo per ogni Gruppo_risorse.
+
+    Programmazione dinamica sui livelli interi di organico 0..organico_massimo:
+        V_t(s') = costo_copertura_t(s') + min_s [V_{t-1}(s) + costo_assunzione * (s' - s)+ + costo_uscita * (s - s')+]
+    Con costi di transizione lineari il minimo interno si calcola con un minimo cumulato in avanti
+    (assunzioni) e uno all'indietro (uscite), quindi ogni mese costa O(livelli) per tutti i gruppi insieme.
+    I costi mensili vengono dalla stessa tabella tariffe e dalla stessa copertura per head count presente di
+    calcola_costo_lavoro (costo_copertura): a parità di organico e fabbisogno le due viste danno lo stesso costo.
+
+    Args:
+        df_fabbisogno: DataFrame con Gruppo_risorse, Anno_Mese, la colonna del fabbisogno mensile e Fattore_assenze
+            facoltativo (da calcola_fattore_assenze di manning_costi, 1 dove manca)
+        df_tariffe: DataFrame per Gruppo_risorse con le colonne COLONNE_TARIFFE
+            (default e gruppi mancanti: crea_tariffe_default)
+        colonna_fabbisogno: Nome della colonna con il fabbisogno head count
+        organico_iniziale: Dizionario opzionale Gruppo_risorse -> organico prima del primo mese
+            (default: fabbisogno del primo mese arrotondato per eccesso)
+        costo_assunzione: Costo una tantum per assunzione
+        costo_uscita: Costo una tantum per uscita
+        organico_massimo: Livello massimo di organico (default: 1.5 volte il fabbisogno massimo)
+
+    Returns:
+        DataFrame per Gruppo_risorse e Anno_Mese con organico, movimenti, copertura (straordinario e interinali
+        in head count presenti) e costi
+    """
+    df_pivot = df_fabbisogno.pivot_table(
+        index='Gruppo_risorse',
+        columns='Anno_Mese',
+        values=colonna_fabbisogno,
+        aggfunc='sum'
+    ).sort_index(axis=1).fillna(0)
+    gruppi = df_pivot.index.to_numpy()
+    mesi = df_pivot.columns.to_numpy()
+    fabbisogno = df_pivot.to_numpy(dtype=float)
+    n_gruppi, n_mesi = fabbisogno.shape
+    if 'Fattore_assenze' in df_fabbisogno.columns:
+        fattore = df_fabbisogno.pivot_table(index='Gruppo_risorse', columns='Anno_Mese', values='Fattore_assenze',
+                                            aggfunc='mean').reindex(index=df_pivot.index, columns=df_pivot.columns)
+        fattore = fattore.fillna(1.0).to_numpy(dtype=float)
+    else:
+        fattore = np.ones_like(fabbisogno)
+
+    # Tariffe per gruppo come colonne (gruppi x 1), in broadcast con i livelli e con i mesi
+    tariffe = crea_tariffe_default(gruppi).set_index('Gruppo_risorse')[COLONNE_TARIFFE]
+    if df_tariffe is not None:
+        tariffe = df_tariffe.groupby('Gruppo_risorse')[COLONNE_TARIFFE].first().reindex(gruppi).fillna(tariffe)
+    costo_persona_mese = tariffe[['Costo_persona_mese']].to_numpy(dtype=float)
+    maggiorazione_straordinario = tariffe[['Maggiorazione_straordinario']].to_numpy(dtype=float)
+    costo_straordinario = costo_persona_mese * (1 + maggiorazione_straordinario)
+    costo_interinale = tariffe[['Costo_interinale_mese']].to_numpy(dtype=float)
+    quota_straordinario = tariffe[['Quota_straordinario_max']].to_numpy(dtype=float)
+
+    if organico_massimo is None:
+        organico_massimo = int(np.ceil(fabbisogno.max() * 1.5)) + 1 if fabbisogno.size else 1
+    livelli = np.arange(organico_massimo + 1, dtype=float)
+
+    if organico_iniziale is None:
+        organico_iniziale = {}
+    iniziale = np.array([organico_iniziale.get(gruppo, np.ceil(fabbisogno[i, 0])) for i, gruppo in enumerate(gruppi)])
+    iniziale = np.clip(iniziale, 0, organico_massimo).astype(int)
+
+    # Stato iniziale: solo il livello di partenza è raggiungibile a costo zero
+    valore = np.full((n_gruppi, len(livelli)), np.inf)
+    valore[np.arange(n_gruppi), iniziale] = 0.0
+    provenienza = np.zeros((n_mesi, n_gruppi, len(livelli)), dtype=int)
+
+    for t in range(n_mesi):
+        # Assunzioni: min_{s<=s'} V(s) - c_a*s + c_a*s'
+        min_avanti, arg_avanti = argmin_cumulato(valore - costo_assunzione * livelli)
+        min_avanti = min_avanti + costo_assunzione * livelli
+        # Uscite: min_{s>=s'} V(s) + c_u*s - c_u*s'
+        min_indietro, arg_indietro = argmin_cumulato((valore + costo_uscita * livelli)[:, ::-1])
+        min_indietro = min_indietro[:, ::-1] - costo_uscita * livelli
+        arg_indietro = len(livelli) - 1 - arg_indietro[:, ::-1]
+
+        costo_mese, _, _ = costo_copertura(livelli, fabbisogno[:, [t]], fattore[:, [t]], costo_persona_mese,
+                                           maggiorazione_straordinario, costo_interinale, quota_straordinario)
+        valore = np.minimum(min_avanti, min_indietro) + costo_mese
+        provenienza[t] = np.where(min_avanti <= min_indietro, arg_avanti, arg_indietro)
+
+    # Ricostruzione della traiettoria ottima all'indietro
+    organico = np.zeros((n_gruppi, n_mesi), dtype=int)
+    livello = np.argmin(valore, axis=1)
+    for t in range(n_mesi - 1, -1, -1):
+        organico[:, t] = livello
+        livello = provenienza[t, np.arange(n_gruppi), livello]
+
+    precedente = np.concatenate([iniziale[:, None], organico[:, :-1]], axis=1)
+    _, straordinario, interinali = costo_copertura(
+        organico.astype(float), fabbisogno, fattore, costo_persona_mese, maggiorazione_straordinario, costo_interinale,
+        quota_straordinario)
+
+    df_piano = pd.DataFrame({
+        'Gruppo_risorse': np.repeat(gruppi, n_mesi),
+        'Anno_Mese': np.tile(mesi, n_gruppi),
+        'Fabbisogno': fabbisogno.ravel(),
+        'Organico': organico.ravel(),
+        'Assunzioni': np.maximum(organico - precedente, 0).ravel(),
+        'Uscite': np.maximum(precedente - organico, 0).ravel(),
+        'Straordinario': straordinario.ravel(),
+        'Interinali': interinali.ravel(),
+        'Eccedenza': np.maximum(organico - fabbisogno, 0).ravel(),
+        'Fattore_assenze': fattore.ravel()
+    })
+    df_piano['Costo_organico'] = np.repeat(costo_persona_mese.ravel(), n_mesi) * df_piano['Organico']
+    df_piano['Costo_straordinario'] = np.repeat(costo_straordinario.ravel(), n_mesi) * df_piano['Straordinario']
+    df_piano['Costo_interinali'] = np.repeat(costo_interinale.ravel(), n_mesi) * df_piano['Interinali']
+    df_piano['Costo_movimenti'] = costo_assunzione * df_piano['Assunzioni'] + costo_uscita * df_piano['Uscite']
+    df_piano['Costo_totale'] = (df_piano['Costo_organico'] + df_piano['Costo_straordinario']
+                                + df_piano['Costo_interinali'] + df_piano['Costo_movimenti'])
+    return df_piano
+
+
+def estendi_orizzonte(df_fabbisogno, anni):
+    """
+    Estende il profilo mensile di fabbisogno ripetendolo per più anni (stessa stagionalità).
+
+    Args:
+        df_fabbisogno: DataFrame con Gruppo_risorse, Anno_Mese e colonne di fabbisogno
+        anni: Numero di anni dell'orizzonte
+
+    Returns:
+        DataFrame con Anno_Mese spostato di anno in anno
+    """
+    periodo = pd.PeriodIndex(df_fabbisogno['Anno_Mese'], freq='M')
+    df_anni = []
+    for anno in range(anni):
+        df_anno = df_fabbisogno.copy()
+        df_anno['Anno_Mese'] = (periodo + 12 * anno).astype(str)
+        df_anni.append(df_anno)
+    return pd.concat(df_anni, ignore_index=True)
+
+
+def crea_grafico_livellamento(df_piano, gruppo_risorse):
+    """
+    Crea un grafico con fabbisogno, organico livellato e copertura con straordinario e interinali.
+
+    Straordinario e interinali (head count presenti) sono riportati in persone di organico equivalenti
+    moltiplicando per Fattore_assenze, così le barre impilate arrivano al fabbisogno.
+
+    Args:
+        df_piano: DataFrame da calcola_livellamento_organico
+        gruppo_risorse: Nome del gruppo risorsa per il titolo
+
+    Returns:
+        Figure plotly
+    """
+    df_gruppo = df_piano[df_piano['Gruppo_risorse'] == gruppo_risorse]
+
+    fig = go.Figure()
+
+    fig.add_trace(go.Bar(
+        x=df_gruppo['Anno_Mese'],
+        y=df_gruppo['Organico'] - df_gruppo['Eccedenza'],
+        name='Organico impiegato'
+    ))
+
+    fig.add_trace(go.Bar(
+        x=df_gruppo['Anno_Mese'],
+        y=df_gruppo['Eccedenza'],
+        name='Eccedenza'
+    ))
+
+    fig.add_trace(go.Bar(
+        x=df_gruppo['Anno_Mese'],
+        y=df_gruppo['Straordinario'] * df_gruppo['Fattore_assenze'],
+        name='Straordinario (equivalente organico)'
+    ))
+
+    fig.add_trace(go.Bar(
+        x=df_gruppo['Anno_Mese'],
+        y=df_gruppo['Interinali'] * df_gruppo['Fattore_assenze'],
+        name='Interinali (equivalente organico)'
+    ))
+
+    fig.add_trace(go.Scatter(
+        x=df_gruppo['Anno_Mese'],
+        y=df_gruppo['Fabbisogno'],
+        name='Fabbisogno',
+        mode='lines+markers',
+        line=dict(color='black')
+    ))
+
+    fig.update_layout(
+        title=f'Organico livellato - {gruppo_risorse}',
+        xaxis_title='Anno-Mese',
+        yaxis_title='Numero Persone',
+        barmode='stack',
+        xaxis_tickangle=-45,
+        height=500,
+        legend=dict(
+            x=0,
+            y=1.0,
+            bgcolor='rgba(255, 255, 255, 0.5)',
+            bordercolor='rgba(255, 255, 255, 0.5)',
+            borderwidth=2,
+            font=dict(size=12)
+        )
+    )
+
+    return fig
@@ -0,0 +1,223 @@
+# Processo manning - velocità e OEE appresi dai log macchina
+# Lettura a blocchi dei CSV di produzione con memoria limitata: si accumulano solo i totali per Risorsa e mese
+# rev1: velocità effettiva mobile su più mesi al posto della Velocità_LL statica, confronto budget vs appreso
+
+import pandas as pd
+import numpy as np
+import plotly.graph_objects as go
+from manning_pipeline import applica_override, calcola_manning
+
+# Colonne dei log: obbligatorie Risorsa, Timestamp, Pezzi; facoltative Scarti, Minuti_fermo, Minuti (durata del record)
+COLONNE_LOG_OBBLIGATORIE = ['Risorsa', 'Timestamp', 'Pezzi']
+COLONNE_LOG_FACOLTATIVE = ['Scarti', 'Minuti_fermo', 'Minuti']
+COLONNE_TOTALI = ['Pezzi', 'Scarti', 'Minuti', 'Minuti_fermo']
+
+
+####### Funzioni di utilità
+
+def aggrega_log_macchina(sorgenti, dimensione_blocco=200_000, colonne=None, minuti_intervallo_max=60, job=None):
+    """
+    Legge i log macchina a blocchi e accumula i totali mensili per Risorsa.
+
+    La memoria usata dipende da dimensione_blocco e dal numero di coppie Risorsa x mese, non dalla
+    lunghezza dei log. Se manca la colonna Minuti la durata di ogni record è il tempo dal record
+    precedente della stessa Risorsa (anche a cavallo tra blocchi); intervalli oltre minuti_intervallo_max
+    (macchina spenta, fine settimana) non contano come tempo pianificato.
+
+    Args:
+        sorgenti: Lista di percorsi o buffer CSV (ordinati nel tempo per ogni Risorsa)
+        dimensione_blocco: Righe lette per blocco
+        colonne: Dizionario opzionale nome colonna nel log -> nome standard (es. {'Macchina': 'Risorsa'})
+        minuti_intervallo_max: Durata massima di un record ricavata dai timestamp
+        job: Job opzionale per avanzamento e annullamento
+
+    Returns:
+        DataFrame per Risorsa e Anno_Mese con Pezzi, Scarti, Minuti, Minuti_fermo e Record
+    """
+    colonne = colonne or {}
+    nomi_standard = set(COLONNE_LOG_OBBLIGATORIE + COLONNE_LOG_FACOLTATIVE)
+    accumulato = None
+    ultimo_timestamp = {}
+    righe_lette = 0
+
+    for i, sorgente in enumerate(sorgenti):
+        lettore = pd.read_csv(sorgente, chunksize=dimensione_blocco,
+                              usecols=lambda col: colonne.get(col, col) in nomi_standard)
+        for blocco in lettore:
+            blocco = blocco.rename(columns=colonne)
+            mancanti = set(COLONNE_LOG_OBBLIGATORIE) - set(blocco.columns)
+            if mancanti:
+                raise ValueError(f"Log macchina: colonne mancanti {', '.join(sorted(mancanti))}")
+            blocco['Timestamp'] = pd.to_datetime(blocco['Timestamp'])
+
+            if 'Minuti' not in blocco.columns:
+                blocco = blocco.sort_values(['Risorsa', 'Timestamp'], kind='stable')
+                precedente = blocco.groupby('Risorsa')['Timestamp'].shift()
+                precedente = precedente.fillna(pd.to_datetime(blocco['Risorsa'].map(ultimo_timestamp)))
+                minuti = (blocco['Timestamp'] - precedente).dt.total_seconds() / 60
+                blocco['Minuti'] = minuti.where(minuti <= minuti_intervallo_max, 0).fillna(0)
+                ultimo_timestamp.update(blocco.groupby('Risorsa')['Timestamp'].last().to_dict())
+
+            for col in ['Scarti', 'Minuti_fermo']:
+                if col not in blocco.columns:
+                    blocco[col] = 0.0
+            blocco['Anno_Mese'] = blocco['Timestamp'].dt.strftime('%Y-%m')
+            blocco['Record'] = 1
+
+            totali = blocco.groupby(['Risorsa', 'Anno_Mese'])[COLONNE_TOTALI + ['Record']].sum()
+            accumulato = totali if accumulato is None else accumulato.add(totali, fill_value=0)
+
+            righe_lette += len(blocco)
+            if job is not None:
+                job.aggiorna(i / len(sorgenti), f'File {i + 1}/{len(sorgenti)}: {righe_lette:,} righe lette')
+
+    if accumulato is None:
+        return pd.DataFrame(columns=['Risorsa', 'Anno_Mese'] + COLONNE_TOTALI + ['Record'])
+    return accumulato.reset_index()
+
+
+def calcola_oee_appreso(df_log_mensile, df_efficienza_oee, finestra_mesi=3):
+    """
+    Calcola disponibilità, performance, qualità, OEE e velocità effettiva per Risorsa e mese.
+
+    Velocità_effettiva = pezzi buoni / ore registrate, stessa unità di Velocità_LL (pezzi per ora di
+    tempo pianificato, perdite OEE incluse). La velocità nominale per la performance è Velocità_LL / OEE
+    del master data (Velocità_LL se manca la colonna OEE). La velocità mobile somma pezzi e ore
+    sugli ultimi finestra_mesi mesi, quindi i mesi con poche ore pesano meno.
+
+    Args:
+        df_log_mensile: DataFrame da aggrega_log_macchina
+        df_efficienza_oee: DataFrame con Risorsa, Velocità_LL ed eventualmente OEE
+        finestra_mesi: Mesi della media mobile
+
+    Returns:
+        DataFrame per Risorsa e Anno_Mese con indicatori OEE e Velocità_effettiva_mobile
+    """
+    df_oee = df_log_mensile.sort_values(['Risorsa', 'Anno_Mese']).reset_index(drop=True)
+    df_oee['Ore_registrate'] = df_oee['Minuti'] / 60
+    df_oee['Ore_funzionamento'] = (df_oee['Minuti'] - df_oee['Minuti_fermo']).clip(lower=0) / 60
+    df_oee['Pezzi_buoni'] = (df_oee['Pezzi'] - df_oee['Scarti']).clip(lower=0)
+
+    colonne_budget = ['Risorsa', 'Velocità_LL'] + (['OEE'] if 'OEE' in df_efficienza_oee.columns else [])
+    df_oee = df_oee.merge(df_efficienza_oee[colonne_budget].drop_duplicates('Risorsa'), on='Risorsa', how='left')
+    oee_budget = df_oee['OEE'] if 'OEE' in df_oee.columns else 1.0
+    df_oee['Velocità_nominale'] = df_oee['Velocità_LL'] / oee_budget
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        df_oee['Disponibilità'] = df_oee['Ore_funzionamento'] / df_oee['Ore_registrate']
+        df_oee['Performance'] = df_oee['Pezzi'] / df_oee['Ore_funzionamento'] / df_oee['Velocità_nominale']
+        df_oee['Qualità'] = df_oee['Pezzi_buoni'] / df_oee['Pezzi']
+        df_oee['Velocità_effettiva'] = df_oee['Pezzi_buoni'] / df_oee['Ore_registrate']
+    df_oee['OEE_appreso'] = df_oee['Disponibilità'] * df_oee['Performance'] * df_oee['Qualità']
+
+    # Somme mobili di pezzi buoni e ore per Risorsa (i mesi sono ordinati dentro ogni Risorsa)
+    mobile = df_oee.groupby('Risorsa')[['Pezzi_buoni', 'Ore_registrate']].rolling(finestra_mesi, min_periods=1).sum()
+    mobile = mobile.reset_index(level=0, drop=True)
+    df_oee['Ore_mobili'] = mobile['Ore_registrate']
+    df_oee['Velocità_effettiva_mobile'] = mobile['Pezzi_buoni'] / mobile['Ore_registrate']
+
+    colonne_indicatori = ['Disponibilità', 'Performance', 'Qualità', 'OEE_appreso', 'Velocità_effettiva', 'Velocità_effettiva_mobile']
+    df_oee[colonne_indicatori] = df_oee[colonne_indicatori].replace([np.inf, -np.inf], np.nan)
+    return df_oee
+
+
+def velocita_apprese(df_oee, ore_minime=100):
+    """
+    Velocità appresa per Risorsa: velocità effettiva mobile dell'ultimo mese con log.
+
+    Args:
+        df_oee: DataFrame da calcola_oee_appreso
+        ore_minime: Ore registrate minime nella finestra mobile (sotto resta la Velocità_LL di budget)
+
+    Returns:
+        DataFrame con Risorsa, Anno_Mese (ultimo mese), Velocità_LL, Velocità_LL_appresa, Ore_mobili, Variazione_%
+    """
+    df_ultimo = df_oee.sort_values('Anno_Mese').groupby('Risorsa').tail(1)
+    df_ultimo = df_ultimo[(df_ultimo['Ore_mobili'] >= ore_minime) & df_ultimo['Velocità_effettiva_mobile'].gt(0)]
+    df_velocita = df_ultimo[['Risorsa', 'Anno_Mese', 'Velocità_LL', 'Velocità_effettiva_mobile', 'Ore_mobili']].rename(
+        columns={'Velocità_effettiva_mobile': 'Velocità_LL_appresa'})
+    df_velocita['Variazione_%'] = (df_velocita['Velocità_LL_appresa'] / df_velocita['Velocità_LL'] - 1) * 100
+    return df_velocita.sort_values('Risorsa').reset_index(drop=True)
+
+
+def sostituisci_velocita(df_efficienza_oee, df_velocita):
+    """
+    Sostituisce Velocità_LL con la velocità appresa dove disponibile.
+
+    Args:
+        df_efficienza_oee: DataFrame del foglio efficienza_oee
+        df_velocita: DataFrame da velocita_apprese
+
+    Returns:
+        Copia di df_efficienza_oee con Velocità_LL aggiornata
+    """
+    df_efficienza = df_efficienza_oee.copy()
+    apprese = df_efficienza['Risorsa'].map(dict(zip(df_velocita['Risorsa'], df_velocita['Velocità_LL_appresa'])))
+    df_efficienza['Velocità_LL'] = apprese.fillna(df_efficienza['Velocità_LL'])
+    return df_efficienza
+
+
+def confronta_head_count_velocita(caricamento, df_velocita, ore_standard, df_piano_turni=None):
+    """
+    Confronta head count diretti con Velocità_LL di budget e con le velocità apprese.
+
+    Args:
+        caricamento: Dizionario da carica_e_prepara
+        df_velocita: DataFrame da velocita_apprese
+        ore_standard: Ore standard di lavoro
+        df_piano_turni: DataFrame opzionale da crea_piano_turni
+
+    Returns:
+        DataFrame per Gruppo_risorse e Anno_Mese con Head Count Diretti budget, appreso e delta
+    """
+    budget = calcola_manning(caricamento, ore_standard, df_piano_turni)['manning_diretti']
+    override = {'velocita': dict(zip(df_velocita['Risorsa'], df_velocita['Velocità_LL_appresa']))}
+    appreso = calcola_manning(applica_override(caricamento, override), ore_standard, df_piano_turni)['manning_diretti']
+
+    df_confronto = budget.merge(appreso, on=['Gruppo_risorse', 'Anno_Mese'], how='outer', suffixes=('_budget', '_appreso'))
+    df_confronto['Delta_head_count'] = df_confronto['Head Count Diretti_appreso'] - df_confronto['Head Count Diretti_budget']
+    return df_confronto
+
+
+def crea_grafico_confronto_velocita(df_confronto):
+    """
+    Crea un grafico dell'head count diretti medio per gruppo con velocità di budget e apprese.
+
+    Args:
+        df_confronto: DataFrame da confronta_head_count_velocita
+
+    Returns:
+        Figure plotly
+    """
+    df_medio = df_confronto.groupby('Gruppo_risorse')[['Head Count Diretti_budget', 'Head Count Diretti_appreso']].mean().reset_index()
+
+    fig = go.Figure()
+
+    fig.add_trace(go.Bar(
+        x=df_medio['Gruppo_risorse'],
+        y=df_medio['Head Count Diretti_budget'],
+        name='Velocità_LL budget'
+    ))
+
+    fig.add_trace(go.Bar(
+        x=df_medio['Gruppo_risorse'],
+        y=df_medio['Head Count Diretti_appreso'],
+        name='Velocità appresa dai log'
+    ))
+
+    fig.update_layout(
+        title='Head Count Diretti medio - Velocità budget vs apprese',
+        xaxis_title='Gruppo Risorse',
+        yaxis_title='Numero Persone',
+        barmode='group',
+        legend=dict(
+            x=0,
+            y=1.0,
+            bgcolor='rgba(255, 255, 255, 0.5)',
+            bordercolor='rgba(255, 255, 255, 0.5)',
+            borderwidth=2,
+            font=dict(size=12)
+        )
+    )
+
+    return fig
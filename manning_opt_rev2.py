@@ -8,47 +8,62 @@ import pandas as pd
 import numpy as np
 import streamlit as st
 from io import BytesIO
+import hashlib
+import os
+import tempfile
 import warnings
 #import matplotlib.pyplot as plt
 import plotly.express as px
 warnings.filterwarnings('ignore')
 import plotly.graph_objects as go
+from manning_inverso import calcola_volumi_massimi, crea_grafico_volume_massimo
+from manning_sensitivita import calcola_gradienti_head_count, calcola_sensitivita, crea_grafico_tornado
+from manning_riallocazione import calcola_riallocazione_volumi, crea_grafico_riallocazione
+from manning_capacita import calcola_saturazione_risorse, classifica_colli_bottiglia, crea_heatmap_saturazione
+from manning_livellamento import calcola_livellamento_organico, estendi_orizzonte, crea_grafico_livellamento
+from manning_validazione import ha_errori_fatali
+from manning_turni import SCHEMI_TURNO, festivita_nazionali, crea_piano_turni, espandi_ore_giornaliere, calcola_ore_disponibili_mensili
+from manning_costi import crea_tariffe_default, calcola_fattore_assenze, calcola_costo_lavoro, crea_grafico_curve_costo, crea_grafico_composizione_costo
+from manning_frontiera import crea_politiche_default, calcola_frontiera_copertura, costo_per_copertura, crea_grafico_frontiera
+from manning_pipeline import (carica_e_prepara, fogli_modificati, prepara_volumi, calcola_equipaggi, calcola_ore_uomo_dirette, prepara_indiretti, calcola_analisi,
+                              esporta_excel, impronta_dataframe)
+from manning_rolling import (CHIUSO, normalizza_consuntivi, congela_mesi, calcola_rolling_forecast, crea_grafico_rolling_forecast,
+                             percorso_congelati, salva_congelati, carica_congelati, elimina_congelati)
+from manning_oee import (aggrega_log_macchina, calcola_oee_appreso, velocita_apprese, sostituisci_velocita,
+                         confronta_head_count_velocita, crea_grafico_confronto_velocita)
+from manning_previsione import prevedi_volumi, sostituisci_volumi_previsti, in_formato_volumi_bgt, crea_grafico_previsione
+from manning_background import GestoreJob, COMPLETATO, ERRORE, ANNULLATO
+from manning_cache import cache_condivisa, registro_condiviso, byte_delta
+from manning_backend import backend_disponibili, aggrega_volumi_dettaglio
+from manning_ordini import aggrega_ordini_erp, ordini_in_volumi_bgt, risorse_senza_gruppo
+from manning_attrezzaggi import prepara_attrezzaggi, sostituisci_attrezzisti, crea_modello_attrezzaggi
+from manning_cubo import TOTALE, costruisci_cubo, crea_grafico_componenti, crea_grafico_figli
+from manning_indiretti import DRIVER_INDIRETTI, calcola_driver_indiretti, crea_regole_indiretti, applica_regole_indiretti
+from manning_competenze import (fabbisogno_persone_risorsa, crea_matrice_competenze_modello, calcola_copertura_competenze,
+                                crea_grafico_copertura)
 
 ####### Funzioni di utilità
 
-def identifica_colonne_data(df, colonne_da_escludere=None):
+@st.fragment(run_every=1)
+def mostra_avanzamento_job(gestore_job, nome_job):
     """
-    Identifica le colonne di tipo data in un dataframe.
-    
+    Mostra barra di avanzamento e pulsante di annullamento di un job in background.
+
+    Il frammento si aggiorna da solo ogni secondo; a job terminato riesegue l'intera pagina
+    per mostrare i nuovi risultati.
+
     Args:
-        df: DataFrame da analizzare
-        colonne_da_escludere: Lista di colonne da escludere dall'analisi
-    
-    Returns:
-        Lista delle colonne identificate come date
+        gestore_job: GestoreJob della sessione
+        nome_job: Nome del job
     """
-    if colonne_da_escludere is None:
-        colonne_da_escludere = []
-    
-    date_columns = []
-    for col in df.columns:
-        if col not in colonne_da_escludere:
-            # Verifica se è già datetime
-            if pd.api.types.is_datetime64_any_dtype(df[col]):
-                date_columns.append(col)
-            else:
-                # Prova a convertire in datetime
-                try:
-                    pd.to_datetime(df[col], errors='raise')
-                    date_columns.append(col)
-                except:
-                    # Se non riesce, verifica se contiene pattern di data
-                    if df[col].dtype == 'object':
-                        sample_values = df[col].dropna().astype(str).head(5)
-                        if any(any(char in str(val) for char in ['-', '/', '2026', '2025']) for val in sample_values):
-                            date_columns.append(col)
-    
-    return date_columns
+    job = gestore_job.job(nome_job)
+    if job is None or not job.in_corso:
+        st.rerun()
+
+    st.progress(job.avanzamento, text=f'{job.messaggio} ({job.durata:.0f} s)')
+    if st.button('Annulla', key=f'annulla_{nome_job}'):
+        job.annulla()
+        st.rerun()
 
 def calcola_fabbisogno_turni_gruppo(gruppo_risorse, df_melted, df_efficienza_oee, df_calendario_melted, turni_standard_gruppo_risorse, ore_standard):
     """
@@ -184,12 +199,65 @@ uploaded_db = st.file_uploader("Carica master_data.xlsx") # nome file da caricar
 if not uploaded_db:
     st.stop()
 
-df_volume = pd.read_excel(uploaded_db, sheet_name='volumi_bgt', parse_dates=True)
-df_equipaggi = pd.read_excel(uploaded_db, sheet_name='equipaggi', parse_dates=True)
-df_calendario = pd.read_excel(uploaded_db, sheet_name='calendario', parse_dates=True)
-df_turni = pd.read_excel(uploaded_db, sheet_name='turni') 
-df_assenteismo_ferie = pd.read_excel(uploaded_db, sheet_name='assenteismo_ferie')
-df_efficienza_oee = pd.read_excel(uploaded_db, sheet_name='efficienza_oee')
+# Lettura, validazione e preparazione in background: durante il calcolo restano visibili i risultati precedenti
+if 'gestore_job' not in st.session_state:
+    st.session_state['gestore_job'] = GestoreJob()
+gestore_job = st.session_state['gestore_job']
+
+# Risultati delle fasi memoizzati per impronta degli input, condivisi tra rerun e sessioni; la copia su disco solo nella
+# cartella lato server MANNING_CARTELLA_CACHE (i .pkl della cartella vengono riletti, non la sceglie il browser)
+cache_stadi = cache_condivisa(cartella=os.environ.get('MANNING_CARTELLA_CACHE'))
+
+# Modelli base condivisi in sola lettura tra le sessioni: lo stesso file viene letto una volta per processo
+registro_modelli = registro_condiviso()
+
+# Rispetto al file caricato in precedenza si rileggono solo i fogli con impronta diversa
+dati_file = uploaded_db.getvalue()
+chiave_file = hashlib.sha256(dati_file).hexdigest()
+caricamento_precedente = registro_modelli.ottieni(st.session_state['caricamento']) if 'caricamento' in st.session_state else None
+
+# In sessione resta solo l'impronta: il modello sta nel registro e ogni rerun ne riceve una copia superficiale
+if registro_modelli.ottieni(chiave_file) is not None:
+    st.session_state['caricamento'] = chiave_file
+    job_caricamento = None
+else:
+    job_caricamento = gestore_job.avvia('caricamento', chiave_file, registro_modelli.ottieni_o_carica, chiave_file, carica_e_prepara,
+                                        dati_file, cache=cache_stadi, precedente=caricamento_precedente)
+    if job_caricamento.in_corso:
+        mostra_avanzamento_job(gestore_job, 'caricamento')
+    elif job_caricamento.stato == COMPLETATO:
+        # modello eliminato dal registro dopo il caricamento di questa sessione: si registra di nuovo
+        registro_modelli.registra(chiave_file, job_caricamento.risultato())
+        st.session_state['caricamento'] = chiave_file
+    elif job_caricamento.stato == ERRORE:
+        st.error(f"Errore nella lettura di master_data.xlsx: {job_caricamento.errore()}")
+        st.stop()
+    elif job_caricamento.stato == ANNULLATO:
+        st.warning("Caricamento annullato")
+        if st.button('Riavvia caricamento'):
+            gestore_job.avvia('caricamento', chiave_file, registro_modelli.ottieni_o_carica, chiave_file, carica_e_prepara, dati_file,
+                              forza=True, cache=cache_stadi, precedente=caricamento_precedente)
+            st.rerun()
+
+chiave_caricamento = st.session_state.get('caricamento')
+caricamento = registro_modelli.ottieni(chiave_caricamento) if chiave_caricamento is not None else None
+if caricamento is None:
+    st.stop()
+modello_base = caricamento
+if chiave_caricamento != chiave_file:
+    st.info("Risultati del file caricato in precedenza: il nuovo file non è ancora stato elaborato")
+elif caricamento_precedente is not None:
+    # Confronto con il file precedente di questa sessione: il modello nel registro è condiviso e non lo conserva
+    modificati = fogli_modificati(caricamento['impronte_fogli'], caricamento_precedente['impronte_fogli'])
+    if len(modificati) < len(caricamento['fogli']):
+        st.caption(f"Fogli modificati rispetto al file precedente: {', '.join(sorted(modificati)) or 'nessuno'}")
+
+df_volume = caricamento['fogli']['volumi_bgt']
+df_equipaggi = caricamento['fogli']['equipaggi']
+df_calendario = caricamento['fogli']['calendario']
+df_turni = caricamento['fogli']['turni']
+df_assenteismo_ferie = caricamento['fogli']['assenteismo_ferie']
+df_efficienza_oee = caricamento['fogli']['efficienza_oee']
 
 with st.expander("Visualizza dati caricati"):
     st.write('volume_bgt')
@@ -205,76 +273,285 @@ with st.expander("Visualizza dati caricati"):
     st.write('turni')
     st.dataframe(df_turni)
 
+# Validazione dei fogli: gli errori fatali bloccano i calcoli a valle
+df_validazione = caricamento['df_validazione']
+
+if ha_errori_fatali(df_validazione):
+    st.error("Errori fatali in master_data.xlsx: correggere il file e ricaricarlo")
+    st.dataframe(df_validazione)
+    st.stop()
+elif not df_validazione.empty:
+    with st.expander(f"Avvisi validazione dati ({len(df_validazione)})"):
+        st.dataframe(df_validazione)
+
 
 ####### Variabili di supporto
 ore_standard= 8
 
 
-# Identifica le colonne di tipo data nel df_calendario
-date_columns_calendario = identifica_colonne_data(df_calendario, ['Gruppo_risorse'])
+df_calendario_melted = caricamento['df_calendario_melted']
+df_turni_melted = caricamento['df_turni_melted']
+turni_standard = caricamento['turni_standard']
+if turni_standard is None:
+    st.warning("Nessuna colonna data valida trovata nel df_turni")
 
-# Melt del df_calendario usando le colonne data identificate
-if date_columns_calendario:
-    df_calendario_melted = df_calendario.melt(
-        id_vars=['Gruppo_risorse'], 
-        value_vars=date_columns_calendario,
-        var_name='Periodo', 
-        value_name='Giorni_lavorativi'
-    )
-    
-    # Converte la colonna Periodo in datetime e crea Anno-Mese
-    try:
-        df_calendario_melted['Periodo_dt'] = pd.to_datetime(df_calendario_melted['Periodo'])
-        df_calendario_melted['Anno_Mese'] = df_calendario_melted['Periodo_dt'].dt.to_period('M').astype(str)
-    except:
-        # Se non riesce la conversione, usa il valore originale
-        df_calendario_melted['Anno_Mese'] = df_calendario_melted['Periodo']
-    
-    # st.write('df_calendario_melted')
-    # st.dataframe(df_calendario_melted)
+####### Previsione volumi da storico
 
+with st.expander("Previsione volumi da storico (al posto di volumi_bgt)"):
+    st.write('Storico nello stesso formato di volumi_bgt: Gruppo_risorse, Risorsa e una colonna per mese')
+    uploaded_storico = st.file_uploader("Carica storico volumi (.xlsx)", key='storico_volumi')
+    usa_volumi_previsti = st.checkbox('Usa i volumi previsti al posto di volumi_bgt', value=False)
 
+if uploaded_storico is not None:
+    df_storico_volumi = prepara_volumi(pd.read_excel(uploaded_storico, parse_dates=True))
+    if df_storico_volumi is None:
+        st.error("Nessuna colonna mese trovata nello storico volumi")
+    else:
+        # Previsione sui mesi del budget, così calendario, equipaggi e turni restano allineati
+        try:
+            df_volumi_previsti, df_parametri_previsione = prevedi_volumi(df_storico_volumi, sorted(caricamento['df_melted']['Anno_Mese'].unique()))
+        except ValueError as e:
+            st.error(str(e))
+            df_volumi_previsti = None
+
+        if df_volumi_previsti is not None:
+            with st.expander("Visualizza previsione volumi"):
+                gruppo_previsione = st.selectbox('Gruppo risorse', sorted(df_volumi_previsti['Gruppo_risorse'].unique()), key='gruppo_previsione')
+                st.plotly_chart(crea_grafico_previsione(df_storico_volumi, df_volumi_previsti, gruppo_previsione), use_container_width=True)
+                st.write('Parametri e errore a un passo per Risorsa')
+                st.dataframe(df_parametri_previsione)
+                st.download_button(
+                    label="📥 Scarica volumi previsti (formato volumi_bgt)",
+                    data=esporta_excel({'volumi_bgt': in_formato_volumi_bgt(df_volumi_previsti)}),
+                    file_name='volumi_bgt_previsti.xlsx',
+                    mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+                )
 
-# Identifica le colonne di tipo data nel df_turni
-date_columns_turni = identifica_colonne_data(df_turni, ['Gruppo_risorse', 'Risorsa'])
+            if usa_volumi_previsti:
+                # I volumi previsti sostituiscono il budget in tutte le fasi a valle
+                caricamento = {**caricamento, 'df_melted': sostituisci_volumi_previsti(caricamento['df_melted'], df_volumi_previsti)}
+                st.info("Volumi previsti in uso al posto di volumi_bgt per le Risorse con storico")
+
+####### Piano volumi di dettaglio
+
+with st.expander("Piano volumi di dettaglio SKU/ordini (al posto di volumi_bgt)"):
+    st.write('Parquet o CSV: Risorsa, Volume, Anno_Mese (YYYY-MM) o Periodo, Velocità facoltativa per SKU (pezzi/ora)')
+    uploaded_dettaglio = st.file_uploader("Carica piano di dettaglio (.parquet, .csv)", type=['parquet', 'csv'], key='piano_dettaglio')
+    percorso_dettaglio = st.text_input('Oppure percorso del file sul server (file oltre il limite di upload, con duckdb anche glob)',
+                                       value='', key='percorso_dettaglio')
+    col1, col2 = st.columns(2)
+    with col1:
+        backend_dettaglio = st.selectbox('Backend', backend_disponibili(), index=len(backend_disponibili()) - 1, key='backend_dettaglio')
+    with col2:
+        dimensione_blocco = st.number_input('Righe per blocco (backend blocchi)', min_value=10_000, value=1_000_000, step=100_000)
+
+# I backend leggono da file: gli upload della sessione stanno in una cartella temporanea propria, eliminata
+# con la sessione; resta solo l'ultimo piano caricato
+if 'cartella_dettaglio' not in st.session_state:
+    st.session_state['cartella_dettaglio'] = tempfile.TemporaryDirectory(prefix='manning_dettaglio_')
+cartella_dettaglio = st.session_state['cartella_dettaglio'].name
+
+sorgente_dettaglio = percorso_dettaglio.strip() or None
+file_dettaglio = None
+if uploaded_dettaglio is not None and sorgente_dettaglio is None:
+    dati_dettaglio = uploaded_dettaglio.getvalue()
+    estensione = '.parquet' if uploaded_dettaglio.name.lower().endswith('.parquet') else '.csv'
+    file_dettaglio = f'dettaglio_{hashlib.sha256(dati_dettaglio).hexdigest()[:16]}{estensione}'
+    sorgente_dettaglio = os.path.join(cartella_dettaglio, file_dettaglio)
+    if not os.path.exists(sorgente_dettaglio):
+        with open(sorgente_dettaglio, 'wb') as f:
+            f.write(dati_dettaglio)
+for file_precedente in os.listdir(cartella_dettaglio):
+    if file_precedente != file_dettaglio:
+        os.remove(os.path.join(cartella_dettaglio, file_precedente))
+
+if sorgente_dettaglio is not None:
+    chiave_dettaglio = f'{sorgente_dettaglio}|{backend_dettaglio}|{dimensione_blocco}|{impronta_dataframe(df_efficienza_oee)}'
+    job_dettaglio = gestore_job.avvia('piano_dettaglio', chiave_dettaglio, aggrega_volumi_dettaglio, sorgente_dettaglio,
+                                      df_efficienza_oee, backend_dettaglio, int(dimensione_blocco))
+    if job_dettaglio.in_corso:
+        mostra_avanzamento_job(gestore_job, 'piano_dettaglio')
+    elif job_dettaglio.stato == ERRORE:
+        st.error(f"Errore nell'aggregazione del piano di dettaglio: {job_dettaglio.errore()}")
+    elif job_dettaglio.stato == COMPLETATO:
+        df_volumi_dettaglio = job_dettaglio.risultato()
+        risorse_sconosciute = sorted(df_volumi_dettaglio.loc[df_volumi_dettaglio['Gruppo_risorse'].isna(), 'Risorsa'].unique())
+        if risorse_sconosciute:
+            st.warning(f"Risorse del piano di dettaglio non presenti in efficienza_oee (escluse): {', '.join(risorse_sconosciute)}")
+        # Volumi aggregati a Risorsa x mese: la Velocità_ponderata del mix sostituisce Velocità_LL nelle ore macchina
+        caricamento = {**caricamento, 'df_melted': df_volumi_dettaglio.dropna(subset=['Gruppo_risorse'])}
+        st.info(f"Piano di dettaglio in uso al posto di volumi_bgt ({len(df_volumi_dettaglio)} righe Risorsa x mese, backend {backend_dettaglio})")
+
+####### Domanda da ordini ERP
+
+with st.expander("Domanda da export ordini ERP (al posto di volumi_bgt)"):
+    st.write('Export CSV/Parquet: Famiglia, Quantità, Data_consegna e facoltative Ordine, Routing (Risorse separate da >)')
+    st.write('Routing per Famiglia: Famiglia, Risorsa e facoltative Fase, Coefficiente (volume per pezzo), Anticipo_giorni')
+    uploaded_ordini = st.file_uploader("Carica export ordini (.csv, .parquet)", type=['csv', 'parquet'], accept_multiple_files=True, key='ordini_erp')
+    uploaded_routing = st.file_uploader("Carica routing per Famiglia (.xlsx, .csv)", type=['xlsx', 'csv'], key='routing_erp')
+    usa_volumi_ordini = st.checkbox('Usa i volumi da ordini al posto di volumi_bgt', value=False)
+
+risultato_ordini = None
+if uploaded_ordini:
+    dati_ordini = [file_ordini.getvalue() for file_ordini in uploaded_ordini]
+    dati_routing = uploaded_routing.getvalue() if uploaded_routing is not None else b''
+    df_routing = None
+    if uploaded_routing is not None:
+        df_routing = (pd.read_csv(BytesIO(dati_routing)) if uploaded_routing.name.lower().endswith('.csv')
+                      else pd.read_excel(BytesIO(dati_routing)))
+    chiave_ordini = hashlib.sha256(b''.join(hashlib.sha256(dati).digest() for dati in dati_ordini + [dati_routing])).hexdigest()
+    job_ordini = gestore_job.avvia('ordini_erp', chiave_ordini, aggrega_ordini_erp, [BytesIO(dati) for dati in dati_ordini], df_routing)
+
+    if job_ordini.in_corso:
+        mostra_avanzamento_job(gestore_job, 'ordini_erp')
+    elif job_ordini.stato == ERRORE:
+        st.error(f"Errore nella lettura degli export ordini: {job_ordini.errore()}")
+    elif job_ordini.stato == COMPLETATO:
+        risultato_ordini = job_ordini.risultato()
+        # Stesse righe e mesi del foglio volumi_bgt: il file scaricato si può incollare in master_data
+        df_volumi_ordini_bgt = ordini_in_volumi_bgt(risultato_ordini['volumi'], df_efficienza_oee, df_volume)
+        st.caption(f"{risultato_ordini['righe_lette']:,} righe ordine lette, {risultato_ordini['righe_senza_data']:,} senza data di consegna valida")
+        if len(risultato_ordini['non_instradate']):
+            st.warning(f"Famiglie senza routing (escluse): {', '.join(risultato_ordini['non_instradate']['Famiglia'].astype(str))}")
+        risorse_escluse = risorse_senza_gruppo(risultato_ordini['volumi'], df_efficienza_oee)
+        if risorse_escluse:
+            st.warning(f"Risorse del routing non presenti in efficienza_oee (escluse): {', '.join(risorse_escluse)}")
+
+        with st.expander("Visualizza volumi da ordini (formato volumi_bgt)"):
+            st.dataframe(df_volumi_ordini_bgt)
+            st.download_button(
+                label="📥 Scarica volumi da ordini (formato volumi_bgt)",
+                data=esporta_excel({'volumi_bgt': df_volumi_ordini_bgt}),
+                file_name='volumi_bgt_ordini.xlsx',
+                mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+            )
 
-# Filtra ulteriormente per escludere colonne che contengono parole chiave non-data
-parole_da_escludere = ['turni', 'giorno', 'ore', 'standard', 'medio']
-date_columns_turni_filtrate = []
-for col in date_columns_turni:
-    col_str = str(col)  # Converte in stringa per gestire oggetti datetime
-    if not any(parola.lower() in col_str.lower() for parola in parole_da_escludere):
-        date_columns_turni_filtrate.append(col)
+        if usa_volumi_ordini:
+            caricamento = {**caricamento, 'df_melted': prepara_volumi(df_volumi_ordini_bgt)}
+            st.info("Volumi da ordini ERP in uso al posto di volumi_bgt")
+
+####### Tempi di attrezzaggio
+
+with st.expander("Tempi di attrezzaggio e lotti (ore di cambio e Attrezzisti)"):
+    st.write('File .xlsx con foglio lotti (formato volumi_bgt, numero cambi lotto per mese) e foglio tempi_attrezzaggio '
+             '(Risorsa, Minuti_attrezzaggio, Attrezzisti_per_cambio): le risorse con Minuti_attrezzaggio vuoto non hanno cambi '
+             'e i loro gruppi mantengono gli Attrezzisti del foglio equipaggi')
+    uploaded_attrezzaggi = st.file_uploader("Carica lotti e tempi di attrezzaggio (.xlsx)", type=['xlsx'], key='attrezzaggi')
+    lotti_da_ordini = st.checkbox('Lotti dai passaggi degli ordini ERP (un lotto per riga ordine e fase)', value=False,
+                                  disabled=risultato_ordini is None)
+    st.download_button(
+        label="📥 Scarica modello lotti e tempi di attrezzaggio",
+        data=esporta_excel(crea_modello_attrezzaggi(df_volume, df_efficienza_oee)),
+        file_name='attrezzaggi.xlsx',
+        mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    )
 
-#st.write(f"Colonne date identificate nel df_turni: {date_columns_turni_filtrate}")
+df_attrezzaggi = None
+if uploaded_attrezzaggi is not None:
+    fogli_attrezzaggi = pd.read_excel(uploaded_attrezzaggi, sheet_name=None)
+    if 'tempi_attrezzaggio' not in fogli_attrezzaggi or ('lotti' not in fogli_attrezzaggi and not lotti_da_ordini):
+        st.error("File attrezzaggi: servono i fogli lotti e tempi_attrezzaggio")
+    else:
+        df_lotti = (risultato_ordini['volumi'].rename(columns={'Passaggi': 'Lotti'}) if lotti_da_ordini and risultato_ordini is not None
+                    else fogli_attrezzaggi['lotti'])
+        try:
+            df_attrezzaggi = prepara_attrezzaggi(df_lotti, fogli_attrezzaggi['tempi_attrezzaggio'])
+        except ValueError as e:
+            st.error(str(e))
+    if df_attrezzaggi is not None:
+        # Ore di cambio nelle ore macchina (diretti) e Attrezzisti dai cambi al posto del foglio equipaggi (indiretti)
+        caricamento = {**caricamento, 'df_attrezzaggi': df_attrezzaggi}
+        st.info(f"Attrezzaggi in uso: {df_attrezzaggi['ore_attrezzaggio'].sum():,.0f} ore di cambio su {df_attrezzaggi['Risorsa'].nunique()} Risorse")
+        with st.expander("Visualizza ore di attrezzaggio per Risorsa e mese"):
+            st.dataframe(df_attrezzaggi)
 
-# Melt del df_turni usando le colonne data filtrate
-if date_columns_turni_filtrate:
-    df_turni_melted = df_turni.melt(
-        id_vars=['Gruppo_risorse', 'Risorsa'],
-        value_vars=date_columns_turni_filtrate,
-        var_name='Periodo',
-        value_name='Turni'
+#st.write('turni_standard gruppo_risorse')
+####### Schemi turno da calendario
+
+with st.expander("Schemi turno per Risorsa e chiusure di stabilimento"):
+    usa_schemi_turno = st.checkbox('Calcola ore macchina da schemi turno e calendario festività', value=False)
+    df_schemi_risorsa = crea_piano_turni(turni_standard, ore_standard).groupby('Risorsa')['Schema'].first().reset_index()
+    df_schemi_risorsa = st.data_editor(
+        df_schemi_risorsa,
+        column_config={'Schema': st.column_config.SelectboxColumn('Schema', options=list(SCHEMI_TURNO))},
+        key='schemi_turno',
+        hide_index=True
+    )
+    st.write('Chiusure di stabilimento oltre alle festività nazionali')
+    df_chiusure = st.data_editor(
+        pd.DataFrame({'Data': pd.Series([], dtype='datetime64[ns]')}),
+        column_config={'Data': st.column_config.DateColumn('Data')},
+        key='chiusure',
+        num_rows='dynamic'
     )
 
-    # Converte la colonna Periodo in datetime e crea Anno-Mese
-    df_turni_melted['Periodo_dt'] = pd.to_datetime(df_turni_melted['Periodo'])
-    df_turni_melted['Anno_Mese'] = df_turni_melted['Periodo_dt'].dt.strftime('%Y-%m')
-
-    # Calcola i turni standard come valore medio raggruppando per Anno_Mese, Gruppo_risorse e Risorsa
-    turni_standard = df_turni_melted.groupby(['Anno_Mese', 'Gruppo_risorse', 'Risorsa']).agg({
-        'Turni': 'mean',
-        'Periodo_dt': 'first'  # Mantiene il primo valore Periodo_dt per ogni gruppo
-    }).reset_index()
-    
-    turni_standard.rename(columns={'Turni': 'Turni_standard'}, inplace=True)
-    
-    # st.write('turni_standard')
-    # st.dataframe(turni_standard)
-else:
-    st.warning("Nessuna colonna data valida trovata nel df_turni")
+if usa_schemi_turno:
+    anni_calendario = sorted(pd.PeriodIndex(turni_standard['Anno_Mese'], freq='M').year.unique())
+    festivita = np.union1d(
+        festivita_nazionali(anni_calendario),
+        pd.to_datetime(df_chiusure['Data']).dropna().to_numpy().astype('datetime64[D]')
+    )
+    df_piano_turni = crea_piano_turni(turni_standard, ore_standard,
+                                      dict(zip(df_schemi_risorsa['Risorsa'], df_schemi_risorsa['Schema'])))
+    df_ore_giornaliere = espandi_ore_giornaliere(df_piano_turni, festivita)
+    df_ore_disponibili = calcola_ore_disponibili_mensili(df_piano_turni, df_ore_giornaliere, df_calendario_melted, ore_standard)
+
+    # Turni standard sostituiti dai turni equivalenti calcolati sulle ore macchina effettive
+    turni_standard = turni_standard.drop(columns='Turni_standard').merge(
+        df_ore_disponibili[['Gruppo_risorse', 'Risorsa', 'Anno_Mese', 'Turni_equivalenti']].rename(
+            columns={'Turni_equivalenti': 'Turni_standard'}),
+        on=['Gruppo_risorse', 'Risorsa', 'Anno_Mese'],
+        how='left'
+    )
+    df_turni_melted = df_ore_disponibili[['Gruppo_risorse', 'Risorsa', 'Anno_Mese', 'Turni_equivalenti']].rename(
+        columns={'Turni_equivalenti': 'Turni'})
+
+    with st.expander("Visualizza ore macchina disponibili da schemi turno"):
+        st.dataframe(df_ore_disponibili)
+
+####### Velocità apprese dai log macchina
+
+with st.expander("Velocità e OEE appresi dai log macchina"):
+    st.write('Log CSV: Risorsa, Timestamp, Pezzi e facoltativi Scarti, Minuti_fermo, Minuti (durata del record)')
+    uploaded_log = st.file_uploader("Carica log macchina (.csv)", accept_multiple_files=True, key='log_macchina')
+    col1, col2 = st.columns(2)
+    with col1:
+        finestra_mesi_oee = st.number_input('Mesi media mobile', min_value=1, max_value=12, value=3, step=1)
+    with col2:
+        ore_minime_oee = st.number_input('Ore registrate minime per usare la velocità appresa', min_value=0, value=100, step=10)
+    usa_velocita_apprese = st.checkbox('Sostituisci Velocità_LL con le velocità apprese', value=False)
+
+df_velocita_apprese = None
+if uploaded_log:
+    # Lettura a blocchi in background: i log possono essere molto più grandi di master_data
+    dati_log = [file_log.getvalue() for file_log in uploaded_log]
+    chiave_log = hashlib.sha256(b''.join(hashlib.sha256(dati).digest() for dati in dati_log)).hexdigest()
+    job_log = gestore_job.avvia('log_macchina', chiave_log, aggrega_log_macchina, [BytesIO(dati) for dati in dati_log])
+
+    if job_log.in_corso:
+        mostra_avanzamento_job(gestore_job, 'log_macchina')
+    elif job_log.stato == ERRORE:
+        st.error(f"Errore nella lettura dei log macchina: {job_log.errore()}")
+    elif job_log.stato == COMPLETATO:
+        df_oee_appreso = calcola_oee_appreso(job_log.risultato(), df_efficienza_oee, finestra_mesi_oee)
+        df_velocita_apprese = velocita_apprese(df_oee_appreso, ore_minime_oee)
+
+        with st.expander("Visualizza OEE appreso per Risorsa e mese"):
+            st.dataframe(df_oee_appreso)
+            st.write('Velocità apprese (ultimo mese, media mobile)')
+            st.dataframe(df_velocita_apprese)
+
+        df_confronto_velocita = confronta_head_count_velocita(caricamento, df_velocita_apprese, ore_standard,
+                                                              df_piano_turni if usa_schemi_turno else None)
+        st.plotly_chart(crea_grafico_confronto_velocita(df_confronto_velocita), use_container_width=True)
+        st.metric("Delta Head Count Diretti medio con velocità apprese",
+                  f"{df_confronto_velocita.groupby('Anno_Mese')['Delta_head_count'].sum().mean():.1f}")
+
+if usa_velocita_apprese and df_velocita_apprese is not None:
+    # Da qui in poi fabbisogno turni, ore macchina e ore uomo usano le velocità apprese
+    df_efficienza_oee = sostituisci_velocita(df_efficienza_oee, df_velocita_apprese)
+    caricamento = {**caricamento, 'fogli': {**caricamento['fogli'], 'efficienza_oee': df_efficienza_oee}}
 
-#st.write('turni_standard gruppo_risorse')
 turni_standard_gruppo_risorse = turni_standard.groupby(['Anno_Mese', 'Gruppo_risorse']).agg({
     'Turni_standard': 'first' # casomai media
 }).reset_index()
@@ -284,32 +561,9 @@ turni_standard_gruppo_risorse = turni_standard.groupby(['Anno_Mese', 'Gruppo_ris
 
 
 # Grafici per ogni Gruppo_risorse con volumi per anno-mese, colorati per Risorsa
+df_melted = caricamento['df_melted']
 
-# Identifica le colonne di tipo data (datetime o che possono essere convertite in date)
-date_columns = identifica_colonne_data(df_volume, ['Gruppo_risorse', 'Risorsa'])
-
-#st.write(f"Colonne identificate come date: {date_columns}")
-
-if date_columns:
-        # Trasforma il dataframe in formato long (melt)
-        df_melted = df_volume.melt(
-            id_vars=['Gruppo_risorse', 'Risorsa'],
-            value_vars=date_columns,
-            var_name='Periodo',
-            value_name='Volume'
-        )
-        
-        # Converte la colonna Periodo in datetime e crea Anno-Mese
-        try:
-            df_melted['Periodo_dt'] = pd.to_datetime(df_melted['Periodo'])
-            df_melted['Anno_Mese'] = df_melted['Periodo_dt'].dt.to_period('M').astype(str)
-        except:
-            # Se non riesce la conversione, usa il valore originale
-            df_melted['Anno_Mese'] = df_melted['Periodo']
-        
-        # Ordina per Anno_Mese
-        df_melted = df_melted.sort_values('Anno_Mese')
-        
+if df_melted is not None:
         # PRIMO GRAFICO: Grafico complessivo per tutti i gruppi
         st.subheader("Volumi budget per Gruppi Risorse", divider='gray')
         
@@ -454,77 +708,14 @@ st.subheader('Equipaggi necessari', divider='gray')
 # st.write('Equpaggi')
 # st.dataframe(df_equipaggi)
 
-df_melted_equipaggi = df_equipaggi.melt(
-    id_vars=['Gruppo_risorse', 'Risorsa'],
-    value_vars=identifica_colonne_data(df_equipaggi, ['Gruppo_risorse', 'Risorsa']),
-    var_name='Periodo',
-    value_name='Equipaggi'
-)
-
-df_melted_equipaggi['Periodo_dt'] = pd.to_datetime(df_melted_equipaggi['Periodo'])
-df_melted_equipaggi['Anno_Mese'] = df_melted_equipaggi['Periodo_dt'].dt.to_period('M').astype(str)
-df_melted_equipaggi = df_melted_equipaggi.merge(df_efficienza_oee[['Risorsa', 'Velocità_LL']], on=['Risorsa'], how='left')
-# elimina righe con Velocità_LL mancante
-df_melted_equipaggi = df_melted_equipaggi[df_melted_equipaggi['Velocità_LL'].notna()]
-
-df_melted_equipaggi = df_melted_equipaggi.merge(df_melted[['Gruppo_risorse', 'Risorsa', 'Anno_Mese', 'Volume']],
-                                                on=['Gruppo_risorse', 'Risorsa', 'Anno_Mese'], how='left')
-
-df_melted_equipaggi['ore_macchina'] = df_melted_equipaggi['Volume'] / df_melted_equipaggi['Velocità_LL']
-
-# se Risorsa = Mastercut, allora dividi per 5 Equipaggi
-mask_mastercut = df_melted_equipaggi['Risorsa'].str.contains('Mastercut', case=False, na=False)
-df_melted_equipaggi.loc[mask_mastercut, 'Equipaggi'] = df_melted_equipaggi.loc[mask_mastercut, 'Equipaggi'] / 5
-
-df_melted_equipaggi['ore_uomo'] = df_melted_equipaggi['ore_macchina'] * df_melted_equipaggi['Equipaggi']
+df_melted_equipaggi = cache_stadi.esegui('calcola_equipaggi', calcola_equipaggi, df_equipaggi, df_efficienza_oee, df_melted,
+                                         ore_standard, df_piano_turni if usa_schemi_turno else None, df_attrezzaggi)
 
 # st.write('df_melted_equipaggi')
 # st.dataframe(df_melted_equipaggi)
 
-df_ore_uomo_dirette_gruppo = df_melted_equipaggi.groupby(['Gruppo_risorse', 'Anno_Mese']).agg({
-    'ore_uomo': 'sum'
-}).reset_index()
-
-
-df_ore_uomo_dirette_gruppo = df_ore_uomo_dirette_gruppo.merge(
-    df_calendario_melted[['Gruppo_risorse', 'Anno_Mese', 'Giorni_lavorativi']]  ,
-    on=['Gruppo_risorse', 'Anno_Mese'],
-    how='left'
-)
-
-df_efficienza_oee_quadratura = df_efficienza_oee.copy()
-df_efficienza_oee_quadratura = df_efficienza_oee_quadratura[['Gruppo_risorse', 'Quadratura']].drop_duplicates().reset_index(drop=True)
-
-# st.write('df_efficienza_oee_quadratura')
-# st.dataframe(df_efficienza_oee_quadratura)
-
-# st.write('df_ore_uomo_dirette_gruppo prima del merge quadratura')
-# st.dataframe(df_ore_uomo_dirette_gruppo)
-
-# merge di df_ore_uomo_dirette_gruppo con df_efficienza_oee_quadratura per ottenere la quadratura
-df_ore_uomo_dirette_gruppo = df_ore_uomo_dirette_gruppo.merge(
-    df_efficienza_oee_quadratura[['Gruppo_risorse', 'Quadratura']], 
-    on=['Gruppo_risorse'], 
-    how='left'
-)
-
-# st.write('df_ore_uomo_dirette_gruppo dopo il merge quadratura')
-# st.dataframe(df_ore_uomo_dirette_gruppo)
-
-#df_ore_uomo_dirette_gruppo = df_ore_uomo_dirette_gruppo.merge(df_efficienza_oee_quadratura[['Quadratura']], left_on=['Gruppo_risorse'], right_on=['Gruppo_risorse'], how='left')
-
-df_ore_uomo_dirette_gruppo['head_count'] = df_ore_uomo_dirette_gruppo['ore_uomo'] / (df_ore_uomo_dirette_gruppo['Giorni_lavorativi'] * ore_standard)
-
-df_ore_uomo_dirette_gruppo = df_ore_uomo_dirette_gruppo.merge(df_assenteismo_ferie[['Gruppo_risorse', 'Assenteismo', 'Copertura_ferie']], on=['Gruppo_risorse'], how='left')
-
-df_ore_uomo_dirette_gruppo['head_count_quadratura'] = df_ore_uomo_dirette_gruppo['head_count'] / (df_ore_uomo_dirette_gruppo['Quadratura']/100)
-
-df_ore_uomo_dirette_gruppo['head_count_assenteismo'] = df_ore_uomo_dirette_gruppo['head_count_quadratura'] * (1+ df_ore_uomo_dirette_gruppo['Assenteismo'])
-df_ore_uomo_dirette_gruppo['head_count_assenteismo_ferie'] = df_ore_uomo_dirette_gruppo['head_count_assenteismo'] * (1+ df_ore_uomo_dirette_gruppo['Copertura_ferie'])
-
-df_ore_uomo_dirette_gruppo['delta_quadratura'] = df_ore_uomo_dirette_gruppo['head_count_quadratura'] - df_ore_uomo_dirette_gruppo['head_count']
-df_ore_uomo_dirette_gruppo['delta_assenteismo'] = df_ore_uomo_dirette_gruppo['head_count_assenteismo'] - df_ore_uomo_dirette_gruppo['head_count_quadratura']
-df_ore_uomo_dirette_gruppo['delta_ferie'] = df_ore_uomo_dirette_gruppo['head_count_assenteismo_ferie'] - df_ore_uomo_dirette_gruppo['head_count_assenteismo']
+df_ore_uomo_dirette_gruppo = cache_stadi.esegui('calcola_ore_uomo_dirette', calcola_ore_uomo_dirette, df_melted_equipaggi,
+                                                df_calendario_melted, df_efficienza_oee, df_assenteismo_ferie, ore_standard)
 
 # st.write('df_calendario_melted')
 # st.dataframe(df_calendario_melted)
@@ -633,17 +824,42 @@ df_indiretti_attrezzisti = df_equipaggi[df_equipaggi['Risorsa'].isin(['Indiretti
 st.write('df_indiretti_attrezzisti')
 st.dataframe(df_indiretti_attrezzisti)
 # Raggruppa per Gruppo_risorse e Anno_Mese
-df_indiretti_attrezzisti_melted = df_indiretti_attrezzisti.melt(
-    id_vars=['Gruppo_risorse', 'Risorsa'],
-    value_vars=identifica_colonne_data(df_indiretti_attrezzisti, ['Gruppo_risorse', 'Risorsa']),
-    var_name='Periodo',
-    value_name='Equipaggi'
-)
-
+df_indiretti_attrezzisti_melted = cache_stadi.esegui('prepara_indiretti', prepara_indiretti, df_equipaggi)
+
+with st.expander("Modello a driver per indiretti (parte fissa + variabile)"):
+    st.write(f"Driver: {', '.join(DRIVER_INDIRETTI)}. Head count ruolo = Fisso + Variabile x driver (pallet = Volume / Pezzi_per_pallet)")
+    usa_driver_indiretti = st.checkbox('Calcola indiretti con il modello a driver', value=False)
+    col1, col2 = st.columns(2)
+    with col1:
+        driver_taratura = st.selectbox('Driver per la taratura sul foglio equipaggi', DRIVER_INDIRETTI[1:], key='driver_taratura')
+    with col2:
+        quota_fissa_indiretti = st.slider('Quota fissa', min_value=0.0, max_value=1.0, value=0.5, step=0.05)
+    df_driver_indiretti = cache_stadi.esegui('calcola_driver_indiretti', calcola_driver_indiretti, df_melted_equipaggi,
+                                             df_ore_uomo_dirette_gruppo, turni_standard)
+    # Regole di partenza tarate sul budget: a volumi di budget gli indiretti valgono in media come nel foglio
+    df_regole_indiretti = st.data_editor(
+        crea_regole_indiretti(df_indiretti_attrezzisti_melted, df_driver_indiretti, driver_taratura, quota_fissa_indiretti),
+        column_config={'Driver': st.column_config.SelectboxColumn('Driver', options=DRIVER_INDIRETTI)},
+        key=f'regole_indiretti_{driver_taratura}_{quota_fissa_indiretti}',
+        num_rows='dynamic',
+        hide_index=True
+    )
 
-# Converte la colonna Periodo in datetime e crea Anno-Mese
-df_indiretti_attrezzisti_melted['Periodo_dt'] = pd.to_datetime(df_indiretti_attrezzisti_melted['Periodo'])
-df_indiretti_attrezzisti_melted['Anno_Mese'] = df_indiretti_attrezzisti_melted['Periodo_dt'].dt.to_period('M').astype(str)
+if usa_driver_indiretti:
+    try:
+        df_indiretti_attrezzisti_melted = cache_stadi.esegui('applica_regole_indiretti', applica_regole_indiretti, df_indiretti_attrezzisti_melted,
+                                                             df_regole_indiretti, df_driver_indiretti)
+        caricamento = {**caricamento, 'df_regole_indiretti': df_regole_indiretti}
+    except ValueError as e:
+        st.error(str(e))
+
+if df_attrezzaggi is not None:
+    # Attrezzisti dei gruppi con tempi di attrezzaggio calcolati dalle ore di cambio
+    df_indiretti_attrezzisti_melted = cache_stadi.esegui('sostituisci_attrezzisti', sostituisci_attrezzisti, df_indiretti_attrezzisti_melted,
+                                                         df_attrezzaggi, df_efficienza_oee, df_calendario_melted, df_assenteismo_ferie,
+                                                         ore_standard)
+    st.write('Attrezzisti calcolati dalle ore di cambio lotto')
+    st.dataframe(df_indiretti_attrezzisti_melted[df_indiretti_attrezzisti_melted['Risorsa'] == 'Attrezzisti'])
 
 # Crea un diagramma a barre sull'asse y il totale degli equipaggi per Gruppo_risorse in x Anno_Mese
 df_indiretti_attrezzisti_agg = df_indiretti_attrezzisti_melted.groupby(['Gruppo_risorse', 'Anno_Mese']).agg({
@@ -674,25 +890,8 @@ st.plotly_chart(fig_indiretti_attrezzisti, use_container_width=True)
 # Totale di stabilimento ==============================================
 
 
-manning_diretti = df_ore_uomo_dirette_gruppo.copy()
-manning_diretti = manning_diretti.groupby(['Gruppo_risorse','Anno_Mese']).agg({
-    'head_count_assenteismo_ferie': 'sum'
-}).reset_index()
-manning_diretti.rename(columns={'head_count_assenteismo_ferie': 'Head Count Diretti'}, inplace=True)
-
-# st.write('manning_diretti')
-# st.dataframe(manning_diretti)
-
-manning_indiretti = df_indiretti_attrezzisti_melted.groupby(['Gruppo_risorse','Anno_Mese']).agg({
-    'Equipaggi': 'sum'
-}).reset_index()
-manning_indiretti.rename(columns={'Equipaggi': 'Head Count Indiretti e Attrezzisti'}, inplace=True)
-
-# st.write('manning_indiretti')
-# st.dataframe(manning_indiretti)
-
-df_analisi = manning_diretti.merge(manning_indiretti, on=['Gruppo_risorse','Anno_Mese'], how='outer')
-df_analisi['Head Count Totale'] = df_analisi['Head Count Diretti'] + df_analisi['Head Count Indiretti e Attrezzisti']
+manning_diretti, manning_indiretti, df_analisi = cache_stadi.esegui('calcola_analisi', calcola_analisi, df_ore_uomo_dirette_gruppo,
+                                                                     df_indiretti_attrezzisti_melted)
 
 # st.write('df_analisi')
 # st.dataframe(df_analisi)
@@ -700,11 +899,14 @@ df_analisi['Head Count Totale'] = df_analisi['Head Count Diretti'] + df_analisi[
 # Crea diagramma a barre impilate per il totale di stabilimento
 st.subheader('Totale di stabilimento - Head Count Impilato', divider='gray')
 
-# Aggrega i dati per Anno_Mese sommando tutti i gruppi
-df_analisi_totale = df_analisi.groupby('Anno_Mese').agg({
-    'Head Count Diretti': 'sum',
-    'Head Count Indiretti e Attrezzisti': 'sum',
-    'Head Count Totale': 'sum'
+# Cubo dei risultati con i totali a ogni livello: i grafici di stabilimento e il drill-down ne leggono le fette
+cubo_manning = cache_stadi.esegui('costruisci_cubo', costruisci_cubo, df_melted_equipaggi, df_ore_uomo_dirette_gruppo,
+                                  df_indiretti_attrezzisti_melted, ore_standard)
+
+df_analisi_totale = cubo_manning.fetta()[['Head_count_diretti', 'Indiretti', 'Head_count_totale']].rename(columns={
+    'Head_count_diretti': 'Head Count Diretti',
+    'Indiretti': 'Head Count Indiretti e Attrezzisti',
+    'Head_count_totale': 'Head Count Totale'
 }).reset_index()
 
 # Prepara i dati in formato long per Plotly Express
@@ -744,44 +946,519 @@ fig_totale_stabilimento.update_layout(
 
 st.plotly_chart(fig_totale_stabilimento, use_container_width=True)
 
-st.stop()
 
+# Drill-down stabilimento -> gruppo -> Risorsa ==============================================
+
+st.subheader('Drill-down Head Count | Stabilimento, Gruppo Risorse, Risorsa', divider='gray')
+
+
+def scendi_nel_cubo(chiave_grafico, gruppo):
+    # Click su una barra dei figli: il gruppo (o la Risorsa) cliccato diventa il nodo corrente
+    punti = st.session_state[chiave_grafico].selection.points
+    if punti:
+        if gruppo == TOTALE:
+            st.session_state['drill_gruppo'] = punti[0]['customdata']
+            st.session_state['drill_risorsa'] = TOTALE
+        else:
+            st.session_state['drill_risorsa'] = punti[0]['customdata']
+
+
+if st.session_state.get('drill_gruppo', TOTALE) not in [TOTALE] + cubo_manning.figli():
+    st.session_state['drill_gruppo'] = TOTALE
+col1, col2 = st.columns(2)
+with col1:
+    gruppo_drill = st.selectbox('Gruppo Risorse', [TOTALE] + cubo_manning.figli(), key='drill_gruppo',
+                                on_change=lambda: st.session_state.update(drill_risorsa=TOTALE))
+opzioni_risorsa = [TOTALE] + (cubo_manning.figli(gruppo_drill) if gruppo_drill != TOTALE else [])
+if st.session_state.get('drill_risorsa', TOTALE) not in opzioni_risorsa:
+    st.session_state['drill_risorsa'] = TOTALE
+with col2:
+    risorsa_drill = st.selectbox('Risorsa', opzioni_risorsa, key='drill_risorsa')
+
+fetta_drill = cubo_manning.fetta(gruppo_drill, risorsa_drill)
+col1, col2, col3, col4 = st.columns(4)
+with col1:
+    st.metric("Head Count Totale Medio", f"{fetta_drill['Head_count_totale'].mean():.1f}")
+with col2:
+    st.metric("Head Count Diretti Medio", f"{fetta_drill['Head_count_diretti'].mean():.1f}")
+with col3:
+    st.metric("Volume totale", f"{fetta_drill['Volume'].sum():,.0f}")
+with col4:
+    st.metric("Ore macchina totali", f"{fetta_drill['ore_macchina'].sum():,.0f}")
+
+st.plotly_chart(crea_grafico_componenti(cubo_manning, gruppo_drill, risorsa_drill), use_container_width=True)
+if risorsa_drill == TOTALE:
+    st.caption('Clicca su una barra per scendere al livello successivo')
+    chiave_grafico_drill = f'drill_figli_{gruppo_drill}'
+    st.plotly_chart(crea_grafico_figli(cubo_manning, gruppo_drill), use_container_width=True, key=chiave_grafico_drill,
+                    on_select=lambda: scendi_nel_cubo(chiave_grafico_drill, gruppo_drill), selection_mode='points')
+
+with st.expander("Visualizza cubo dei risultati"):
+    st.dataframe(fetta_drill)
+
+
+# Modalità inversa: volume massimo con tetto di head count ==============================
+
+st.subheader('Volume massimo producibile con tetto Head Count Diretti', divider='gray')
+
+# Tetto iniziale = head count diretti calcolato sul budget (arrotondato per eccesso)
+df_head_count_max_pivot = np.ceil(df_ore_uomo_dirette_gruppo.pivot_table(
+    index='Gruppo_risorse',
+    columns='Anno_Mese',
+    values='head_count_assenteismo_ferie',
+    aggfunc='sum'
+))
+
+with st.expander("Imposta tetto Head Count Diretti per Gruppo Risorse e mese"):
+    df_head_count_max_pivot = st.data_editor(df_head_count_max_pivot, key='head_count_max')
+    rispetta_capacita = st.checkbox('Rispetta capacità macchina (Turni standard)', value=True)
+
+df_head_count_max = df_head_count_max_pivot.reset_index().melt(
+    id_vars=['Gruppo_risorse'],
+    var_name='Anno_Mese',
+    value_name='Head_count_max'
+)
 
+df_volumi_massimi_risorsa, df_volumi_massimi_gruppo = calcola_volumi_massimi(
+    df_melted_equipaggi,
+    df_ore_uomo_dirette_gruppo,
+    df_head_count_max,
+    ore_standard,
+    turni_standard=turni_standard if rispetta_capacita else None
+)
 
+for gruppo in gruppi_risorse:
+    if (df_volumi_massimi_gruppo['Gruppo_risorse'] == gruppo).any():
+        fig = crea_grafico_volume_massimo(df_volumi_massimi_gruppo, gruppo)
+        st.plotly_chart(fig, use_container_width=True)
+
+with st.expander("Visualizza volumi massimi per Risorsa"):
+    st.write('Riepilogo per Gruppo Risorse')
+    st.dataframe(df_volumi_massimi_gruppo)
+    st.write('Dettaglio per Risorsa')
+    st.dataframe(df_volumi_massimi_risorsa)
+
+
+# Sensitività dell'head count ai driver ==============================================
+
+st.subheader('Sensitività Head Count Diretti ai driver', divider='gray')
 
+col1, col2 = st.columns(2)
+with col1:
+    variazione_sensitivita = st.slider('Variazione driver (%)', min_value=1, max_value=50, value=10) / 100
+with col2:
+    numero_driver = st.number_input('Numero driver da mostrare', min_value=5, max_value=100, value=15)
 
+df_gradienti = calcola_gradienti_head_count(df_melted_equipaggi, df_ore_uomo_dirette_gruppo, ore_standard)
+df_sensitivita = calcola_sensitivita(df_gradienti, variazione_sensitivita)
 
+fig_tornado = crea_grafico_tornado(df_sensitivita, variazione_sensitivita, numero_driver)
+st.plotly_chart(fig_tornado, use_container_width=True)
 
+with st.expander("Visualizza derivate ed elasticità per driver"):
+    st.dataframe(df_sensitivita)
 
 
+# Riallocazione mix volumi tra macchine alternative ==============================================
+
+st.subheader('Riallocazione volumi tra risorse del gruppo | Minimo Ore Uomo', divider='gray')
+
+risorse_fisse = st.multiselect(
+    'Risorse non intercambiabili (mantengono il volume di budget)',
+    options=sorted(df_melted_equipaggi['Risorsa'].unique())
+)
+
+df_riallocazione_risorsa, df_riallocazione_gruppo = calcola_riallocazione_volumi(
+    df_melted_equipaggi,
+    df_ore_uomo_dirette_gruppo,
+    turni_standard,
+    ore_standard,
+    risorse_fisse=risorse_fisse
+)
 
+for gruppo in gruppi_risorse:
+    df_gruppo = df_riallocazione_gruppo[df_riallocazione_gruppo['Gruppo_risorse'] == gruppo]
+    if not df_gruppo.empty:
+        fig = crea_grafico_riallocazione(df_riallocazione_gruppo, gruppo)
+        st.plotly_chart(fig, use_container_width=True)
 
-######### Pre-processing
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Head Count Budget Medio", f"{df_gruppo['Head_count_budget'].mean():.1f}")
+        with col2:
+            st.metric("Head Count Mix Ottimo Medio", f"{df_gruppo['Head_count_ottimo'].mean():.1f}")
+        with col3:
+            st.metric("Risparmio Medio", f"{df_gruppo['Risparmio_head_count'].mean():.1f}")
+        if df_gruppo['Capacita_superata'].any():
+            st.warning(f"{gruppo}: in alcuni mesi il volume supera la capacità macchina del gruppo")
 
-########## scarica excel
+with st.expander("Visualizza volumi riallocati per Risorsa"):
+    st.write('Riepilogo per Gruppo Risorse')
+    st.dataframe(df_riallocazione_gruppo)
+    st.write('Dettaglio per Risorsa')
+    st.dataframe(df_riallocazione_risorsa)
 
-def to_excel_bytes(df):
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        df.to_excel(writer, index=False, sheet_name='Foglio1')
-    return output.getvalue()
 
-############ Analisi run 
+# Saturazione capacità e colli di bottiglia per Risorsa ==============================================
 
+st.subheader('Saturazione capacità per Risorsa | Colli di bottiglia', divider='gray')
 
+soglia_collo_bottiglia = st.slider('Soglia saturazione collo di bottiglia (%)', min_value=50, max_value=150, value=100) / 100
 
-###### scarica excel
-# Crea il bottone per scaricare df_analisi
-analisi = to_excel_bytes(df_analisi)
-st.download_button(
-    label="📥 Scarica Analisi Run Complessivo",
-    data=analisi,
-    file_name='Analisi_fustellatura.xlsx',
-    mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+df_saturazione = calcola_saturazione_risorse(
+    df_melted,
+    df_efficienza_oee,
+    df_calendario_melted,
+    df_turni_melted,
+    ore_standard,
+    soglia_collo_bottiglia
 )
+df_colli_bottiglia = classifica_colli_bottiglia(df_saturazione)
+
+col1, col2, col3 = st.columns(3)
+with col1:
+    st.metric("Risorse collo di bottiglia", f"{(df_colli_bottiglia['Mesi_collo_bottiglia'] > 0).sum()} / {len(df_colli_bottiglia)}")
+with col2:
+    st.metric("Mesi-risorsa in sovraccarico", f"{df_saturazione['Collo_bottiglia'].sum()}")
+with col3:
+    st.metric("Ore sovraccarico totali", f"{df_saturazione['Ore_sovraccarico'].sum():,.0f}")
+
+fig_saturazione = crea_heatmap_saturazione(df_saturazione, soglia_collo_bottiglia)
+st.plotly_chart(fig_saturazione, use_container_width=True)
 
+st.write('Classifica colli di bottiglia')
+st.dataframe(df_colli_bottiglia[df_colli_bottiglia['Mesi_collo_bottiglia'] > 0])
 
+with st.expander("Visualizza saturazione per Risorsa e mese"):
+    st.dataframe(df_saturazione)
 
 
+# Copertura con matrice competenze operatori x Risorsa ==============================================
 
+st.subheader('Copertura competenze | Matrice operatori x Risorsa', divider='gray')
 
+# Il fabbisogno per Risorsa usa gli stessi coefficienti dell'head count di gruppo; ogni operatore copre la sua Disponibilita
+df_fabbisogno_risorsa = fabbisogno_persone_risorsa(df_melted_equipaggi, df_ore_uomo_dirette_gruppo, ore_standard)
+with st.expander("Matrice competenze"):
+    st.write('Matrice: Operatore, Gruppo_risorse, Disponibilita (FTE) e una colonna per Risorsa (1 = qualificato)')
+    uploaded_competenze = st.file_uploader("Carica matrice competenze (.xlsx o .csv)", key='matrice_competenze')
+    formazione_incrociata = st.checkbox('Proponi formazione incrociata prima delle assunzioni', value=True)
+    st.download_button(
+        label="📥 Scarica matrice di esempio (tutti qualificati sul proprio gruppo)",
+        data=esporta_excel({'competenze': crea_matrice_competenze_modello(df_fabbisogno_risorsa)}),
+        file_name='matrice_competenze.xlsx',
+        mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    )
+
+if uploaded_competenze is None:
+    st.info("Carica una matrice competenze per verificare la copertura del fabbisogno per Risorsa")
+else:
+    if uploaded_competenze.name.endswith('.csv'):
+        df_competenze = pd.read_csv(uploaded_competenze)
+    else:
+        df_competenze = pd.read_excel(uploaded_competenze)
+
+    if 'Operatore' not in df_competenze.columns:
+        st.error("Matrice competenze: colonna Operatore mancante")
+    else:
+        df_copertura, df_formazioni, df_assunzioni = calcola_copertura_competenze(
+            df_fabbisogno_risorsa, df_competenze, formazione_incrociata)
+
+        mesi_scoperti_matrice = (df_copertura['Fabbisogno_persone'] - df_copertura['Coperto_matrice']).groupby(df_copertura['Anno_Mese']).sum() > 1e-6
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Mesi non coperti con matrice attuale", f"{mesi_scoperti_matrice.sum()} / {len(mesi_scoperti_matrice)}")
+        with col2:
+            st.metric("Formazioni incrociate", f"{len(df_formazioni)}")
+        with col3:
+            st.metric("Assunzioni aggiuntive", f"{df_assunzioni['Assunzioni'].sum()}")
+
+        st.plotly_chart(crea_grafico_copertura(df_copertura), use_container_width=True)
+
+        if not df_formazioni.empty:
+            st.write('Formazioni incrociate proposte')
+            st.dataframe(df_formazioni)
+        st.write('Assunzioni per Gruppo Risorse (mese peggiore)')
+        st.dataframe(df_assunzioni[df_assunzioni['Assunzioni'] > 0])
+
+        with st.expander("Visualizza copertura per Risorsa e mese"):
+            st.dataframe(df_copertura)
+
+
+# Livellamento organico con costi di assunzione e uscita ==============================================
+
+st.subheader('Livellamento organico | Assunzioni, uscite, straordinario e interinali', divider='gray')
+
+with st.expander("Tariffe per Gruppo Risorse, costi di movimento e orizzonte"):
+    # Stessa tabella tariffe e stessa copertura per head count presente del costo del lavoro
+    st.write('Tariffe base (usate anche per il costo del lavoro)')
+    df_tariffe = st.data_editor(crea_tariffe_default(gruppi_risorse), key='tariffe', hide_index=True)
+    col1, col2 = st.columns(2)
+    with col1:
+        colonna_fabbisogno = st.selectbox('Fabbisogno da livellare', ['Head Count Totale', 'Head Count Diretti'])
+        anni_orizzonte = st.number_input('Orizzonte (anni, profilo budget ripetuto)', min_value=1, max_value=5, value=1)
+    with col2:
+        costo_assunzione = st.number_input('Costo assunzione (€)', min_value=0.0, value=5000.0, step=500.0)
+        costo_uscita = st.number_input('Costo uscita (€)', min_value=0.0, value=15000.0, step=500.0)
+
+df_piano_organico = calcola_livellamento_organico(
+    estendi_orizzonte(df_analisi.merge(calcola_fattore_assenze(df_ore_uomo_dirette_gruppo), on=['Gruppo_risorse', 'Anno_Mese'],
+                                       how='left'), anni_orizzonte),
+    df_tariffe,
+    colonna_fabbisogno=colonna_fabbisogno,
+    costo_assunzione=costo_assunzione,
+    costo_uscita=costo_uscita
+)
+
+for gruppo in gruppi_risorse:
+    df_gruppo = df_piano_organico[df_piano_organico['Gruppo_risorse'] == gruppo]
+    if not df_gruppo.empty:
+        fig = crea_grafico_livellamento(df_piano_organico, gruppo)
+        st.plotly_chart(fig, use_container_width=True)
+
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Costo totale", f"€ {df_gruppo['Costo_totale'].sum():,.0f}")
+        with col2:
+            st.metric("Assunzioni", f"{df_gruppo['Assunzioni'].sum()}")
+        with col3:
+            st.metric("Uscite", f"{df_gruppo['Uscite'].sum()}")
+        with col4:
+            st.metric("Interinali medi", f"{df_gruppo['Interinali'].mean():.1f}")
+
+with st.expander("Visualizza piano organico livellato"):
+    st.dataframe(df_piano_organico)
+
+
+# Costo del lavoro ==============================================
+
+st.subheader('Costo del lavoro | Contratto, straordinario e interinali', divider='gray')
+
+with st.expander("Scenari di costo"):
+    st.write('Scenari (le tariffe vuote usano le tariffe base del livellamento organico, Fattore_head_count scala i fabbisogni)')
+    df_scenari = st.data_editor(
+        pd.DataFrame({
+            'Scenario': ['Base', 'Volumi +10%', 'Interinali convenzionati'],
+            'Fattore_head_count': [1.0, 1.1, 1.0],
+            'Costo_persona_mese': [np.nan, np.nan, np.nan],
+            'Costo_interinale_mese': [np.nan, np.nan, 3300.0]
+        }),
+        key='scenari_costo',
+        num_rows='dynamic',
+        hide_index=True
+    )
+
+df_costi = calcola_costo_lavoro(df_ore_uomo_dirette_gruppo, df_tariffe, manning_indiretti, df_scenari.dropna(subset=['Scenario']))
+
+fig_curve_costo = crea_grafico_curve_costo(df_costi)
+st.plotly_chart(fig_curve_costo, use_container_width=True)
+
+scenario_costo = st.selectbox('Scenario per la composizione del costo', df_costi['Scenario'].unique())
+fig_composizione_costo = crea_grafico_composizione_costo(df_costi, scenario_costo)
+st.plotly_chart(fig_composizione_costo, use_container_width=True)
+
+df_costi_scenario = df_costi.groupby('Scenario')[['Costo_totale', 'HC_straordinario', 'HC_interinali']].agg({
+    'Costo_totale': 'sum',
+    'HC_straordinario': 'mean',
+    'HC_interinali': 'mean'
+}).reset_index()
+st.dataframe(df_costi_scenario)
+
+with st.expander("Visualizza costo del lavoro per scenario, gruppo e mese"):
+    st.dataframe(df_costi)
+
+# Frontiera costo / copertura ==============================================
+
+st.subheader('Frontiera costo / copertura | Buffer di organico e politiche di flessibilità', divider='gray')
+
+with st.expander("Incertezza della domanda, buffer e politiche"):
+    col1, col2 = st.columns(2)
+    with col1:
+        cv_domanda = st.number_input('Variabilità volumi mensili (CV %)', min_value=0.0, max_value=100.0, value=10.0, step=1.0) / 100
+        n_scenari_frontiera = st.number_input('Scenari di volume', min_value=200, max_value=50_000, value=5000, step=500)
+    with col2:
+        buffer_max_frontiera = st.number_input('Buffer massimo organico (%)', min_value=5, max_value=200, value=50, step=5) / 100
+        n_punti_frontiera = st.number_input('Punti della frontiera', min_value=5, max_value=200, value=50, step=5)
+    st.write('Politiche (Quota_straordinario vuota = Quota_straordinario_max delle tariffe; quote sull\'organico a contratto)')
+    df_politiche = st.data_editor(crea_politiche_default(), key='politiche_frontiera', num_rows='dynamic', hide_index=True)
+
+# Fabbisogno turni vs turni standard: oltre i turni standard nessun organico copre la domanda
+fabbisogno_turni_gruppi = [calcola_fabbisogno_turni_gruppo(gruppo, df_melted, df_efficienza_oee, df_calendario_melted,
+                                                           turni_standard_gruppo_risorse, ore_standard)
+                           for gruppo in gruppi_risorse]
+df_fabbisogno_turni = pd.concat(fabbisogno_turni_gruppi) if any(df is not None for df in fabbisogno_turni_gruppi) else None
+risultato_frontiera = cache_stadi.esegui('calcola_frontiera_copertura', calcola_frontiera_copertura, df_ore_uomo_dirette_gruppo,
+                                         df_tariffe, df_politiche, df_fabbisogno_turni, cv_domanda=cv_domanda,
+                                         n_scenari=int(n_scenari_frontiera), buffer_max=buffer_max_frontiera,
+                                         n_punti=int(n_punti_frontiera))
+
+if risultato_frontiera['frontiera'].empty:
+    st.info("Nessun Gruppo Risorse con tariffe e fabbisogno per la frontiera")
+else:
+    gruppo_frontiera = st.selectbox('Gruppo Risorse', risultato_frontiera['limiti']['Gruppo_risorse'], key='gruppo_frontiera')
+    st.plotly_chart(crea_grafico_frontiera(risultato_frontiera, gruppo_frontiera), use_container_width=True)
+
+    limiti_gruppo = risultato_frontiera['limiti'].set_index('Gruppo_risorse').loc[gruppo_frontiera]
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("Margine medio turni standard - fabbisogno", f"{limiti_gruppo['Margine_turni_medio']:.2f}")
+    with col2:
+        st.metric("Copertura massima con i turni standard", f"{limiti_gruppo['Copertura_massima_macchina']:.1%}")
+
+    st.write('Costo minimo per copertura obiettivo (vuoto se oltre il tetto dei turni standard o il buffer massimo)')
+    st.dataframe(costo_per_copertura(risultato_frontiera['candidati']))
+
+with st.expander("Visualizza punti della frontiera per Gruppo Risorse"):
+    st.dataframe(risultato_frontiera['frontiera'])
+
+# Rolling forecast ==============================================
+
+st.subheader('Rolling forecast | Consuntivi mesi chiusi e forecast mesi aperti', divider='gray')
+
+# Mesi chiusi calcolati una volta con i consuntivi e congelati per il file caricato; a ogni chiusura si ricalcolano solo i mesi aperti
+mesi_budget = sorted(df_melted['Anno_Mese'].unique())
+with st.expander("Consuntivi mensili e chiusura mesi"):
+    st.write('Consuntivi: Gruppo_risorse, Risorsa, Anno_Mese e facoltativi Volume, Velocità_LL, Assenteismo')
+    uploaded_consuntivi = st.file_uploader("Carica consuntivi (.xlsx o .csv)", key='consuntivi')
+    mese_chiusura = st.selectbox('Ultimo mese chiuso', ['Nessuno'] + mesi_budget, key='mese_chiusura')
+    riapri_mesi = st.button('Riapri tutti i mesi', key='riapri_mesi')
+
+if uploaded_consuntivi is not None:
+    if uploaded_consuntivi.name.endswith('.csv'):
+        df_consuntivi = pd.read_csv(uploaded_consuntivi)
+    else:
+        df_consuntivi = pd.read_excel(uploaded_consuntivi)
+    try:
+        df_consuntivi = normalizza_consuntivi(df_consuntivi)
+    except ValueError as e:
+        st.error(str(e))
+        df_consuntivi = pd.DataFrame()
+else:
+    df_consuntivi = pd.DataFrame()
+
+# Mesi chiusi e aperti con gli stessi input effettivi del budget (velocità apprese, attrezzaggi, indiretti a driver,
+# piano turni): se cambiano, i mesi congelati vanno ricalcolati
+df_piano_turni_rolling = df_piano_turni if usa_schemi_turno else None
+chiave_rolling = (chiave_caricamento,) + tuple(
+    None if df is None else impronta_dataframe(df)
+    for df in [caricamento['df_melted'], df_efficienza_oee, df_piano_turni_rolling,
+               caricamento.get('df_attrezzaggi'), caricamento.get('df_regole_indiretti')])
+
+# Mesi congelati salvati anche nella cartella lato server (MANNING_CARTELLA_ROLLING): restano dopo la chiusura della
+# sessione e il riavvio, per ogni sessione che carica lo stesso file con gli stessi input
+cartella_rolling = os.environ.get('MANNING_CARTELLA_ROLLING', os.path.join(tempfile.gettempdir(), 'manning_rolling'))
+chiave_congelati, file_congelati, congelati = st.session_state.get('mesi_congelati', (None, None, None))
+if chiave_congelati != chiave_rolling:
+    file_congelati = percorso_congelati(
+        cartella_rolling, chiave_caricamento, caricamento['df_melted'], df_efficienza_oee, df_piano_turni_rolling,
+        caricamento.get('df_attrezzaggi'), caricamento.get('df_regole_indiretti'))
+    congelati = carica_congelati(file_congelati)
+if riapri_mesi:
+    elimina_congelati(file_congelati)
+    congelati = None
+if mese_chiusura != 'Nessuno':
+    mesi_congelati_prima = 0 if congelati is None else len(congelati['df_analisi'])
+    congelati = congela_mesi(caricamento, df_consuntivi, mese_chiusura, ore_standard, congelati, df_piano_turni_rolling)
+    if len(congelati['df_analisi']) > mesi_congelati_prima:
+        salva_congelati(congelati, file_congelati)
+st.session_state['mesi_congelati'] = (chiave_rolling, file_congelati, congelati)
+
+if congelati is None or congelati['df_analisi'].empty:
+    st.info("Nessun mese chiuso: il rolling forecast coincide con il budget")
+else:
+    rolling = calcola_rolling_forecast(caricamento, congelati, ore_standard, df_piano_turni_rolling)
+    df_rolling = rolling['df_analisi']
+
+    mesi_chiusi = sorted(df_rolling.loc[df_rolling['Stato'] == CHIUSO, 'Anno_Mese'].unique())
+    mesi_senza_consuntivo = sorted(df_rolling.loc[(df_rolling['Stato'] == CHIUSO) & (df_rolling['Fonte'] == 'Budget'), 'Anno_Mese'].unique())
+    if mesi_senza_consuntivo:
+        st.warning(f"Mesi chiusi senza consuntivi (congelati a budget): {', '.join(mesi_senza_consuntivo)}")
+
+    st.plotly_chart(crea_grafico_rolling_forecast(df_analisi, df_rolling), use_container_width=True)
+
+    delta_rolling = df_rolling['Head Count Totale'].sum() - df_analisi['Head Count Totale'].sum()
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Mesi chiusi", f"{len(mesi_chiusi)} / {len(mesi_budget)}")
+    with col2:
+        st.metric("Head Count medio rolling", f"{df_rolling.groupby('Anno_Mese')['Head Count Totale'].sum().mean():.1f}")
+    with col3:
+        st.metric("Scostamento vs budget (persone-mese)", f"{delta_rolling:.1f}")
+
+    with st.expander("Visualizza rolling forecast per Gruppo Risorse e mese"):
+        st.dataframe(df_rolling)
+
+####### Esportazione risultati
+
+st.subheader('Esportazione risultati', divider='gray')
+
+# Scrittura del file Excel in background, rifatta solo se i risultati sono cambiati
+fogli_export = {
+    'Analisi': df_analisi,
+    'Totale_stabilimento': df_analisi_totale,
+    'Costi': df_costi
+}
+if congelati is not None and not congelati['df_analisi'].empty:
+    fogli_export['Rolling_forecast'] = df_rolling
+job_esportazione = gestore_job.avvia('esportazione', impronta_dataframe(*fogli_export.values()), esporta_excel, fogli_export)
+
+if job_esportazione.in_corso:
+    mostra_avanzamento_job(gestore_job, 'esportazione')
+elif job_esportazione.stato == COMPLETATO:
+    st.download_button(
+        label="📥 Scarica Analisi Run Complessivo",
+        data=job_esportazione.risultato(),
+        file_name='Analisi_manning.xlsx',
+        mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    )
+elif job_esportazione.stato == ERRORE:
+    st.error(f"Errore nell'esportazione: {job_esportazione.errore()}")
+elif job_esportazione.stato == ANNULLATO:
+    if st.button('Riavvia esportazione'):
+        gestore_job.avvia('esportazione', job_esportazione.chiave, esporta_excel, fogli_export, forza=True)
+        st.rerun()
+
+####### Diagnostica cache degli stadi
+
+with st.expander("Diagnostica cache stadi"):
+    # La cache è del processo: si riconfigura solo quando l'utente cambia un limite, non a ogni rerun di ogni sessione
+    col1, col2 = st.columns(2)
+    with col1:
+        st.number_input('Voci massime', min_value=8, max_value=2048, value=cache_stadi.max_voci, step=8, key='max_voci_cache',
+                        on_change=lambda: cache_stadi.configura(max_voci=st.session_state['max_voci_cache']))
+    with col2:
+        st.number_input('Memoria massima (MB)', min_value=16, max_value=16384, value=cache_stadi.max_mb, step=16, key='max_mb_cache',
+                        on_change=lambda: cache_stadi.configura(max_mb=st.session_state['max_mb_cache']))
+    st.caption(f"Cartella su disco (MANNING_CARTELLA_CACHE): {cache_stadi.cartella or 'nessuna, solo memoria'}")
+
+    df_diagnostica_cache = cache_stadi.diagnostica()
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Hit", f"{df_diagnostica_cache['hit'].sum() + df_diagnostica_cache['hit_disco'].sum()}")
+    with col2:
+        st.metric("Miss", f"{df_diagnostica_cache['miss'].sum()}")
+    with col3:
+        st.metric("Memoria usata (MB)", f"{cache_stadi.byte_in_memoria() / 1024 ** 2:.1f}")
+    st.dataframe(df_diagnostica_cache)
+    if st.button('Svuota cache', key='svuota_cache'):
+        cache_stadi.invalida()
+        st.rerun()
+
+    # Modelli base condivisi: una copia per file nel processo, ogni sessione aggiunge solo i suoi delta
+    st.write('Modelli base condivisi tra le sessioni')
+    col1, col2 = st.columns(2)
+    with col1:
+        st.number_input('Modelli massimi', min_value=1, max_value=64, value=registro_modelli.max_modelli, step=1,
+                        key='max_modelli_registro',
+                        on_change=lambda: registro_modelli.configura(max_modelli=st.session_state['max_modelli_registro']))
+    with col2:
+        st.number_input('Memoria massima modelli (MB)', min_value=64, max_value=65536, value=registro_modelli.max_mb, step=64,
+                        key='max_mb_registro', on_change=lambda: registro_modelli.configura(max_mb=st.session_state['max_mb_registro']))
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Modelli in memoria", f"{len(registro_modelli.modelli)}")
+    with col2:
+        st.metric("Memoria modelli (MB)", f"{registro_modelli.byte_in_memoria() / 1024 ** 2:.1f}")
+    with col3:
+        st.metric("Delta di questa sessione (MB)", f"{byte_delta(caricamento, modello_base) / 1024 ** 2:.2f}")
+    st.dataframe(registro_modelli.diagnostica())
@@ -0,0 +1,187 @@
+# Processo manning - domanda da export ordini ERP
+# Le righe ordine sono lette a blocchi, esplose sulle fasi del routing e sommate per Risorsa e mese
+# rev1: routing per Famiglia (tabella) o per riga ordine (colonna Routing), uscita nel formato del foglio volumi_bgt
+
+import pandas as pd
+from manning_backend import leggi_a_blocchi
+from manning_pipeline import aggiorna_avanzamento
+
+# Colonne dell'export: obbligatorie Famiglia, Quantità, Data_consegna; facoltative Ordine e Routing (Risorse separate da '>')
+COLONNE_ORDINI_OBBLIGATORIE = ['Famiglia', 'Quantità', 'Data_consegna']
+COLONNE_ORDINI_FACOLTATIVE = ['Ordine', 'Routing']
+# Routing per Famiglia: obbligatorie Famiglia, Risorsa; facoltative Coefficiente (unità di volume sulla Risorsa per pezzo)
+# e Anticipo_giorni (giorni tra il passaggio sulla Risorsa e la consegna)
+COLONNE_ROUTING_OBBLIGATORIE = ['Famiglia', 'Risorsa']
+
+
+####### Funzioni di utilità
+
+def prepara_routing(df_routing):
+    """
+    Controlla la tabella di routing e completa le colonne facoltative.
+
+    Args:
+        df_routing: DataFrame con Famiglia, Risorsa e facoltative Fase, Coefficiente, Anticipo_giorni
+
+    Returns:
+        DataFrame con Famiglia, Risorsa, Coefficiente e Anticipo_giorni
+    """
+    mancanti = set(COLONNE_ROUTING_OBBLIGATORIE) - set(df_routing.columns)
+    if mancanti:
+        raise ValueError(f"Routing: colonne mancanti {', '.join(sorted(mancanti))}")
+    df_routing = df_routing.dropna(subset=COLONNE_ROUTING_OBBLIGATORIE).copy()
+    df_routing['Famiglia'] = df_routing['Famiglia'].astype(str)
+    df_routing['Risorsa'] = df_routing['Risorsa'].astype(str)
+    df_routing['Coefficiente'] = df_routing['Coefficiente'].astype(float).fillna(1.0) if 'Coefficiente' in df_routing.columns else 1.0
+    df_routing['Anticipo_giorni'] = df_routing['Anticipo_giorni'].astype(float).fillna(0.0) if 'Anticipo_giorni' in df_routing.columns else 0.0
+    return df_routing[['Famiglia', 'Risorsa', 'Coefficiente', 'Anticipo_giorni']]
+
+
+def esplodi_routing(blocco, df_routing, separatore_routing='>'):
+    """
+    Una riga per riga ordine e fase: routing della riga se presente, altrimenti quello della Famiglia.
+
+    Args:
+        blocco: DataFrame di righe ordine con Famiglia, Quantità, Data (e Routing facoltativa)
+        df_routing: DataFrame da prepara_routing (None se il routing è solo nelle righe)
+        separatore_routing: Separatore delle Risorse nella colonna Routing
+
+    Returns:
+        Tupla (fasi con Risorsa, Volume e Data, righe senza routing)
+    """
+    if 'Routing' in blocco.columns:
+        con_routing = blocco['Routing'].notna()
+        fasi_riga = blocco.loc[con_routing, ['Quantità', 'Data', 'Routing']]
+        fasi_riga = fasi_riga.assign(Risorsa=fasi_riga.pop('Routing').astype(str).str.split(separatore_routing)).explode('Risorsa')
+        fasi_riga = fasi_riga.assign(Risorsa=fasi_riga['Risorsa'].str.strip(), Volume=fasi_riga['Quantità'])
+        blocco = blocco.loc[~con_routing]
+    else:
+        fasi_riga = None
+
+    if df_routing is not None:
+        fasi_famiglia = blocco[['Famiglia', 'Quantità', 'Data']].merge(df_routing, on='Famiglia', how='left')
+        senza_routing = fasi_famiglia[fasi_famiglia['Risorsa'].isna()][['Famiglia', 'Quantità']]
+        fasi_famiglia = fasi_famiglia[fasi_famiglia['Risorsa'].notna()]
+        fasi_famiglia = fasi_famiglia.assign(
+            Volume=fasi_famiglia['Quantità'] * fasi_famiglia['Coefficiente'],
+            Data=fasi_famiglia['Data'] - pd.to_timedelta(fasi_famiglia['Anticipo_giorni'], unit='D')
+        )
+    else:
+        fasi_famiglia = None
+        senza_routing = blocco[['Famiglia', 'Quantità']]
+
+    fasi = pd.concat([df[['Risorsa', 'Volume', 'Data']] for df in (fasi_riga, fasi_famiglia) if df is not None])
+    return fasi, senza_routing
+
+
+def aggrega_ordini_erp(sorgenti, df_routing=None, dimensione_blocco=500_000, colonne=None, separatore_routing='>', job=None):
+    """
+    Legge gli export ordini a blocchi e accumula il volume mensile per Risorsa.
+
+    La memoria usata dipende da dimensione_blocco, dal routing e dal numero di coppie Risorsa x mese, non
+    dalla lunghezza degli export. Il mese è quello di Data_consegna meno l'Anticipo_giorni della fase.
+
+    Args:
+        sorgenti: Lista di percorsi o buffer CSV/Parquet
+        df_routing: DataFrame di routing per Famiglia (None se gli export hanno la colonna Routing)
+        dimensione_blocco: Righe lette per blocco
+        colonne: Dizionario opzionale nome colonna nell'export -> nome standard (es. {'Qta': 'Quantità'})
+        separatore_routing: Separatore delle Risorse nella colonna Routing
+        job: Job opzionale per avanzamento e annullamento
+
+    Returns:
+        Dizionario con volumi (Risorsa, Anno_Mese, Volume, Passaggi = righe ordine x fase), non_instradate (Famiglia, Quantità, Righe),
+        righe_lette e righe_senza_data
+    """
+    colonne = colonne or {}
+    nomi_standard = set(COLONNE_ORDINI_OBBLIGATORIE + COLONNE_ORDINI_FACOLTATIVE)
+    colonne_lette = [col for col in colonne if colonne[col] in nomi_standard] + sorted(nomi_standard - set(colonne.values()))
+    df_routing = prepara_routing(df_routing) if df_routing is not None else None
+    accumulato = None
+    non_instradate = None
+    righe_lette = 0
+    righe_senza_data = 0
+
+    for i, sorgente in enumerate(sorgenti):
+        righe_file = 0
+        for blocco, totale in leggi_a_blocchi(sorgente, dimensione_blocco, colonne_lette):
+            blocco = blocco.rename(columns=colonne)
+            mancanti = set(COLONNE_ORDINI_OBBLIGATORIE) - set(blocco.columns)
+            if mancanti:
+                raise ValueError(f"Export ordini: colonne mancanti {', '.join(sorted(mancanti))}")
+            if df_routing is None and 'Routing' not in blocco.columns:
+                raise ValueError("Export ordini senza colonna Routing: serve la tabella di routing per Famiglia")
+            righe_lette += len(blocco)
+            righe_file += len(blocco)
+
+            blocco = blocco.assign(
+                Famiglia=blocco['Famiglia'].astype(str),
+                Quantità=pd.to_numeric(blocco['Quantità'], errors='coerce').fillna(0.0),
+                Data=pd.to_datetime(blocco['Data_consegna'], errors='coerce')
+            )
+            senza_data = blocco['Data'].isna()
+            righe_senza_data += int(senza_data.sum())
+            fasi, senza_routing = esplodi_routing(blocco[~senza_data], df_routing, separatore_routing)
+
+            # mese come datetime64[M]: raggruppare su interi è molto più veloce che su stringhe
+            totali = fasi.assign(Mese=fasi['Data'].to_numpy().astype('datetime64[M]'), Passaggi=1).groupby(
+                ['Risorsa', 'Mese'])[['Volume', 'Passaggi']].sum()
+            accumulato = totali if accumulato is None else accumulato.add(totali, fill_value=0)
+            scartate = senza_routing.assign(Righe=1).groupby('Famiglia')[['Quantità', 'Righe']].sum()
+            non_instradate = scartate if non_instradate is None else non_instradate.add(scartate, fill_value=0)
+
+            avanzamento = (i + min(righe_file / totale, 1.0) if totale else i) / len(sorgenti)
+            aggiorna_avanzamento(job, avanzamento, f'File {i + 1}/{len(sorgenti)}: {righe_lette:,} righe ordine lette')
+
+    if accumulato is None:
+        df_volumi = pd.DataFrame(columns=['Risorsa', 'Anno_Mese', 'Volume', 'Passaggi'])
+    else:
+        df_volumi = accumulato.reset_index()
+        df_volumi['Anno_Mese'] = df_volumi.pop('Mese').dt.strftime('%Y-%m')
+        df_volumi = df_volumi[['Risorsa', 'Anno_Mese', 'Volume', 'Passaggi']].sort_values(['Risorsa', 'Anno_Mese']).reset_index(drop=True)
+    df_non_instradate = (non_instradate.reset_index() if non_instradate is not None
+                         else pd.DataFrame(columns=['Famiglia', 'Quantità', 'Righe']))
+    return {
+        'volumi': df_volumi,
+        'non_instradate': df_non_instradate,
+        'righe_lette': righe_lette,
+        'righe_senza_data': righe_senza_data
+    }
+
+
+def ordini_in_volumi_bgt(df_volumi_ordini, df_efficienza_oee, df_volumi_modello=None):
+    """
+    Porta i volumi aggregati dagli ordini nel formato del foglio volumi_bgt.
+
+    Args:
+        df_volumi_ordini: DataFrame volumi da aggrega_ordini_erp
+        df_efficienza_oee: DataFrame con Gruppo_risorse per Risorsa
+        df_volumi_modello: Foglio volumi_bgt opzionale: se presente si usano le sue righe e i suoi mesi (0 dove manca domanda)
+
+    Returns:
+        DataFrame con Gruppo_risorse, Risorsa e una colonna datetime per mese
+    """
+    gruppi = df_efficienza_oee.drop_duplicates('Risorsa').set_index('Risorsa')['Gruppo_risorse']
+    df_volumi = df_volumi_ordini.assign(
+        Gruppo_risorse=df_volumi_ordini['Risorsa'].map(gruppi),
+        Periodo_dt=pd.to_datetime(df_volumi_ordini['Anno_Mese'] + '-01')
+    ).dropna(subset=['Gruppo_risorse'])
+    df_bgt = df_volumi.pivot_table(
+        index=['Gruppo_risorse', 'Risorsa'],
+        columns='Periodo_dt',
+        values='Volume',
+        aggfunc='sum'
+    ).rename_axis(columns=None)
+
+    if df_volumi_modello is not None:
+        colonne_mese = [col for col in df_volumi_modello.columns if col not in ('Gruppo_risorse', 'Risorsa')]
+        mesi_modello = pd.to_datetime(pd.Index(colonne_mese)).to_period('M').to_timestamp()
+        righe = pd.MultiIndex.from_frame(df_volumi_modello[['Gruppo_risorse', 'Risorsa']])
+        df_bgt = df_bgt.reindex(index=righe, columns=mesi_modello).fillna(0.0)
+        df_bgt.columns = colonne_mese
+    return df_bgt.reset_index()
+
+
+def risorse_senza_gruppo(df_volumi_ordini, df_efficienza_oee):
+    """Risorse del routing non presenti in efficienza_oee (il loro volume non entra in volumi_bgt)."""
+    return sorted(set(df_volumi_ordini['Risorsa']) - set(df_efficienza_oee['Risorsa'].astype(str)))
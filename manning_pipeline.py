@@ -0,0 +1,655 @@
+# Processo manning - fasi di caricamento e preparazione dati
+# Funzioni senza interfaccia per leggere master_data.xlsx e portare i fogli in formato long
+# rev1: estratte da manning_opt_rev2 per eseguirle in background con avanzamento
+# rev2: catena equipaggi -> head count diretti e indiretti riusabile fuori da Streamlit
+# rev3: fasi eseguite attraverso la cache degli stadi (manning_cache) quando indicata
+# rev4: impronta per foglio dal file .xlsx, al ricaricamento si rileggono e ripreparano solo i fogli modificati
+# rev5: lettura dei fogli con il motore Excel più veloce disponibile (manning_lettura), file aperto una volta
+# rev6: ore di attrezzaggio nelle ore macchina e Attrezzisti calcolati dai cambi lotto (manning_attrezzaggi)
+# rev7: indiretti dal modello a driver (manning_indiretti) nella stessa catena dei diretti
+# rev8: fogli modificati calcolati da chi confronta i caricamenti, non salvati nel modello condiviso
+
+import re
+import hashlib
+import zipfile
+import pandas as pd
+import numpy as np
+from io import BytesIO
+from manning_validazione import valida_master_data
+from manning_cache import esegui_stadio
+from manning_lettura import parti_fogli, apri_excel
+from manning_attrezzaggi import aggiungi_ore_attrezzaggio, sostituisci_attrezzisti
+from manning_indiretti import calcola_driver_indiretti, applica_regole_indiretti
+
+# Campi accettati da applica_override
+CAMPI_OVERRIDE = {'volumi', 'fattore_volumi', 'velocita', 'assenteismo', 'copertura_ferie', 'quadratura'}
+
+# Fogli di master_data.xlsx e parametri di lettura
+FOGLI_MASTER_DATA = {
+    'volumi_bgt': {'parse_dates': True},
+    'equipaggi': {'parse_dates': True},
+    'calendario': {'parse_dates': True},
+    'turni': {},
+    'assenteismo_ferie': {},
+    'efficienza_oee': {},
+}
+
+
+####### Funzioni di utilità
+
+def identifica_colonne_data(df, colonne_da_escludere=None):
+    """
+    Identifica le colonne di tipo data in un dataframe.
+
+    Args:
+        df: DataFrame da analizzare
+        colonne_da_escludere: Lista di colonne da escludere dall'analisi
+
+    Returns:
+        Lista delle colonne identificate come date
+    """
+    if colonne_da_escludere is None:
+        colonne_da_escludere = []
+
+    date_columns = []
+    for col in df.columns:
+        if col not in colonne_da_escludere:
+            # Verifica se è già datetime
+            if pd.api.types.is_datetime64_any_dtype(df[col]):
+                date_columns.append(col)
+            else:
+                # Prova a convertire in datetime
+                try:
+                    pd.to_datetime(df[col], errors='raise')
+                    date_columns.append(col)
+                except:
+                    # Se non riesce, verifica se contiene pattern di data
+                    if df[col].dtype == 'object':
+                        sample_values = df[col].dropna().astype(str).head(5)
+                        if any(any(char in str(val) for char in ['-', '/', '2026', '2025']) for val in sample_values):
+                            date_columns.append(col)
+
+    return date_columns
+
+
+def aggiorna_avanzamento(job, avanzamento, messaggio):
+    """
+    Aggiorna l'avanzamento del job se presente (le fasi funzionano anche senza job).
+
+    Args:
+        job: Job di manning_background o None
+        avanzamento: Frazione completata tra 0 e 1
+        messaggio: Descrizione della fase in corso
+    """
+    if job is not None:
+        job.aggiorna(avanzamento, messaggio)
+
+
+def impronte_fogli(dati_file):
+    """
+    Impronta di ogni foglio dal contenuto del file .xlsx senza leggerlo con pandas.
+
+    L'impronta è lo SHA-256 della parte XML del foglio, delle stringhe condivise che il foglio usa e degli
+    stili (i formati data decidono quali colonne sono mesi): modificare un foglio non cambia le altre impronte.
+
+    Args:
+        dati_file: Contenuto del file .xlsx (bytes) o percorso
+
+    Returns:
+        Dizionario nome foglio -> impronta esadecimale (vuoto se il file non è un .xlsx)
+    """
+    try:
+        archivio = zipfile.ZipFile(BytesIO(dati_file) if isinstance(dati_file, bytes) else dati_file)
+    except zipfile.BadZipFile:
+        return {}
+
+    with archivio:
+        nomi = set(archivio.namelist())
+
+        stringhe = []
+        if 'xl/sharedStrings.xml' in nomi:
+            stringhe = re.findall(rb'<si>(.*?)</si>', archivio.read('xl/sharedStrings.xml'), re.DOTALL)
+        impronta_stili = hashlib.sha256(archivio.read('xl/styles.xml') if 'xl/styles.xml' in nomi else b'').digest()
+
+        impronte = {}
+        for foglio, parte in parti_fogli(archivio).items():
+            xml_foglio = archivio.read(parte)
+            h = hashlib.sha256(xml_foglio)
+            h.update(impronta_stili)
+            for indice in re.findall(rb'<c\b[^>]*\bt="s"[^>]*>\s*<v>(\d+)</v>', xml_foglio):
+                indice = int(indice)
+                h.update(stringhe[indice] if indice < len(stringhe) else b'')
+                h.update(b'\x00')
+            impronte[foglio] = h.hexdigest()
+    return impronte
+
+
+def leggi_master_data(dati_file, job=None, riuso=None, motore='auto'):
+    """
+    Legge i sei fogli di master_data.xlsx.
+
+    Args:
+        dati_file: Contenuto del file .xlsx (bytes) o percorso
+        job: Job opzionale per avanzamento e annullamento
+        riuso: Dizionario opzionale nome foglio -> DataFrame già letto da riusare senza rileggere
+        motore: Motore Excel ('auto' = il più veloce disponibile, vedi manning_lettura)
+
+    Returns:
+        Dizionario nome foglio -> DataFrame
+    """
+    riuso = riuso or {}
+    fogli = dict(riuso)
+    if len(riuso) == len(FOGLI_MASTER_DATA):
+        return fogli
+
+    with apri_excel(dati_file, motore) as libro:
+        for i, (foglio, parametri) in enumerate(FOGLI_MASTER_DATA.items()):
+            if foglio in riuso:
+                continue
+            aggiorna_avanzamento(job, i / len(FOGLI_MASTER_DATA) * 0.8, f'Lettura foglio {foglio}')
+            fogli[foglio] = libro.parse(foglio, **parametri)
+    return {foglio: fogli[foglio] for foglio in FOGLI_MASTER_DATA}
+
+
+def prepara_calendario(df_calendario):
+    """
+    Porta il calendario in formato long con Giorni_lavorativi per Gruppo_risorse e Anno_Mese.
+
+    Args:
+        df_calendario: DataFrame del foglio calendario
+
+    Returns:
+        DataFrame df_calendario_melted (None se non ci sono colonne data)
+    """
+    # Identifica le colonne di tipo data nel df_calendario
+    date_columns_calendario = identifica_colonne_data(df_calendario, ['Gruppo_risorse'])
+
+    if not date_columns_calendario:
+        return None
+
+    # Melt del df_calendario usando le colonne data identificate
+    df_calendario_melted = df_calendario.melt(
+        id_vars=['Gruppo_risorse'],
+        value_vars=date_columns_calendario,
+        var_name='Periodo',
+        value_name='Giorni_lavorativi'
+    )
+
+    # Converte la colonna Periodo in datetime e crea Anno-Mese
+    try:
+        df_calendario_melted['Periodo_dt'] = pd.to_datetime(df_calendario_melted['Periodo'])
+        df_calendario_melted['Anno_Mese'] = df_calendario_melted['Periodo_dt'].dt.to_period('M').astype(str)
+    except:
+        # Se non riesce la conversione, usa il valore originale
+        df_calendario_melted['Anno_Mese'] = df_calendario_melted['Periodo']
+
+    return df_calendario_melted
+
+
+def prepara_turni(df_turni):
+    """
+    Porta i turni in formato long e calcola i turni standard medi per Risorsa e Anno_Mese.
+
+    Args:
+        df_turni: DataFrame del foglio turni
+
+    Returns:
+        Tupla (df_turni_melted, turni_standard), (None, None) se non ci sono colonne data valide
+    """
+    # Identifica le colonne di tipo data nel df_turni
+    date_columns_turni = identifica_colonne_data(df_turni, ['Gruppo_risorse', 'Risorsa'])
+
+    # Filtra ulteriormente per escludere colonne che contengono parole chiave non-data
+    parole_da_escludere = ['turni', 'giorno', 'ore', 'standard', 'medio']
+    date_columns_turni_filtrate = []
+    for col in date_columns_turni:
+        col_str = str(col)  # Converte in stringa per gestire oggetti datetime
+        if not any(parola.lower() in col_str.lower() for parola in parole_da_escludere):
+            date_columns_turni_filtrate.append(col)
+
+    if not date_columns_turni_filtrate:
+        return None, None
+
+    # Melt del df_turni usando le colonne data filtrate
+    df_turni_melted = df_turni.melt(
+        id_vars=['Gruppo_risorse', 'Risorsa'],
+        value_vars=date_columns_turni_filtrate,
+        var_name='Periodo',
+        value_name='Turni'
+    )
+
+    # Converte la colonna Periodo in datetime e crea Anno-Mese
+    df_turni_melted['Periodo_dt'] = pd.to_datetime(df_turni_melted['Periodo'])
+    df_turni_melted['Anno_Mese'] = df_turni_melted['Periodo_dt'].dt.strftime('%Y-%m')
+
+    # Calcola i turni standard come valore medio raggruppando per Anno_Mese, Gruppo_risorse e Risorsa
+    turni_standard = df_turni_melted.groupby(['Anno_Mese', 'Gruppo_risorse', 'Risorsa']).agg({
+        'Turni': 'mean',
+        'Periodo_dt': 'first'  # Mantiene il primo valore Periodo_dt per ogni gruppo
+    }).reset_index()
+
+    turni_standard.rename(columns={'Turni': 'Turni_standard'}, inplace=True)
+
+    return df_turni_melted, turni_standard
+
+
+def prepara_volumi(df_volume):
+    """
+    Porta i volumi di budget in formato long per Gruppo_risorse, Risorsa e Anno_Mese.
+
+    Args:
+        df_volume: DataFrame del foglio volumi_bgt
+
+    Returns:
+        DataFrame df_melted ordinato per Anno_Mese (None se non ci sono colonne data)
+    """
+    # Identifica le colonne di tipo data (datetime o che possono essere convertite in date)
+    date_columns = identifica_colonne_data(df_volume, ['Gruppo_risorse', 'Risorsa'])
+
+    if not date_columns:
+        return None
+
+    # Trasforma il dataframe in formato long (melt)
+    df_melted = df_volume.melt(
+        id_vars=['Gruppo_risorse', 'Risorsa'],
+        value_vars=date_columns,
+        var_name='Periodo',
+        value_name='Volume'
+    )
+
+    # Converte la colonna Periodo in datetime e crea Anno-Mese
+    try:
+        df_melted['Periodo_dt'] = pd.to_datetime(df_melted['Periodo'])
+        df_melted['Anno_Mese'] = df_melted['Periodo_dt'].dt.to_period('M').astype(str)
+    except:
+        # Se non riesce la conversione, usa il valore originale
+        df_melted['Anno_Mese'] = df_melted['Periodo']
+
+    # Ordina per Anno_Mese
+    return df_melted.sort_values('Anno_Mese')
+
+
+def fogli_modificati(impronte, impronte_precedenti):
+    """
+    Fogli di master_data con impronta diversa da quella precedente.
+
+    I fogli senza impronta (file non .xlsx) o senza precedente risultano sempre modificati.
+    Le fasi a valle non dipendono da questo elenco: la cache degli stadi le riusa per contenuto degli input.
+
+    Args:
+        impronte: Dizionario da impronte_fogli del file nuovo
+        impronte_precedenti: Dizionario da impronte_fogli del file di confronto (vuoto = nessuno)
+
+    Returns:
+        Insieme dei nomi foglio modificati
+    """
+    invariati = {foglio for foglio in FOGLI_MASTER_DATA
+                 if impronte.get(foglio) is not None and impronte_precedenti.get(foglio) == impronte[foglio]}
+    return set(FOGLI_MASTER_DATA) - invariati
+
+
+def carica_e_prepara(dati_file, job=None, cache=None, precedente=None, motore='auto'):
+    """
+    Fase di caricamento completa: lettura fogli, validazione e formati long di calendario, turni e volumi.
+
+    Con precedente (il risultato del caricamento precedente) i fogli con la stessa impronta non vengono
+    riletti e le preparazioni che dipendono solo da fogli invariati sono riusate così come sono.
+
+    Args:
+        dati_file: Contenuto del file master_data.xlsx (bytes) o percorso
+        job: Job opzionale per avanzamento e annullamento
+        cache: CacheStadi opzionale per le fasi da rifare
+        precedente: Dizionario opzionale da una chiamata precedente di carica_e_prepara
+        motore: Motore Excel per i fogli da leggere ('auto' = il più veloce disponibile)
+
+    Returns:
+        Dizionario con fogli, df_validazione, df_calendario_melted, df_turni_melted, turni_standard, df_melted,
+        impronte_fogli (i fogli modificati rispetto a un altro caricamento si ottengono con fogli_modificati)
+    """
+    impronte = impronte_fogli(dati_file)
+    impronte_precedenti = precedente.get('impronte_fogli', {}) if precedente is not None else {}
+    modificati = fogli_modificati(impronte, impronte_precedenti)
+    invariati = set(FOGLI_MASTER_DATA) - modificati
+
+    fogli = leggi_master_data(dati_file, job, riuso={foglio: precedente['fogli'][foglio] for foglio in invariati}, motore=motore)
+
+    aggiorna_avanzamento(job, 0.8, 'Validazione dati')
+    if modificati:
+        df_validazione = esegui_stadio(cache, 'valida_master_data', valida_master_data, fogli)
+    else:
+        df_validazione = precedente['df_validazione']
+
+    aggiorna_avanzamento(job, 0.9, 'Preparazione calendario, turni e volumi')
+    if 'turni' in modificati:
+        df_turni_melted, turni_standard = esegui_stadio(cache, 'prepara_turni', prepara_turni, fogli['turni'])
+    else:
+        df_turni_melted, turni_standard = precedente['df_turni_melted'], precedente['turni_standard']
+    risultati = {
+        'fogli': fogli,
+        'df_validazione': df_validazione,
+        'df_calendario_melted': (esegui_stadio(cache, 'prepara_calendario', prepara_calendario, fogli['calendario'])
+                                 if 'calendario' in modificati else precedente['df_calendario_melted']),
+        'df_turni_melted': df_turni_melted,
+        'turni_standard': turni_standard,
+        'df_melted': (esegui_stadio(cache, 'prepara_volumi', prepara_volumi, fogli['volumi_bgt'])
+                      if 'volumi_bgt' in modificati else precedente['df_melted']),
+        'impronte_fogli': impronte,
+    }
+
+    aggiorna_avanzamento(job, 1.0, 'Caricamento completato')
+    return risultati
+
+
+
+def calcola_equipaggi(df_equipaggi, df_efficienza_oee, df_melted, ore_standard, df_piano_turni=None, df_attrezzaggi=None):
+    """
+    Calcola ore macchina e ore uomo per Risorsa e Anno_Mese dagli equipaggi.
+
+    Args:
+        df_equipaggi: DataFrame del foglio equipaggi
+        df_efficienza_oee: DataFrame con Velocità_LL per Risorsa
+        df_melted: DataFrame dei volumi in formato long (con Velocità_ponderata facoltativa da manning_backend)
+        ore_standard: Ore standard di lavoro per turno
+        df_piano_turni: DataFrame opzionale da crea_piano_turni (equipaggi riproporzionati su Ore_turno)
+        df_attrezzaggi: DataFrame opzionale da prepara_attrezzaggi (ore di cambio lotto sommate alle ore macchina)
+
+    Returns:
+        DataFrame df_melted_equipaggi con Volume, Velocità_LL, Equipaggi, ore_macchina e ore_uomo
+    """
+    df_melted_equipaggi = df_equipaggi.melt(
+        id_vars=['Gruppo_risorse', 'Risorsa'],
+        value_vars=identifica_colonne_data(df_equipaggi, ['Gruppo_risorse', 'Risorsa']),
+        var_name='Periodo',
+        value_name='Equipaggi'
+    )
+
+    df_melted_equipaggi['Periodo_dt'] = pd.to_datetime(df_melted_equipaggi['Periodo'])
+    df_melted_equipaggi['Anno_Mese'] = df_melted_equipaggi['Periodo_dt'].dt.to_period('M').astype(str)
+    df_melted_equipaggi = df_melted_equipaggi.merge(df_efficienza_oee[['Risorsa', 'Velocità_LL']], on=['Risorsa'], how='left')
+    # elimina righe con Velocità_LL mancante
+    df_melted_equipaggi = df_melted_equipaggi[df_melted_equipaggi['Velocità_LL'].notna()]
+
+    colonne_volumi = ['Gruppo_risorse', 'Risorsa', 'Anno_Mese', 'Volume'] + (['Velocità_ponderata'] if 'Velocità_ponderata' in df_melted.columns else [])
+    df_melted_equipaggi = df_melted_equipaggi.merge(df_melted[colonne_volumi],
+                                                    on=['Gruppo_risorse', 'Risorsa', 'Anno_Mese'], how='left')
+
+    # piani di dettaglio SKU/ordini: velocità del mix del mese (Volume / somma dei Volume_SKU / Velocità_SKU)
+    if 'Velocità_ponderata' in df_melted_equipaggi.columns:
+        df_melted_equipaggi['Velocità_LL'] = df_melted_equipaggi.pop('Velocità_ponderata').fillna(df_melted_equipaggi['Velocità_LL'])
+
+    df_melted_equipaggi['ore_macchina'] = df_melted_equipaggi['Volume'] / df_melted_equipaggi['Velocità_LL']
+    if df_attrezzaggi is not None:
+        df_melted_equipaggi = aggiungi_ore_attrezzaggio(df_melted_equipaggi, df_attrezzaggi)
+
+    # se Risorsa = Mastercut, allora dividi per 5 Equipaggi
+    mask_mastercut = df_melted_equipaggi['Risorsa'].str.contains('Mastercut', case=False, na=False)
+    df_melted_equipaggi.loc[mask_mastercut, 'Equipaggi'] = df_melted_equipaggi.loc[mask_mastercut, 'Equipaggi'] / 5
+
+    # con schemi turno da 6 o 12 ore una persona copre Ore_turno ore al giorno invece di ore_standard
+    if df_piano_turni is not None:
+        df_melted_equipaggi = df_melted_equipaggi.merge(df_piano_turni[['Gruppo_risorse', 'Risorsa', 'Anno_Mese', 'Ore_turno']],
+                                                        on=['Gruppo_risorse', 'Risorsa', 'Anno_Mese'], how='left')
+        df_melted_equipaggi['Equipaggi'] = df_melted_equipaggi['Equipaggi'] * ore_standard / df_melted_equipaggi['Ore_turno'].fillna(ore_standard)
+
+    df_melted_equipaggi['ore_uomo'] = df_melted_equipaggi['ore_macchina'] * df_melted_equipaggi['Equipaggi']
+    return df_melted_equipaggi
+
+
+def calcola_ore_uomo_dirette(df_melted_equipaggi, df_calendario_melted, df_efficienza_oee, df_assenteismo_ferie, ore_standard):
+    """
+    Calcola head count diretti per Gruppo_risorse e Anno_Mese con quadratura, assenteismo e ferie.
+
+    Args:
+        df_melted_equipaggi: DataFrame da calcola_equipaggi
+        df_calendario_melted: DataFrame con giorni lavorativi per Gruppo_risorse e Anno_Mese
+        df_efficienza_oee: DataFrame con Quadratura per Gruppo_risorse
+        df_assenteismo_ferie: DataFrame con Assenteismo e Copertura_ferie per Gruppo_risorse
+        ore_standard: Ore standard di lavoro
+
+    Returns:
+        DataFrame df_ore_uomo_dirette_gruppo con head count e delta per ogni passaggio
+    """
+    df_ore_uomo_dirette_gruppo = df_melted_equipaggi.groupby(['Gruppo_risorse', 'Anno_Mese']).agg({
+        'ore_uomo': 'sum'
+    }).reset_index()
+
+    df_ore_uomo_dirette_gruppo = df_ore_uomo_dirette_gruppo.merge(
+        df_calendario_melted[['Gruppo_risorse', 'Anno_Mese', 'Giorni_lavorativi']],
+        on=['Gruppo_risorse', 'Anno_Mese'],
+        how='left'
+    )
+
+    df_efficienza_oee_quadratura = df_efficienza_oee[['Gruppo_risorse', 'Quadratura']].drop_duplicates().reset_index(drop=True)
+
+    # merge di df_ore_uomo_dirette_gruppo con df_efficienza_oee_quadratura per ottenere la quadratura
+    df_ore_uomo_dirette_gruppo = df_ore_uomo_dirette_gruppo.merge(
+        df_efficienza_oee_quadratura[['Gruppo_risorse', 'Quadratura']],
+        on=['Gruppo_risorse'],
+        how='left'
+    )
+
+    df_ore_uomo_dirette_gruppo['head_count'] = df_ore_uomo_dirette_gruppo['ore_uomo'] / (df_ore_uomo_dirette_gruppo['Giorni_lavorativi'] * ore_standard)
+
+    df_ore_uomo_dirette_gruppo = df_ore_uomo_dirette_gruppo.merge(df_assenteismo_ferie[['Gruppo_risorse', 'Assenteismo', 'Copertura_ferie']], on=['Gruppo_risorse'], how='left')
+
+    df_ore_uomo_dirette_gruppo['head_count_quadratura'] = df_ore_uomo_dirette_gruppo['head_count'] / (df_ore_uomo_dirette_gruppo['Quadratura']/100)
+
+    df_ore_uomo_dirette_gruppo['head_count_assenteismo'] = df_ore_uomo_dirette_gruppo['head_count_quadratura'] * (1+ df_ore_uomo_dirette_gruppo['Assenteismo'])
+    df_ore_uomo_dirette_gruppo['head_count_assenteismo_ferie'] = df_ore_uomo_dirette_gruppo['head_count_assenteismo'] * (1+ df_ore_uomo_dirette_gruppo['Copertura_ferie'])
+
+    df_ore_uomo_dirette_gruppo['delta_quadratura'] = df_ore_uomo_dirette_gruppo['head_count_quadratura'] - df_ore_uomo_dirette_gruppo['head_count']
+    df_ore_uomo_dirette_gruppo['delta_assenteismo'] = df_ore_uomo_dirette_gruppo['head_count_assenteismo'] - df_ore_uomo_dirette_gruppo['head_count_quadratura']
+    df_ore_uomo_dirette_gruppo['delta_ferie'] = df_ore_uomo_dirette_gruppo['head_count_assenteismo_ferie'] - df_ore_uomo_dirette_gruppo['head_count_assenteismo']
+    return df_ore_uomo_dirette_gruppo
+
+
+def prepara_indiretti(df_equipaggi):
+    """
+    Porta in formato long gli equipaggi di Indiretti, Attrezzisti e Voltapile.
+
+    Args:
+        df_equipaggi: DataFrame del foglio equipaggi
+
+    Returns:
+        DataFrame df_indiretti_attrezzisti_melted con Equipaggi per Risorsa e Anno_Mese
+    """
+    df_indiretti_attrezzisti = df_equipaggi[df_equipaggi['Risorsa'].isin(['Indiretti', 'Attrezzisti','Voltapile'])]
+    df_indiretti_attrezzisti_melted = df_indiretti_attrezzisti.melt(
+        id_vars=['Gruppo_risorse', 'Risorsa'],
+        value_vars=identifica_colonne_data(df_indiretti_attrezzisti, ['Gruppo_risorse', 'Risorsa']),
+        var_name='Periodo',
+        value_name='Equipaggi'
+    )
+
+    # Converte la colonna Periodo in datetime e crea Anno-Mese
+    df_indiretti_attrezzisti_melted['Periodo_dt'] = pd.to_datetime(df_indiretti_attrezzisti_melted['Periodo'])
+    df_indiretti_attrezzisti_melted['Anno_Mese'] = df_indiretti_attrezzisti_melted['Periodo_dt'].dt.to_period('M').astype(str)
+    return df_indiretti_attrezzisti_melted
+
+
+def calcola_analisi(df_ore_uomo_dirette_gruppo, df_indiretti_attrezzisti_melted):
+    """
+    Unisce head count diretti e indiretti per Gruppo_risorse e Anno_Mese.
+
+    Args:
+        df_ore_uomo_dirette_gruppo: DataFrame da calcola_ore_uomo_dirette
+        df_indiretti_attrezzisti_melted: DataFrame da prepara_indiretti
+
+    Returns:
+        Tupla (manning_diretti, manning_indiretti, df_analisi)
+    """
+    manning_diretti = df_ore_uomo_dirette_gruppo.groupby(['Gruppo_risorse','Anno_Mese']).agg({
+        'head_count_assenteismo_ferie': 'sum'
+    }).reset_index()
+    manning_diretti.rename(columns={'head_count_assenteismo_ferie': 'Head Count Diretti'}, inplace=True)
+
+    manning_indiretti = df_indiretti_attrezzisti_melted.groupby(['Gruppo_risorse','Anno_Mese']).agg({
+        'Equipaggi': 'sum'
+    }).reset_index()
+    manning_indiretti.rename(columns={'Equipaggi': 'Head Count Indiretti e Attrezzisti'}, inplace=True)
+
+    df_analisi = manning_diretti.merge(manning_indiretti, on=['Gruppo_risorse','Anno_Mese'], how='outer')
+    df_analisi['Head Count Totale'] = df_analisi['Head Count Diretti'] + df_analisi['Head Count Indiretti e Attrezzisti']
+    return manning_diretti, manning_indiretti, df_analisi
+
+
+def calcola_manning(caricamento, ore_standard, df_piano_turni=None, cache=None):
+    """
+    Catena completa da dati caricati a head count: equipaggi, diretti, indiretti e analisi.
+
+    Args:
+        caricamento: Dizionario da carica_e_prepara (eventualmente con fogli o df_melted modificati,
+            df_attrezzaggi da prepara_attrezzaggi e df_regole_indiretti per il modello a driver)
+        ore_standard: Ore standard di lavoro
+        df_piano_turni: DataFrame opzionale da crea_piano_turni
+        cache: CacheStadi opzionale: si ricalcolano solo le fasi con input cambiati
+
+    Returns:
+        Dizionario con df_melted_equipaggi, df_ore_uomo_dirette_gruppo, df_indiretti_attrezzisti_melted,
+        manning_diretti, manning_indiretti e df_analisi
+    """
+    fogli = caricamento['fogli']
+    df_attrezzaggi = caricamento.get('df_attrezzaggi')
+    df_melted_equipaggi = esegui_stadio(cache, 'calcola_equipaggi', calcola_equipaggi, fogli['equipaggi'], fogli['efficienza_oee'],
+                                        caricamento['df_melted'], ore_standard, df_piano_turni, df_attrezzaggi)
+    df_ore_uomo_dirette_gruppo = esegui_stadio(cache, 'calcola_ore_uomo_dirette', calcola_ore_uomo_dirette, df_melted_equipaggi,
+                                               caricamento['df_calendario_melted'], fogli['efficienza_oee'],
+                                               fogli['assenteismo_ferie'], ore_standard)
+    df_indiretti_attrezzisti_melted = esegui_stadio(cache, 'prepara_indiretti', prepara_indiretti, fogli['equipaggi'])
+    if caricamento.get('df_regole_indiretti') is not None:
+        df_driver = esegui_stadio(cache, 'calcola_driver_indiretti', calcola_driver_indiretti, df_melted_equipaggi,
+                                  df_ore_uomo_dirette_gruppo, caricamento['turni_standard'])
+        df_indiretti_attrezzisti_melted = esegui_stadio(cache, 'applica_regole_indiretti', applica_regole_indiretti,
+                                                        df_indiretti_attrezzisti_melted, caricamento['df_regole_indiretti'], df_driver)
+    if df_attrezzaggi is not None:
+        df_indiretti_attrezzisti_melted = esegui_stadio(cache, 'sostituisci_attrezzisti', sostituisci_attrezzisti,
+                                                        df_indiretti_attrezzisti_melted, df_attrezzaggi, fogli['efficienza_oee'],
+                                                        caricamento['df_calendario_melted'], fogli['assenteismo_ferie'], ore_standard)
+    manning_diretti, manning_indiretti, df_analisi = esegui_stadio(cache, 'calcola_analisi', calcola_analisi,
+                                                                   df_ore_uomo_dirette_gruppo, df_indiretti_attrezzisti_melted)
+    return {
+        'df_melted_equipaggi': df_melted_equipaggi,
+        'df_ore_uomo_dirette_gruppo': df_ore_uomo_dirette_gruppo,
+        'df_indiretti_attrezzisti_melted': df_indiretti_attrezzisti_melted,
+        'manning_diretti': manning_diretti,
+        'manning_indiretti': manning_indiretti,
+        'df_analisi': df_analisi,
+    }
+
+
+def applica_override(caricamento, override):
+    """
+    Applica gli override JSON ai dati caricati senza modificarli.
+
+    Args:
+        caricamento: Dizionario da carica_e_prepara
+        override: Dizionario con i campi di CAMPI_OVERRIDE
+
+    Returns:
+        Nuovo dizionario caricamento con df_melted e fogli sostituiti dove richiesto
+    """
+    sconosciuti = set(override) - CAMPI_OVERRIDE
+    if sconosciuti:
+        raise ValueError(f"Campi non riconosciuti: {', '.join(sorted(sconosciuti))}")
+
+    fogli = dict(caricamento['fogli'])
+    df_melted = caricamento['df_melted']
+
+    if override.get('volumi'):
+        df_volumi = pd.DataFrame(override['volumi'])
+        mancanti = {'Risorsa', 'Anno_Mese', 'Volume'} - set(df_volumi.columns)
+        if mancanti:
+            raise ValueError(f"volumi: colonne mancanti {', '.join(sorted(mancanti))}")
+        nuovi = df_melted[['Risorsa', 'Anno_Mese']].merge(
+            df_volumi[['Risorsa', 'Anno_Mese', 'Volume']].astype({'Anno_Mese': str}),
+            on=['Risorsa', 'Anno_Mese'], how='left')['Volume'].to_numpy(dtype=float)
+        df_melted = df_melted.copy()
+        df_melted['Volume'] = np.where(np.isnan(nuovi), df_melted['Volume'].to_numpy(dtype=float), nuovi)
+
+    if override.get('fattore_volumi') is not None:
+        df_melted = df_melted.copy()
+        df_melted['Volume'] = df_melted['Volume'] * float(override['fattore_volumi'])
+
+    if override.get('velocita'):
+        df_oee = fogli['efficienza_oee'].copy()
+        df_oee['Velocità_LL'] = df_oee['Risorsa'].map(override['velocita']).fillna(df_oee['Velocità_LL'])
+        fogli['efficienza_oee'] = df_oee
+
+    if override.get('quadratura'):
+        df_oee = fogli['efficienza_oee'].copy()
+        df_oee['Quadratura'] = df_oee['Gruppo_risorse'].map(override['quadratura']).fillna(df_oee['Quadratura'])
+        fogli['efficienza_oee'] = df_oee
+
+    for campo, colonna in (('assenteismo', 'Assenteismo'), ('copertura_ferie', 'Copertura_ferie')):
+        if override.get(campo):
+            df_af = fogli['assenteismo_ferie'].copy()
+            df_af[colonna] = df_af['Gruppo_risorse'].map(override[campo]).fillna(df_af[colonna])
+            fogli['assenteismo_ferie'] = df_af
+
+    return {**caricamento, 'fogli': fogli, 'df_melted': df_melted}
+
+
+def filtra_mesi(caricamento, mesi):
+    """
+    Restringe i dati caricati ai mesi indicati (volumi, calendario, turni e colonne mese degli equipaggi).
+
+    Args:
+        caricamento: Dizionario da carica_e_prepara
+        mesi: Lista di Anno_Mese ('YYYY-MM') da mantenere
+
+    Returns:
+        Nuovo dizionario caricamento limitato ai mesi
+    """
+    mesi = set(mesi)
+    fogli = dict(caricamento['fogli'])
+    df_equipaggi = fogli['equipaggi']
+    colonne_mese = identifica_colonne_data(df_equipaggi, ['Gruppo_risorse', 'Risorsa'])
+    escluse = [col for col in colonne_mese if pd.Timestamp(col).strftime('%Y-%m') not in mesi]
+    fogli['equipaggi'] = df_equipaggi.drop(columns=escluse)
+
+    def filtra(df):
+        return None if df is None else df[df['Anno_Mese'].isin(mesi)]
+
+    return {
+        **caricamento,
+        'fogli': fogli,
+        'df_melted': filtra(caricamento['df_melted']),
+        'df_calendario_melted': filtra(caricamento['df_calendario_melted']),
+        'df_turni_melted': filtra(caricamento['df_turni_melted']),
+        'turni_standard': filtra(caricamento['turni_standard']),
+    }
+
+def esporta_excel(fogli_export, job=None):
+    """
+    Scrive più DataFrame in un unico file Excel, un foglio per DataFrame.
+
+    Args:
+        fogli_export: Dizionario nome foglio -> DataFrame
+        job: Job opzionale per avanzamento e annullamento
+
+    Returns:
+        Contenuto del file .xlsx in bytes
+    """
+    output = BytesIO()
+    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+        for i, (foglio, df) in enumerate(fogli_export.items()):
+            aggiorna_avanzamento(job, i / len(fogli_export), f'Scrittura foglio {foglio}')
+            df.to_excel(writer, index=False, sheet_name=foglio[:31])
+    aggiorna_avanzamento(job, 1.0, 'Esportazione completata')
+    return output.getvalue()
+
+
+def impronta_dataframe(*dfs):
+    """
+    Calcola un'impronta del contenuto di uno o più DataFrame (per riconoscere risultati già esportati).
+
+    Args:
+        dfs: DataFrame da confrontare
+
+    Returns:
+        Intero con l'impronta combinata
+    """
+    impronta = 0
+    for df in dfs:
+        impronta = hash((impronta, int(pd.util.hash_pandas_object(df, index=False).sum()), tuple(map(str, df.columns))))
+    return impronta
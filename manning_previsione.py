@@ -0,0 +1,256 @@
+# Processo manning - previsione volumi per Risorsa da storico
+# Holt-Winters additivo con trend smorzato, vettoriale su tutte le serie e su una griglia di parametri insieme
+# rev1: uscita nel formato long di volumi_bgt (df_melted) e nel formato a colonne mese del foglio
+# rev2: con modello_serie niente stima Holt-Winters, parametri vuoti e nome del modello in df_parametri
+
+import pandas as pd
+import numpy as np
+import plotly.graph_objects as go
+
+# Griglia dei parametri di livellamento: ogni serie sceglie la combinazione con minimo errore a un passo
+GRIGLIA_ALFA = [0.1, 0.3, 0.5, 0.7, 0.9]
+GRIGLIA_BETA = [0.0, 0.05, 0.15]
+GRIGLIA_GAMMA = [0.0, 0.1, 0.3]
+
+
+####### Funzioni di utilità
+
+def matrice_storico(df_storico):
+    """
+    Porta lo storico long in matrice serie x mesi (mesi mancanti a zero).
+
+    Args:
+        df_storico: DataFrame con Gruppo_risorse, Risorsa, Anno_Mese e Volume
+
+    Returns:
+        Tupla (df_serie con Gruppo_risorse e Risorsa, lista mesi, matrice volumi)
+    """
+    df_pivot = df_storico.pivot_table(
+        index=['Gruppo_risorse', 'Risorsa'],
+        columns='Anno_Mese',
+        values='Volume',
+        aggfunc='sum'
+    ).sort_index(axis=1)
+    # Mesi consecutivi anche se lo storico ha buchi
+    mesi = pd.period_range(df_pivot.columns.min(), df_pivot.columns.max(), freq='M').astype(str)
+    df_pivot = df_pivot.reindex(columns=mesi).fillna(0)
+    return df_pivot.index.to_frame(index=False), list(mesi), df_pivot.to_numpy(dtype=float)
+
+
+def holt_winters_vettoriale(storico, periodo=12, smorzamento=0.98):
+    """
+    Stima Holt-Winters additivo su tutte le serie e tutte le combinazioni della griglia in parallelo.
+
+    Per ogni serie sceglie alfa, beta e gamma con il minimo errore quadratico a un passo; il ciclo è
+    solo sui mesi, ogni passo aggiorna un array serie x combinazioni. Con meno di due stagioni di
+    storico la stagionalità è esclusa (gamma e componente stagionale a zero).
+
+    Args:
+        storico: Matrice serie x mesi dei volumi
+        periodo: Lunghezza della stagionalità in mesi
+        smorzamento: Fattore di smorzamento del trend (phi)
+
+    Returns:
+        Dizionario con livello, trend e stagionalità finali per serie, parametri scelti ed errore (RMSE)
+    """
+    n_serie, n_mesi = storico.shape
+    stagionale = n_mesi >= 2 * periodo
+    griglia = np.array([(a, b, g) for a in GRIGLIA_ALFA for b in GRIGLIA_BETA
+                        for g in (GRIGLIA_GAMMA if stagionale else [0.0])])
+    alfa, beta, gamma = griglia[:, 0], griglia[:, 1], griglia[:, 2]
+    n_comb = len(griglia)
+
+    # Inizializzazione: stagionalità dalla media della prima stagione, livello e trend dalle prime due
+    if stagionale:
+        prima = storico[:, :periodo].mean(axis=1)
+        seconda = storico[:, periodo:2 * periodo].mean(axis=1)
+        stagioni = np.repeat((storico[:, :periodo] - prima[:, None])[:, None, :], n_comb, axis=1)
+        livello = np.repeat(prima[:, None], n_comb, axis=1)
+        trend = np.repeat(((seconda - prima) / periodo)[:, None], n_comb, axis=1)
+    else:
+        stagioni = np.zeros((n_serie, n_comb, periodo))
+        livello = np.repeat(storico[:, [0]], n_comb, axis=1)
+        trend = np.repeat((storico[:, [1]] - storico[:, [0]]) if n_mesi > 1 else np.zeros((n_serie, 1)), n_comb, axis=1)
+
+    sse = np.zeros((n_serie, n_comb))
+    for t in range(1, n_mesi):
+        s = t % periodo
+        previsione = livello + smorzamento * trend + stagioni[:, :, s]
+        osservato = storico[:, [t]]
+        sse += (osservato - previsione) ** 2
+
+        livello_precedente = livello
+        livello = alfa * (osservato - stagioni[:, :, s]) + (1 - alfa) * (livello + smorzamento * trend)
+        trend = beta * (livello - livello_precedente) + (1 - beta) * smorzamento * trend
+        stagioni[:, :, s] = gamma * (osservato - livello) + (1 - gamma) * stagioni[:, :, s]
+
+    migliore = np.argmin(sse, axis=1)
+    righe = np.arange(n_serie)
+    return {
+        'livello': livello[righe, migliore],
+        'trend': trend[righe, migliore],
+        'stagioni': stagioni[righe, migliore],
+        'alfa': alfa[migliore],
+        'beta': beta[migliore],
+        'gamma': gamma[migliore],
+        'rmse': np.sqrt(sse[righe, migliore] / max(n_mesi - 1, 1)),
+        'mesi_storico': n_mesi,
+        'periodo': periodo,
+        'smorzamento': smorzamento
+    }
+
+
+def proietta(modello, passi):
+    """
+    Proietta il modello di holt_winters_vettoriale di 'passi' mesi dopo la fine dello storico.
+
+    Args:
+        modello: Dizionario da holt_winters_vettoriale
+        passi: Array di orizzonti (1 = mese successivo all'ultimo storico)
+
+    Returns:
+        Matrice serie x len(passi) di volumi previsti (non negativi)
+    """
+    passi = np.asarray(passi)
+    phi = modello['smorzamento']
+    # Somma phi + phi^2 + ... + phi^h del trend smorzato
+    somma_phi = np.array([np.sum(phi ** np.arange(1, h + 1)) for h in passi])
+    indice_stagione = (modello['mesi_storico'] - 1 + passi) % modello['periodo']
+    previsione = (modello['livello'][:, None] + modello['trend'][:, None] * somma_phi[None, :]
+                  + modello['stagioni'][:, indice_stagione])
+    return np.maximum(previsione, 0.0)
+
+
+def prevedi_volumi(df_storico, mesi_previsione, periodo=12, modello_serie=None):
+    """
+    Prevede i volumi per Risorsa nei mesi indicati, nel formato long di df_melted.
+
+    Args:
+        df_storico: DataFrame long con Gruppo_risorse, Risorsa, Anno_Mese e Volume (es. da prepara_volumi)
+        mesi_previsione: Lista di Anno_Mese da prevedere (successivi allo storico)
+        periodo: Stagionalità in mesi
+        modello_serie: Funzione opzionale (storico 1D, passi) -> previsione 1D per un modello più pesante
+            applicato serie per serie al posto di Holt-Winters (es. NeuralProphet)
+
+    Returns:
+        Tupla (df_previsione long come df_melted, df_parametri per Risorsa con Modello, parametri e RMSE
+        di Holt-Winters; vuoti con modello_serie)
+    """
+    df_serie, mesi_storico, storico = matrice_storico(df_storico)
+    ultimo = pd.Period(mesi_storico[-1], freq='M')
+    passi = np.array([(pd.Period(mese, freq='M') - ultimo).n for mese in mesi_previsione])
+    if (passi < 1).any():
+        raise ValueError(f"I mesi da prevedere devono essere successivi all'ultimo mese di storico ({mesi_storico[-1]})")
+
+    if modello_serie is None:
+        modello = holt_winters_vettoriale(storico, periodo)
+        previsione = proietta(modello, passi)
+        nome_modello = 'Holt-Winters'
+    else:
+        # Parametri e RMSE di Holt-Winters non descrivono questa previsione: la stima non si fa
+        modello = {parametro: np.nan for parametro in ['alfa', 'beta', 'gamma', 'rmse']}
+        previsione = np.vstack([np.asarray(modello_serie(serie, passi), dtype=float) for serie in storico])
+        nome_modello = getattr(modello_serie, '__name__', 'modello_serie')
+
+    df_parametri = df_serie.assign(
+        Modello=nome_modello, Alfa=modello['alfa'], Beta=modello['beta'], Gamma=modello['gamma'], RMSE=modello['rmse'],
+        Volume_medio_storico=storico.mean(axis=1)
+    )
+
+    periodi = pd.PeriodIndex(mesi_previsione, freq='M').to_timestamp()
+    df_previsione = pd.DataFrame({
+        'Gruppo_risorse': np.repeat(df_serie['Gruppo_risorse'].to_numpy(), len(mesi_previsione)),
+        'Risorsa': np.repeat(df_serie['Risorsa'].to_numpy(), len(mesi_previsione)),
+        'Periodo': np.tile(periodi, len(df_serie)),
+        'Volume': previsione.ravel()
+    })
+    df_previsione['Periodo_dt'] = pd.to_datetime(df_previsione['Periodo'])
+    df_previsione['Anno_Mese'] = df_previsione['Periodo_dt'].dt.to_period('M').astype(str)
+    return df_previsione.sort_values('Anno_Mese'), df_parametri
+
+
+def sostituisci_volumi_previsti(df_melted, df_previsione):
+    """
+    Sostituisce i volumi di budget con quelli previsti per le Risorse con storico.
+
+    Args:
+        df_melted: DataFrame long dei volumi di budget
+        df_previsione: DataFrame da prevedi_volumi
+
+    Returns:
+        Copia di df_melted con Volume previsto dove disponibile e colonna Fonte_volume
+    """
+    df_nuovo = df_melted.merge(
+        df_previsione[['Risorsa', 'Anno_Mese', 'Volume']].rename(columns={'Volume': 'Volume_previsto'}),
+        on=['Risorsa', 'Anno_Mese'], how='left')
+    df_nuovo['Fonte_volume'] = np.where(df_nuovo['Volume_previsto'].notna(), 'Previsione', 'Budget')
+    df_nuovo['Volume'] = df_nuovo['Volume_previsto'].fillna(df_nuovo['Volume'])
+    return df_nuovo.drop(columns='Volume_previsto').sort_values('Anno_Mese')
+
+
+def in_formato_volumi_bgt(df_previsione):
+    """
+    Porta la previsione nel formato del foglio volumi_bgt (una colonna per mese).
+
+    Args:
+        df_previsione: DataFrame da prevedi_volumi
+
+    Returns:
+        DataFrame con Gruppo_risorse, Risorsa e una colonna datetime per mese
+    """
+    return df_previsione.pivot_table(
+        index=['Gruppo_risorse', 'Risorsa'],
+        columns='Periodo_dt',
+        values='Volume',
+        aggfunc='sum'
+    ).reset_index().rename_axis(columns=None)
+
+
+def crea_grafico_previsione(df_storico, df_previsione, gruppo_risorse):
+    """
+    Crea un grafico storico + previsione dei volumi totali di un gruppo risorsa.
+
+    Args:
+        df_storico: DataFrame long dello storico
+        df_previsione: DataFrame da prevedi_volumi
+        gruppo_risorse: Nome del gruppo risorsa
+
+    Returns:
+        Figure plotly
+    """
+    storico = df_storico[df_storico['Gruppo_risorse'] == gruppo_risorse].groupby('Anno_Mese')['Volume'].sum()
+    previsione = df_previsione[df_previsione['Gruppo_risorse'] == gruppo_risorse].groupby('Anno_Mese')['Volume'].sum()
+
+    fig = go.Figure()
+
+    fig.add_trace(go.Scatter(
+        x=storico.index,
+        y=storico.to_numpy(),
+        name='Storico',
+        mode='lines+markers'
+    ))
+
+    fig.add_trace(go.Scatter(
+        x=previsione.index,
+        y=previsione.to_numpy(),
+        name='Previsione',
+        mode='lines+markers',
+        line=dict(dash='dash')
+    ))
+
+    fig.update_layout(
+        title=f'Volumi storici e previsti - {gruppo_risorse}',
+        xaxis_title='Anno-Mese',
+        yaxis_title='Volume',
+        xaxis_tickangle=-45,
+        legend=dict(
+            x=0,
+            y=1.0,
+            bgcolor='rgba(255, 255, 255, 0.5)',
+            bordercolor='rgba(255, 255, 255, 0.5)',
+            borderwidth=2,
+            font=dict(size=12)
+        )
+    )
+
+    return fig
@@ -0,0 +1,161 @@
+# Processo manning - riallocazione mix volumi tra macchine alternative
+# LP per gruppo e mese: minimizza ore_uomo spostando volume tra risorse del gruppo entro la capacità macchina
+# rev1: soluzione esatta dell'LP con ordinamento per costo (knapsack frazionario), vettoriale su tutti i gruppi
+# rev2: etichetta della variazione di head count con segno esplicito
+
+import pandas as pd
+import numpy as np
+import plotly.graph_objects as go
+from manning_inverso import calcola_coefficiente_head_count
+
+
+####### Funzioni di utilità
+
+def calcola_riallocazione_volumi(df_melted_equipaggi, df_ore_uomo_dirette_gruppo, turni_standard, ore_standard,
+                                 risorse_fisse=None):
+    """
+    Rialloca il volume tra le risorse di un gruppo per minimizzare le ore uomo in ogni mese.
+
+    Per ogni Gruppo_risorse e Anno_Mese risolve l'LP
+        min sum_r x_r * Equipaggi_r / Velocità_LL_r
+        s.t. sum_r x_r = Volume totale del gruppo, 0 <= x_r <= Turni_standard_r * Giorni_lavorativi * ore_standard * Velocità_LL_r
+    Con un solo vincolo di bilancio e limiti sulle variabili l'ottimo si ottiene riempiendo le risorse
+    in ordine di ore uomo per pezzo crescente (knapsack frazionario), calcolato con cumsum per gruppo.
+    Se il volume supera la capacità del gruppo l'eccedenza resta sulla risorsa più efficiente.
+
+    Args:
+        df_melted_equipaggi: DataFrame per Risorsa e Anno_Mese con Volume, Velocità_LL ed Equipaggi
+        df_ore_uomo_dirette_gruppo: DataFrame per Gruppo_risorse e Anno_Mese con i parametri di head count
+        turni_standard: DataFrame con Anno_Mese, Gruppo_risorse, Risorsa e Turni_standard
+        ore_standard: Ore standard di lavoro
+        risorse_fisse: Lista opzionale di Risorsa che mantengono il volume di budget (non intercambiabili)
+
+    Returns:
+        Tupla (df_risorse, df_gruppi): volumi ottimi per Risorsa e riepilogo per gruppo e mese
+    """
+    if risorse_fisse is None:
+        risorse_fisse = []
+
+    df_risorse = df_melted_equipaggi[['Gruppo_risorse', 'Risorsa', 'Anno_Mese', 'Volume', 'Velocità_LL', 'Equipaggi']].copy()
+    df_risorse['Volume'] = df_risorse['Volume'].fillna(0)
+    df_risorse = df_risorse.merge(
+        df_ore_uomo_dirette_gruppo[['Gruppo_risorse', 'Anno_Mese', 'Giorni_lavorativi']],
+        on=['Gruppo_risorse', 'Anno_Mese'],
+        how='left'
+    )
+    df_risorse = df_risorse.merge(
+        turni_standard[['Anno_Mese', 'Gruppo_risorse', 'Risorsa', 'Turni_standard']],
+        on=['Anno_Mese', 'Gruppo_risorse', 'Risorsa'],
+        how='left'
+    )
+
+    df_risorse['ore_uomo_per_pezzo'] = df_risorse['Equipaggi'] / df_risorse['Velocità_LL']
+    df_risorse['Volume_capacita'] = (df_risorse['Turni_standard'] * df_risorse['Giorni_lavorativi']
+                                     * ore_standard * df_risorse['Velocità_LL'])
+
+    # Risorse senza turni o escluse mantengono il volume di budget
+    df_risorse['Intercambiabile'] = (~df_risorse['Risorsa'].isin(risorse_fisse)
+                                     & df_risorse['Volume_capacita'].notna()
+                                     & df_risorse['ore_uomo_per_pezzo'].notna())
+    df_risorse['Volume_da_allocare'] = np.where(df_risorse['Intercambiabile'], df_risorse['Volume'], 0.0)
+    df_risorse['Capacita_allocabile'] = np.where(df_risorse['Intercambiabile'], df_risorse['Volume_capacita'], 0.0)
+
+    # Riempimento in ordine di ore uomo per pezzo crescente all'interno di ogni gruppo-mese
+    df_risorse = df_risorse.sort_values(['Gruppo_risorse', 'Anno_Mese', 'Intercambiabile', 'ore_uomo_per_pezzo'],
+                                        ascending=[True, True, False, True]).reset_index(drop=True)
+    chiave = ['Gruppo_risorse', 'Anno_Mese']
+    volume_pool = df_risorse.groupby(chiave)['Volume_da_allocare'].transform('sum')
+    capacita_cumulata = df_risorse.groupby(chiave)['Capacita_allocabile'].cumsum()
+    capacita_precedente = capacita_cumulata - df_risorse['Capacita_allocabile']
+    df_risorse['Volume_ottimo'] = np.clip(volume_pool - capacita_precedente, 0, df_risorse['Capacita_allocabile'])
+
+    # Eccedenza oltre la capacità del gruppo sulla risorsa intercambiabile più efficiente
+    eccedenza = volume_pool - df_risorse.groupby(chiave)['Capacita_allocabile'].transform('sum')
+    prima = df_risorse['Intercambiabile'] & ~df_risorse[chiave + ['Intercambiabile']].duplicated()
+    df_risorse.loc[prima, 'Volume_ottimo'] += eccedenza[prima].clip(lower=0)
+    df_risorse['Volume_ottimo'] = np.where(df_risorse['Intercambiabile'], df_risorse['Volume_ottimo'], df_risorse['Volume'])
+    df_risorse['Capacita_superata'] = df_risorse['Volume_ottimo'] > df_risorse['Volume_capacita'] * (1 + 1e-9)
+
+    df_risorse['ore_uomo_budget'] = df_risorse['Volume'] * df_risorse['ore_uomo_per_pezzo']
+    df_risorse['ore_uomo_ottimo'] = df_risorse['Volume_ottimo'] * df_risorse['ore_uomo_per_pezzo']
+    # Ore macchina per la velocità pesata come in calcola_fabbisogno_turni_gruppo
+    df_risorse['Volume_/_Velocità_budget'] = df_risorse['Volume'] / df_risorse['Velocità_LL']
+    df_risorse['Volume_/_Velocità_ottimo'] = df_risorse['Volume_ottimo'] / df_risorse['Velocità_LL']
+
+    df_gruppi = df_risorse.groupby(chiave).agg({
+        'Volume': 'sum',
+        'Volume_ottimo': 'sum',
+        'ore_uomo_budget': 'sum',
+        'ore_uomo_ottimo': 'sum',
+        'Volume_/_Velocità_budget': 'sum',
+        'Volume_/_Velocità_ottimo': 'sum',
+        'Giorni_lavorativi': 'first',
+        'Capacita_superata': 'any'
+    }).reset_index()
+
+    df_gruppi['Velocità_LL_reparto_budget'] = df_gruppi['Volume'] / df_gruppi['Volume_/_Velocità_budget']
+    df_gruppi['Velocità_LL_reparto_ottimo'] = df_gruppi['Volume_ottimo'] / df_gruppi['Volume_/_Velocità_ottimo']
+    df_gruppi['Fabbisogno_turni_budget'] = df_gruppi['Volume'] / (
+        df_gruppi['Giorni_lavorativi'] * ore_standard * df_gruppi['Velocità_LL_reparto_budget'])
+    df_gruppi['Fabbisogno_turni_ottimo'] = df_gruppi['Volume_ottimo'] / (
+        df_gruppi['Giorni_lavorativi'] * ore_standard * df_gruppi['Velocità_LL_reparto_ottimo'])
+
+    df_gruppi = df_gruppi.merge(calcola_coefficiente_head_count(df_ore_uomo_dirette_gruppo, ore_standard),
+                                on=chiave, how='left')
+    df_gruppi['Head_count_budget'] = df_gruppi['ore_uomo_budget'] * df_gruppi['Coefficiente_head_count']
+    df_gruppi['Head_count_ottimo'] = df_gruppi['ore_uomo_ottimo'] * df_gruppi['Coefficiente_head_count']
+    df_gruppi['Risparmio_head_count'] = df_gruppi['Head_count_budget'] - df_gruppi['Head_count_ottimo']
+
+    df_gruppi = df_gruppi.drop(columns=['Volume_/_Velocità_budget', 'Volume_/_Velocità_ottimo', 'Coefficiente_head_count'])
+    df_gruppi.rename(columns={'Volume': 'Volume_budget'}, inplace=True)
+    df_risorse = df_risorse.drop(columns=['Volume_da_allocare', 'Capacita_allocabile',
+                                          'Volume_/_Velocità_budget', 'Volume_/_Velocità_ottimo'])
+    df_risorse.rename(columns={'Volume': 'Volume_budget'}, inplace=True)
+    return df_risorse, df_gruppi
+
+
+def crea_grafico_riallocazione(df_gruppi, gruppo_risorse):
+    """
+    Crea un grafico confronto tra head count con allocazione budget e con mix ottimo.
+
+    Args:
+        df_gruppi: DataFrame riepilogo per gruppo e mese da calcola_riallocazione_volumi
+        gruppo_risorse: Nome del gruppo risorsa per il titolo
+
+    Returns:
+        Figure plotly
+    """
+    df_gruppo = df_gruppi[df_gruppi['Gruppo_risorse'] == gruppo_risorse]
+
+    fig = go.Figure()
+
+    fig.add_trace(go.Bar(
+        x=df_gruppo['Anno_Mese'],
+        y=df_gruppo['Head_count_budget'],
+        name='Head Count Allocazione Budget'
+    ))
+
+    fig.add_trace(go.Bar(
+        x=df_gruppo['Anno_Mese'],
+        y=df_gruppo['Head_count_ottimo'],
+        name='Head Count Mix Ottimo',
+        text=[f"<b>{-val:+.1f}</b>" for val in df_gruppo['Risparmio_head_count']],
+        textposition='outside'
+    ))
+
+    fig.update_layout(
+        title=f'Riallocazione volumi tra risorse - {gruppo_risorse}',
+        xaxis_title='Anno-Mese',
+        yaxis_title='Numero Persone',
+        xaxis_tickangle=-45,
+        legend=dict(
+            x=0,
+            y=1.0,
+            bgcolor='rgba(255, 255, 255, 0.5)',
+            bordercolor='rgba(255, 255, 255, 0.5)',
+            borderwidth=2,
+            font=dict(size=12)
+        )
+    )
+
+    return fig
@@ -0,0 +1,227 @@
+# Processo manning - rolling forecast con consuntivi mensili
+# I mesi chiusi sono calcolati una volta con volumi, assenteismo e velocità a consuntivo e poi congelati
+# rev1: a ogni chiusura si ricalcolano solo i mesi aperti, la parte congelata si salva su disco
+# rev2: piano turni applicato anche ai mesi chiusi, come ai mesi aperti
+# rev3: file dei mesi congelati nominato con l'impronta SHA-256 degli input, eliminazione alla riapertura
+
+import os
+import pandas as pd
+import numpy as np
+import plotly.graph_objects as go
+from manning_pipeline import filtra_mesi, applica_override, calcola_manning
+from manning_cache import impronta_valore
+
+CHIUSO = 'Chiuso'
+APERTO = 'Aperto'
+
+
+####### Funzioni di utilità
+
+def normalizza_consuntivi(df_consuntivi):
+    """
+    Controlla e normalizza la tabella consuntivi (Anno_Mese in formato 'YYYY-MM').
+
+    Colonne: Risorsa e Anno_Mese obbligatorie; Volume, Velocità_LL (per Risorsa) e Assenteismo
+    (per Gruppo_risorse) facoltative: dove mancano restano i valori di budget.
+
+    Args:
+        df_consuntivi: DataFrame dei consuntivi mensili
+
+    Returns:
+        DataFrame normalizzato
+    """
+    mancanti = {'Risorsa', 'Anno_Mese'} - set(df_consuntivi.columns)
+    if mancanti:
+        raise ValueError(f"Consuntivi: colonne mancanti {', '.join(sorted(mancanti))}")
+    df_consuntivi = df_consuntivi.copy()
+    df_consuntivi['Anno_Mese'] = pd.to_datetime(df_consuntivi['Anno_Mese'].astype(str)).dt.strftime('%Y-%m')
+    return df_consuntivi
+
+
+def override_consuntivo(df_consuntivi_mese):
+    """
+    Converte i consuntivi di un mese nel dizionario di override della catena manning.
+
+    Args:
+        df_consuntivi_mese: DataFrame dei consuntivi normalizzati di un solo mese
+
+    Returns:
+        Dizionario per applica_override
+    """
+    override = {}
+    if 'Volume' in df_consuntivi_mese.columns:
+        df_volumi = df_consuntivi_mese[df_consuntivi_mese['Volume'].notna()]
+        override['volumi'] = df_volumi[['Risorsa', 'Anno_Mese', 'Volume']].to_dict('records')
+    if 'Velocità_LL' in df_consuntivi_mese.columns:
+        df_velocita = df_consuntivi_mese[df_consuntivi_mese['Velocità_LL'].notna()]
+        override['velocita'] = dict(zip(df_velocita['Risorsa'], df_velocita['Velocità_LL']))
+    if 'Assenteismo' in df_consuntivi_mese.columns and 'Gruppo_risorse' in df_consuntivi_mese.columns:
+        df_assenteismo = df_consuntivi_mese[df_consuntivi_mese['Assenteismo'].notna()]
+        override['assenteismo'] = df_assenteismo.groupby('Gruppo_risorse')['Assenteismo'].first().to_dict()
+    return override
+
+
+def mesi_vuoti():
+    """Parte congelata vuota (nessun mese chiuso)."""
+    return {'df_analisi': pd.DataFrame(), 'df_ore_uomo_dirette_gruppo': pd.DataFrame()}
+
+
+def concatena(dfs):
+    """Concatena ignorando i DataFrame vuoti."""
+    dfs = [df for df in dfs if not df.empty]
+    return pd.concat(dfs, ignore_index=True) if dfs else pd.DataFrame()
+
+
+def congela_mesi(caricamento, df_consuntivi, mese_chiusura, ore_standard, congelati=None, df_piano_turni=None):
+    """
+    Calcola con i consuntivi e congela i mesi fino a mese_chiusura non ancora congelati.
+
+    Ogni mese chiuso viene calcolato una sola volta sul proprio sottoinsieme di dati; i mesi già
+    presenti in congelati non vengono ricalcolati anche se i consuntivi cambiano.
+
+    Args:
+        caricamento: Dizionario da carica_e_prepara
+        df_consuntivi: DataFrame da normalizza_consuntivi (può essere vuoto)
+        mese_chiusura: Ultimo mese chiuso ('YYYY-MM')
+        ore_standard: Ore standard di lavoro
+        congelati: Parte congelata precedente (default: nessun mese chiuso)
+        df_piano_turni: DataFrame opzionale da crea_piano_turni
+
+    Returns:
+        Dizionario con df_analisi e df_ore_uomo_dirette_gruppo dei mesi chiusi
+    """
+    if congelati is None:
+        congelati = mesi_vuoti()
+    gia_chiusi = set(congelati['df_analisi']['Anno_Mese']) if not congelati['df_analisi'].empty else set()
+    mesi = sorted(caricamento['df_melted']['Anno_Mese'].unique())
+    da_chiudere = [mese for mese in mesi if mese <= mese_chiusura and mese not in gia_chiusi]
+
+    df_analisi = [congelati['df_analisi']]
+    df_ore_uomo = [congelati['df_ore_uomo_dirette_gruppo']]
+    for mese in da_chiudere:
+        df_consuntivi_mese = df_consuntivi[df_consuntivi['Anno_Mese'] == mese] if not df_consuntivi.empty else df_consuntivi
+        caricamento_mese = applica_override(filtra_mesi(caricamento, [mese]), override_consuntivo(df_consuntivi_mese))
+        risultati = calcola_manning(caricamento_mese, ore_standard, df_piano_turni)
+        fonte = 'Consuntivo' if not df_consuntivi_mese.empty else 'Budget'
+        df_analisi.append(risultati['df_analisi'].assign(Fonte=fonte))
+        df_ore_uomo.append(risultati['df_ore_uomo_dirette_gruppo'].assign(Fonte=fonte))
+
+    return {'df_analisi': concatena(df_analisi), 'df_ore_uomo_dirette_gruppo': concatena(df_ore_uomo)}
+
+
+def calcola_rolling_forecast(caricamento, congelati, ore_standard, df_piano_turni=None):
+    """
+    Unisce i mesi congelati con il ricalcolo dei soli mesi aperti.
+
+    Args:
+        caricamento: Dizionario da carica_e_prepara
+        congelati: Dizionario da congela_mesi
+        ore_standard: Ore standard di lavoro
+        df_piano_turni: DataFrame opzionale da crea_piano_turni (lo stesso passato a congela_mesi)
+
+    Returns:
+        Dizionario con df_analisi e df_ore_uomo_dirette_gruppo su tutto l'orizzonte, colonna Stato Chiuso/Aperto
+    """
+    mesi_chiusi = set(congelati['df_analisi']['Anno_Mese']) if not congelati['df_analisi'].empty else set()
+    mesi_aperti = [mese for mese in sorted(caricamento['df_melted']['Anno_Mese'].unique()) if mese not in mesi_chiusi]
+
+    aperti = mesi_vuoti()
+    if mesi_aperti:
+        aperti = calcola_manning(filtra_mesi(caricamento, mesi_aperti), ore_standard, df_piano_turni)
+
+    rolling = {}
+    for nome in ['df_analisi', 'df_ore_uomo_dirette_gruppo']:
+        rolling[nome] = concatena([
+            congelati[nome].assign(Stato=CHIUSO) if not congelati[nome].empty else congelati[nome],
+            aperti[nome].assign(Stato=APERTO, Fonte='Budget') if not aperti[nome].empty else aperti[nome]
+        ])
+        if not rolling[nome].empty:
+            rolling[nome] = rolling[nome].sort_values(['Gruppo_risorse', 'Anno_Mese']).reset_index(drop=True)
+    return rolling
+
+
+def percorso_congelati(cartella, *input_rolling):
+    """
+    Percorso del file dei mesi congelati per gli input del rolling forecast.
+
+    L'impronta SHA-256 non dipende dal processo: dopo un riavvio lo stesso file con gli stessi
+    input ritrova i mesi chiusi, input diversi non li leggono.
+
+    Args:
+        cartella: Cartella lato server dei mesi congelati
+        input_rolling: Chiave del file caricato e DataFrame che entrano nel calcolo dei mesi chiusi
+
+    Returns:
+        Percorso del file pickle
+    """
+    return os.path.join(cartella, f'congelati_{impronta_valore(input_rolling)[:40]}.pkl')
+
+
+def salva_congelati(congelati, percorso):
+    """Salva su disco la parte congelata (pickle pandas)."""
+    os.makedirs(os.path.dirname(percorso) or '.', exist_ok=True)
+    pd.to_pickle(congelati, percorso)
+
+
+def carica_congelati(percorso):
+    """Legge la parte congelata salvata, nessun mese chiuso se il file non esiste."""
+    if not os.path.exists(percorso):
+        return mesi_vuoti()
+    return pd.read_pickle(percorso)
+
+
+def elimina_congelati(percorso):
+    """Elimina la parte congelata salvata (riapertura di tutti i mesi)."""
+    if os.path.exists(percorso):
+        os.remove(percorso)
+
+
+def crea_grafico_rolling_forecast(df_budget, df_rolling):
+    """
+    Crea un grafico budget vs rolling forecast dell'head count totale di stabilimento.
+
+    Args:
+        df_budget: df_analisi del budget
+        df_rolling: df_analisi da calcola_rolling_forecast
+
+    Returns:
+        Figure plotly
+    """
+    budget = df_budget.groupby('Anno_Mese')['Head Count Totale'].sum()
+    rolling = df_rolling.groupby(['Anno_Mese', 'Stato'])['Head Count Totale'].sum().reset_index()
+
+    fig = go.Figure()
+
+    for stato in [CHIUSO, APERTO]:
+        df_stato = rolling[rolling['Stato'] == stato]
+        fig.add_trace(go.Bar(
+            x=df_stato['Anno_Mese'],
+            y=df_stato['Head Count Totale'],
+            name='Consuntivo (mesi chiusi)' if stato == CHIUSO else 'Forecast (mesi aperti)'
+        ))
+
+    fig.add_trace(go.Scatter(
+        x=budget.index,
+        y=budget.to_numpy(),
+        name='Budget',
+        mode='lines+markers',
+        line=dict(color='black')
+    ))
+
+    fig.update_layout(
+        title='Head Count Totale di stabilimento - Budget vs Rolling forecast',
+        xaxis_title='Anno-Mese',
+        yaxis_title='Numero Persone',
+        xaxis_tickangle=-45,
+        height=500,
+        legend=dict(
+            x=0,
+            y=1.0,
+            bgcolor='rgba(255, 255, 255, 0.5)',
+            bordercolor='rgba(255, 255, 255, 0.5)',
+            borderwidth=2,
+            font=dict(size=12)
+        )
+    )
+
+    return fig
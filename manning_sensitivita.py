@@ -0,0 +1,155 @@
+# Processo manning - analisi di sensitività
+# Derivate esatte dell'head count diretto rispetto ai driver di input in un solo passaggio vettoriale
+# rev1: velocità, equipaggi, quadratura, assenteismo, copertura ferie, giorni lavorativi + grafico tornado
+# rev2: derivata rispetto agli equipaggi dalla formula, definita anche con Equipaggi a zero
+
+import pandas as pd
+import numpy as np
+import plotly.graph_objects as go
+from manning_inverso import calcola_coefficiente_head_count
+
+
+####### Funzioni di utilità
+
+def calcola_gradienti_head_count(df_melted_equipaggi, df_ore_uomo_dirette_gruppo, ore_standard):
+    """
+    Calcola le derivate parziali di head_count_assenteismo_ferie rispetto a ogni input, per cella.
+
+    La catena è un prodotto/rapporto di input:
+    head_count_assenteismo_ferie = sum_r(Volume * Equipaggi / Velocità_LL) * (1 + Assenteismo) * (1 + Copertura_ferie)
+                                   / (Giorni_lavorativi * ore_standard * Quadratura/100)
+    quindi ogni derivata si ottiene in forma chiusa dal contributo della cella.
+
+    Args:
+        df_melted_equipaggi: DataFrame per Risorsa e Anno_Mese con Volume, Velocità_LL ed Equipaggi
+        df_ore_uomo_dirette_gruppo: DataFrame per Gruppo_risorse e Anno_Mese con head count e parametri
+        ore_standard: Ore standard di lavoro
+
+    Returns:
+        DataFrame long con Tipo_driver, Gruppo_risorse, Risorsa, Anno_Mese, Valore, Head_count e Derivata
+    """
+    # Contributo di ogni risorsa-mese all'head count finale
+    df_risorse = df_melted_equipaggi[['Gruppo_risorse', 'Risorsa', 'Anno_Mese', 'Volume', 'Velocità_LL', 'Equipaggi']].merge(
+        calcola_coefficiente_head_count(df_ore_uomo_dirette_gruppo, ore_standard),
+        on=['Gruppo_risorse', 'Anno_Mese'],
+        how='left'
+    )
+    head_count_per_equipaggio = (df_risorse['Volume'].fillna(0) / df_risorse['Velocità_LL']
+                                 * df_risorse['Coefficiente_head_count'])
+    head_count_risorsa = head_count_per_equipaggio * df_risorse['Equipaggi']
+
+    # d/dv (V*E/v) = -contributo/v ; d/dE (V*E/v) = V/v, non contributo/E (indefinito con Equipaggi a zero)
+    df_velocita = df_risorse[['Gruppo_risorse', 'Risorsa', 'Anno_Mese']].assign(
+        Tipo_driver='Velocità_LL', Valore=df_risorse['Velocità_LL'], Head_count=head_count_risorsa,
+        Derivata=-head_count_risorsa / df_risorse['Velocità_LL'])
+    df_equipaggi = df_risorse[['Gruppo_risorse', 'Risorsa', 'Anno_Mese']].assign(
+        Tipo_driver='Equipaggi', Valore=df_risorse['Equipaggi'], Head_count=head_count_risorsa,
+        Derivata=head_count_per_equipaggio)
+
+    # Driver di gruppo: derivate logaritmiche del prodotto
+    df_gruppo = df_ore_uomo_dirette_gruppo
+    head_count_gruppo = df_gruppo['head_count_assenteismo_ferie']
+    derivate_gruppo = {
+        'Quadratura': (df_gruppo['Quadratura'], -head_count_gruppo / df_gruppo['Quadratura']),
+        'Assenteismo': (df_gruppo['Assenteismo'], head_count_gruppo / (1 + df_gruppo['Assenteismo'])),
+        'Copertura_ferie': (df_gruppo['Copertura_ferie'], head_count_gruppo / (1 + df_gruppo['Copertura_ferie'])),
+        'Giorni_lavorativi': (df_gruppo['Giorni_lavorativi'], -head_count_gruppo / df_gruppo['Giorni_lavorativi']),
+    }
+    df_driver_gruppo = [
+        df_gruppo[['Gruppo_risorse', 'Anno_Mese']].assign(
+            Tipo_driver=tipo, Risorsa=None, Valore=valore, Head_count=head_count_gruppo, Derivata=derivata)
+        for tipo, (valore, derivata) in derivate_gruppo.items()
+    ]
+
+    df_gradienti = pd.concat([df_velocita, df_equipaggi] + df_driver_gruppo, ignore_index=True)
+    df_gradienti['Derivata'] = df_gradienti['Derivata'].replace([np.inf, -np.inf], np.nan)
+    return df_gradienti[['Tipo_driver', 'Gruppo_risorse', 'Risorsa', 'Anno_Mese', 'Valore', 'Head_count', 'Derivata']]
+
+
+def calcola_sensitivita(df_gradienti, variazione=0.10):
+    """
+    Aggrega le derivate per driver e calcola elasticità e impatto di una variazione percentuale.
+
+    Le derivate per mese vengono sommate: corrispondono a una variazione uniforme del driver su tutti i mesi.
+    Per Velocità_LL, Equipaggi, Quadratura e Giorni_lavorativi l'elasticità è -1 o +1 sul contributo del driver;
+    per Assenteismo e Copertura_ferie è Valore / (1 + Valore).
+
+    Args:
+        df_gradienti: DataFrame da calcola_gradienti_head_count
+        variazione: Variazione relativa del driver per l'impatto (0.10 = +10%)
+
+    Returns:
+        DataFrame per driver ordinato per impatto assoluto decrescente
+    """
+    df = df_gradienti.copy()
+    df['Risorsa'] = df['Risorsa'].fillna('')
+    # Elasticità pesata: sum(derivata * valore) / head count totale
+    df['Derivata_x_Valore'] = df['Derivata'] * df['Valore']
+    df_sensitivita = df.groupby(['Tipo_driver', 'Gruppo_risorse', 'Risorsa'], sort=False).agg({
+        'Derivata': 'sum',
+        'Derivata_x_Valore': 'sum',
+        'Valore': 'mean'
+    }).reset_index()
+
+    # Una riga per gruppo-mese nei driver di gruppo
+    head_count_totale = df_gradienti.loc[df_gradienti['Tipo_driver'] == 'Quadratura', 'Head_count'].sum()
+    df_sensitivita['Elasticita'] = df_sensitivita['Derivata_x_Valore'] / head_count_totale
+    df_sensitivita['Delta_head_count'] = df_sensitivita['Derivata_x_Valore'] * variazione
+    df_sensitivita['Driver'] = np.where(
+        df_sensitivita['Risorsa'] == '',
+        df_sensitivita['Tipo_driver'] + ' | ' + df_sensitivita['Gruppo_risorse'],
+        df_sensitivita['Tipo_driver'] + ' | ' + df_sensitivita['Risorsa']
+    )
+
+    df_sensitivita = df_sensitivita.drop(columns=['Derivata_x_Valore'])
+    df_sensitivita = df_sensitivita.reindex(
+        df_sensitivita['Delta_head_count'].abs().sort_values(ascending=False).index).reset_index(drop=True)
+    return df_sensitivita
+
+
+def crea_grafico_tornado(df_sensitivita, variazione=0.10, numero_driver=15):
+    """
+    Crea un grafico tornado con l'impatto sull'head count totale di una variazione +/- dei driver.
+
+    Args:
+        df_sensitivita: DataFrame da calcola_sensitivita
+        variazione: Variazione relativa usata per Delta_head_count
+        numero_driver: Numero di driver più influenti da mostrare
+
+    Returns:
+        Figure plotly
+    """
+    df_top = df_sensitivita.head(numero_driver).iloc[::-1]
+
+    fig = go.Figure()
+
+    fig.add_trace(go.Bar(
+        y=df_top['Driver'],
+        x=df_top['Delta_head_count'],
+        orientation='h',
+        name=f'+{variazione:.0%}'
+    ))
+
+    fig.add_trace(go.Bar(
+        y=df_top['Driver'],
+        x=-df_top['Delta_head_count'],
+        orientation='h',
+        name=f'-{variazione:.0%}'
+    ))
+
+    fig.update_layout(
+        title=f'Sensitività Head Count Diretti totale a variazioni del {variazione:.0%}',
+        xaxis_title='Variazione Head Count (somma sui mesi)',
+        barmode='overlay',
+        height=max(400, 30 * len(df_top)),
+        legend=dict(
+            x=0,
+            y=1.0,
+            bgcolor='rgba(255, 255, 255, 0.5)',
+            bordercolor='rgba(255, 255, 255, 0.5)',
+            borderwidth=2,
+            font=dict(size=12)
+        )
+    )
+
+    return fig
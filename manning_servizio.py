@@ -0,0 +1,256 @@
+# Processo manning - servizio REST/JSON locale per ERP e HR
+# Master data caricati una volta in memoria, override di volumi e parametri in JSON, head count Gruppo x mese in uscita
+# rev1: http.server della libreria standard, richieste a lotti e cache LRU delle risposte per payload
+# rev2: cache degli stadi sotto le risposte: payload diversi riusano le fasi con input invariati
+# rev3: /ricarica rilegge solo i fogli modificati
+# rev4: fogli modificati dell'ultimo /ricarica tenuti dal servizio
+# rev5: payload validati (oggetto JSON, Quadratura e Velocità_LL come in valida_master_data), errori imprevisti in 500 JSON
+#
+# Avvio: python manning_servizio.py master_data.xlsx --porta 8502
+#
+# GET  /salute                 stato del servizio, file caricato, statistiche cache
+# POST /head_count             un payload di override -> head count per Gruppo_risorse e Anno_Mese
+# POST /head_count/lotto       {"richieste": [payload, ...]} -> lista di risposte nello stesso ordine
+# POST /ricarica               rilegge master_data.xlsx e svuota la cache
+#
+# Payload (tutti i campi facoltativi):
+#   {"volumi": [{"Risorsa": "...", "Anno_Mese": "2026-03", "Volume": 120000}, ...],
+#    "fattore_volumi": 1.1,
+#    "velocita": {"Risorsa": 5200},
+#    "assenteismo": {"Gruppo_risorse": 0.06},
+#    "copertura_ferie": {"Gruppo_risorse": 0.10},
+#    "quadratura": {"Gruppo_risorse": 90}}
+
+import argparse
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from manning_pipeline import carica_e_prepara, calcola_manning, applica_override, fogli_modificati
+from manning_validazione import ha_errori_fatali
+from manning_cache import CacheStadi
+
+ORE_STANDARD = 8
+
+
+# Override per chiave con il valore minimo escluso: gli stessi divisori controllati da valida_master_data
+MINIMI_OVERRIDE = {
+    'velocita': (0, 'Velocità_LL nulla o negativa (divisore)'),
+    'quadratura': (1, 'Quadratura nulla, negativa o espressa come frazione (attesa percentuale, es. 85)')
+}
+
+
+####### Funzioni di utilità
+
+def chiave_payload(override):
+    """Chiave di cache di un payload: JSON canonico (chiavi ordinate) passato in SHA-256."""
+    return hashlib.sha256(json.dumps(override, sort_keys=True, separators=(',', ':')).encode()).hexdigest()
+
+
+def valida_override(override):
+    """
+    Controlla un payload prima del calcolo: gli override scavalcano valida_master_data, quindi Quadratura
+    e Velocità_LL sostituite vengono ricontrollate qui (altrimenti head count nulli o infiniti in risposta).
+
+    Args:
+        override: Payload JSON decodificato
+
+    Returns:
+        None, solleva ValueError se il payload non è valido
+    """
+    if not isinstance(override, dict):
+        raise ValueError('Payload atteso come oggetto JSON')
+    for campo in ('velocita', 'assenteismo', 'copertura_ferie', 'quadratura'):
+        if override.get(campo) is not None and not isinstance(override[campo], dict):
+            raise ValueError(f'{campo}: atteso un oggetto JSON chiave -> valore')
+    for campo, (minimo, controllo) in MINIMI_OVERRIDE.items():
+        non_validi = [chiave for chiave, valore in (override.get(campo) or {}).items()
+                      if isinstance(valore, bool) or not isinstance(valore, (int, float)) or not valore > minimo]
+        if non_validi:
+            raise ValueError(f"{campo}: {controllo}: {', '.join(map(str, non_validi))}")
+
+
+class ModelloManning:
+    """
+    Master data tenuti in memoria e cache LRU delle risposte per payload di override.
+    """
+
+    def __init__(self, percorso, ore_standard=ORE_STANDARD, dimensione_cache=256):
+        self.percorso = percorso
+        self.ore_standard = ore_standard
+        self.dimensione_cache = dimensione_cache
+        self.cache = OrderedDict()
+        self.hit = 0
+        self.miss = 0
+        self.cache_stadi = CacheStadi(max_voci=4 * dimensione_cache)
+        self.caricamento = None
+        self.fogli_modificati = []
+        self._lock = threading.Lock()
+        self.carica()
+
+    def carica(self):
+        """(Ri)legge master_data.xlsx e svuota la cache."""
+        with open(self.percorso, 'rb') as f:
+            dati_file = f.read()
+        caricamento = carica_e_prepara(dati_file, cache=self.cache_stadi, precedente=self.caricamento)
+        if ha_errori_fatali(caricamento['df_validazione']):
+            raise ValueError(f"Errori fatali in {self.percorso}:\n{caricamento['df_validazione'].to_string()}")
+        impronte_precedenti = self.caricamento['impronte_fogli'] if self.caricamento is not None else {}
+        with self._lock:
+            self.fogli_modificati = sorted(fogli_modificati(caricamento['impronte_fogli'], impronte_precedenti))
+            self.caricamento = caricamento
+            self.impronta_file = hashlib.sha256(dati_file).hexdigest()
+            self.cache.clear()
+
+    def head_count(self, override):
+        """
+        Head count per Gruppo_risorse e Anno_Mese con gli override indicati (dalla cache se già calcolato).
+
+        Args:
+            override: Dizionario di override (vuoto = budget del file)
+
+        Returns:
+            Lista di record con Gruppo_risorse, Anno_Mese e head count diretti, indiretti e totale
+        """
+        valida_override(override)
+        chiave = chiave_payload(override)
+        with self._lock:
+            if chiave in self.cache:
+                self.cache.move_to_end(chiave)
+                self.hit += 1
+                return self.cache[chiave]
+            self.miss += 1
+            caricamento = self.caricamento
+
+        df_analisi = calcola_manning(applica_override(caricamento, override), self.ore_standard, cache=self.cache_stadi)['df_analisi']
+        risposta = json.loads(df_analisi.sort_values(['Gruppo_risorse', 'Anno_Mese']).to_json(orient='records'))
+
+        with self._lock:
+            self.cache[chiave] = risposta
+            if len(self.cache) > self.dimensione_cache:
+                self.cache.popitem(last=False)
+        return risposta
+
+    def lotto(self, richieste):
+        """
+        Elabora un lotto di payload: quelli identici sono calcolati una volta sola.
+
+        Args:
+            richieste: Lista di dizionari di override
+
+        Returns:
+            Lista di risposte nello stesso ordine (errori come {"errore": messaggio})
+        """
+        if not isinstance(richieste, list):
+            raise ValueError('richieste: attesa una lista di payload')
+        risposte = {}
+        risultati = []
+        for override in richieste:
+            chiave = chiave_payload(override)
+            if chiave not in risposte:
+                try:
+                    risposte[chiave] = self.head_count(override)
+                except (ValueError, KeyError, TypeError) as e:
+                    risposte[chiave] = {'errore': str(e)}
+            risultati.append(risposte[chiave])
+        return risultati
+
+    def salute(self):
+        with self._lock:
+            return {
+                'file': self.percorso,
+                'impronta_file': self.impronta_file,
+                'fogli_modificati': self.fogli_modificati,
+                'cache': {'voci': len(self.cache), 'hit': self.hit, 'miss': self.miss},
+                'cache_stadi': self.cache_stadi.diagnostica().to_dict('records')
+            }
+
+
+def crea_handler(modello):
+    """
+    Crea la classe handler HTTP legata al modello.
+
+    Args:
+        modello: ModelloManning
+
+    Returns:
+        Sottoclasse di BaseHTTPRequestHandler
+    """
+
+    class HandlerManning(BaseHTTPRequestHandler):
+
+        def _rispondi(self, codice, corpo):
+            dati = json.dumps(corpo, ensure_ascii=False).encode('utf-8')
+            self.send_response(codice)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(dati)))
+            self.end_headers()
+            self.wfile.write(dati)
+
+        def _leggi_json(self):
+            lunghezza = int(self.headers.get('Content-Length', 0))
+            if lunghezza == 0:
+                return {}
+            return json.loads(self.rfile.read(lunghezza))
+
+        def do_GET(self):
+            if self.path == '/salute':
+                self._rispondi(200, modello.salute())
+            else:
+                self._rispondi(404, {'errore': f'Percorso non trovato: {self.path}'})
+
+        def do_POST(self):
+            try:
+                payload = self._leggi_json()
+                if not isinstance(payload, dict):
+                    raise ValueError('Payload atteso come oggetto JSON')
+                if self.path == '/head_count':
+                    self._rispondi(200, {'head_count': modello.head_count(payload)})
+                elif self.path == '/head_count/lotto':
+                    self._rispondi(200, {'risposte': modello.lotto(payload.get('richieste', []))})
+                elif self.path == '/ricarica':
+                    modello.carica()
+                    self._rispondi(200, modello.salute())
+                else:
+                    self._rispondi(404, {'errore': f'Percorso non trovato: {self.path}'})
+            except (ValueError, KeyError, TypeError) as e:
+                self._rispondi(400, {'errore': str(e)})
+            except Exception as e:
+                # Il client riceve sempre una risposta JSON, anche per errori imprevisti del calcolo
+                self._rispondi(500, {'errore': f'{type(e).__name__}: {e}'})
+
+        def log_message(self, formato, *args):
+            pass
+
+    return HandlerManning
+
+
+def avvia_servizio(percorso, host='127.0.0.1', porta=8502):
+    """
+    Carica master data e avvia il server HTTP (bloccante).
+
+    Args:
+        percorso: Percorso di master_data.xlsx
+        host: Indirizzo di ascolto (default solo locale)
+        porta: Porta TCP
+    """
+    modello = ModelloManning(percorso)
+    server = ThreadingHTTPServer((host, porta), crea_handler(modello))
+    print(f'Servizio manning su http://{host}:{porta} ({percorso})')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Servizio REST/JSON del modello manning')
+    parser.add_argument('file', help='Percorso di master_data.xlsx')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=8502)
+    argomenti = parser.parse_args()
+    avvia_servizio(argomenti.file, argomenti.host, argomenti.porta)
@@ -0,0 +1,161 @@
+# Processo manning - schemi turno e ore macchina disponibili da calendario
+# Espansione giornaliera dei piani turno per Risorsa con calendari busday NumPy e festività di stabilimento
+# rev1: schemi 1x8, 2x8, 3x8, 4x6, ciclo continuo e squadre weekend
+
+import pandas as pd
+import numpy as np
+
+# Schema turno -> (turni al giorno, ore per turno, giorni della settimana lun..dom)
+SCHEMI_TURNO = {
+    '1x8': (1, 8, '1111100'),
+    '2x8': (2, 8, '1111100'),
+    '3x8': (3, 8, '1111100'),
+    '3x8 + sabato': (3, 8, '1111110'),
+    '3x8 ciclo continuo': (3, 8, '1111111'),
+    '4x6': (4, 6, '1111100'),
+    '4x6 + sabato': (4, 6, '1111110'),
+    'Weekend 2x12': (2, 12, '0000011'),
+}
+
+
+####### Funzioni di utilità
+
+def calcola_pasqua(anni):
+    """
+    Calcola la data di Pasqua per una lista di anni (algoritmo gregoriano anonimo).
+
+    Args:
+        anni: Lista di anni
+
+    Returns:
+        Lista di date di Pasqua (numpy datetime64[D])
+    """
+    date = []
+    for anno in anni:
+        a, b, c = anno % 19, anno // 100, anno % 100
+        d, e = b // 4, b % 4
+        f = (b + 8) // 25
+        g = (b - f + 1) // 3
+        h = (19 * a + b - d - g + 15) % 30
+        i, k = c // 4, c % 4
+        l = (32 + 2 * e + 2 * i - h - k) % 7
+        m = (a + 11 * h + 22 * l) // 451
+        mese = (h + l - 7 * m + 114) // 31
+        giorno = (h + l - 7 * m + 114) % 31 + 1
+        date.append(np.datetime64(f'{anno:04d}-{mese:02d}-{giorno:02d}'))
+    return date
+
+
+def festivita_nazionali(anni):
+    """
+    Restituisce le festività nazionali italiane (incluso Lunedì dell'Angelo) per gli anni indicati.
+
+    Args:
+        anni: Lista di anni
+
+    Returns:
+        Array numpy datetime64[D] ordinato
+    """
+    fisse = ['01-01', '01-06', '04-25', '05-01', '06-02', '08-15', '11-01', '12-08', '12-25', '12-26']
+    date = [np.datetime64(f'{anno:04d}-{giorno}') for anno in anni for giorno in fisse]
+    date += [pasqua + np.timedelta64(1, 'D') for pasqua in calcola_pasqua(anni)]
+    return np.array(sorted(set(date)), dtype='datetime64[D]')
+
+
+def crea_piano_turni(turni_standard, ore_standard, schemi_risorsa=None):
+    """
+    Crea il piano schema turno per Risorsa e Anno_Mese.
+
+    Di default lo schema deriva dal numero di turni del foglio turni (es. 3 -> '3x8' con ore_standard);
+    schemi_risorsa sostituisce lo schema per le risorse indicate su tutti i mesi.
+
+    Args:
+        turni_standard: DataFrame con Anno_Mese, Gruppo_risorse, Risorsa e Turni_standard
+        ore_standard: Ore standard di lavoro per turno
+        schemi_risorsa: Dizionario opzionale Risorsa -> nome schema in SCHEMI_TURNO
+
+    Returns:
+        DataFrame con Gruppo_risorse, Risorsa, Anno_Mese, Schema, Turni_giorno, Ore_turno, Maschera_giorni
+    """
+    df_piano = turni_standard[['Gruppo_risorse', 'Risorsa', 'Anno_Mese', 'Turni_standard']].copy()
+    turni = df_piano['Turni_standard'].round().fillna(0).astype(int)
+    df_piano['Schema'] = turni.astype(str) + 'x' + str(int(ore_standard))
+    if schemi_risorsa:
+        sostituzioni = df_piano['Risorsa'].map(schemi_risorsa)
+        df_piano['Schema'] = sostituzioni.fillna(df_piano['Schema'])
+
+    # Schemi non in tabella (es. 2x8 con ore_standard diverse): turni e ore dal nome, giorni feriali
+    definizione = df_piano['Schema'].map(SCHEMI_TURNO)
+    df_piano['Turni_giorno'] = [d[0] if isinstance(d, tuple) else t for d, t in zip(definizione, turni)]
+    df_piano['Ore_turno'] = [d[1] if isinstance(d, tuple) else ore_standard for d in definizione]
+    df_piano['Maschera_giorni'] = [d[2] if isinstance(d, tuple) else '1111100' for d in definizione]
+    return df_piano.drop(columns='Turni_standard')
+
+
+def espandi_ore_giornaliere(df_piano, festivita):
+    """
+    Espande il piano turni in ore macchina disponibili per Risorsa e giorno.
+
+    Per ogni maschera giorni distinta calcola una sola volta np.is_busday sull'intervallo di date
+    (con le festività), poi distribuisce le ore con indicizzazione vettoriale senza cicli per riga.
+
+    Args:
+        df_piano: DataFrame da crea_piano_turni
+        festivita: Array di date festive / chiusure di stabilimento (datetime64[D])
+
+    Returns:
+        DataFrame con Gruppo_risorse, Risorsa, Anno_Mese, Data, Lavorativo, Ore_macchina
+    """
+    inizio = pd.PeriodIndex(df_piano['Anno_Mese'], freq='M').to_timestamp().to_numpy().astype('datetime64[D]')
+    fine = (pd.PeriodIndex(df_piano['Anno_Mese'], freq='M') + 1).to_timestamp().to_numpy().astype('datetime64[D]')
+    giorni_mese = (fine - inizio).astype(int)
+
+    date = np.arange(inizio.min(), fine.max(), dtype='datetime64[D]')
+    maschere, id_maschera = np.unique(df_piano['Maschera_giorni'].to_numpy(), return_inverse=True)
+    lavorativo = np.stack([np.is_busday(date, weekmask=maschera, holidays=festivita) for maschera in maschere])
+
+    # Una riga per risorsa-giorno: ripetizione delle righe e offset progressivo nel mese
+    righe = np.repeat(np.arange(len(df_piano)), giorni_mese)
+    offset = np.arange(len(righe)) - np.repeat(np.cumsum(giorni_mese) - giorni_mese, giorni_mese)
+    data_giorno = inizio[righe] + offset
+    indice_data = (data_giorno - date[0]).astype(int)
+    giorno_lavorativo = lavorativo[id_maschera[righe], indice_data]
+
+    ore_giorno = (df_piano['Turni_giorno'].to_numpy(dtype=float) * df_piano['Ore_turno'].to_numpy(dtype=float))[righe]
+    return pd.DataFrame({
+        'Gruppo_risorse': df_piano['Gruppo_risorse'].to_numpy()[righe],
+        'Risorsa': df_piano['Risorsa'].to_numpy()[righe],
+        'Anno_Mese': df_piano['Anno_Mese'].to_numpy()[righe],
+        'Data': data_giorno,
+        'Lavorativo': giorno_lavorativo,
+        'Ore_macchina': np.where(giorno_lavorativo, ore_giorno, 0.0)
+    })
+
+
+def calcola_ore_disponibili_mensili(df_piano, df_ore_giornaliere, df_calendario_melted, ore_standard):
+    """
+    Aggrega le ore giornaliere per Risorsa e mese e le converte in turni standard equivalenti.
+
+    Turni_equivalenti = Ore_macchina_disponibili / (Giorni_lavorativi * ore_standard): stesso denominatore di
+    Fabbisogno_turni, quindi sostituisce Turni_standard nei confronti con il fabbisogno e nelle capacità.
+
+    Args:
+        df_piano: DataFrame da crea_piano_turni
+        df_ore_giornaliere: DataFrame da espandi_ore_giornaliere
+        df_calendario_melted: DataFrame con giorni lavorativi per Gruppo_risorse e Anno_Mese
+        ore_standard: Ore standard di lavoro
+
+    Returns:
+        DataFrame per Risorsa e Anno_Mese con giorni macchina, ore disponibili e turni equivalenti
+    """
+    df_mensile = df_ore_giornaliere.groupby(['Gruppo_risorse', 'Risorsa', 'Anno_Mese']).agg(
+        Giorni_macchina=('Lavorativo', 'sum'),
+        Ore_macchina_disponibili=('Ore_macchina', 'sum')
+    ).reset_index()
+    df_mensile = df_mensile.merge(df_piano[['Gruppo_risorse', 'Risorsa', 'Anno_Mese', 'Schema', 'Turni_giorno', 'Ore_turno']],
+                                  on=['Gruppo_risorse', 'Risorsa', 'Anno_Mese'], how='left')
+    df_mensile = df_mensile.merge(df_calendario_melted[['Gruppo_risorse', 'Anno_Mese', 'Giorni_lavorativi']],
+                                  on=['Gruppo_risorse', 'Anno_Mese'], how='left')
+    df_mensile['Turni_equivalenti'] = df_mensile['Ore_macchina_disponibili'] / (df_mensile['Giorni_lavorativi'] * ore_standard)
+    df_mensile['Turni_equivalenti'] = df_mensile['Turni_equivalenti'].replace([np.inf, -np.inf], np.nan)
+    return df_mensile
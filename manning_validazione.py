@@ -0,0 +1,295 @@
+# Processo manning - validazione master_data
+# Controlli di integrità, divisori nulli, chiavi duplicate e unità anomale eseguiti al caricamento
+# rev1: controlli vettoriali per foglio, report strutturato con livello Fatale / Avviso
+# rev2: Quadratura mancante o non numerica fatale, anche nel confronto tra risorse dello stesso gruppo
+
+import pandas as pd
+import numpy as np
+
+COLONNE_OBBLIGATORIE = {
+    'volumi_bgt': ['Gruppo_risorse', 'Risorsa'],
+    'equipaggi': ['Gruppo_risorse', 'Risorsa'],
+    'calendario': ['Gruppo_risorse'],
+    'turni': ['Gruppo_risorse', 'Risorsa'],
+    'assenteismo_ferie': ['Gruppo_risorse', 'Assenteismo', 'Copertura_ferie'],
+    'efficienza_oee': ['Gruppo_risorse', 'Risorsa', 'Velocità_LL', 'Quadratura'],
+}
+
+FOGLI_CON_PERIODI = ['volumi_bgt', 'equipaggi', 'calendario', 'turni']
+
+RISORSE_INDIRETTE = ['Indiretti', 'Attrezzisti', 'Voltapile']
+
+FATALE = 'Fatale'
+AVVISO = 'Avviso'
+
+
+####### Funzioni di utilità
+
+def colonne_periodo(df):
+    """
+    Restituisce le colonne il cui nome è una data (mese del budget), convertite a periodo mensile.
+
+    Args:
+        df: DataFrame di un foglio di master_data
+
+    Returns:
+        Dizionario {colonna: periodo mensile}
+    """
+    periodi = {}
+    for col in df.columns:
+        if isinstance(col, (pd.Timestamp, np.datetime64)) or hasattr(col, 'year'):
+            periodi[col] = pd.Period(col, freq='M')
+        elif isinstance(col, str) and any(sep in col for sep in ['-', '/']):
+            data = pd.to_datetime(col, errors='coerce')
+            if pd.notna(data):
+                periodi[col] = data.to_period('M')
+    return periodi
+
+
+def matrice_periodi(df, chiave):
+    """
+    Trasforma le colonne periodo di un foglio in una matrice numerica chiave x mese.
+
+    Args:
+        df: DataFrame di un foglio di master_data
+        chiave: Colonna o lista di colonne indice
+
+    Returns:
+        Tupla (matrice, valori_non_numerici): DataFrame numerico con colonne Period e conteggio
+        dei valori non convertibili
+    """
+    periodi = colonne_periodo(df)
+    grezzo = df.set_index(chiave)[list(periodi)]
+    matrice = grezzo.apply(pd.to_numeric, errors='coerce')
+    valori_non_numerici = int((matrice.isna() & grezzo.notna()).to_numpy().sum())
+    matrice.columns = [periodi[col] for col in matrice.columns]
+    return matrice, valori_non_numerici
+
+
+def unisci_chiave(df, colonne):
+    """
+    Unisce più colonne chiave in una stringa 'a | b' per riga.
+
+    Args:
+        df: DataFrame
+        colonne: Lista di colonne chiave
+
+    Returns:
+        Series di stringhe
+    """
+    chiave = df[colonne[0]].astype(str)
+    for col in colonne[1:]:
+        chiave = chiave + ' | ' + df[col].astype(str)
+    return chiave
+
+
+def valida_master_data(fogli):
+    """
+    Valida i sei fogli di master_data prima dei calcoli.
+
+    Controlli:
+        - colonne obbligatorie e colonne mese presenti
+        - chiavi duplicate che moltiplicherebbero le righe nei merge
+        - integrità referenziale tra fogli (risorse senza velocità, gruppi senza calendario, ...)
+        - divisori nulli o negativi (Velocità_LL, Giorni_lavorativi, Quadratura)
+        - unità anomale (percentuali al posto di frazioni e viceversa, volumi fuori scala)
+
+    Gli errori Fatali renderebbero il calcolo infinito o moltiplicato e devono bloccare le fasi a valle;
+    gli Avvisi segnalano righe ignorate o valori mancanti nei risultati.
+
+    Args:
+        fogli: Dizionario nome foglio -> DataFrame letto da master_data.xlsx
+
+    Returns:
+        DataFrame con Livello, Foglio, Controllo, Righe, Esempi
+    """
+    report = []
+
+    def segnala(livello, foglio, controllo, chiavi):
+        chiavi = pd.Series(chiavi, dtype=object).dropna()
+        if len(chiavi) == 0:
+            return
+        esempi = chiavi.astype(str).unique()
+        report.append({
+            'Livello': livello,
+            'Foglio': foglio,
+            'Controllo': controllo,
+            'Righe': len(chiavi),
+            'Esempi': ', '.join(esempi[:10]) + (' ...' if len(esempi) > 10 else '')
+        })
+
+    # Colonne obbligatorie: senza di esse gli altri controlli del foglio non hanno senso
+    fogli_validi = {}
+    for foglio, colonne in COLONNE_OBBLIGATORIE.items():
+        df = fogli.get(foglio)
+        if df is None:
+            segnala(FATALE, foglio, 'Foglio mancante', [foglio])
+            continue
+        mancanti = [col for col in colonne if col not in df.columns]
+        if mancanti:
+            segnala(FATALE, foglio, 'Colonne obbligatorie mancanti', mancanti)
+            continue
+        if foglio in FOGLI_CON_PERIODI and not colonne_periodo(df):
+            segnala(FATALE, foglio, 'Nessuna colonna mese trovata', [foglio])
+            continue
+        fogli_validi[foglio] = df
+
+    df_volume = fogli_validi.get('volumi_bgt')
+    df_equipaggi = fogli_validi.get('equipaggi')
+    df_calendario = fogli_validi.get('calendario')
+    df_turni = fogli_validi.get('turni')
+    df_assenteismo_ferie = fogli_validi.get('assenteismo_ferie')
+    df_efficienza_oee = fogli_validi.get('efficienza_oee')
+
+    def chiave_risorsa(df):
+        return unisci_chiave(df, ['Gruppo_risorse', 'Risorsa'])
+
+    # Chiavi duplicate
+    for foglio, df, chiave, livello in [
+        ('volumi_bgt', df_volume, ['Gruppo_risorse', 'Risorsa'], FATALE),
+        ('equipaggi', df_equipaggi, ['Gruppo_risorse', 'Risorsa'], FATALE),
+        ('turni', df_turni, ['Gruppo_risorse', 'Risorsa'], AVVISO),
+        ('efficienza_oee', df_efficienza_oee, ['Risorsa'], FATALE),
+        ('calendario', df_calendario, ['Gruppo_risorse'], FATALE),
+        ('assenteismo_ferie', df_assenteismo_ferie, ['Gruppo_risorse'], FATALE),
+    ]:
+        if df is not None:
+            duplicati = unisci_chiave(df.loc[df.duplicated(chiave, keep='first')], chiave)
+            segnala(livello, foglio, f'Chiave duplicata {chiave}', duplicati)
+
+    if df_efficienza_oee is not None:
+        # Quadratura mancante conteggiata come valore a sé: un gruppo con una cella vuota ha due quadrature
+        quadratura = pd.to_numeric(df_efficienza_oee['Quadratura'], errors='coerce')
+        quadrature = quadratura.groupby(df_efficienza_oee['Gruppo_risorse']).nunique(dropna=False)
+        segnala(FATALE, 'efficienza_oee', 'Quadratura diversa tra risorse dello stesso gruppo (righe duplicate nel merge)',
+                quadrature[quadrature > 1].index)
+
+        velocita = pd.to_numeric(df_efficienza_oee['Velocità_LL'], errors='coerce')
+        segnala(AVVISO, 'efficienza_oee', 'Velocità_LL mancante o non numerica (risorsa esclusa dalle ore uomo)',
+                df_efficienza_oee.loc[velocita.isna(), 'Risorsa'])
+
+        segnala(FATALE, 'efficienza_oee', 'Quadratura mancante o non numerica (divisore)',
+                df_efficienza_oee.loc[quadratura.isna(), 'Gruppo_risorse'].drop_duplicates())
+        segnala(FATALE, 'efficienza_oee', 'Quadratura nulla o negativa (divisore)',
+                df_efficienza_oee.loc[quadratura <= 0, 'Gruppo_risorse'].drop_duplicates())
+        segnala(FATALE, 'efficienza_oee', 'Quadratura espressa come frazione (attesa percentuale, es. 85)',
+                df_efficienza_oee.loc[(quadratura > 0) & (quadratura <= 1), 'Gruppo_risorse'].drop_duplicates())
+        segnala(AVVISO, 'efficienza_oee', 'Quadratura oltre 100%',
+                df_efficienza_oee.loc[quadratura > 100, 'Gruppo_risorse'].drop_duplicates())
+
+    if df_assenteismo_ferie is not None:
+        for col in ['Assenteismo', 'Copertura_ferie']:
+            valori = pd.to_numeric(df_assenteismo_ferie[col], errors='coerce')
+            segnala(AVVISO, 'assenteismo_ferie', f'{col} mancante o non numerico',
+                    df_assenteismo_ferie.loc[valori.isna(), 'Gruppo_risorse'])
+            segnala(AVVISO, 'assenteismo_ferie', f'{col} negativo', df_assenteismo_ferie.loc[valori < 0, 'Gruppo_risorse'])
+            segnala(AVVISO, 'assenteismo_ferie', f'{col} oltre 1 (atteso frazione, es. 0.06)',
+                    df_assenteismo_ferie.loc[valori >= 1, 'Gruppo_risorse'])
+
+    # Volumi: valori non numerici, negativi e fuori scala
+    if df_volume is not None:
+        matrice_volumi, non_numerici = matrice_periodi(df_volume, ['Gruppo_risorse', 'Risorsa'])
+        if non_numerici:
+            segnala(AVVISO, 'volumi_bgt', 'Valori non numerici (trattati come mancanti)', [f'{non_numerici} celle'])
+        negativi = (matrice_volumi < 0).any(axis=1)
+        segnala(AVVISO, 'volumi_bgt', 'Volumi negativi', matrice_volumi.index[negativi].map(' | '.join))
+        # Fuori scala: mese oltre 10 volte la mediana dei mesi non nulli della stessa risorsa (unità diverse)
+        mediana = matrice_volumi.where(matrice_volumi > 0).median(axis=1)
+        fuori_scala = matrice_volumi.gt(10 * mediana, axis=0).any(axis=1)
+        segnala(AVVISO, 'volumi_bgt', 'Volume mensile oltre 10 volte la mediana della risorsa',
+                matrice_volumi.index[fuori_scala].map(' | '.join))
+
+    if df_equipaggi is not None:
+        matrice_equipaggi, non_numerici = matrice_periodi(df_equipaggi, ['Gruppo_risorse', 'Risorsa'])
+        if non_numerici:
+            segnala(AVVISO, 'equipaggi', 'Valori non numerici (trattati come mancanti)', [f'{non_numerici} celle'])
+        segnala(AVVISO, 'equipaggi', 'Equipaggi negativi',
+                matrice_equipaggi.index[(matrice_equipaggi < 0).any(axis=1)].map(' | '.join))
+        segnala(AVVISO, 'equipaggi', 'Equipaggi oltre 20 persone per risorsa',
+                matrice_equipaggi.index[(matrice_equipaggi > 20).any(axis=1)].map(' | '.join))
+
+    # Integrità referenziale tra fogli
+    if df_volume is not None and df_efficienza_oee is not None:
+        senza_velocita = ~df_volume['Risorsa'].isin(df_efficienza_oee['Risorsa'])
+        segnala(AVVISO, 'volumi_bgt', 'Risorsa senza riga in efficienza_oee (esclusa da fabbisogno e ore uomo)',
+                chiave_risorsa(df_volume[senza_velocita]))
+        senza_quadratura = ~df_volume['Gruppo_risorse'].isin(df_efficienza_oee['Gruppo_risorse'])
+        segnala(AVVISO, 'volumi_bgt', 'Gruppo_risorse senza Quadratura in efficienza_oee (head count mancante)',
+                df_volume.loc[senza_quadratura, 'Gruppo_risorse'].drop_duplicates())
+
+    if df_volume is not None and df_equipaggi is not None:
+        senza_equipaggi = ~chiave_risorsa(df_volume).isin(chiave_risorsa(df_equipaggi))
+        segnala(AVVISO, 'volumi_bgt', 'Risorsa senza equipaggi (volume escluso dalle ore uomo)',
+                chiave_risorsa(df_volume[senza_equipaggi]))
+        dirette = ~df_equipaggi['Risorsa'].isin(RISORSE_INDIRETTE)
+        senza_volume = dirette & ~chiave_risorsa(df_equipaggi).isin(chiave_risorsa(df_volume))
+        segnala(AVVISO, 'equipaggi', 'Risorsa diretta senza volumi di budget', chiave_risorsa(df_equipaggi[senza_volume]))
+
+        # Gruppi con soli indiretti o soli diretti: Head Count Totale NaN nel merge outer di df_analisi
+        gruppi_indiretti = df_equipaggi.loc[~dirette, 'Gruppo_risorse'].drop_duplicates()
+        gruppi_diretti = df_volume['Gruppo_risorse'].drop_duplicates()
+        segnala(AVVISO, 'equipaggi', 'Gruppo con indiretti ma senza volumi diretti (Head Count Totale mancante)',
+                gruppi_indiretti[~gruppi_indiretti.isin(gruppi_diretti)])
+        segnala(AVVISO, 'volumi_bgt', 'Gruppo con volumi ma senza indiretti (Head Count Totale mancante)',
+                gruppi_diretti[~gruppi_diretti.isin(gruppi_indiretti)])
+
+    if df_volume is not None and df_turni is not None:
+        senza_turni = ~chiave_risorsa(df_volume).isin(chiave_risorsa(df_turni))
+        segnala(AVVISO, 'volumi_bgt', 'Risorsa senza turni standard', chiave_risorsa(df_volume[senza_turni]))
+
+    for foglio, df in [('volumi_bgt', df_volume), ('equipaggi', df_equipaggi), ('turni', df_turni)]:
+        if df is not None and df_calendario is not None:
+            senza_calendario = ~df['Gruppo_risorse'].isin(df_calendario['Gruppo_risorse'])
+            segnala(AVVISO, foglio, 'Gruppo_risorse senza calendario (Giorni_lavorativi mancanti)',
+                    df.loc[senza_calendario, 'Gruppo_risorse'].drop_duplicates())
+        if df is not None and df_assenteismo_ferie is not None and foglio == 'volumi_bgt':
+            senza_assenteismo = ~df['Gruppo_risorse'].isin(df_assenteismo_ferie['Gruppo_risorse'])
+            segnala(AVVISO, foglio, 'Gruppo_risorse senza assenteismo_ferie (head count mancante)',
+                    df.loc[senza_assenteismo, 'Gruppo_risorse'].drop_duplicates())
+
+    # Divisori: velocità e giorni lavorativi nulli dove c'è volume producono head count infiniti
+    if df_volume is not None and df_efficienza_oee is not None:
+        volume_risorsa = matrice_volumi.fillna(0).sum(axis=1).groupby(level='Risorsa').sum()
+        velocita_risorsa = pd.to_numeric(df_efficienza_oee.set_index('Risorsa')['Velocità_LL'], errors='coerce')
+        velocita_risorsa = velocita_risorsa[~velocita_risorsa.index.duplicated()]
+        velocita_con_volume = velocita_risorsa.reindex(volume_risorsa[volume_risorsa > 0].index)
+        segnala(FATALE, 'efficienza_oee', 'Velocità_LL nulla o negativa su risorsa con volume (ore macchina infinite)',
+                velocita_con_volume[velocita_con_volume <= 0].index)
+        segnala(AVVISO, 'efficienza_oee', 'Velocità_LL nulla o negativa',
+                velocita_risorsa[(velocita_risorsa <= 0) & ~velocita_risorsa.index.isin(velocita_con_volume.index)].index)
+
+    if df_calendario is not None:
+        matrice_giorni, non_numerici = matrice_periodi(df_calendario, 'Gruppo_risorse')
+        if non_numerici:
+            segnala(AVVISO, 'calendario', 'Valori non numerici (trattati come mancanti)', [f'{non_numerici} celle'])
+        segnala(AVVISO, 'calendario', 'Giorni_lavorativi oltre 31',
+                matrice_giorni.index[(matrice_giorni > 31).any(axis=1)])
+        if df_volume is not None:
+            matrice_giorni = matrice_giorni[~matrice_giorni.index.duplicated()]
+            volume_gruppo = matrice_volumi.fillna(0).groupby(level='Gruppo_risorse').sum()
+            volume_gruppo = volume_gruppo.T.groupby(level=0).sum().T
+            mesi_senza_calendario = sorted(set(volume_gruppo.columns) - set(matrice_giorni.columns))
+            segnala(AVVISO, 'calendario', 'Mese con volumi ma senza colonna calendario', [str(mese) for mese in mesi_senza_calendario])
+
+            giorni = matrice_giorni.T.groupby(level=0).first().T.reindex(index=volume_gruppo.index, columns=volume_gruppo.columns)
+            giorni_nulli = (giorni <= 0) & (volume_gruppo > 0)
+            righe, colonne = np.nonzero(giorni_nulli.to_numpy())
+            segnala(FATALE, 'calendario', 'Giorni_lavorativi nulli o negativi in mese con volume (head count infinito)',
+                    [f'{giorni.index[r]} | {giorni.columns[c]}' for r, c in zip(righe, colonne)])
+
+    df_report = pd.DataFrame(report, columns=['Livello', 'Foglio', 'Controllo', 'Righe', 'Esempi'])
+    df_report['Livello'] = pd.Categorical(df_report['Livello'], categories=[FATALE, AVVISO], ordered=True)
+    return df_report.sort_values(['Livello', 'Foglio'], kind='stable').reset_index(drop=True)
+
+
+def ha_errori_fatali(df_report):
+    """
+    Indica se il report di validazione contiene errori che devono bloccare i calcoli.
+
+    Args:
+        df_report: DataFrame da valida_master_data
+
+    Returns:
+        True se esiste almeno un errore Fatale
+    """
+    return bool((df_report['Livello'] == FATALE).any())
@@ -0,0 +1,36 @@
+import pandas as pd
+import pytest
+
+from manning_attrezzaggi import crea_modello_attrezzaggi, prepara_attrezzaggi, sostituisci_attrezzisti
+from manning_pipeline import prepara_indiretti
+
+MESE = pd.Timestamp('2026-01-01')
+
+
+def test_modello_compilato_solo_per_un_gruppo():
+    # Il pianificatore compila i tempi solo per il gruppo A: il gruppo B mantiene gli Attrezzisti del foglio
+    df_efficienza_oee = pd.DataFrame({'Gruppo_risorse': ['A', 'A', 'B'], 'Risorsa': ['A1', 'A2', 'B1']})
+    df_volume = df_efficienza_oee.copy()
+    df_volume[MESE] = 100000.0
+    df_equipaggi = pd.DataFrame({'Gruppo_risorse': ['A', 'B'], 'Risorsa': ['Attrezzisti', 'Attrezzisti'], MESE: [4.0, 4.0]})
+    df_calendario_melted = pd.DataFrame({'Gruppo_risorse': ['A', 'B'], 'Anno_Mese': ['2026-01'] * 2, 'Giorni_lavorativi': [20, 20]})
+    df_assenteismo_ferie = pd.DataFrame({'Gruppo_risorse': ['A', 'B'], 'Assenteismo': [0.0, 0.0], 'Copertura_ferie': [0.0, 0.0]})
+
+    modello = crea_modello_attrezzaggi(df_volume, df_efficienza_oee)
+    assert modello['tempi_attrezzaggio']['Minuti_attrezzaggio'].isna().all()
+    df_lotti = modello['lotti']
+    df_lotti[MESE] = 160
+    df_tempi = modello['tempi_attrezzaggio']
+    df_tempi.loc[df_tempi['Gruppo_risorse'] == 'A', 'Minuti_attrezzaggio'] = 30.0
+    # zero esplicito come vuoto: nessun tempo di cambio
+    df_tempi = pd.concat([df_tempi, pd.DataFrame({'Gruppo_risorse': ['B'], 'Risorsa': ['B2'], 'Minuti_attrezzaggio': [0.0]})])
+
+    df_attrezzaggi = prepara_attrezzaggi(df_lotti, df_tempi)
+    assert set(df_attrezzaggi['Risorsa']) == {'A1', 'A2'}
+
+    df_indiretti = sostituisci_attrezzisti(prepara_indiretti(df_equipaggi), df_attrezzaggi, df_efficienza_oee,
+                                           df_calendario_melted, df_assenteismo_ferie, ore_standard=8)
+    attrezzisti = df_indiretti[df_indiretti['Risorsa'] == 'Attrezzisti'].set_index('Gruppo_risorse')['Equipaggi']
+    assert attrezzisti['B'] == pytest.approx(4.0)
+    # 2 risorse x 160 lotti x 30 minuti = 160 ore su 20 giorni x 8 ore
+    assert attrezzisti['A'] == pytest.approx(1.0)
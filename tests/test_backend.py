@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from manning_backend import backend_disponibili, calcola_manning_dettaglio
+from manning_lettura import genera_master_data_sintetico
+from manning_pipeline import carica_e_prepara, calcola_manning
+
+ORE_STANDARD = 8
+
+
+@pytest.fixture(scope='module')
+def caricamento():
+    return carica_e_prepara(genera_master_data_sintetico(n_risorse=30, n_mesi=6, seme=1), motore='openpyxl')
+
+
+@pytest.fixture(scope='module')
+def piano_parquet(caricamento, tmp_path_factory):
+    # volumi_bgt spezzati in tre SKU per Risorsa e mese, alla velocità della Risorsa: stesso head count del budget
+    pytest.importorskip('pyarrow')
+    df_melted = caricamento['df_melted']
+    quote = np.array([0.5, 0.3, 0.2])
+    piano = pd.DataFrame({
+        'Risorsa': np.repeat(df_melted['Risorsa'].to_numpy(), len(quote)),
+        'Anno_Mese': np.repeat(df_melted['Anno_Mese'].to_numpy(), len(quote)),
+        'Volume': (df_melted['Volume'].to_numpy()[:, None] * quote).ravel()
+    })
+    percorso = tmp_path_factory.mktemp('dettaglio') / 'piano.parquet'
+    piano.to_parquet(percorso, index=False)
+    return str(percorso)
+
+
+@pytest.mark.parametrize('backend', ['pandas', 'blocchi', 'duckdb'])
+def test_backend_uguale_al_calcolo_pandas(caricamento, piano_parquet, backend):
+    if backend not in backend_disponibili():
+        pytest.skip(f'{backend} non installato')
+    colonne = ['Gruppo_risorse', 'Anno_Mese', 'Head Count Diretti', 'Head Count Indiretti e Attrezzisti', 'Head Count Totale']
+    atteso = calcola_manning(caricamento, ORE_STANDARD)['df_analisi']
+    atteso = atteso.sort_values(['Gruppo_risorse', 'Anno_Mese']).reset_index(drop=True)[colonne]
+
+    ottenuto = calcola_manning_dettaglio(caricamento, piano_parquet, ORE_STANDARD, backend=backend, dimensione_blocco=50)['df_analisi']
+    ottenuto = ottenuto.sort_values(['Gruppo_risorse', 'Anno_Mese']).reset_index(drop=True)[colonne]
+    pd.testing.assert_frame_equal(ottenuto, atteso, check_dtype=False, check_exact=False, rtol=1e-9)
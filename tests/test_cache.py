@@ -0,0 +1,46 @@
+import pandas as pd
+
+from manning_cache import CacheStadi, impronta_codice
+
+
+def aiuto(x):
+    return x + 1
+
+
+def fase(df):
+    return df['Volume'] / 5 + aiuto(0)
+
+
+def test_chiave_cambia_con_le_costanti():
+    cache = CacheStadi()
+    df = pd.DataFrame({'Volume': [10.0]})
+    originale = fase.__code__
+    chiave = cache.chiave('fase', fase, (df,), {})
+    try:
+        fase.__code__ = originale.replace(co_consts=tuple(4 if c == 5 else c for c in originale.co_consts))
+        assert cache.chiave('fase', fase, (df,), {}) != chiave
+    finally:
+        fase.__code__ = originale
+    assert cache.chiave('fase', fase, (df,), {}) == chiave
+
+
+def test_chiave_cambia_con_gli_helper_richiamati():
+    impronta = impronta_codice(fase)
+    originale = aiuto.__code__
+    try:
+        aiuto.__code__ = originale.replace(co_consts=tuple(2 if c == 1 else c for c in originale.co_consts))
+        assert impronta_codice(fase) != impronta
+    finally:
+        aiuto.__code__ = originale
+    assert impronta_codice(fase) == impronta
+
+
+def test_modifica_in_place_di_una_sessione_non_tocca_il_modello_condiviso():
+    from manning_cache import RegistroModelli
+
+    registro = RegistroModelli()
+    registro.registra('file', {'fogli': {'volumi_bgt': pd.DataFrame({'Volume': [1.0, 2.0]})}})
+    sessione = registro.ottieni('file')
+    sessione['fogli']['volumi_bgt'].loc[0, 'Volume'] = 99.0
+    sessione['fogli']['volumi_bgt']['Volume'] *= 2
+    assert registro.ottieni('file')['fogli']['volumi_bgt']['Volume'].tolist() == [1.0, 2.0]
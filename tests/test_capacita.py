@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+
+from manning_capacita import crea_heatmap_saturazione
+
+
+def test_heatmap_senza_saturazioni_finite():
+    # Nessuna ora disponibile: saturazioni infinite o non calcolabili, la scala resta valida
+    df_saturazione = pd.DataFrame({
+        'Gruppo_risorse': ['Stampa', 'Stampa'],
+        'Risorsa': ['R1', 'R2'],
+        'Anno_Mese': ['2026-01', '2026-01'],
+        'Saturazione': [np.inf, np.nan]
+    })
+    fig = crea_heatmap_saturazione(df_saturazione, soglia_collo_bottiglia=0.0)
+    coloraxis = fig.layout.coloraxis
+    assert coloraxis.cmax == 1.0
+    assert all(np.isfinite(posizione) for posizione, _ in coloraxis.colorscale)
+
+
+def test_heatmap_saturazione_infinita_al_massimo_con_etichetta():
+    # R1 ha ore richieste ma nessun turno: cella piena al massimo della scala, non vuota
+    df_saturazione = pd.DataFrame({
+        'Gruppo_risorse': ['Stampa'] * 4,
+        'Risorsa': ['R1', 'R1', 'R2', 'R2'],
+        'Anno_Mese': ['2026-01', '2026-02'] * 2,
+        'Saturazione': [np.inf, 0.5, 0.8, np.nan]
+    })
+    fig = crea_heatmap_saturazione(df_saturazione)
+    traccia = fig.data[0]
+    np.testing.assert_allclose(np.asarray(traccia.z, dtype=float)[:, 0], [1.5, 0.8])
+    assert np.asarray(traccia.text).tolist() == [['∞ senza turni', '50%'], ['80%', '']]
+    assert traccia.texttemplate == '%{text}'
@@ -0,0 +1,24 @@
+import pandas as pd
+import pytest
+
+from manning_competenze import calcola_copertura_competenze
+
+
+def test_formazioni_di_un_mese_non_entrano_nella_matrice_dei_mesi_successivi():
+    df_fabbisogno = pd.DataFrame({
+        'Gruppo_risorse': ['G'] * 4,
+        'Risorsa': ['A', 'B', 'A', 'B'],
+        'Anno_Mese': ['2026-01', '2026-01', '2026-02', '2026-02'],
+        'Fabbisogno_persone': [0.5, 1.0, 0.5, 0.9]
+    })
+    df_competenze = pd.DataFrame({'Operatore': ['o1', 'o2'], 'Gruppo_risorse': ['G', 'G'], 'A': [1, 1], 'B': [0, 0]})
+
+    df_copertura, df_formazioni, df_assunzioni = calcola_copertura_competenze(df_fabbisogno, df_competenze)
+    copertura_b = df_copertura[df_copertura['Risorsa'] == 'B'].set_index('Anno_Mese')
+
+    # nessuno è qualificato su B nella matrice caricata, in nessun mese
+    assert (copertura_b['Coperto_matrice'] == 0).all()
+    # la formazione proposta nel mese più carico copre anche l'altro
+    assert len(df_formazioni) == 1
+    assert copertura_b.loc['2026-02', 'Coperto_con_formazione'] == pytest.approx(0.9)
+    assert df_assunzioni['Assunzioni'].sum() == 0
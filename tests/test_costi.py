@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from manning_costi import crea_tariffe_default, calcola_costo_lavoro
+
+
+def ore_uomo_gruppo(head_count=100.0, quadratura=0.85, assenteismo=0.06, copertura_ferie=0.10):
+    head_count_quadratura = head_count / quadratura
+    head_count_assenteismo = head_count_quadratura * (1 + assenteismo)
+    return pd.DataFrame({
+        'Gruppo_risorse': ['Stampa'],
+        'Anno_Mese': ['2026-01'],
+        'head_count': [head_count],
+        'delta_quadratura': [head_count_quadratura - head_count],
+        'delta_assenteismo': [head_count_assenteismo - head_count_quadratura],
+        'delta_ferie': [head_count_assenteismo * copertura_ferie]
+    })
+
+
+def test_straordinario_scelto_se_maggiorazione_inferiore_alle_assenze():
+    # incidenza assenze e ferie 1.06 x 1.10 = 16.6%: con maggiorazione 10% lo straordinario costa meno di un assunto
+    tariffe = crea_tariffe_default(['Stampa'], maggiorazione_straordinario=0.10, quota_straordinario_max=0.10,
+                                   costo_interinale_mese=6000.0)
+    costi = calcola_costo_lavoro(ore_uomo_gruppo(), tariffe).iloc[0]
+
+    fattore_assenze = 1.06 * 1.10
+    gap_presenze = costi['HC_gap_assenze'] / fattore_assenze
+    straordinario_max = 0.10 * costi['HC_strutturale'] / fattore_assenze
+    assert costi['HC_straordinario'] == pytest.approx(min(gap_presenze, straordinario_max))
+    assert costi['HC_straordinario'] > 0
+    assert costi['HC_interinali'] == 0
+
+    # più economico che coprire tutto il gap con assunzioni a contratto
+    tutto_contratto = (costi['HC_strutturale'] + costi['HC_gap_assenze']) * 3500.0
+    assert costi['Costo_totale'] < tutto_contratto
+
+
+def test_contratto_scelto_se_maggiorazione_superiore_alle_assenze():
+    tariffe = crea_tariffe_default(['Stampa'], maggiorazione_straordinario=0.25, costo_interinale_mese=6000.0)
+    costi = calcola_costo_lavoro(ore_uomo_gruppo(), tariffe).iloc[0]
+    assert costi['HC_straordinario'] == 0
+    assert costi['HC_contratto_assenze'] == pytest.approx(costi['HC_gap_assenze'])
+
+
+def test_fattore_head_count_scala_anche_gli_indiretti():
+    indiretti = pd.DataFrame({'Gruppo_risorse': ['Stampa'], 'Anno_Mese': ['2026-01'], 'Head Count Indiretti e Attrezzisti': [10.0]})
+    scenari = pd.DataFrame({'Scenario': ['Base', 'Volumi +10%'], 'Fattore_head_count': [1.0, 1.1]})
+    costi = calcola_costo_lavoro(ore_uomo_gruppo(), crea_tariffe_default(['Stampa']), indiretti, scenari).set_index('Scenario')
+    assert costi.loc['Volumi +10%', 'HC_indiretti'] == pytest.approx(11.0)
+    assert costi.loc['Volumi +10%', 'Costo_totale'] == pytest.approx(1.1 * costi.loc['Base', 'Costo_totale'])
@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from manning_costi import crea_tariffe_default, calcola_fattore_assenze, copri_gap_presenze
+from manning_frontiera import calcola_frontiera_copertura
+
+
+def test_flessibilita_prezzata_come_nel_costo_del_lavoro():
+    # Un mese, domanda certa +10% sull'organico senza buffer: 5% in straordinario e il resto in interinali
+    head_count_quadratura = 100.0 / 0.85
+    head_count_assenteismo = head_count_quadratura * 1.06
+    df_ore_uomo = pd.DataFrame({
+        'Gruppo_risorse': ['Stampa'], 'Anno_Mese': ['2026-01'], 'head_count': [100.0],
+        'delta_quadratura': [head_count_quadratura - 100.0],
+        'delta_assenteismo': [head_count_assenteismo - head_count_quadratura],
+        'delta_ferie': [head_count_assenteismo * 0.10],
+        'head_count_assenteismo_ferie': [head_count_assenteismo * 1.10]
+    })
+    df_tariffe = crea_tariffe_default(['Stampa'])
+    df_politiche = pd.DataFrame({'Politica': ['Flessibile'], 'Quota_straordinario': [0.05], 'Quota_interinali': [0.5]})
+
+    candidati = calcola_frontiera_copertura(df_ore_uomo, df_tariffe, df_politiche, buffer_max=0.0, n_buffer=1,
+                                            moltiplicatori=np.array([1.1]))['candidati'].iloc[0]
+
+    organico = df_ore_uomo['head_count_assenteismo_ferie'].iloc[0]
+    fattore = calcola_fattore_assenze(df_ore_uomo)['Fattore_assenze'].iloc[0]
+    tariffa = df_tariffe.iloc[0]
+    copertura = copri_gap_presenze(0.1 * organico, 0.05 * organico, fattore, tariffa['Costo_persona_mese'],
+                                   tariffa['Maggiorazione_straordinario'], tariffa['Costo_interinale_mese'], contratto=False)
+    assert fattore == pytest.approx(1.06 * 1.10)
+    assert candidati['Straordinario_medio'] == pytest.approx(float(copertura['straordinario']))
+    assert candidati['Interinali_medi'] == pytest.approx(float(copertura['interinali']))
+    assert candidati['Costo'] == pytest.approx(tariffa['Costo_persona_mese'] * organico + float(copertura['costo']))
+    assert candidati['Copertura'] == pytest.approx(1.0)
@@ -0,0 +1,73 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from manning_costi import crea_tariffe_default, calcola_costo_lavoro, calcola_fattore_assenze
+from manning_livellamento import calcola_livellamento_organico, costo_copertura
+
+
+def ore_uomo_gruppi(assenteismi, ferie, head_count=100.0, quadratura=0.85):
+    righe = []
+    for i, (assenteismo, copertura_ferie) in enumerate(zip(assenteismi, ferie)):
+        head_count_quadratura = head_count / quadratura
+        head_count_assenteismo = head_count_quadratura * (1 + assenteismo)
+        righe.append({'Gruppo_risorse': f'G{i}', 'Anno_Mese': '2026-01', 'head_count': head_count,
+                      'delta_quadratura': head_count_quadratura - head_count,
+                      'delta_assenteismo': head_count_assenteismo - head_count_quadratura,
+                      'delta_ferie': head_count_assenteismo * copertura_ferie})
+    return pd.DataFrame(righe)
+
+
+def test_stesso_costo_del_costo_del_lavoro():
+    # Tariffe che scelgono ogni copertura: straordinario, contratto, interinali, con tetto raggiunto o no
+    combinazioni = list(itertools.product([0.05, 0.25, 0.60], [0.02, 0.10], [3300.0, 4800.0, 9000.0]))
+    df_ore_uomo = ore_uomo_gruppi([0.06, 0.12] * len(combinazioni), [0.10, 0.05] * len(combinazioni)).iloc[:len(combinazioni)]
+    df_tariffe = crea_tariffe_default(df_ore_uomo['Gruppo_risorse'])
+    df_tariffe[['Maggiorazione_straordinario', 'Quota_straordinario_max', 'Costo_interinale_mese']] = combinazioni
+    indiretti = df_ore_uomo[['Gruppo_risorse', 'Anno_Mese']].assign(**{'Head Count Indiretti e Attrezzisti': 12.0})
+
+    costi = calcola_costo_lavoro(df_ore_uomo, df_tariffe, indiretti).merge(df_tariffe, on='Gruppo_risorse')
+    costi = costi.merge(calcola_fattore_assenze(df_ore_uomo), on=['Gruppo_risorse', 'Anno_Mese'])
+
+    # Stesso piano nel livellamento: organico = persone a contratto del costo del lavoro, fabbisogno = head count totale
+    organico = costi['HC_strutturale'] + costi['HC_indiretti'] + costi['HC_contratto_assenze']
+    fabbisogno = costi['HC_strutturale'] + costi['HC_gap_assenze'] + costi['HC_indiretti']
+    costo, straordinario, interinali = costo_copertura(
+        organico.to_numpy(), fabbisogno.to_numpy(), costi['Fattore_assenze'].to_numpy(), costi['Costo_persona_mese'].to_numpy(),
+        costi['Maggiorazione_straordinario'].to_numpy(), costi['Costo_interinale_mese'].to_numpy(),
+        costi['Quota_straordinario_max'].to_numpy())
+
+    assert (costi['HC_straordinario'] > 0).any() and (costi['HC_interinali'] > 0).any() and (costi['HC_contratto_assenze'] > 0).any()
+    np.testing.assert_allclose(costo, costi['Costo_totale'], rtol=1e-12)
+    np.testing.assert_allclose(straordinario, costi['HC_straordinario'], atol=1e-9)
+    np.testing.assert_allclose(interinali, costi['HC_interinali'], atol=1e-9)
+
+
+def test_costi_dalle_tariffe_del_gruppo_per_head_count_presente():
+    # Picco a metà anno: con uscite costose il piano copre il picco con straordinario e interinali
+    fabbisogno = [10, 10, 14, 14, 10, 10]
+    df_fabbisogno = pd.DataFrame({
+        'Gruppo_risorse': np.repeat(['Stampa', 'Fustellatura'], len(fabbisogno)),
+        'Anno_Mese': [f'2026-{mese:02d}' for mese in range(1, len(fabbisogno) + 1)] * 2,
+        'Head Count Totale': fabbisogno * 2,
+        'Fattore_assenze': np.repeat([1.166, 1.10], len(fabbisogno))
+    })
+    df_tariffe = crea_tariffe_default(['Stampa', 'Fustellatura'])
+    df_tariffe.loc[df_tariffe['Gruppo_risorse'] == 'Fustellatura', ['Costo_persona_mese', 'Maggiorazione_straordinario']] = [4000.0, 0.5]
+
+    df_piano = calcola_livellamento_organico(df_fabbisogno, df_tariffe, costo_assunzione=20000.0, costo_uscita=20000.0)
+
+    df_piano = df_piano.merge(df_tariffe, on='Gruppo_risorse')
+    assert (df_piano['Straordinario'] > 0).any() and (df_piano['Interinali'] > 0).any()
+    # gap coperto in head count presenti, straordinario entro la quota dell'organico presente
+    gap_presenze = np.maximum(df_piano['Fabbisogno'] - df_piano['Organico'], 0) / df_piano['Fattore_assenze']
+    np.testing.assert_allclose(df_piano['Straordinario'] + df_piano['Interinali'], gap_presenze)
+    assert (df_piano['Straordinario'] <= df_piano['Quota_straordinario_max'] * df_piano['Organico'] / df_piano['Fattore_assenze']
+            + 1e-9).all()
+    np.testing.assert_allclose(df_piano['Costo_organico'], df_piano['Organico'] * df_piano['Costo_persona_mese'])
+    np.testing.assert_allclose(df_piano['Costo_straordinario'], df_piano['Straordinario'] * df_piano['Costo_persona_mese']
+                               * (1 + df_piano['Maggiorazione_straordinario']))
+    np.testing.assert_allclose(df_piano['Costo_interinali'], df_piano['Interinali'] * df_piano['Costo_interinale_mese'])
+    assert df_piano.groupby('Gruppo_risorse')['Fattore_assenze'].first().to_dict() == pytest.approx({'Stampa': 1.166, 'Fustellatura': 1.10})
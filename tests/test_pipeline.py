@@ -0,0 +1,41 @@
+from io import BytesIO
+
+import openpyxl
+import pandas as pd
+import pytest
+
+from manning_lettura import genera_master_data_sintetico
+from manning_pipeline import FOGLI_MASTER_DATA, carica_e_prepara, fogli_modificati, impronte_fogli
+
+
+def salva(dati_file, volume_aggiunto=0):
+    # Stesso salvataggio openpyxl per i due file: differiscono solo nella cella modificata di volumi_bgt
+    wb = openpyxl.load_workbook(BytesIO(dati_file))
+    foglio = wb['volumi_bgt']
+    foglio.cell(2, foglio.max_column).value += volume_aggiunto
+    buffer = BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+@pytest.fixture(scope='module')
+def file_master():
+    dati_file = genera_master_data_sintetico(n_risorse=10, n_mesi=3, seme=3)
+    return salva(dati_file), salva(dati_file, 1000)
+
+
+def test_fogli_modificati_solo_il_foglio_cambiato(file_master):
+    originale, modificato = file_master
+    assert fogli_modificati(impronte_fogli(modificato), impronte_fogli(originale)) == {'volumi_bgt'}
+    assert fogli_modificati(impronte_fogli(originale), {}) == set(FOGLI_MASTER_DATA)
+    assert fogli_modificati({}, {}) == set(FOGLI_MASTER_DATA)
+
+
+def test_modello_indipendente_dal_caricamento_precedente(file_master):
+    # Il modello va nel registro condiviso: non deve dipendere dal file precedente della sessione che lo carica
+    originale, modificato = file_master
+    da_zero = carica_e_prepara(modificato, motore='openpyxl')
+    da_precedente = carica_e_prepara(modificato, precedente=carica_e_prepara(originale, motore='openpyxl'), motore='openpyxl')
+    assert da_zero.keys() == da_precedente.keys()
+    assert 'fogli_modificati' not in da_zero
+    pd.testing.assert_frame_equal(da_zero['df_melted'], da_precedente['df_melted'])
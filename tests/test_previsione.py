@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+
+import manning_previsione
+from manning_previsione import prevedi_volumi
+
+
+def storico_sintetico(n_mesi=24):
+    mesi = pd.period_range('2024-01', periods=n_mesi, freq='M').astype(str)
+    stagione = 1 + 0.2 * np.sin(2 * np.pi * np.arange(n_mesi) / 12)
+    return pd.DataFrame({
+        'Gruppo_risorse': 'Stampa',
+        'Risorsa': np.repeat(['R1', 'R2'], n_mesi),
+        'Anno_Mese': np.tile(mesi, 2),
+        'Volume': np.concatenate([100000 * stagione, 50000 * stagione])
+    })
+
+
+def test_holt_winters_con_parametri():
+    _, df_parametri = prevedi_volumi(storico_sintetico(), ['2026-01', '2026-02'])
+    assert (df_parametri['Modello'] == 'Holt-Winters').all()
+    assert df_parametri[['Alfa', 'Beta', 'Gamma', 'RMSE']].notna().all().all()
+
+
+def test_modello_serie_senza_stima_holt_winters(monkeypatch):
+    def non_chiamare(*args, **kwargs):
+        raise AssertionError('Holt-Winters stimato anche con modello_serie')
+    monkeypatch.setattr(manning_previsione, 'holt_winters_vettoriale', non_chiamare)
+
+    def ultimo_valore(serie, passi):
+        return np.full(len(passi), serie[-1])
+
+    df_previsione, df_parametri = prevedi_volumi(storico_sintetico(), ['2026-01', '2026-02'], modello_serie=ultimo_valore)
+    assert (df_parametri['Modello'] == 'ultimo_valore').all()
+    assert df_parametri[['Alfa', 'Beta', 'Gamma', 'RMSE']].isna().all().all()
+    assert len(df_previsione) == 4
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from manning_lettura import genera_master_data_sintetico
+from manning_pipeline import carica_e_prepara, calcola_manning
+from manning_riallocazione import calcola_riallocazione_volumi, crea_grafico_riallocazione
+
+ORE_STANDARD = 8
+
+
+@pytest.fixture(scope='module')
+def riallocazione():
+    caricamento = carica_e_prepara(genera_master_data_sintetico(n_risorse=24, n_mesi=4, seme=4), motore='openpyxl')
+    # Volumi all'80%: il budget sintetico è appena oltre la capacità, l'LP deve essere ammissibile
+    caricamento = {**caricamento, 'df_melted': caricamento['df_melted'].assign(Volume=caricamento['df_melted']['Volume'] * 0.8)}
+    risultati = calcola_manning(caricamento, ORE_STANDARD)
+    risorse_fisse = list(caricamento['df_melted']['Risorsa'].unique()[::5])
+    df_risorse, df_gruppi = calcola_riallocazione_volumi(risultati['df_melted_equipaggi'], risultati['df_ore_uomo_dirette_gruppo'],
+                                                         caricamento['turni_standard'], ORE_STANDARD, risorse_fisse)
+    return df_risorse, df_gruppi
+
+
+def test_ottimo_uguale_a_linprog(riallocazione):
+    # Il riempimento per ore uomo per pezzo crescente deve dare lo stesso ottimo dell'LP risolto con scipy
+    linprog = pytest.importorskip('scipy.optimize').linprog
+    df_risorse, _ = riallocazione
+    confrontati = 0
+    for _, df in df_risorse.groupby(['Gruppo_risorse', 'Anno_Mese']):
+        mobili = df[df['Intercambiabile']]
+        if mobili['Capacita_superata'].any():
+            continue
+        soluzione = linprog(mobili['ore_uomo_per_pezzo'].to_numpy(),
+                            A_eq=np.ones((1, len(mobili))), b_eq=[mobili['Volume_budget'].sum()],
+                            bounds=list(zip(np.zeros(len(mobili)), mobili['Volume_capacita'])), method='highs')
+        assert soluzione.status == 0
+        np.testing.assert_allclose(mobili['ore_uomo_ottimo'].sum(), soluzione.fun, rtol=1e-7)
+        fisse = df[~df['Intercambiabile']]
+        np.testing.assert_allclose(fisse['Volume_ottimo'], fisse['Volume_budget'])
+        confrontati += 1
+    assert confrontati > 0
+
+
+def test_etichetta_variazione_head_count(riallocazione):
+    _, df_gruppi = riallocazione
+    gruppo = df_gruppi['Gruppo_risorse'].iloc[0]
+    fig = crea_grafico_riallocazione(df_gruppi.assign(Risparmio_head_count=[2.5, -1.0] + [0.0] * (len(df_gruppi) - 2)), gruppo)
+    etichette = list(fig.data[1].text)
+    assert etichette[0] == '<b>-2.5</b>'
+    assert etichette[1] == '<b>+1.0</b>'
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from manning_lettura import genera_master_data_sintetico
+from manning_pipeline import carica_e_prepara, calcola_manning
+from manning_rolling import (congela_mesi, calcola_rolling_forecast, percorso_congelati, salva_congelati, carica_congelati,
+                             elimina_congelati)
+from manning_turni import crea_piano_turni
+
+ORE_STANDARD = 8
+COLONNE = ['Head Count Diretti', 'Head Count Indiretti e Attrezzisti', 'Head Count Totale']
+
+
+@pytest.fixture(scope='module')
+def caricamento():
+    return carica_e_prepara(genera_master_data_sintetico(n_risorse=20, n_mesi=6, seme=2), motore='openpyxl')
+
+
+def test_rolling_senza_consuntivi_coincide_con_budget_con_piano_turni(caricamento):
+    # Risorse in 4x6: Ore_turno diverse da ore_standard, il piano turni cambia l'head count
+    risorse = caricamento['turni_standard']['Risorsa'].unique()
+    df_piano_turni = crea_piano_turni(caricamento['turni_standard'], ORE_STANDARD, {risorsa: '4x6' for risorsa in risorse[::2]})
+    mesi = sorted(caricamento['df_melted']['Anno_Mese'].unique())
+
+    congelati = congela_mesi(caricamento, pd.DataFrame(), mesi[2], ORE_STANDARD, df_piano_turni=df_piano_turni)
+    rolling = calcola_rolling_forecast(caricamento, congelati, ORE_STANDARD, df_piano_turni)['df_analisi']
+    budget = calcola_manning(caricamento, ORE_STANDARD, df_piano_turni)['df_analisi']
+
+    chiavi = ['Gruppo_risorse', 'Anno_Mese']
+    confronto = budget.merge(rolling, on=chiavi, suffixes=('_budget', '_rolling'), validate='one_to_one')
+    assert len(confronto) == len(budget)
+    for col in COLONNE:
+        np.testing.assert_allclose(confronto[f'{col}_rolling'], confronto[f'{col}_budget'], rtol=1e-9)
+
+
+def test_mesi_congelati_ritrovati_su_disco_con_gli_stessi_input(caricamento, tmp_path):
+    # Nuova sessione (o riavvio) con lo stesso file e gli stessi input: ritrova i mesi chiusi, input diversi no
+    mesi = sorted(caricamento['df_melted']['Anno_Mese'].unique())
+    congelati = congela_mesi(caricamento, pd.DataFrame(), mesi[1], ORE_STANDARD)
+    percorso = percorso_congelati(tmp_path / 'rolling', 'file', caricamento['df_melted'], None)
+    salva_congelati(congelati, percorso)
+
+    assert percorso_congelati(tmp_path / 'rolling', 'file', caricamento['df_melted'].copy(), None) == percorso
+    assert percorso_congelati(tmp_path / 'rolling', 'file', caricamento['df_melted'].iloc[1:], None) != percorso
+    ritrovati = carica_congelati(percorso)
+    pd.testing.assert_frame_equal(ritrovati['df_analisi'], congelati['df_analisi'])
+
+    elimina_congelati(percorso)
+    assert carica_congelati(percorso)['df_analisi'].empty
@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+from manning_lettura import genera_master_data_sintetico
+from manning_pipeline import carica_e_prepara, calcola_manning
+from manning_sensitivita import calcola_gradienti_head_count
+
+ORE_STANDARD = 8
+
+
+@pytest.fixture(scope='module')
+def risultati():
+    caricamento = carica_e_prepara(genera_master_data_sintetico(n_risorse=10, n_mesi=3, seme=6), motore='openpyxl')
+    return calcola_manning(caricamento, ORE_STANDARD)
+
+
+def test_derivata_equipaggi_definita_con_equipaggi_a_zero(risultati):
+    df_melted_equipaggi = risultati['df_melted_equipaggi']
+    df_ore_uomo = risultati['df_ore_uomo_dirette_gruppo']
+    senza_equipaggi = df_melted_equipaggi.assign(Equipaggi=np.where(df_melted_equipaggi.index == 0, 0.0,
+                                                                    df_melted_equipaggi['Equipaggi']))
+
+    def derivate(df):
+        df_gradienti = calcola_gradienti_head_count(df, df_ore_uomo, ORE_STANDARD)
+        return df_gradienti.loc[df_gradienti['Tipo_driver'] == 'Equipaggi', 'Derivata'].to_numpy()
+
+    # Il contributo è lineare negli equipaggi: la derivata non dipende dal loro valore, nemmeno a zero
+    attesa = derivate(df_melted_equipaggi)
+    assert np.isfinite(attesa[0]) and attesa[0] > 0
+    np.testing.assert_allclose(derivate(senza_equipaggi), attesa)
@@ -0,0 +1,66 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from manning_lettura import genera_master_data_sintetico
+from manning_servizio import ModelloManning, crea_handler
+
+
+@pytest.fixture(scope='module')
+def servizio(tmp_path_factory):
+    percorso = tmp_path_factory.mktemp('servizio') / 'master_data.xlsx'
+    percorso.write_bytes(genera_master_data_sintetico(n_risorse=10, n_mesi=3, seme=4))
+    modello = ModelloManning(str(percorso))
+    server = ThreadingHTTPServer(('127.0.0.1', 0), crea_handler(modello))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield modello, f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+
+
+def invia(url, percorso, payload):
+    richiesta = urllib.request.Request(url + percorso, data=json.dumps(payload).encode(), method='POST',
+                                       headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(richiesta, timeout=60) as risposta:
+            return risposta.status, json.loads(risposta.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_payload_non_valido_risponde_400(servizio):
+    modello, url = servizio
+    gruppo = modello.caricamento['fogli']['efficienza_oee']['Gruppo_risorse'].iloc[0]
+    risorsa = modello.caricamento['fogli']['efficienza_oee']['Risorsa'].iloc[0]
+
+    # Lista al posto dell'oggetto: prima nessuna risposta (AttributeError su payload.get)
+    codice, corpo = invia(url, '/head_count/lotto', [{}])
+    assert codice == 400 and 'oggetto' in corpo['errore']
+    codice, corpo = invia(url, '/head_count/lotto', {'richieste': {}})
+    assert codice == 400
+
+    # Override che valida_master_data avrebbe bloccato: prima head count nulli in risposta
+    for payload in [{'quadratura': {gruppo: 0}}, {'quadratura': {gruppo: 0.85}}, {'velocita': {risorsa: 0}},
+                    {'velocita': {risorsa: None}}, {'quadratura': [90]}]:
+        codice, corpo = invia(url, '/head_count', payload)
+        assert codice == 400, payload
+
+    codice, corpo = invia(url, '/head_count/lotto', {'richieste': [{'quadratura': {gruppo: 90}}, {'quadratura': {gruppo: 0}}]})
+    assert codice == 200
+    assert all(record['Head Count Diretti'] is not None for record in corpo['risposte'][0])
+    assert 'Quadratura' in corpo['risposte'][1]['errore']
+
+
+def test_errore_imprevisto_risponde_500_json(servizio, monkeypatch):
+    modello, url = servizio
+
+    def guasto(override):
+        raise RuntimeError('calcolo interrotto')
+
+    monkeypatch.setattr(modello, 'head_count', guasto)
+    codice, corpo = invia(url, '/head_count', {})
+    assert codice == 500 and 'calcolo interrotto' in corpo['errore']
@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+
+from manning_lettura import genera_master_data_sintetico
+from manning_pipeline import leggi_master_data
+from manning_validazione import FATALE, valida_master_data, ha_errori_fatali
+
+
+@pytest.fixture(scope='module')
+def fogli():
+    return leggi_master_data(genera_master_data_sintetico(n_risorse=30, n_mesi=3, seme=5), motore='openpyxl')
+
+
+def test_quadratura_mancante_o_non_numerica_fatale(fogli):
+    assert not ha_errori_fatali(valida_master_data(fogli))
+
+    # Una cella vuota e una di testo in due gruppi: prima passavano tutti i controlli (NaN non è <= 0)
+    df_oee = fogli['efficienza_oee'].copy().astype({'Quadratura': object})
+    gruppi = df_oee['Gruppo_risorse'].drop_duplicates().to_list()[:2]
+    df_oee.loc[df_oee['Gruppo_risorse'] == gruppi[0], 'Quadratura'] = np.nan
+    df_oee.loc[df_oee.index[df_oee['Gruppo_risorse'] == gruppi[1]][0], 'Quadratura'] = 'n.d.'
+
+    report = valida_master_data({**fogli, 'efficienza_oee': df_oee})
+    fatali = report[report['Livello'] == FATALE].set_index('Controllo')['Esempi']
+    assert set(fatali['Quadratura mancante o non numerica (divisore)'].split(', ')) == set(gruppi)
+    # Il gruppo con una sola cella non numerica ha quadrature diverse tra le risorse
+    assert gruppi[1] in fatali['Quadratura diversa tra risorse dello stesso gruppo (righe duplicate nel merge)']